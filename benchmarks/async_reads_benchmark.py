@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+"""
+Wall time of a multi-address getBalance (resolve each Unstoppable Domain, then read each balance) on the supervisor
+Lambda's synchronous web3 path against the concurrent AsyncWeb3 path in `async_reads.py`, with a fake JSON-RPC node
+(fake_rpc.py) that delays every request. It checks that both paths return the same balances and that no more than
+the concurrency cap of requests reach the node at once.
+
+    python benchmarks/async_reads_benchmark.py --domains 3 --addresses 3 --latency-ms 80 --limit 8
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+os.environ.setdefault("POWERTOOLS_METRICS_DISABLED", "true")
+os.environ.setdefault("POWERTOOLS_TRACE_DISABLED", "true")
+os.environ.setdefault("POWERTOOLS_LOG_LEVEL", "ERROR")
+# Measure round trips, not the block read cache (read_cache_benchmark.py covers that)
+os.environ.setdefault("RPC_CACHE_MAX_ENTRIES", "0")
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "lib/shared/tracing"))
+sys.path.insert(0, os.path.join(ROOT, "lib/crypto-ai-agent-supervisor-stack/lambda"))
+
+from fake_rpc import FakeRPCServer  # noqa: E402
+
+from web3 import Web3  # noqa: E402
+
+import unstoppable_domains  # noqa: E402
+from async_reads import get_balances, run  # noqa: E402
+from chains import get_chain  # noqa: E402
+from provider_pool import PooledHTTPProvider  # noqa: E402
+from rpc import get_rpc_pool  # noqa: E402
+
+
+def sync_balances(w3, addresses):
+    # The one-at-a-time path index.py used before: resolve, then read the balance, address after address
+    contract = w3.eth.contract(
+        address=Web3.to_checksum_address(get_chain()["ud_resolver"]),
+        abi=unstoppable_domains.ABI,
+    )
+    results = []
+    for address in addresses:
+        if not unstoppable_domains.is_address(address):
+            address = contract.functions.getData([], unstoppable_domains.token_id(address)).call()[1]
+        results.append((address, Web3.from_wei(w3.eth.get_balance(Web3.to_checksum_address(address)), "ether")))
+    return results
+
+
+def timed(function, repeats):
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = function()
+        timings.append((time.perf_counter() - start) * 1000)
+    return result, statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--domains", type=int, default=3)
+    parser.add_argument("--addresses", type=int, default=3)
+    parser.add_argument("--latency-ms", type=float, default=80.0)
+    parser.add_argument("--limit", type=int, default=8)
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    with FakeRPCServer(latency_seconds=args.latency_ms / 1000) as node:
+        os.environ["BLOCKCHAIN_RPC_URLS"] = node.url
+        chain = node.chain
+        addresses = []
+        for i in range(args.domains + args.addresses):
+            owner = "0x" + format(0xA11CE + i, "040x")
+            chain.balances[owner] = (i + 1) * 10 ** 17
+            if i < args.domains:
+                domain = f"wallet{i}.crypto"
+                chain.register_domain(unstoppable_domains.token_id(domain), owner)
+                addresses.append(domain)
+            else:
+                addresses.append(owner)
+
+        w3 = Web3(PooledHTTPProvider(get_rpc_pool()))
+        # Warm up: the first async run opens the aiohttp session
+        run(get_balances(addresses[:1]))
+
+        expected, sync_ms = timed(lambda: sync_balances(w3, addresses), args.repeats)
+        print(f"{len(addresses)} balances ({args.domains} domains), {args.latency_ms:.0f} ms per RPC round trip")
+        print(f"{'path':<28}{'wall ms':>10}{'peak in flight':>16}")
+        print(f"{'sync, one at a time':<28}{sync_ms:>10.0f}{1:>16}")
+
+        ok = True
+        for limit in sorted({1, 2, args.limit}):
+            node.reset_counters()
+            results, async_ms = timed(lambda: run(get_balances(addresses, limit=limit)), args.repeats)
+            print(f"{f'async, limit {limit}':<28}{async_ms:>10.0f}{node.max_in_flight:>16}")
+            ok &= [(Web3.to_checksum_address(a), b) for a, b in results] == \
+                [(Web3.to_checksum_address(a), b) for a, b in expected]
+            ok &= node.max_in_flight <= limit
+
+    print()
+    print("{:<60}{}".format("async results match the sync path, cap respected", "ok" if ok else "FAILED"))
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+"""
+Reads Athena query results with the txtsql Lambda's reader (`athena_results.py`): the result CSV streamed from S3
+with ranged GETs against paging GetQueryResults. Runs against the Athena stand-in of fake_services.py writing its
+result CSVs to a moto S3 server, over a table of --rows rows with NULLs, quotes, commas, line breaks and non-ASCII
+text in its values. It checks that:
+- both sources give the same typed rows, with ranges small enough to split rows and characters
+- the answer keeps to the row and byte budget, and the summary of the other rows matches DuckDB's aggregates
+- past the scan budget the row count is estimated from the bytes left
+- an unreadable result object falls back to GetQueryResults
+It then compares reading the whole result (no budget) and answering with the default budget from each source:
+requests, wall time and rows/s, plus the time at --latency-ms per request (moto and the stand-in answer at once).
+
+    python benchmarks/athena_results_check.py --rows 10000 100000 --latency-ms 50
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from contextlib import ExitStack
+
+os.environ.setdefault("POWERTOOLS_METRICS_DISABLED", "true")
+os.environ.setdefault("POWERTOOLS_TRACE_DISABLED", "true")
+os.environ.setdefault("POWERTOOLS_LOG_LEVEL", "ERROR")
+os.environ.update(AWS_REGION="us-east-1", AWS_DEFAULT_REGION="us-east-1", AWS_ACCESS_KEY_ID="check",
+                  AWS_SECRET_ACCESS_KEY="check")
+
+BENCHMARKS = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCHMARKS)
+sys.path.insert(0, os.path.join(ROOT, "lib/shared/tracing"))
+sys.path.insert(0, os.path.join(ROOT, "lib/knowledge-base-blockchain-data-stack/lambda/bedrock-agent-txtsql-action"))
+
+BUCKET = "check-results"
+
+# Every Athena type the reader converts, with awkward text
+TABLE = """SELECT
+    i AS id,
+    (i * 7919) % 1000003 AS amount,
+    CASE WHEN i % 11 = 0 THEN NULL ELSE i * 0.25::DOUBLE END AS ratio,
+    CAST(i AS DECIMAL(38, 0)) * 1000000000000000000 AS wei,
+    i % 3 = 0 AS flagged,
+    DATE '2024-01-01' + CAST(i % 365 AS INTEGER) AS day,
+    CASE i % 5
+        WHEN 0 THEN 'plain'
+        WHEN 1 THEN 'comma, and "quotes"'
+        WHEN 2 THEN 'line' || chr(10) || 'break'
+        WHEN 3 THEN 'naïve ünïcödé €'
+        ELSE ''
+    END AS note,
+    CASE WHEN i % 13 = 0 THEN NULL ELSE md5(i::VARCHAR) END AS hash
+FROM range({rows}) t(i)"""
+
+
+def check(name, condition):
+    print("{:<72}{}".format(name, "ok" if condition else "FAILED"))
+    return condition
+
+
+def run_query(athena, query):
+    execution_id = athena.start_query_execution(
+        QueryString=query, ResultConfiguration={"OutputLocation": f"s3://{BUCKET}/"}
+    )["QueryExecutionId"]
+    return athena.get_query_execution(QueryExecutionId=execution_id)["QueryExecution"]
+
+
+def api_only(execution):
+    # The same execution without a CSV output location: read_results pages GetQueryResults
+    return dict(execution, ResultConfiguration={})
+
+
+def budget(max_rows, max_bytes, scan_bytes=None):
+    import athena_results
+
+    athena_results.MAX_ROWS = max_rows
+    athena_results.MAX_BYTES = max_bytes
+    athena_results.SCAN_BYTES = scan_bytes or 1 << 40
+
+
+def timed(reader, athena, s3, execution, counter):
+    before = counter()
+    start = time.perf_counter()
+    result = reader(athena, s3, execution)
+    return result, time.perf_counter() - start, counter() - before
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    args = parser.parse_args()
+
+    import boto3
+    from event_replay_benchmark import start_s3
+    from fake_services import FakeAthenaServer
+
+    with ExitStack() as stack:
+        s3_endpoint = start_s3(stack, BUCKET)
+        if not s3_endpoint:
+            sys.exit(1)
+        server = stack.enter_context(FakeAthenaServer(rows=0, s3_endpoint=s3_endpoint))
+        athena = boto3.client("athena", endpoint_url=server.url)
+        s3 = boto3.client("s3", endpoint_url=s3_endpoint)
+        s3_gets = {"count": 0}
+        s3.meta.events.register("before-call.s3.GetObject",
+                                lambda **kwargs: s3_gets.__setitem__("count", s3_gets["count"] + 1))
+
+        import athena_results
+        from athena_results import read_results
+
+        ok = True
+        rows = 5000
+        server.add_table("checks", TABLE.format(rows=rows))
+        execution = run_query(athena, "SELECT * FROM checks ORDER BY id")
+
+        budget(10 ** 9, 10 ** 12)
+        athena_results.RANGE_MIN_BYTES = 1000
+        from_s3 = read_results(athena, s3, execution)
+        athena_results.RANGE_MIN_BYTES = 256 * 1024
+        from_api = read_results(athena, s3, api_only(execution))
+        if athena_results.CSV_QUOTING == csv.QUOTE_MINIMAL:
+            # Before Python 3.12 the csv module reads a NULL varchar like an empty one
+            varchars = [i for i, column in enumerate(from_api["columns"]) if column["type"] == "varchar"]
+            from_api["rows"] = [["" if i in varchars and value is None else value for i, value in enumerate(row)]
+                                for row in from_api["rows"]]
+            print("csv.QUOTE_NOTNULL needs Python 3.12: NULL varchar values read as ''")
+        ok &= check("the streamed CSV and GetQueryResults give the same typed rows",
+                    from_s3["rows"] == from_api["rows"] and from_s3["rowCount"] == rows)
+        sample = from_s3["rows"][:5]
+        ok &= check("values are typed from the column types",
+                    sample[1][0] == 1 and sample[1][2] == 0.25 and sample[1][3] == "1000000000000000000"
+                    and sample[0][4] is True and sample[1][6] == 'comma, and "quotes"' and sample[0][2] is None
+                    and sample[3][6] == "naïve ünïcödé €" and "\n" in sample[2][6])
+
+        budget(100, 8000)
+        answer = read_results(athena, s3, execution)
+        size = len(json.dumps(answer["rows"]))
+        rest = server.connection.execute(
+            f"SELECT count(*), sum(amount), min(ratio), max(day), count(*) - count(ratio) "
+            f"FROM (SELECT * FROM checks ORDER BY id OFFSET {len(answer['rows'])})"
+        ).fetchone()
+        summary = answer["remaining"]["columns"]
+        ok &= check("the answer keeps to the row and byte budget",
+                    0 < len(answer["rows"]) <= 100 and size <= 8000 and answer["truncated"]
+                    and answer["rowCount"] == rows)
+        ok &= check("the rest is summarized like DuckDB aggregates it",
+                    answer["remaining"]["rows"] == rest[0] and summary["amount"]["sum"] == rest[1]
+                    and summary["ratio"]["min"] == rest[2] and summary["day"]["max"] == str(rest[3])
+                    and summary["ratio"]["nulls"] == rest[4])
+        ok &= check("the answer fits a Bedrock agent response", len(json.dumps(answer)) < 25000)
+
+        budget(100, 8000, scan_bytes=200000)
+        athena_results.RANGE_MIN_BYTES = 50000
+        partial = read_results(athena, s3, execution)
+        athena_results.RANGE_MIN_BYTES = 256 * 1024
+        ok &= check("past the scan budget the row count is estimated",
+                    partial["remaining"].get("complete") is False and partial["rowCount"] < rows
+                    and abs(partial["estimatedRowCount"] - rows) < rows * 0.1)
+
+        budget(100, 8000)
+        missing = dict(execution, ResultConfiguration={"OutputLocation": f"s3://{BUCKET}/missing.csv"})
+        ok &= check("an unreadable result object falls back to GetQueryResults",
+                    [row[:6] for row in read_results(athena, s3, missing)["rows"]]
+                    == [row[:6] for row in answer["rows"]])
+
+        print()
+        print(f"reading results, {args.latency_ms:.0f} ms per request at the modeled latency")
+        print(f"{'rows':>8}{'read':>14}{'source':>8}{'requests':>10}{'ms':>10}{'rows/s':>12}{'ms at latency':>16}")
+        for count in args.rows:
+            server.add_table("results", TABLE.format(rows=count))
+            execution = run_query(athena, "SELECT * FROM results")
+            for label, limits in (("everything", (10 ** 9, 10 ** 12)), ("budget", (200, 16000))):
+                budget(*limits)
+                for source in ("s3", "api"):
+                    target = execution if source == "s3" else api_only(execution)
+                    # Calls to the stand-in: GetQueryResults pages (and the column types of the S3 read)
+                    counter = (lambda: server.requests + s3_gets["count"])
+                    result, seconds, requests = timed(read_results, athena, s3, target, counter)
+                    modeled = seconds * 1000 + requests * args.latency_ms
+                    print(f"{count:>8}{label:>14}{source:>8}{requests:>10}{seconds * 1000:>10.0f}"
+                          f"{count / seconds:>12,.0f}{modeled:>16,.0f}")
+                    ok &= result["rowCount"] == count
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+"""
+Drill for the blue/green index deployment in `oss_handler.deploy_blue_green_index`, run against a local
+OpenSearch container. It creates the alias-backed index, loads documents, then rolls out a different index
+profile while a background thread keeps querying the alias, and reports:
+- failed or empty queries during the roll-out (expected: 0)
+- the document count behind the alias before and after
+- which physical index is live and whether the previous one is gone
+- per-phase timings
+- that a roll-out to another vector dimension swaps to an empty index for re-ingestion and keeps the previous one
+
+    python benchmarks/blue_green_swap_drill.py --docs 5000 --from-profile default --to-profile compact
+"""
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "lib/knowledge-base-news-stack/src/amazon_bedrock_knowledge_base_infra_setup_lambda"))
+sys.path.insert(0, os.path.join(ROOT, "lib/shared/embedding_models"))
+os.environ.setdefault("AWS_REGION", "us-east-1")
+
+from opensearchpy import OpenSearch  # noqa: E402
+
+from oss_handler import deploy_blue_green_index  # noqa: E402
+from oss_utils import build_index_request, count_documents, get_alias_targets  # noqa: E402
+
+MODEL_ID = "amazon.titan-embed-text-v2:0"
+VECTOR_FIELD = "bedrock-knowledge-base-default-vector"
+TEXT_FIELD = "AMAZON_BEDROCK_TEXT_CHUNK"
+
+
+def load_documents(client, alias_name, num_docs, dimension, seed):
+    rng = random.Random(seed)
+    for start in range(0, num_docs, 500):
+        body = []
+        for doc_id in range(start, min(start + 500, num_docs)):
+            body.append({"index": {"_index": alias_name}})
+            body.append({
+                TEXT_FIELD: "news chunk {}".format(doc_id),
+                VECTOR_FIELD: [rng.uniform(-1, 1) for _ in range(dimension)],
+            })
+        client.bulk(body=body)
+    client.indices.refresh(index=alias_name)
+
+
+class AliasQueryLoop(threading.Thread):
+    def __init__(self, client, alias_name, dimension):
+        super().__init__(daemon=True)
+        self.client = client
+        self.alias_name = alias_name
+        self.vector = [0.1] * dimension
+        self.stop_event = threading.Event()
+        self.queries = 0
+        self.failures = []
+
+    def run(self):
+        while not self.stop_event.is_set():
+            self.queries += 1
+            try:
+                response = self.client.search(
+                    index=self.alias_name,
+                    body={"size": 3, "query": {"knn": {VECTOR_FIELD: {"vector": self.vector, "k": 3}}}},
+                )
+                if not response["hits"]["hits"]:
+                    self.failures.append("empty result")
+            except Exception as e:
+                self.failures.append(str(e))
+            time.sleep(0.05)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=9200)
+    parser.add_argument("--alias", default="blue-green-drill")
+    parser.add_argument("--docs", type=int, default=5000)
+    parser.add_argument("--dimension", type=int, default=256, choices=[256, 512, 1024])
+    parser.add_argument("--from-profile", default="default")
+    parser.add_argument("--to-profile", default="compact")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    client = OpenSearch(hosts=[{"host": args.host, "port": args.port}], timeout=120)
+    for index_name in get_alias_targets(client, args.alias):
+        client.indices.delete(index=index_name)
+
+    old_request = build_index_request(MODEL_ID, args.from_profile, args.dimension)
+    new_request = build_index_request(MODEL_ID, args.to_profile, args.dimension)
+
+    deploy_blue_green_index(client, args.alias, old_request)
+    load_documents(client, args.alias, args.docs, args.dimension, args.seed)
+    old_targets = get_alias_targets(client, args.alias)
+    count_before = count_documents(client, args.alias)
+
+    query_loop = AliasQueryLoop(client, args.alias, args.dimension)
+    query_loop.start()
+    timings = deploy_blue_green_index(client, args.alias, new_request)
+    time.sleep(1)
+    query_loop.stop_event.set()
+    query_loop.join()
+
+    new_targets = get_alias_targets(client, args.alias)
+    print("alias {}: {} -> {}".format(args.alias, old_targets, new_targets))
+    print("documents: {} -> {}".format(count_before, count_documents(client, args.alias)))
+    print("previous index removed: {}".format(not any(client.indices.exists(index=i) for i in old_targets)))
+    print("queries during roll-out: {}, failed or empty: {}".format(query_loop.queries, len(query_loop.failures)))
+    for failure in query_loop.failures[:5]:
+        print("  {}".format(failure))
+    for phase, seconds in timings.items():
+        print("{:<14}{:>8.2f}s".format(phase, seconds))
+
+    other_dimension = 512 if args.dimension != 512 else 256
+    deploy_blue_green_index(client, args.alias, build_index_request(MODEL_ID, args.to_profile, other_dimension))
+    reingest_targets = get_alias_targets(client, args.alias)
+    print("dimension {} -> {}: alias {} -> {}".format(args.dimension, other_dimension, new_targets, reingest_targets))
+    print(
+        "incompatible roll-out swapped to an empty index, previous kept: {}".format(
+            reingest_targets != new_targets
+            and count_documents(client, args.alias) == 0
+            and all(count_documents(client, index_name) == count_before for index_name in new_targets)
+        )
+    )
+
+    for index_name in new_targets + reingest_targets:
+        client.indices.delete(index=index_name)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+"""
+CPU time of building the ERC-20 calls of sendToken and getTokenBalance with the precomputed selectors and 32-byte
+word packing of `tokens.py`, against web3's contract path: `contract.functions.transfer(...).build_transaction`
+with every field given (so web3 makes no RPC call), on a contract created per call and on one reused contract, and
+`contract.encode_abi("balanceOf", ...)`. Random receivers and amounts, the same for every path.
+
+It prints the per-call p50 and throughput of each path, and checks that:
+- every path produces the same calldata and transaction, including for amounts 0, 1 and 2**256 - 1
+- an amount over 2**256 - 1 and an amount with more decimals than the token are rejected
+- the web3 path made no RPC request (it is compared on encoding alone)
+
+    python benchmarks/erc20_encoding_benchmark.py --calls 20000
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+from decimal import Decimal
+
+os.environ.setdefault("POWERTOOLS_METRICS_DISABLED", "true")
+os.environ.setdefault("POWERTOOLS_TRACE_DISABLED", "true")
+os.environ.setdefault("POWERTOOLS_LOG_LEVEL", "ERROR")
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "lib/shared/tracing"))
+sys.path.insert(0, os.path.join(ROOT, "lib/crypto-ai-agent-supervisor-stack/lambda"))
+
+from fake_rpc import FakeRPCServer  # noqa: E402
+
+from web3 import Web3  # noqa: E402
+
+from tokens import MAX_UINT256, TOKENS, balance_of_data, get_token, to_units, transfer_data  # noqa: E402
+
+ERC20_ABI = [
+    {"type": "function", "name": "transfer", "stateMutability": "nonpayable",
+     "inputs": [{"name": "to", "type": "address"}, {"name": "value", "type": "uint256"}],
+     "outputs": [{"name": "", "type": "bool"}]},
+    {"type": "function", "name": "balanceOf", "stateMutability": "view",
+     "inputs": [{"name": "owner", "type": "address"}],
+     "outputs": [{"name": "", "type": "uint256"}]},
+]
+SENDER = "0x000000000000000000000000000000000000dEaD"
+GAS_PRICE = 30 * 10 ** 9
+CHAIN_ID = 137
+
+
+def fast_transfer(token_address, receiver, units, nonce):
+    # What send_transaction builds for a token
+    return {
+        "to": token_address,
+        "value": 0,
+        "data": transfer_data(receiver, units),
+        "gas": 62400,
+        "gasPrice": GAS_PRICE,
+        "nonce": nonce,
+        "chainId": CHAIN_ID,
+    }
+
+
+def web3_transfer(contract, receiver, units, nonce):
+    return contract.functions.transfer(receiver, units).build_transaction({
+        "from": SENDER,
+        "value": 0,
+        "gas": 62400,
+        "gasPrice": GAS_PRICE,
+        "nonce": nonce,
+        "chainId": CHAIN_ID,
+    })
+
+
+def same_transaction(fast, built):
+    return all(str(fast[field]).lower() == str(built[field]).lower()
+               for field in ("to", "value", "data", "gas", "gasPrice", "nonce", "chainId"))
+
+
+def measure(function, cases):
+    timings = []
+    start = time.perf_counter()
+    for case in cases:
+        call_start = time.perf_counter_ns()
+        function(*case)
+        timings.append((time.perf_counter_ns() - call_start) / 1000)
+    wall = time.perf_counter() - start
+    return statistics.median(timings), sorted(timings)[int(len(timings) * 0.99) - 1], len(cases) / wall
+
+
+def check(name, condition):
+    print("{:<66}{}".format(name, "ok" if condition else "FAILED"))
+    return condition
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=20000)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    token_address = Web3.to_checksum_address(TOKENS["polygon"]["USDC"][0])
+    receivers = [Web3.to_checksum_address("0x" + rng.randbytes(20).hex()) for _ in range(256)]
+    cases = [(receivers[i % len(receivers)], rng.randrange(1, 10 ** 12), i) for i in range(args.calls)]
+    edge_cases = [(receivers[0], units, 0) for units in (0, 1, MAX_UINT256)]
+
+    with FakeRPCServer() as node:
+        w3 = Web3(Web3.HTTPProvider(node.url))
+        node.reset_counters()
+        reused = w3.eth.contract(address=token_address, abi=ERC20_ABI)
+
+        paths = {
+            "tokens.transfer_data": lambda receiver, units, nonce: fast_transfer(token_address, receiver, units, nonce),
+            "web3, reused contract": lambda receiver, units, nonce: web3_transfer(reused, receiver, units, nonce),
+            "web3, contract per call": lambda receiver, units, nonce: web3_transfer(
+                w3.eth.contract(address=token_address, abi=ERC20_ABI), receiver, units, nonce),
+            "tokens.balance_of_data": lambda receiver, units, nonce: balance_of_data(receiver),
+            "web3 encode_abi balanceOf": lambda receiver, units, nonce: reused.encode_abi("balanceOf", args=[receiver]),
+        }
+
+        ok = True
+        ok &= check("transfer transactions identical to web3's, edge amounts included", all(
+            same_transaction(fast_transfer(token_address, *case), web3_transfer(reused, *case))
+            for case in cases[:1000] + edge_cases
+        ))
+        ok &= check("balanceOf calldata identical to web3's", all(
+            balance_of_data(receiver) == reused.encode_abi("balanceOf", args=[receiver]) for receiver in receivers
+        ))
+
+        results = {name: measure(function, cases) for name, function in paths.items()}
+        rpc_requests = node.http_requests
+
+    usdc = get_token("USDC", "polygon")
+    try:
+        transfer_data(receivers[0], MAX_UINT256 + 1)
+        overflow_rejected = False
+    except ValueError:
+        overflow_rejected = True
+    try:
+        to_units(Decimal("1.0000001"), usdc)
+        precision_rejected = False
+    except ValueError:
+        precision_rejected = True
+    ok &= check("an amount over 2**256 - 1 is rejected", overflow_rejected)
+    ok &= check("an amount with more decimals than the token is rejected",
+                precision_rejected and to_units(Decimal("2.5"), usdc) == 2500000)
+    ok &= check("the web3 path made no RPC request", rpc_requests == 0)
+
+    print()
+    print(f"{args.calls} calls per path")
+    print(f"{'path':<30}{'p50 us':>10}{'p99 us':>10}{'calls/s':>12}{'speedup':>10}")
+    for name, (p50, p99, throughput) in results.items():
+        # Against web3 with a contract per call for transfer, encode_abi for balanceOf
+        baseline = results["web3 encode_abi balanceOf" if "balance" in name.lower() else "web3, contract per call"][0]
+        print(f"{name:<30}{p50:>10.1f}{p99:>10.1f}{throughput:>12.0f}{baseline / p50:>9.1f}x")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
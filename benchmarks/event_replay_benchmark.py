@@ -0,0 +1,451 @@
+#!/usr/bin/env python3
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+"""
+Replays the Bedrock agent event corpus in benchmarks/events/<handler>/ against each action group Lambda's
+lambda_handler, offline:
+- supervisor (sendTx, sendToken, getBalance, getCryptoPrice, ...): fake JSON-RPC node (fake_rpc.py) with the
+  Polygon tokens, KMS stand-in holding a real secp256k1 key and a fake CoinGecko API
+- txtsql (/athenaQuery, /templateQuery): Athena stand-in running the queries and the prepared statements of the
+  query templates on DuckDB, results in a moto S3 server
+- kb_query (the news knowledge base query Lambda): Bedrock Agent Runtime stand-in for RetrieveAndGenerate
+The stand-ins are in fake_services.py; the handlers reach them through AWS_ENDPOINT_URL_<SERVICE> and
+COINGECKO_API_URL, so the handler code runs unchanged.
+
+Every handler runs in fresh processes, each one an execution environment:
+- cold start: --cold-runs processes import the handler and serve one event; init is the import, first is the
+  first invocation
+- warm: after one pass over the corpus, each process replays --requests events in a loop. At concurrency N, N
+  processes replay at the same time (like N concurrent Lambda environments) and throughput is the total over the
+  wall time
+- peak RSS is the largest max resident set size of the warm processes
+
+--compare REF compares REF with the working tree, --compare A B two commits; each commit is checked out in a
+temporary git worktree and replayed with the same corpus and stand-ins. Only commits that read COINGECKO_API_URL
+(this one and later) keep CoinGecko traffic local.
+
+    python benchmarks/event_replay_benchmark.py --requests 100 --concurrency 1 4 --latency-ms 20
+    python benchmarks/event_replay_benchmark.py --handlers supervisor --compare HEAD~1
+"""
+import argparse
+import glob
+import json
+import logging
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+
+BENCHMARKS = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCHMARKS)
+
+HANDLERS = {
+    "supervisor": ("lib/crypto-ai-agent-supervisor-stack/lambda", "index"),
+    "txtsql": ("lib/knowledge-base-blockchain-data-stack/lambda/bedrock-agent-txtsql-action", "index"),
+    "kb_query": ("lib/knowledge-base-news-stack/src/queryKnowledgeBase", "queryKBLambda"),
+}
+
+# Seeded on the fake node; the corpus refers to them
+ALICE_DOMAIN = "alice.crypto"
+ALICE = "0x00000000000000000000000000000000000a11ce"
+BOB = "0x000000000000000000000000000000000000b0b0"
+
+
+class LambdaContext:
+    function_name = "event-replay"
+    memory_limit_in_mb = 1024
+    invoked_function_arn = "arn:aws:lambda:us-east-1:123456789012:function:event-replay"
+
+    def __init__(self):
+        self.aws_request_id = str(uuid.uuid4())
+
+    def get_remaining_time_in_millis(self):
+        return 300000
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    if not ordered:
+        return float("nan")
+    return ordered[min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))]
+
+
+def load_events(handler):
+    events = []
+    for path in sorted(glob.glob(os.path.join(BENCHMARKS, "events", handler, "*.json"))):
+        with open(path) as f:
+            events.append((os.path.splitext(os.path.basename(path))[0], json.load(f)))
+    return events
+
+
+def response_error(handler, name, response):
+    # Why the response is not the one the event should get, None when it is
+    expect_error = name.endswith("_error")
+    if handler == "supervisor":
+        body = response["response"]["functionResponse"]["responseBody"]["TEXT"]["body"]
+        failed = body.startswith(("Failed", "Error", "Invalid parameters", "Function ")) or \
+            " failed: " in body or "did not complete" in body
+        return body if failed != expect_error else None
+    if handler == "txtsql":
+        body = response["response"]["responseBody"]["application/json"]["body"]
+        failed = response["response"]["httpStatusCode"] != 200 or "error" in body
+        return json.dumps(body, default=str)[:200] if failed != expect_error else None
+    return None if "response" in response or "results" in response else json.dumps(response)[:200]
+
+
+# -- child: one execution environment --------------------------------------------------------------------------
+
+def invoke(lambda_handler, handler, name, event):
+    if "sessionId" in event:
+        # A new agent turn every time, so sendTx signs and sends instead of answering from its idempotency record
+        event = dict(event, sessionId=uuid.uuid4().hex)
+    start = time.perf_counter()
+    try:
+        error = response_error(handler, name, lambda_handler(event, LambdaContext()))
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+    return (time.perf_counter() - start) * 1000, error
+
+
+def child(args):
+    directory, module_name = HANDLERS[args.handler]
+    sys.path.insert(0, os.path.join(args.tree, "lib/shared/tracing"))
+    sys.path.insert(0, os.path.join(args.tree, "lib/shared/embedding_models"))
+    sys.path.insert(0, os.path.join(args.tree, directory))
+    events = load_events(args.handler)
+
+    start = time.perf_counter()
+    module = __import__(module_name)
+    init_ms = (time.perf_counter() - start) * 1000
+    result = {"init_ms": init_ms}
+
+    if args.child == "cold":
+        name, event = events[args.event_index % len(events)]
+        result["first_ms"], result["error"] = invoke(module.lambda_handler, args.handler, name, event)
+        result["event"] = name
+    else:
+        for name, event in events:
+            invoke(module.lambda_handler, args.handler, name, event)
+        open(os.path.join(args.barrier, f"ready-{os.getpid()}"), "w").close()
+        while not os.path.exists(os.path.join(args.barrier, "go")):
+            time.sleep(0.005)
+        samples = []
+        started = time.time()
+        for i in range(args.requests):
+            name, event = events[i % len(events)]
+            latency_ms, error = invoke(module.lambda_handler, args.handler, name, event)
+            samples.append((name, latency_ms, error))
+        result.update(samples=samples, started=started, finished=time.time())
+    result["peak_rss_mb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(json.dumps(result))
+
+
+# -- parent ---------------------------------------------------------------------------------------------------
+
+def start_stand_ins(stack, args):
+    # Starts the stand-ins on `stack` and returns (environment of the replay processes, {name: server})
+    from eth_utils import keccak
+    from cryptography.hazmat.primitives import serialization
+
+    from fake_rpc import FakeRPCServer
+    from fake_services import FakeBedrockAgentRuntimeServer, FakeCoinGeckoServer, FakeKMSServer
+
+    latency = args.latency_ms / 1000
+    node = stack.enter_context(FakeRPCServer(latency_seconds=latency))
+    kms = stack.enter_context(FakeKMSServer(latency_seconds=latency))
+    coingecko = stack.enter_context(FakeCoinGeckoServer(latency_seconds=latency))
+    bedrock = stack.enter_context(FakeBedrockAgentRuntimeServer(latency_seconds=latency))
+
+    sys.path.insert(0, os.path.join(ROOT, "lib/crypto-ai-agent-supervisor-stack/lambda"))
+    import unstoppable_domains
+    from tokens import TOKENS
+
+    point = kms.private_key.public_key().public_bytes(
+        serialization.Encoding.X962, serialization.PublicFormat.UncompressedPoint
+    )
+    wallet = "0x" + keccak(point[1:])[-20:].hex()
+    node.chain.balances.update({wallet: 10 ** 21, ALICE: 3 * 10 ** 18, BOB: 5 * 10 ** 17})
+    node.chain.register_domain(unstoppable_domains.token_id(ALICE_DOMAIN), ALICE)
+    for symbol, (address, token_decimals) in TOKENS["polygon"].items():
+        node.chain.add_token(address, symbol, token_decimals)
+    usdc, decimals = TOKENS["polygon"]["USDC"]
+    node.chain.add_token(usdc, "USDC", decimals, {wallet: 1000 * 10 ** decimals, ALICE: 42 * 10 ** decimals})
+    weth, weth_decimals = TOKENS["polygon"]["WETH"]
+    node.chain.add_token(weth, "WETH", weth_decimals, {wallet: 25 * 10 ** (weth_decimals - 2)})
+    for block, (sender, receiver, amount) in enumerate([(ALICE, wallet, 40), (wallet, BOB, 15), (BOB, wallet, 5)]):
+        node.chain.add_token_transfer(usdc, sender, receiver, amount * 10 ** decimals, 900 + block * 20)
+
+    env = {
+        "AWS_REGION": "us-east-1",
+        "AWS_DEFAULT_REGION": "us-east-1",
+        "AWS_ACCESS_KEY_ID": "replay",
+        "AWS_SECRET_ACCESS_KEY": "replay",
+        "AWS_ENDPOINT_URL_KMS": kms.url,
+        "AWS_ENDPOINT_URL_BEDROCK_AGENT_RUNTIME": bedrock.url,
+        "COINGECKO_API_KEY": "replay",
+        "COINGECKO_API_URL": coingecko.url + "/api/v3",
+        "BLOCKCHAIN_RPC_URL": node.url,
+        "BLOCKCHAIN_RPC_URLS": node.url,
+        "ATHENA_QUERY_RESULTS_BUCKET_NAME": "replay-results",
+        "KNOWLEDGE_BASE_ID": "REPLAYKB01",
+        "POWERTOOLS_METRICS_DISABLED": "true",
+        "POWERTOOLS_TRACE_DISABLED": "true",
+        "POWERTOOLS_LOG_LEVEL": "ERROR",
+        # Metrics are disabled, so powertools warns on every flush that there is nothing to publish
+        "PYTHONWARNINGS": "ignore::UserWarning",
+    }
+    servers = {"node": node, "kms": kms, "coingecko": coingecko, "bedrock": bedrock}
+    if "txtsql" in args.handlers:
+        try:
+            from fake_services import FakeAthenaServer
+
+            s3_endpoint = start_s3(stack, env["ATHENA_QUERY_RESULTS_BUCKET_NAME"])
+            athena = stack.enter_context(FakeAthenaServer(rows=args.athena_rows, latency_seconds=latency,
+                                                          s3_endpoint=s3_endpoint))
+            env["AWS_ENDPOINT_URL_ATHENA"] = athena.url
+            env["ATHENA_WORKGROUP"] = "replay-workgroup"
+            prepare_templates(athena.url, env["ATHENA_WORKGROUP"])
+            if s3_endpoint:
+                env["AWS_ENDPOINT_URL_S3"] = s3_endpoint
+            servers["athena"] = athena
+        except ImportError:
+            print("duckdb is not installed, skipping txtsql (pip install duckdb)")
+            args.handlers = [handler for handler in args.handlers if handler != "txtsql"]
+    return env, servers
+
+
+def prepare_templates(athena_url, work_group):
+    # The prepared statements the stack creates from the txtsql handler's query_templates.json
+    import boto3
+
+    with open(os.path.join(ROOT, HANDLERS["txtsql"][0], "query_templates.json")) as f:
+        templates = json.load(f)
+    athena = boto3.client("athena", endpoint_url=athena_url, region_name="us-east-1", aws_access_key_id="replay",
+                          aws_secret_access_key="replay")
+    for template_id, template in templates.items():
+        athena.create_prepared_statement(StatementName=template_id, WorkGroup=work_group,
+                                         QueryStatement=template["sql"])
+
+
+def start_s3(stack, bucket):
+    # A moto S3 server holding the query results bucket, None without moto[server]: the txtsql handler then pages
+    # GetQueryResults instead of reading the result CSV
+    try:
+        import boto3
+        from moto.server import ThreadedMotoServer
+    except ImportError:
+        print("moto[server] is not installed, txtsql reads results from GetQueryResults (pip install 'moto[server]')")
+        return None
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    server = ThreadedMotoServer(ip_address="127.0.0.1", port=0, verbose=False)
+    server.start()
+    stack.callback(server.stop)
+    endpoint = "http://127.0.0.1:{}".format(server._server.server_address[1])
+    boto3.client("s3", endpoint_url=endpoint, region_name="us-east-1", aws_access_key_id="replay",
+                 aws_secret_access_key="replay").create_bucket(Bucket=bucket)
+    return endpoint
+
+
+def child_command(args, tree, handler, mode, **options):
+    command = [sys.executable, os.path.abspath(__file__), "--child", mode, "--handler", handler, "--tree", tree]
+    for option, value in options.items():
+        command += ["--" + option.replace("_", "-"), str(value)]
+    return command
+
+
+def child_result(process, stdout):
+    if process.returncode != 0 or not stdout.strip():
+        raise RuntimeError(f"replay process exited with {process.returncode}")
+    return json.loads(stdout.strip().splitlines()[-1])
+
+
+def cold_starts(args, env, tree, handler):
+    runs = []
+    for i in range(args.cold_runs):
+        process = subprocess.Popen(child_command(args, tree, handler, "cold", event_index=i), env=env,
+                                   stdout=subprocess.PIPE, text=True)
+        stdout, _ = process.communicate()
+        runs.append(child_result(process, stdout))
+    return runs
+
+
+def warm_run(args, env, tree, handler, concurrency):
+    barrier = tempfile.mkdtemp(prefix="event-replay-")
+    try:
+        processes = [
+            subprocess.Popen(child_command(args, tree, handler, "warm", requests=args.requests, barrier=barrier),
+                             env=env, stdout=subprocess.PIPE, text=True)
+            for _ in range(concurrency)
+        ]
+        while len(glob.glob(os.path.join(barrier, "ready-*"))) < concurrency:
+            if any(process.poll() is not None for process in processes):
+                break
+            time.sleep(0.01)
+        open(os.path.join(barrier, "go"), "w").close()
+        results = []
+        for process in processes:
+            stdout, _ = process.communicate()
+            results.append(child_result(process, stdout))
+    finally:
+        shutil.rmtree(barrier, ignore_errors=True)
+    samples = [sample for result in results for sample in result["samples"]]
+    wall = max(result["finished"] for result in results) - min(result["started"] for result in results)
+    return {
+        "samples": samples,
+        "throughput": len(samples) / wall if wall else float("nan"),
+        "peak_rss_mb": max(result["peak_rss_mb"] for result in results),
+    }
+
+
+def replay_tree(args, env, tree):
+    # {handler: {"cold": [...], "warm": {concurrency: {...}}}}
+    report = {}
+    for handler in args.handlers:
+        data_dir = tempfile.mkdtemp(prefix="event-replay-data-")
+        handler_env = dict(env, IDEMPOTENCY_DB_PATH=os.path.join(data_dir, "idempotency.sqlite3"),
+                           TX_STATUS_DB_PATH=os.path.join(data_dir, "tx_status.sqlite3"),
+                           ACTIVITY_DB_PATH=os.path.join(data_dir, "wallet_activity.sqlite3"))
+        try:
+            report[handler] = {
+                "cold": cold_starts(args, handler_env, tree, handler),
+                "warm": {concurrency: warm_run(args, handler_env, tree, handler, concurrency)
+                         for concurrency in args.concurrency},
+            }
+        except RuntimeError as e:
+            report[handler] = {"failed": str(e)}
+        finally:
+            shutil.rmtree(data_dir, ignore_errors=True)
+    return report
+
+
+def summary(handler_report):
+    cold = handler_report["cold"]
+    warm = handler_report["warm"]
+    single = warm[min(warm)]["samples"]
+    return {
+        "init p50": percentile([run["init_ms"] for run in cold], 50),
+        "cold p50": percentile([run["init_ms"] + run["first_ms"] for run in cold], 50),
+        "cold p99": percentile([run["init_ms"] + run["first_ms"] for run in cold], 99),
+        "warm p50": percentile([latency for _, latency, _ in single], 50),
+        "warm p99": percentile([latency for _, latency, _ in single], 99),
+        f"req/s @{max(warm)}": warm[max(warm)]["throughput"],
+        "peak RSS MB": max(run["peak_rss_mb"] for run in warm.values()),
+        "errors": sum(1 for run in cold if run["error"]) +
+        sum(1 for run in warm.values() for _, _, error in run["samples"] if error),
+    }
+
+
+def print_report(label, report):
+    print(f"== {label}")
+    for handler, handler_report in report.items():
+        if "failed" in handler_report:
+            print(f"{handler}: {handler_report['failed']}")
+            continue
+        cold = handler_report["cold"]
+        print(f"{handler}: init p50 {summary(handler_report)['init p50']:.0f} ms, cold start (init + first "
+              f"invocation) p50 {summary(handler_report)['cold p50']:.0f} ms / p99 "
+              f"{summary(handler_report)['cold p99']:.0f} ms over {len(cold)} runs")
+        for run in cold:
+            if run["error"]:
+                print(f"  cold {run['event']}: {run['error']}")
+        print(f"  {'concurrency':<14}{'requests':>10}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'peak RSS MB':>13}"
+              f"{'errors':>8}")
+        for concurrency, run in handler_report["warm"].items():
+            latencies = [latency for _, latency, _ in run["samples"]]
+            errors = sum(1 for _, _, error in run["samples"] if error)
+            print(f"  {concurrency:<14}{len(latencies):>10}{run['throughput']:>10.1f}{percentile(latencies, 50):>10.1f}"
+                  f"{percentile(latencies, 99):>10.1f}{run['peak_rss_mb']:>13.0f}{errors:>8}")
+        single = handler_report["warm"][min(handler_report["warm"])]["samples"]
+        print(f"  {'event (warm, concurrency ' + str(min(handler_report['warm'])) + ')':<40}{'p50 ms':>10}"
+              f"{'p99 ms':>10}{'errors':>8}")
+        for name in dict.fromkeys(name for name, _, _ in single):
+            latencies = [latency for event, latency, _ in single if event == name]
+            errors = [error for event, _, error in single if event == name and error]
+            print(f"  {name:<40}{percentile(latencies, 50):>10.1f}{percentile(latencies, 99):>10.1f}"
+                  f"{len(errors):>8}")
+            if errors:
+                print(f"    {errors[0]}")
+    print()
+
+
+def print_comparison(labels, reports):
+    print(f"== {labels[0]} -> {labels[1]}")
+    for handler in reports[0]:
+        if "failed" in reports[0][handler] or "failed" in reports[1].get(handler, {"failed": ""}):
+            print(f"{handler}: not comparable, a replay failed")
+            continue
+        before, after = summary(reports[0][handler]), summary(reports[1][handler])
+        print(f"{handler}")
+        print(f"  {'':<16}{labels[0][:14]:>14}{labels[1][:14]:>14}{'change':>10}")
+        for metric in before:
+            change = f"{(after[metric] - before[metric]) / before[metric] * 100:+.0f}%" if before[metric] else "-"
+            print(f"  {metric:<16}{before[metric]:>14.1f}{after[metric]:>14.1f}{change:>10}")
+    print()
+
+
+def checkout(ref, stack):
+    path = tempfile.mkdtemp(prefix="event-replay-worktree-")
+    subprocess.run(["git", "-C", ROOT, "worktree", "add", "--detach", "--force", path, ref], check=True,
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    stack.callback(subprocess.run, ["git", "-C", ROOT, "worktree", "remove", "--force", path], check=False)
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--handlers", nargs="+", choices=list(HANDLERS), default=list(HANDLERS))
+    parser.add_argument("--requests", type=int, default=100, help="events replayed per warm process")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4])
+    parser.add_argument("--cold-runs", type=int, default=5)
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="delay of every stand-in request")
+    parser.add_argument("--athena-rows", type=int, default=10000)
+    parser.add_argument("--compare", nargs="+", metavar="REF", help="REF against the working tree, or two REFs")
+    parser.add_argument("--json", help="also write the raw results to this file")
+    # Internal: run as one replay process
+    parser.add_argument("--child", choices=["cold", "warm"], help=argparse.SUPPRESS)
+    parser.add_argument("--handler", help=argparse.SUPPRESS)
+    parser.add_argument("--tree", help=argparse.SUPPRESS)
+    parser.add_argument("--event-index", type=int, default=0, help=argparse.SUPPRESS)
+    parser.add_argument("--barrier", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args)
+        return
+
+    from contextlib import ExitStack
+
+    with ExitStack() as stack:
+        stand_in_env, _ = start_stand_ins(stack, args)
+        env = dict(os.environ, **stand_in_env)
+        env.pop("AWS_PROFILE", None)
+        if args.compare:
+            refs = args.compare if len(args.compare) > 1 else [args.compare[0], None]
+            trees = [(ref or "working tree", checkout(ref, stack) if ref else ROOT) for ref in refs[:2]]
+        else:
+            trees = [("working tree", ROOT)]
+
+        print(f"replaying {', '.join(f'{handler} ({len(load_events(handler))} events)' for handler in args.handlers)}"
+              f", {args.latency_ms:.0f} ms per stand-in request")
+        print()
+        reports = []
+        for label, tree in trees:
+            reports.append(replay_tree(args, env, tree))
+            print_report(label, reports[-1])
+        if len(reports) == 2:
+            print_comparison([label for label, _ in trees], reports)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({label: report for (label, _), report in zip(trees, reports)}, f, indent=2, default=str)
+    failed = any("failed" in handler_report or summary(handler_report)["errors"]
+                 for report in reports for handler_report in report.values())
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
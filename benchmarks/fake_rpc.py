@@ -0,0 +1,312 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+"""
+In-process fake EVM JSON-RPC node for the supervisor Lambda benchmarks. It serves single and batch requests over
+HTTP on localhost, advances blocks on demand, and counts HTTP requests, JSON-RPC calls and the peak number of
+requests in flight. Faults can be injected
+per server:
+- latency_seconds delays every HTTP request to model the round trip to a hosted node
+- slow_rate / slow_seconds add a latency spike to that share of requests (tail latency)
+- error_rate answers that share of requests with HTTP 503; `down = True` fails all of them
+
+Only the methods the benchmarks exercise are implemented; eth_call answers the Unstoppable Domains getData lookup
+for the domains registered with FakeChain.register_domain, the balanceOf / decimals / symbol reads of the ERC-20
+tokens added with FakeChain.add_token and Multicall3 aggregate3 / getEthBalance over those, eth_getLogs serves the Transfer logs of FakeChain.add_token_transfer (with
+a provider style error past `log_limit` results or `max_log_range` blocks, and Infura's rate limit error for the next
+`rate_limited_logs` queries), and eth_sendRawTransaction accepts any
+raw transaction as pending (the nonce it reports is the number of transactions accepted so far, as for a single
+sending wallet).
+"""
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from eth_abi import decode, encode
+from eth_utils import keccak
+
+ZERO_ADDRESS = "0x" + "0" * 40
+MULTICALL3_ADDRESS = "0xca11bde05977b3631167028862be2a173976ca11"
+TRANSFER_TOPIC = "0x" + keccak(text="Transfer(address,address,uint256)").hex()
+
+
+class RPCFault(Exception):
+    # Answered as a JSON-RPC error object
+    def __init__(self, code, message, data=None):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+        self.data = data
+
+
+def _topic(address):
+    return "0x" + address[2:].lower().rjust(64, "0")
+
+
+class FakeChain:
+    def __init__(self, chain_id=137, block_number=1000):
+        self.lock = threading.Lock()
+        self.chain_id = chain_id
+        self.block_number = block_number
+        # tx hash -> {"block_number", "status", "gas_used"}; block_number None while pending
+        self.transactions = {}
+        self.balances = {}
+        # Unstoppable Domains token id -> owner
+        self.domains = {}
+        # lowercase ERC-20 contract address -> {"symbol", "decimals", "balances": {lowercase owner: units}}
+        self.tokens = {}
+        # Event logs, in block order: {"address", "topics", "data", "blockNumber", "transactionHash", "logIndex"}
+        self.logs = []
+        # eth_getLogs limits of hosted providers; None is unlimited
+        self.log_limit = None
+        self.max_log_range = None
+        # The next eth_getLogs queries refused with Infura's rate limit error (the same -32005 code)
+        self.rate_limited_logs = 0
+        self.rate_limit_backoff_seconds = 0.01
+
+    def register_domain(self, token_id, owner):
+        with self.lock:
+            self.domains[token_id] = owner
+
+    def add_token(self, address, symbol, decimals, balances=None):
+        with self.lock:
+            self.tokens[address.lower()] = {
+                "symbol": symbol,
+                "decimals": decimals,
+                "balances": {owner.lower(): units for owner, units in (balances or {}).items()},
+            }
+
+    def add_token_transfer(self, token, sender, receiver, units, block_number=None):
+        # A mined ERC-20 transfer: its Transfer log, in the current block by default, and the token balances
+        with self.lock:
+            block_number = self.block_number if block_number is None else block_number
+            tx_hash = "0x" + keccak(text=f"transfer-{len(self.logs)}").hex()
+            self.logs.append({
+                "address": token.lower(),
+                "topics": [TRANSFER_TOPIC, _topic(sender), _topic(receiver)],
+                "data": "0x" + format(units, "064x"),
+                "blockNumber": block_number,
+                "transactionHash": tx_hash,
+                "logIndex": 0,
+            })
+            self.logs.sort(key=lambda log: log["blockNumber"])
+            balances = self.tokens.get(token.lower(), {}).get("balances")
+            if balances is not None:
+                balances[sender.lower()] = balances.get(sender.lower(), 0) - units
+                balances[receiver.lower()] = balances.get(receiver.lower(), 0) + units
+            return tx_hash
+
+    def get_logs(self, log_filter):
+        def block(value, default):
+            if value in (None, "latest", "safe", "finalized"):
+                return default
+            return 0 if value == "earliest" else int(value, 16)
+
+        if self.rate_limited_logs > 0:
+            self.rate_limited_logs -= 1
+            raise RPCFault(-32005, "project ID request rate exceeded",
+                           {"see": "https://infura.io/dashboard", "current_rps": 13.3, "allowed_rps": 10.0,
+                            "backoff_seconds": self.rate_limit_backoff_seconds})
+        from_block = block(log_filter.get("fromBlock"), self.block_number)
+        to_block = block(log_filter.get("toBlock"), self.block_number)
+        if self.max_log_range is not None and to_block - from_block + 1 > self.max_log_range:
+            raise RPCFault(-32005, f"block range is too wide, the maximum is {self.max_log_range} blocks")
+        addresses = log_filter.get("address")
+        if isinstance(addresses, str):
+            addresses = [addresses]
+        addresses = {address.lower() for address in addresses} if addresses else None
+        wanted = [
+            None if topic is None else {t.lower() for t in ([topic] if isinstance(topic, str) else topic)}
+            for topic in log_filter.get("topics") or []
+        ]
+        matches = []
+        for log in self.logs:
+            if not from_block <= log["blockNumber"] <= to_block:
+                continue
+            if addresses is not None and log["address"] not in addresses:
+                continue
+            if any(topics is not None and (i >= len(log["topics"]) or log["topics"][i] not in topics)
+                   for i, topics in enumerate(wanted)):
+                continue
+            matches.append(dict(log, blockNumber=hex(log["blockNumber"]), logIndex=hex(log["logIndex"])))
+            if self.log_limit is not None and len(matches) > self.log_limit:
+                raise RPCFault(-32005, f"query returned more than {self.log_limit} results")
+        return matches
+
+    def add_transaction(self, tx_hash, status=1, gas_used=21000):
+        with self.lock:
+            self.transactions[tx_hash] = {"block_number": None, "status": status, "gas_used": gas_used}
+
+    def mine(self, tx_hashes=(), blocks=1):
+        with self.lock:
+            self.block_number += 1
+            for tx_hash in tx_hashes:
+                self.transactions[tx_hash]["block_number"] = self.block_number
+            self.block_number += blocks - 1
+
+    def receipt(self, tx_hash):
+        tx = self.transactions.get(tx_hash)
+        if tx is None or tx["block_number"] is None:
+            return None
+        return {
+            "transactionHash": tx_hash,
+            "blockNumber": hex(tx["block_number"]),
+            "status": hex(tx["status"]),
+            "gasUsed": hex(tx["gas_used"]),
+            "effectiveGasPrice": hex(30 * 10 ** 9),
+        }
+
+    def token_call(self, token, data):
+        selector = data[:10]
+        if selector == "0x70a08231":  # balanceOf(address)
+            return "0x" + encode(["uint256"], [token["balances"].get("0x" + data[34:74].lower(), 0)]).hex()
+        if selector == "0x313ce567":  # decimals()
+            return "0x" + encode(["uint8"], [token["decimals"]]).hex()
+        if selector == "0x95d89b41":  # symbol()
+            return "0x" + encode(["string"], [token["symbol"]]).hex()
+        raise KeyError(selector)
+
+    def multicall(self, data):
+        # aggregate3((address target, bool allowFailure, bytes callData)[]) -> (bool success, bytes returnData)[]
+        results = []
+        for target, _, call_data in decode(["(address,bool,bytes)[]"], bytes.fromhex(data[10:]))[0]:
+            call_data = "0x" + call_data.hex()
+            token = self.tokens.get(target.lower())
+            try:
+                if target.lower() == MULTICALL3_ADDRESS and call_data[:10] == "0x4d2301cc":  # getEthBalance(address)
+                    result = "0x" + encode(["uint256"], [self.balances.get("0x" + call_data[34:74].lower(), 0)]).hex()
+                elif token is not None:
+                    result = self.token_call(token, call_data)
+                else:
+                    raise KeyError(target)
+                results.append((True, bytes.fromhex(result[2:])))
+            except KeyError:
+                results.append((False, b""))
+        return "0x" + encode(["(bool,bytes)[]"], [results]).hex()
+
+    def call(self, method, params):
+        with self.lock:
+            if method == "eth_blockNumber":
+                return hex(self.block_number)
+            if method == "eth_chainId":
+                return hex(self.chain_id)
+            if method == "web3_clientVersion":
+                return "FakeRPC/1.0"
+            if method == "eth_getTransactionReceipt":
+                return self.receipt(params[0])
+            if method == "eth_getBalance":
+                return hex(self.balances.get(params[0].lower(), 0))
+            if method == "eth_estimateGas":
+                # A contract call (an ERC-20 transfer) costs more than a plain transfer
+                return hex(52000 if params[0].get("data") or params[0].get("input") else 21000)
+            if method == "eth_gasPrice":
+                return hex(30 * 10 ** 9)
+            if method == "eth_getTransactionCount":
+                return hex(len(self.transactions))
+            if method == "eth_sendRawTransaction":
+                tx_hash = "0x" + keccak(hexstr=params[0]).hex()
+                self.transactions.setdefault(tx_hash, {"block_number": None, "status": 1, "gas_used": 21000})
+                return tx_hash
+            if method == "eth_getLogs":
+                return self.get_logs(params[0])
+            if method == "eth_call":
+                data = params[0].get("data") or params[0]["input"]
+                if params[0]["to"].lower() == MULTICALL3_ADDRESS and data[:10] == "0x82ad56cb":
+                    return self.multicall(data)
+                token = self.tokens.get(params[0]["to"].lower())
+                if token is not None:
+                    return self.token_call(token, data)
+                # getData(string[] keys, uint256 tokenId): selector, offset of keys, tokenId
+                owner = self.domains.get(int(data[74:138], 16), ZERO_ADDRESS)
+                return "0x" + encode(["address", "address", "string[]"], [ZERO_ADDRESS, owner, []]).hex()
+        raise KeyError(method)
+
+
+class FakeRPCServer:
+    def __init__(self, chain=None, latency_seconds=0.0, slow_rate=0.0, slow_seconds=0.0, error_rate=0.0, seed=None):
+        self.chain = chain or FakeChain()
+        self.latency_seconds = latency_seconds
+        self.slow_rate = slow_rate
+        self.slow_seconds = slow_seconds
+        self.error_rate = error_rate
+        self.down = False
+        self.random = random.Random(seed)
+        self.http_requests = 0
+        self.calls = {}
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.counter_lock = threading.Lock()
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler_class())
+        self.url = "http://127.0.0.1:{}".format(self.server.server_address[1])
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *args):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def reset_counters(self):
+        self.http_requests = 0
+        self.calls = {}
+        self.max_in_flight = 0
+
+    def _answer(self, request):
+        self.calls[request["method"]] = self.calls.get(request["method"], 0) + 1
+        try:
+            result = self.chain.call(request["method"], request.get("params", []))
+            return {"jsonrpc": "2.0", "id": request.get("id"), "result": result}
+        except KeyError:
+            error = {"code": -32601, "message": "Method {} not found".format(request["method"])}
+            return {"jsonrpc": "2.0", "id": request.get("id"), "error": error}
+        except RPCFault as fault:
+            error = {"code": fault.code, "message": fault.message}
+            if fault.data is not None:
+                error["data"] = fault.data
+            return {"jsonrpc": "2.0", "id": request.get("id"), "error": error}
+
+    def _handler_class(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                with fake.counter_lock:
+                    fake.http_requests += 1
+                    fake.in_flight += 1
+                    fake.max_in_flight = max(fake.max_in_flight, fake.in_flight)
+                try:
+                    self._respond()
+                finally:
+                    with fake.counter_lock:
+                        fake.in_flight -= 1
+
+            def _respond(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                delay = fake.latency_seconds
+                if fake.slow_rate and fake.random.random() < fake.slow_rate:
+                    delay += fake.slow_seconds
+                if delay:
+                    time.sleep(delay)
+                if fake.down or (fake.error_rate and fake.random.random() < fake.error_rate):
+                    self.send_response(503)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                if isinstance(body, list):
+                    response = [fake._answer(request) for request in body]
+                else:
+                    response = fake._answer(body)
+                payload = json.dumps(response).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
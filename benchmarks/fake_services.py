@@ -0,0 +1,411 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+"""
+In-process fakes of the non-EVM services the action group Lambdas call, for the event replay benchmark. Each one
+serves HTTP on localhost and is reached by the unchanged handler code through an endpoint override:
+- FakeKMSServer: DescribeKey, GetPublicKey and Sign for one real secp256k1 key (AWS_ENDPOINT_URL_KMS). Signatures
+  are DER encoded ECDSA over the given digest, like KMS ECC_SECG_P256K1 keys, so sendTx recovers the signer and
+  builds a valid transaction
+- FakeAthenaServer: StartQueryExecution, GetQueryExecution, GetQueryResults (1000 row pages) and
+  CreatePreparedStatement (run by EXECUTE ... USING) backed by DuckDB, with small synthetic btc and eth tables
+  (AWS_ENDPOINT_URL_ATHENA). Queries run synchronously, so the first status
+  check already sees SUCCEEDED or FAILED. Given an S3 endpoint (moto server), a SELECT also writes its result CSV to
+  the output location like Athena does. `EXPLAIN (TYPE IO, FORMAT JSON)` fails like the query would and answers an
+  IO plan: the btc/eth tables named in the query, the `date` range of comparisons of the bare column to ISO date
+  strings (Trino cannot turn `cast(date as date)` into a partition range either), and NaN estimates like tables
+  without statistics, or rows read times explain_row_bytes when that is set. Failed queries carry Athena's error
+  names (SYNTAX_ERROR, TABLE_NOT_FOUND, COLUMN_NOT_FOUND); explain_failure, when set, fails every EXPLAIN with it
+- FakeBedrockAgentRuntimeServer: RetrieveAndGenerate with a canned answer (AWS_ENDPOINT_URL_BEDROCK_AGENT_RUNTIME)
+- FakeCoinGeckoServer: /coins/markets and /coins/{id}/market_chart (COINGECKO_API_URL)
+
+Like fake_rpc.py, every server counts its requests and can delay each one by latency_seconds.
+"""
+import base64
+import json
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import ec
+from cryptography.hazmat.primitives.asymmetric.utils import Prehashed
+
+
+class FakeServer:
+    def __init__(self, latency_seconds=0.0):
+        self.latency_seconds = latency_seconds
+        self.requests = 0
+        self.counter_lock = threading.Lock()
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler_class())
+        self.url = "http://127.0.0.1:{}".format(self.server.server_address[1])
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *args):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def answer(self, method, path, headers, body):
+        # (status, payload); payload is JSON serialized
+        raise NotImplementedError
+
+    def _handler_class(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def _respond(self, method):
+                with fake.counter_lock:
+                    fake.requests += 1
+                length = int(self.headers.get("Content-Length") or 0)
+                body = self.rfile.read(length) if length else b""
+                if fake.latency_seconds:
+                    time.sleep(fake.latency_seconds)
+                status, payload = fake.answer(method, self.path, self.headers, body)
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/x-amz-json-1.1")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                self._respond("GET")
+
+            def do_POST(self):
+                self._respond("POST")
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+
+class FakeAWSJSONServer(FakeServer):
+    # AWS JSON 1.1 protocol: POST / with the operation in X-Amz-Target
+    target_prefix = ""
+
+    def answer(self, method, path, headers, body):
+        operation = headers.get("X-Amz-Target", "").replace(self.target_prefix + ".", "")
+        handler = getattr(self, "op_" + operation, None)
+        if handler is None:
+            return 400, {"__type": "UnknownOperationException", "message": operation}
+        try:
+            return 200, handler(json.loads(body or b"{}"))
+        except LookupError as e:
+            return 400, {"__type": "NotFoundException", "message": str(e)}
+
+
+class FakeKMSServer(FakeAWSJSONServer):
+    target_prefix = "TrentService"
+
+    def __init__(self, alias="alias/crypto-ai-agent-wallet", latency_seconds=0.0):
+        super().__init__(latency_seconds)
+        self.alias = alias
+        self.key_id = str(uuid.uuid4())
+        self.private_key = ec.generate_private_key(ec.SECP256K1())
+        self.public_key_der = self.private_key.public_key().public_bytes(
+            serialization.Encoding.DER, serialization.PublicFormat.SubjectPublicKeyInfo
+        )
+
+    def _key_id(self, request):
+        if request["KeyId"] not in (self.alias, self.key_id):
+            raise LookupError(f"Key {request['KeyId']} not found")
+        return self.key_id
+
+    def op_DescribeKey(self, request):
+        return {"KeyMetadata": {
+            "KeyId": self._key_id(request),
+            "KeySpec": "ECC_SECG_P256K1",
+            "KeyUsage": "SIGN_VERIFY",
+            "Enabled": True,
+        }}
+
+    def op_GetPublicKey(self, request):
+        return {
+            "KeyId": self._key_id(request),
+            "PublicKey": base64.b64encode(self.public_key_der).decode(),
+            "KeySpec": "ECC_SECG_P256K1",
+            "SigningAlgorithms": ["ECDSA_SHA_256"],
+        }
+
+    def op_Sign(self, request):
+        digest = base64.b64decode(request["Message"])
+        signature = self.private_key.sign(digest, ec.ECDSA(Prehashed(hashes.SHA256())))
+        return {
+            "KeyId": self._key_id(request),
+            "Signature": base64.b64encode(signature).decode(),
+            "SigningAlgorithm": "ECDSA_SHA_256",
+        }
+
+
+class FakeAthenaServer(FakeAWSJSONServer):
+    target_prefix = "AmazonAthena"
+
+    def __init__(self, rows=10000, latency_seconds=0.0, s3_endpoint=None):
+        import duckdb
+
+        super().__init__(latency_seconds)
+        self.lock = threading.Lock()
+        self.connection = duckdb.connect()
+        self.executions = {}
+        self.prepared_statements = {}
+        self.explain_row_bytes = None
+        self.explain_failure = None
+        self.s3 = None
+        if s3_endpoint:
+            import boto3
+
+            self.s3 = boto3.client("s3", endpoint_url=s3_endpoint, region_name="us-east-1",
+                                   aws_access_key_id="fake", aws_secret_access_key="fake")
+        self._load(rows)
+
+    def _load(self, rows):
+        # The columns the text-to-SQL agent's queries use from the AWS public blockchain datasets; `date` is a
+        # varchar there too
+        for statement in (
+            "CREATE SCHEMA btc",
+            "CREATE SCHEMA eth",
+            f"""CREATE TABLE btc.blocks AS SELECT
+                    md5(i::VARCHAR) AS hash, i AS number, TIMESTAMP '2024-01-01' + i * INTERVAL 10 MINUTE AS timestamp,
+                    1000000 + i % 500000 AS size, 2000 + i % 3000 AS transaction_count,
+                    strftime(TIMESTAMP '2024-01-01' + i * INTERVAL 10 MINUTE, '%Y-%m-%d') AS date
+                FROM range({rows}) t(i)""",
+            f"""CREATE TABLE btc.transactions AS SELECT
+                    md5('tx' || i::VARCHAR) AS hash, i // 20 AS block_number,
+                    TIMESTAMP '2024-01-01' + (i // 20) * INTERVAL 10 MINUTE AS block_timestamp,
+                    (i % 1000) * 0.00001 AS fee, (i % 997) * 0.01 AS input_value, (i % 997) * 0.0099 AS output_value,
+                    i % 20 = 0 AS is_coinbase, strftime(TIMESTAMP '2024-01-01' + (i // 20) * INTERVAL 10 MINUTE,
+                    '%Y-%m-%d') AS date
+                FROM range({rows * 20}) t(i)""",
+            f"""CREATE TABLE eth.blocks AS SELECT
+                    md5('eth' || i::VARCHAR) AS hash, i AS number,
+                    TIMESTAMP '2024-01-01' + i * INTERVAL 12 SECOND AS timestamp,
+                    '0x' || lpad(to_hex(i % 50), 40, '0') AS miner, 15000000 + i % 15000000 AS gas_used,
+                    150 + i % 100 AS transaction_count, 10 + i % 40 AS base_fee_per_gas,
+                    strftime(TIMESTAMP '2024-01-01' + i * INTERVAL 12 SECOND, '%Y-%m-%d') AS date
+                FROM range({rows}) t(i)""",
+            f"""CREATE TABLE eth.transactions AS SELECT
+                    md5('etx' || i::VARCHAR) AS hash, i // 20 AS block_number,
+                    TIMESTAMP '2024-01-01' + (i // 20) * INTERVAL 12 SECOND AS block_timestamp,
+                    '0x' || lpad(to_hex(i % 5000), 40, '0') AS from_address,
+                    '0x' || lpad(to_hex(i % 7919), 40, '0') AS to_address, (i % 1000) * 1e15 AS value,
+                    21000 + i % 100000 AS receipt_gas_used, 20 + i % 30 AS gas_price,
+                    strftime(TIMESTAMP '2024-01-01' + (i // 20) * INTERVAL 12 SECOND, '%Y-%m-%d') AS date
+                FROM range({rows * 20}) t(i)""",
+            f"""CREATE TABLE eth.token_transfers AS SELECT
+                    CASE i % 3 WHEN 0 THEN '0x514910771af9ca656af840dff83e8264ecf986ca'
+                        ELSE '0x' || lpad(to_hex(i % 3), 40, '0') END AS token_address,
+                    '0x' || lpad(to_hex(i % 5000), 40, '0') AS from_address,
+                    '0x' || lpad(to_hex(i % 7919), 40, '0') AS to_address, (i % 10007) * 1e16 AS value,
+                    md5('etx' || (i // 2)::VARCHAR) AS transaction_hash, i % 2 AS log_index, i // 40 AS block_number,
+                    TIMESTAMP '2024-01-01' + (i // 40) * INTERVAL 12 SECOND AS block_timestamp,
+                    strftime(TIMESTAMP '2024-01-01' + (i // 40) * INTERVAL 12 SECOND, '%Y-%m-%d') AS date
+                FROM range({rows * 10}) t(i)""",
+        ):
+            self.connection.execute(statement)
+
+    def add_table(self, name, select):
+        with self.lock:
+            self.connection.execute(f"CREATE OR REPLACE TABLE {name} AS {select}")
+
+    @staticmethod
+    def _athena_type(type_name):
+        type_name = str(type_name).lower()
+        if type_name.endswith("[]"):
+            return "array"
+        return {"hugeint": "bigint", "timestamp with time zone": "timestamp"}.get(type_name, type_name)
+
+    @staticmethod
+    def _text(value):
+        # A value as Athena writes it in results
+        if value is None:
+            return None
+        if isinstance(value, bool):
+            return str(value).lower()
+        if hasattr(value, "hour"):
+            return value.isoformat(sep=" ", timespec="milliseconds")
+        return str(value)
+
+    def _write_csv(self, output_location, names, rows):
+        # Every value in double quotes, NULL as an empty unquoted field
+        def line(values):
+            return ",".join("" if value is None else '"' + value.replace('"', '""') + '"' for value in values) + "\n"
+
+        bucket, _, key = output_location[len("s3://"):].partition("/")
+        body = line(names) + "".join(line([self._text(value) for value in row]) for row in rows)
+        self.s3.put_object(Bucket=bucket, Key=key, Body=body.encode())
+
+    def op_CreatePreparedStatement(self, request):
+        self.prepared_statements[(request["WorkGroup"], request["StatementName"])] = request["QueryStatement"]
+        return {}
+
+    def _executable(self, query, work_group):
+        # EXECUTE <name> [USING <literal>, ...]: the prepared statement with the literals in place of its `?`s
+        match = re.match(r"\s*EXECUTE\s+(\w+)(?:\s+USING\s+(.*))?$", query, re.IGNORECASE | re.DOTALL)
+        if not match:
+            return query
+        statement = self.prepared_statements.get((work_group, match.group(1)))
+        if statement is None:
+            raise ValueError(f"Prepared statement {match.group(1)} not found in workgroup {work_group}")
+        literals = re.findall(r"(?:DATE|TIMESTAMP)\s*'(?:[^']|'')*'|'(?:[^']|'')*'|-?\d+(?:\.\d+)?",
+                              match.group(2) or "")
+        if statement.count("?") != len(literals):
+            raise ValueError(f"{match.group(1)} takes {statement.count('?')} parameters, got {len(literals)}")
+        parts = statement.split("?")
+        return parts[0] + "".join(value + part for value, part in zip(literals, parts[1:]))
+
+    def _io_plan(self, query):
+        # The IO plan of a query DuckDB can plan, in the shape of Trino's EXPLAIN (TYPE IO, FORMAT JSON)
+        self.connection.cursor().execute(f"EXPLAIN {query}")
+        date = r"(?<![\w.(])date"
+        ranges = [(low, high) for low, high in re.findall(
+            date + r"\s+BETWEEN\s+'(\d{4}-\d{2}-\d{2})'\s+AND\s+'(\d{4}-\d{2}-\d{2})'", query, re.IGNORECASE)]
+        for operator, value in re.findall(date + r"\s*(>=|<=|=|>|<)\s*'(\d{4}-\d{2}-\d{2})'", query, re.IGNORECASE):
+            ranges.append((value if operator[0] in "=>" else None, value if operator[0] in "=<" else None))
+        low = max((low for low, _ in ranges if low), default=None)
+        high = min((high for _, high in ranges if high), default=None)
+        inputs = []
+        for schema, table in dict.fromkeys(re.findall(r"\b(btc|eth)\.(\w+)", query, re.IGNORECASE)):
+            constraint = {"none": False, "columnConstraints": []}
+            if ranges:
+                constraint["columnConstraints"].append({"columnName": "date", "type": "varchar", "domain": {
+                    "nullsAllowed": False,
+                    "ranges": [{"low": {"value": low, "bound": "EXACTLY"} if low else {"bound": "ABOVE"},
+                                "high": {"value": high, "bound": "EXACTLY"} if high else {"bound": "BELOW"}}],
+                }})
+            size = "NaN"
+            if self.explain_row_bytes:
+                where = " AND ".join([f"date >= '{low}'"] * bool(low) + [f"date <= '{high}'"] * bool(high)) or "true"
+                rows = self.connection.cursor().execute(
+                    f"SELECT count(*) FROM {schema}.{table} WHERE {where}").fetchone()[0]
+                size = rows * self.explain_row_bytes
+            inputs.append({
+                "table": {"catalog": "awsdatacatalog", "schemaTable": {"schema": schema.lower(), "table": table.lower()}},
+                "columnHandles": [],
+                "constraint": constraint,
+                "estimate": {"outputRowCount": "NaN", "outputSizeInBytes": size, "cpuCost": "NaN",
+                             "maxMemory": "NaN", "networkCost": "NaN"},
+            })
+        return {"inputTableColumnInfos": inputs, "estimate": {"outputRowCount": "NaN", "outputSizeInBytes": "NaN",
+                                                               "cpuCost": "NaN", "maxMemory": "NaN",
+                                                               "networkCost": "NaN"}}
+
+    def op_StartQueryExecution(self, request):
+        execution_id = str(uuid.uuid4())
+        execution = {"Query": request["QueryString"], "Status": {"State": "SUCCEEDED"}, "StatementType": "DML"}
+        output = request.get("ResultConfiguration", {}).get("OutputLocation", "")
+        try:
+            query = self._executable(request["QueryString"], request.get("WorkGroup", "primary"))
+            explain = re.match(r"\s*EXPLAIN\s*\(\s*TYPE\s+IO\s*,\s*FORMAT\s+JSON\s*\)\s*(.*)$", query,
+                               re.IGNORECASE | re.DOTALL)
+            if explain and self.explain_failure:
+                raise RuntimeError(self.explain_failure)
+            if explain:
+                # Utility statement: no header row, the plan one line per row
+                with self.lock:
+                    plan = self._io_plan(explain.group(1))
+                execution.update(StatementType="UTILITY", columns=[("Query Plan", "varchar")],
+                                 rows=[(line,) for line in json.dumps(plan, indent=2).splitlines()])
+                self.executions[execution_id] = execution
+                return {"QueryExecutionId": execution_id}
+            with self.lock:
+                cursor = self.connection.cursor()
+                cursor.execute(query)
+                execution["columns"] = [(column[0], self._athena_type(column[1])) for column in cursor.description]
+                execution["rows"] = cursor.fetchall()
+            if output:
+                execution["OutputLocation"] = output.rstrip("/") + f"/{execution_id}.csv"
+                if self.s3:
+                    self._write_csv(execution["OutputLocation"], [name for name, _ in execution["columns"]],
+                                    execution["rows"])
+        except Exception as e:
+            execution["Status"] = {"State": "FAILED", "StateChangeReason": self._reason(e)}
+        self.executions[execution_id] = execution
+        return {"QueryExecutionId": execution_id}
+
+    @staticmethod
+    def _reason(error):
+        # DuckDB's planning errors under the name Athena gives them
+        name = {"ParserException": "SYNTAX_ERROR", "CatalogException": "TABLE_NOT_FOUND",
+                "BinderException": "COLUMN_NOT_FOUND"}.get(type(error).__name__)
+        return f"{name}: line 1:1: {error}" if name else str(error)
+
+    def _execution(self, request):
+        if request["QueryExecutionId"] not in self.executions:
+            raise LookupError(f"Query execution {request['QueryExecutionId']} not found")
+        return self.executions[request["QueryExecutionId"]]
+
+    def op_GetQueryExecution(self, request):
+        execution = self._execution(request)
+        return {"QueryExecution": {
+            "QueryExecutionId": request["QueryExecutionId"],
+            "Query": execution["Query"],
+            "StatementType": execution["StatementType"],
+            "ResultConfiguration": {"OutputLocation": execution.get("OutputLocation", "")},
+            "Status": execution["Status"],
+        }}
+
+    def op_GetQueryResults(self, request):
+        # Like Athena, the first row of a SELECT result holds the column names; pages of up to 1000 rows
+        execution = self._execution(request)
+
+        def row(values):
+            return {"Data": [{} if value is None else {"VarCharValue": self._text(value)} for value in values]}
+
+        header = [[name for name, _ in execution["columns"]]] if execution["StatementType"] == "DML" else []
+        table = header + execution["rows"]
+        offset = int(request.get("NextToken") or 0)
+        limit = min(int(request.get("MaxResults") or 1000), 1000)
+        page = {"ResultSet": {
+            "Rows": [row(values) for values in table[offset:offset + limit]],
+            "ResultSetMetadata": {"ColumnInfo": [{"Name": name, "Type": type_name}
+                                                 for name, type_name in execution["columns"]]},
+        }}
+        if offset + limit < len(table):
+            page["NextToken"] = str(offset + limit)
+        return page
+
+
+class FakeBedrockAgentRuntimeServer(FakeServer):
+    # REST JSON protocol; only POST /retrieveAndGenerate
+    def answer(self, method, path, headers, body):
+        if method != "POST" or path != "/retrieveAndGenerate":
+            return 404, {"message": f"{method} {path} not found"}
+        request = json.loads(body)
+        return 200, {
+            "sessionId": str(uuid.uuid4()),
+            "output": {"text": f"Retrieved answer to: {request['input']['text']}"},
+            "citations": [],
+        }
+
+
+class FakeCoinGeckoServer(FakeServer):
+    def __init__(self, prices=None, days=365, latency_seconds=0.0):
+        super().__init__(latency_seconds)
+        self.prices = prices or {
+            "bitcoin": 60000.0, "ethereum": 3000.0, "polygon-ecosystem-token": 0.5,
+            "usd-coin": 1.0, "tether": 1.0, "dai": 1.0, "weth": 3000.0,
+        }
+        self.days = days
+
+    def answer(self, method, path, headers, body):
+        url = urlparse(path)
+        parts = url.path.rstrip("/").split("/")
+        if url.path.endswith("/coins/markets"):
+            ids = parse_qs(url.query).get("ids", [""])[0].split(",")
+            return 200, [{"id": coin, "current_price": self.prices[coin]} for coin in ids if coin in self.prices]
+        if len(parts) >= 2 and parts[-1] == "market_chart" and parts[-2] in self.prices:
+            # A year of daily closes rising to today's price, with the all-time high 60 days ago
+            price = self.prices[parts[-2]]
+            start = int(time.time() * 1000) - self.days * 86400000
+            closes = [price * (0.5 + 0.7 * day / self.days) if day < self.days - 60 else price * 1.1
+                      for day in range(self.days)]
+            closes[-1] = price
+            return 200, {"prices": [[start + day * 86400000, close] for day, close in enumerate(closes)]}
+        return 404, {"error": f"{url.path} not found"}
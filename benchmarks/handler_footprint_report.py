@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+"""
+Import time and package size of each supervisor stack handler, the two numbers that drive its cold start:
+- import time: median over --runs fresh interpreters of importing the handler module, with the number of modules
+  it loads and which of the heavy dependencies (web3, eth-account, eth-keys, pyasn1, asn1tools, cryptography,
+  aiohttp, boto3) among them
+- package size: the installed size of the handler's requirement set (the file its image is built from) with all
+  transitive dependencies, as installed in this environment, plus the handler directory itself. boto3 and its
+  dependencies ship with the Lambda Python base image, so the size is also given without them (w/o boto3)
+
+    python benchmarks/handler_footprint_report.py --runs 5
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+from importlib import metadata
+
+from packaging.requirements import Requirement
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LAMBDA_DIR = os.path.join(ROOT, "lib/crypto-ai-agent-supervisor-stack/lambda")
+
+# handler module -> requirement file of its image (see the stack in crypto-ai-agent-supervisor-stack/index.ts)
+HANDLERS = {
+    "investment_advice": "requirements-investment-advice.txt",
+    "wallet_management": "requirements.txt",
+    "receipt_poller": "requirements.txt",
+    "index": "requirements.txt",
+}
+HEAVY_MODULES = ["web3", "eth_account", "eth_keys", "pyasn1", "asn1tools", "cryptography", "aiohttp", "boto3"]
+BASE_IMAGE_PACKAGES = {"boto3", "botocore", "s3transfer", "jmespath", "python-dateutil", "six", "urllib3"}
+
+IMPORT_PROBE = """
+import sys, time, json
+sys.path.insert(0, {tracing!r})
+sys.path.insert(0, {lambda_dir!r})
+before = set(sys.modules)
+start = time.perf_counter()
+__import__({module!r})
+elapsed = (time.perf_counter() - start) * 1000
+loaded = set(sys.modules) - before
+print(json.dumps({{"ms": elapsed, "modules": len(loaded),
+                  "heavy": sorted(m for m in {heavy!r} if m in loaded)}}))
+"""
+
+
+def import_profile(module, runs):
+    env = dict(
+        os.environ,
+        COINGECKO_API_KEY=os.environ.get("COINGECKO_API_KEY", "report"),
+        AWS_DEFAULT_REGION=os.environ.get("AWS_DEFAULT_REGION", "us-east-1"),
+        POWERTOOLS_METRICS_DISABLED="true",
+        POWERTOOLS_TRACE_DISABLED="true",
+    )
+    code = IMPORT_PROBE.format(tracing=os.path.join(ROOT, "lib/shared/tracing"), lambda_dir=LAMBDA_DIR,
+                               module=module, heavy=HEAVY_MODULES)
+    results = []
+    for _ in range(runs):
+        output = subprocess.run([sys.executable, "-c", code], env=env, capture_output=True, text=True, check=True)
+        results.append(json.loads(output.stdout.strip().splitlines()[-1]))
+    return statistics.median(result["ms"] for result in results), results[0]["modules"], results[0]["heavy"]
+
+
+def read_requirements(path):
+    requirements = []
+    with open(path) as f:
+        for line in f:
+            line = line.split("#")[0].strip()
+            if line.startswith("-r"):
+                requirements += read_requirements(os.path.join(os.path.dirname(path), line[2:].strip()))
+            elif line:
+                requirements.append(Requirement(line))
+    return requirements
+
+
+def normalize(name):
+    return re.sub(r"[-_.]+", "-", name).lower()
+
+
+def dependency_closure(requirements):
+    # {distribution name: installed size in bytes}; requirements not installed here are listed with size None
+    sizes = {}
+    pending = [(requirement.name, set(requirement.extras)) for requirement in requirements]
+    while pending:
+        name, extras = pending.pop()
+        key = normalize(name)
+        if key in sizes:
+            continue
+        try:
+            distribution = metadata.distribution(name)
+        except metadata.PackageNotFoundError:
+            sizes[key] = None
+            continue
+        sizes[key] = sum(file.size or 0 for file in distribution.files or [])
+        for requirement in map(Requirement, distribution.requires or []):
+            if requirement.marker is None or any(
+                requirement.marker.evaluate({"extra": extra}) for extra in (extras or {""})
+            ):
+                pending.append((requirement.name, set(requirement.extras)))
+    return sizes
+
+
+def code_size():
+    total = 0
+    for directory in (LAMBDA_DIR, os.path.join(ROOT, "lib/shared/tracing")):
+        for name in os.listdir(directory):
+            if name.endswith(".py"):
+                total += os.path.getsize(os.path.join(directory, name))
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--verbose", action="store_true", help="list the size of every distribution")
+    args = parser.parse_args()
+
+    mb = 1024 * 1024
+    print(f"{'handler':<20}{'import ms':>10}{'modules':>9}{'packages':>10}{'size MB':>9}{'w/o boto3':>11}  heavy imports")
+    for module, requirements_file in HANDLERS.items():
+        import_ms, modules, heavy = import_profile(module, args.runs)
+        sizes = dependency_closure(read_requirements(os.path.join(LAMBDA_DIR, requirements_file)))
+        installed = {name: size for name, size in sizes.items() if size is not None}
+        total = sum(installed.values()) + code_size()
+        without_base = total - sum(size for name, size in installed.items() if name in BASE_IMAGE_PACKAGES)
+        print(f"{module:<20}{import_ms:>10.0f}{modules:>9}{len(sizes):>10}{total / mb:>9.1f}{without_base / mb:>11.1f}"
+              f"  {', '.join(heavy) or '-'}")
+        missing = sorted(name for name, size in sizes.items() if size is None)
+        if missing:
+            print(f"{'':<20}not installed here, not counted: {', '.join(missing)}")
+        if args.verbose:
+            for name, size in sorted(installed.items(), key=lambda item: -item[1]):
+                print(f"{'':<22}{name:<32}{size / mb:>8.2f} MB")
+    print()
+    print(f"requirement sets in {os.path.relpath(LAMBDA_DIR, ROOT)}: "
+          f"{', '.join(sorted(set(HANDLERS.values())))}; sizes are of the versions installed in this environment")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+"""
+Offline recall@k and latency evaluation of vector-only, BM25-only and hybrid (RRF + rerank) retrieval
+for the news knowledge base index, run against a local OpenSearch container:
+
+    (start OpenSearch as described in benchmarks/README.md)
+    python benchmarks/hybrid_retrieval_eval.py --docs 2000 --queries 200
+
+The corpus is synthetic crypto news. Embeddings are a hashed bag of dictionary words, so rare identifiers
+(tickers, 0x addresses) barely move the vector, which mirrors where real embedding models do worst.
+"""
+import argparse
+import hashlib
+import math
+import os
+import random
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "lib/knowledge-base-news-stack/src/queryKnowledgeBase"))
+
+from opensearchpy import OpenSearch  # noqa: E402
+
+from hybrid_search import (  # noqa: E402
+    build_knn_query,
+    build_lexical_query,
+    hybrid_search,
+    run_queries,
+    text_field_name,
+    vector_field_name,
+)
+
+TOPICS = [
+    "exchange listing", "liquidity pool", "airdrop", "token unlock", "governance vote",
+    "bridge exploit", "staking rewards", "memecoin rally", "stablecoin depeg", "layer two launch",
+]
+FILLER = (
+    "market traders reported volume across major venues while analysts watched funding rates "
+    "and on chain flows as the price moved sharply during the session"
+).split()
+
+
+def make_ticker(rng):
+    return "".join(rng.choice("ABCDEFGHIJKLMNOPQRSTUVWXYZ") for _ in range(rng.randint(3, 5)))
+
+
+def make_address(rng):
+    return "0x" + "".join(rng.choice("0123456789abcdef") for _ in range(40))
+
+
+def embed(text, dimension):
+    vector = [0.0] * dimension
+    for word in text.lower().split():
+        if word.startswith("0x") or len(word) <= 2:
+            continue
+        digest = hashlib.md5(word.encode("utf-8")).digest()
+        index = int.from_bytes(digest[:4], "little") % dimension
+        vector[index] += 1.0 if digest[4] & 1 else -1.0
+    norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+    return [v / norm for v in vector]
+
+
+def build_corpus(rng, num_docs):
+    docs = []
+    for doc_id in range(num_docs):
+        ticker = make_ticker(rng)
+        address = make_address(rng)
+        topic = rng.choice(TOPICS)
+        filler = " ".join(rng.sample(FILLER, 12))
+        text = f"{ticker} {topic} news: contract {address} {filler}"
+        docs.append({"id": str(doc_id), "ticker": ticker, "address": address, "topic": topic, "text": text})
+    return docs
+
+
+def build_queries(rng, docs, num_queries):
+    queries = []
+    for doc in rng.sample(docs, num_queries):
+        if rng.random() < 0.5:
+            question = f"latest {doc['topic']} news for {doc['ticker']}"
+        else:
+            question = f"what happened with contract {doc['address']}"
+        queries.append({"question": question, "relevant": doc["id"]})
+    return queries
+
+
+def create_index(client, index_name, dimension):
+    if client.indices.exists(index=index_name):
+        client.indices.delete(index=index_name)
+    client.indices.create(
+        index=index_name,
+        body={
+            "settings": {"index": {"knn": True, "knn.algo_param.ef_search": 512}},
+            "mappings": {
+                "properties": {
+                    vector_field_name: {
+                        "type": "knn_vector",
+                        "dimension": dimension,
+                        "method": {
+                            "name": "hnsw",
+                            "engine": "faiss",
+                            "parameters": {"ef_construction": 512, "m": 16},
+                            "space_type": "l2",
+                        },
+                    },
+                    "AMAZON_BEDROCK_METADATA": {"type": "text", "index": "false"},
+                    text_field_name: {"type": "text", "index": "true"},
+                }
+            },
+        },
+    )
+
+
+def load_corpus(client, index_name, docs, dimension, batch_size=500):
+    for start in range(0, len(docs), batch_size):
+        body = []
+        for doc in docs[start:start + batch_size]:
+            body.append({"index": {"_index": index_name, "_id": doc["id"]}})
+            body.append({text_field_name: doc["text"], vector_field_name: embed(doc["text"], dimension)})
+        client.bulk(body=body)
+    client.indices.refresh(index=index_name)
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))]
+
+
+def evaluate(client, index_name, queries, dimension, k):
+    def vector_only(q, emb):
+        return run_queries(client, index_name, [build_knn_query(emb, k)])[0]
+
+    def lexical_only(q, emb):
+        return run_queries(client, index_name, [build_lexical_query(q, k)])[0]
+
+    def hybrid(q, emb):
+        return hybrid_search(client, index_name, q, emb, size=k, use_reranker=False)
+
+    def hybrid_rerank(q, emb):
+        return hybrid_search(client, index_name, q, emb, size=k, use_reranker=True)
+
+    modes = {"vector": vector_only, "bm25": lexical_only, "hybrid_rrf": hybrid, "hybrid_rrf_rerank": hybrid_rerank}
+    report = {}
+    for name, search in modes.items():
+        hits_at_k = 0
+        latencies = []
+        for query in queries:
+            emb = embed(query["question"], dimension)
+            start = time.perf_counter()
+            hits = search(query["question"], emb)
+            latencies.append((time.perf_counter() - start) * 1000)
+            if query["relevant"] in [hit["_id"] for hit in hits[:k]]:
+                hits_at_k += 1
+        report[name] = {
+            "recall": hits_at_k / len(queries),
+            "p50_ms": statistics.median(latencies),
+            "p99_ms": percentile(latencies, 99),
+        }
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=9200)
+    parser.add_argument("--index", default="hybrid-eval")
+    parser.add_argument("--docs", type=int, default=2000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--dimension", type=int, default=256)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    client = OpenSearch(hosts=[{"host": args.host, "port": args.port}], timeout=60)
+    docs = build_corpus(rng, args.docs)
+    queries = build_queries(rng, docs, min(args.queries, len(docs)))
+
+    create_index(client, args.index, args.dimension)
+    load_corpus(client, args.index, docs, args.dimension)
+    report = evaluate(client, args.index, queries, args.dimension, args.k)
+    client.indices.delete(index=args.index)
+
+    print(f"{'mode':<20}{'recall@' + str(args.k):>10}{'p50 ms':>10}{'p99 ms':>10}")
+    for name, row in report.items():
+        print(f"{name:<20}{row['recall']:>10.3f}{row['p50_ms']:>10.1f}{row['p99_ms']:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
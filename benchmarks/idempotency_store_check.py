@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+"""
+Checks the sendTx idempotency stores in the supervisor Lambda (`idempotency.py`) and reports claim latency:
+- concurrent claims of the same request: exactly one caller wins, the others see the record
+- a retry after signing gets the stored raw transaction and hash back
+- release only drops requests that never got signed, discard_signed only signed ones
+- an expired IN_PROGRESS claim can be taken over
+
+The SQLite store always runs; pass --dynamodb-endpoint to also run the DynamoDB store against DynamoDB Local
+(see benchmarks/README.md).
+
+    python benchmarks/idempotency_store_check.py --dynamodb-endpoint http://localhost:8000 --threads 32
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+os.environ.setdefault("POWERTOOLS_METRICS_DISABLED", "true")
+os.environ.setdefault("POWERTOOLS_TRACE_DISABLED", "true")
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "lib/shared/tracing"))
+sys.path.insert(0, os.path.join(ROOT, "lib/crypto-ai-agent-supervisor-stack/lambda"))
+
+import boto3  # noqa: E402
+
+import idempotency  # noqa: E402
+from idempotency import (  # noqa: E402
+    IN_PROGRESS, SENT, SIGNED, DynamoDBIdempotencyStore, SQLiteIdempotencyStore, idempotency_key,
+)
+
+RECEIVER = "0xd8dA6BF26964aF9D7eEd9e03E53415D37aA96045"
+
+
+def check(name, condition):
+    print("  {:<56}{}".format(name, "ok" if condition else "FAILED"))
+    return condition
+
+
+def new_key():
+    event = {"sessionId": uuid.uuid4().hex, "inputText": "send 0.1 to vitalik"}
+    return idempotency_key(event, RECEIVER.lower(), Decimal("0.1"))
+
+
+def run_checks(store, threads):
+    ok = True
+    key = new_key()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        results = list(executor.map(lambda _: store.claim(key, RECEIVER, Decimal("0.1")), range(threads)))
+    ok &= check(f"{threads} concurrent claims, one winner", sum(result is None for result in results) == 1)
+    ok &= check("losers see IN_PROGRESS", all(r["status"] == IN_PROGRESS for r in results if r is not None))
+
+    store.mark_signed(key, "ab" * 32, "f8" * 50)
+    record = store.claim(key, RECEIVER, Decimal("0.1"))
+    ok &= check("retry after signing returns raw tx and hash",
+                record["status"] == SIGNED and record["tx_hash"] == "ab" * 32 and record["raw_tx"] == "f8" * 50)
+    store.release(key)
+    ok &= check("release keeps signed requests", store.get(key) is not None)
+    store.mark_sent(key)
+    ok &= check("retry after broadcast returns SENT", store.claim(key, RECEIVER, Decimal("0.1"))["status"] == SENT)
+
+    key = new_key()
+    store.claim(key, RECEIVER, Decimal("0.1"))
+    store.release(key)
+    ok &= check("release drops unsigned requests", store.claim(key, RECEIVER, Decimal("0.1")) is None)
+    store.discard_signed(key)
+    ok &= check("discard keeps unsigned requests", store.get(key) is not None)
+    store.mark_signed(key, "cd" * 32, "f8" * 50)
+    store.discard_signed(key)
+    ok &= check("discard drops signed requests", store.claim(key, RECEIVER, Decimal("0.1")) is None)
+
+    key = new_key()
+    in_progress_ttl = idempotency.IN_PROGRESS_TTL_SECONDS
+    idempotency.IN_PROGRESS_TTL_SECONDS = 1
+    try:
+        store.claim(key, RECEIVER, Decimal("0.1"))
+        time.sleep(2.1)
+        ok &= check("expired IN_PROGRESS claim can be taken over", store.claim(key, RECEIVER, Decimal("0.1")) is None)
+    finally:
+        idempotency.IN_PROGRESS_TTL_SECONDS = in_progress_ttl
+    return ok
+
+
+def time_claims(store, count):
+    latencies = []
+    for _ in range(count):
+        key = new_key()
+        start = time.perf_counter()
+        store.claim(key, RECEIVER, Decimal("0.1"))
+        latencies.append((time.perf_counter() - start) * 1000)
+        start = time.perf_counter()
+        store.claim(key, RECEIVER, Decimal("0.1"))
+        latencies.append((time.perf_counter() - start) * 1000)
+    latencies.sort()
+    return latencies[len(latencies) // 2], latencies[int(len(latencies) * 0.99) - 1]
+
+
+def create_table(client, table_name):
+    client.create_table(
+        TableName=table_name,
+        KeySchema=[{"AttributeName": "id", "KeyType": "HASH"}],
+        AttributeDefinitions=[{"AttributeName": "id", "AttributeType": "S"}],
+        BillingMode="PAY_PER_REQUEST",
+    )
+    client.get_waiter("table_exists").wait(TableName=table_name)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dynamodb-endpoint", default=None)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--claims", type=int, default=200)
+    args = parser.parse_args()
+
+    stores = [("sqlite", SQLiteIdempotencyStore(os.path.join(tempfile.mkdtemp(), "idempotency.sqlite3")))]
+    if args.dynamodb_endpoint:
+        client = boto3.client(
+            "dynamodb", endpoint_url=args.dynamodb_endpoint, region_name="us-east-1",
+            aws_access_key_id="local", aws_secret_access_key="local",
+        )
+        table_name = "idempotency-check-" + uuid.uuid4().hex[:8]
+        create_table(client, table_name)
+        stores.append(("dynamodb", DynamoDBIdempotencyStore(table_name, client=client)))
+
+    ok = True
+    for name, store in stores:
+        print(name)
+        ok &= run_checks(store, args.threads)
+        p50, p99 = time_claims(store, args.claims)
+        print("  claim latency p50 {:.2f} ms, p99 {:.2f} ms".format(p50, p99))
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
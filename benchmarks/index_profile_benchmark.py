@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+"""
+Recall@k, p99 query latency and k-NN graph memory of each OpenSearch index profile
+(`oss_utils.INDEX_PROFILES`) on a synthetic clustered vector corpus, run against a local OpenSearch container.
+
+    python benchmarks/index_profile_benchmark.py --vectors 20000 --dimension 256
+    python benchmarks/index_profile_benchmark.py --profiles default compact --space-type innerproduct
+
+Ground truth is exact nearest neighbours computed with NumPy. Requires numpy and the news stack
+lambda_layer requirements.
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "lib/knowledge-base-news-stack/src/amazon_bedrock_knowledge_base_infra_setup_lambda"))
+sys.path.insert(0, os.path.join(ROOT, "lib/shared/embedding_models"))
+
+from opensearchpy import OpenSearch  # noqa: E402
+
+from oss_utils import INDEX_PROFILES, build_index_request, get_index_profile  # noqa: E402
+
+VECTOR_FIELD = "bedrock-knowledge-base-default-vector"
+MODEL_ID = "amazon.titan-embed-text-v2:0"
+
+
+def synthetic_corpus(rng, num_vectors, num_queries, dimension, num_clusters=64):
+    centers = rng.normal(size=(num_clusters, dimension))
+    assignments = rng.integers(0, num_clusters, size=num_vectors + num_queries)
+    data = centers[assignments] + 0.35 * rng.normal(size=(num_vectors + num_queries, dimension))
+    data /= np.linalg.norm(data, axis=1, keepdims=True)
+    return data[:num_vectors].astype(np.float32), data[num_vectors:].astype(np.float32)
+
+
+def exact_neighbours(corpus, queries, k, space_type):
+    if space_type == "innerproduct":
+        scores = queries @ corpus.T
+    else:
+        scores = -(
+            (queries ** 2).sum(axis=1, keepdims=True) - 2 * queries @ corpus.T + (corpus ** 2).sum(axis=1)
+        )
+    return np.argsort(-scores, axis=1)[:, :k]
+
+
+def to_index_vectors(vectors, quantization):
+    if quantization == "byte":
+        return np.clip(np.rint(vectors * 127), -128, 127).astype(np.int8)
+    return vectors
+
+
+def load(client, index_name, vectors, batch_size=1000):
+    for start in range(0, len(vectors), batch_size):
+        body = []
+        for offset, vector in enumerate(vectors[start:start + batch_size]):
+            body.append({"index": {"_index": index_name, "_id": str(start + offset)}})
+            body.append({VECTOR_FIELD: vector.tolist()})
+        client.bulk(body=body)
+    client.indices.refresh(index=index_name)
+    client.indices.forcemerge(index=index_name, max_num_segments=1, request_timeout=600)
+
+
+def graph_memory_kb(client, index_name):
+    client.transport.perform_request("GET", f"/_plugins/_knn/warmup/{index_name}")
+    stats = client.transport.perform_request("GET", "/_plugins/_knn/stats")
+    total = 0
+    for node in stats["nodes"].values():
+        total += node.get("indices_in_cache", {}).get(index_name, {}).get("graph_memory_usage", 0)
+    return total
+
+
+def run_profile(client, profile_name, space_type, corpus, queries, truth, k, dimension):
+    index_name = f"profile-bench-{profile_name}"
+    request = build_index_request(MODEL_ID, profile_name, dimension, space_type)
+    quantization = get_index_profile(MODEL_ID, profile_name, space_type)["quantization"]
+    if client.indices.exists(index=index_name):
+        client.indices.delete(index=index_name)
+    client.indices.create(index=index_name, body=request)
+
+    start = time.perf_counter()
+    load(client, index_name, to_index_vectors(corpus, quantization))
+    build_seconds = time.perf_counter() - start
+    memory_kb = graph_memory_kb(client, index_name)
+
+    latencies = []
+    hits = 0
+    query_vectors = to_index_vectors(queries, quantization)
+    for query, expected in zip(query_vectors, truth):
+        start = time.perf_counter()
+        response = client.search(
+            index=index_name,
+            body={"size": k, "_source": False, "query": {"knn": {VECTOR_FIELD: {"vector": query.tolist(), "k": k}}}},
+        )
+        latencies.append((time.perf_counter() - start) * 1000)
+        found = {int(hit["_id"]) for hit in response["hits"]["hits"]}
+        hits += len(found & set(expected.tolist()))
+
+    client.indices.delete(index=index_name)
+    return {
+        "recall": hits / (len(queries) * k),
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p99_ms": float(np.percentile(latencies, 99)),
+        "memory_kb": memory_kb,
+        "build_s": build_seconds,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=9200)
+    parser.add_argument("--vectors", type=int, default=20000)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--dimension", type=int, default=256, choices=[256, 512, 1024])
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--space-type", default=None, choices=["l2", "innerproduct"])
+    parser.add_argument("--profiles", nargs="+", default=list(INDEX_PROFILES))
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    client = OpenSearch(hosts=[{"host": args.host, "port": args.port}], timeout=120)
+    rng = np.random.default_rng(args.seed)
+    corpus, queries = synthetic_corpus(rng, args.vectors, args.queries, args.dimension)
+
+    print(f"{'profile':<14}{'space':<14}{'recall@' + str(args.k):>10}{'p50 ms':>9}{'p99 ms':>9}{'graph KB':>11}{'build s':>9}")
+    for profile_name in args.profiles:
+        space_type = get_index_profile(MODEL_ID, profile_name, args.space_type)["space_type"]
+        truth = exact_neighbours(corpus, queries, args.k, space_type)
+        row = run_profile(client, profile_name, space_type, corpus, queries, truth, args.k, args.dimension)
+        print(
+            f"{profile_name:<14}{space_type:<14}{row['recall']:>10.3f}{row['p50_ms']:>9.1f}"
+            f"{row['p99_ms']:>9.1f}{row['memory_kb']:>11.0f}{row['build_s']:>9.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+"""
+Local stand-in for the `rds-data` boto3 client on top of a plain Postgres connection (psycopg2), so the RDS
+custom resource code in rds_utils can run against a local pgvector container:
+
+    docker run -d --name pgvector -p 5432:5432 -e POSTGRES_PASSWORD=postgres pgvector/pgvector:pg16
+    pip install psycopg2-binary
+
+Only the calls rds_utils makes are implemented. Each call can be delayed by `latency_seconds` to model the
+Data API round trip, and `fail_on` makes any statement containing that text fail, to exercise rollbacks.
+"""
+import re
+import time
+import uuid
+
+import psycopg2
+
+NAMED_PARAMETER_PATTERN = re.compile(r"(?<!:):([A-Za-z_][A-Za-z0-9_]*)")
+
+
+def to_python_value(field):
+    if field.get("isNull"):
+        return None
+    for key in ("stringValue", "longValue", "doubleValue", "booleanValue"):
+        if key in field:
+            return field[key]
+    raise ValueError("Unsupported parameter value {}".format(field))
+
+
+def to_psycopg(sql, parameters):
+    if not parameters:
+        return sql, None
+    values = {p["name"]: to_python_value(p["value"]) for p in parameters}
+    return NAMED_PARAMETER_PATTERN.sub(lambda m: "%({})s".format(m.group(1)), sql.replace("%", "%%")), values
+
+
+class LocalDataApiClient:
+    def __init__(self, dsn, latency_seconds=0.0, fail_on=None):
+        self.dsn = dsn
+        self.latency_seconds = latency_seconds
+        self.fail_on = fail_on
+        self.calls = {}
+        self.transactions = {}
+
+    def _record(self, name):
+        self.calls[name] = self.calls.get(name, 0) + 1
+        if self.latency_seconds:
+            time.sleep(self.latency_seconds)
+
+    def _connection(self, transaction_id):
+        if transaction_id:
+            return self.transactions[transaction_id], False
+        connection = psycopg2.connect(self.dsn)
+        connection.autocommit = True
+        return connection, True
+
+    def _check_failure(self, sql):
+        if self.fail_on and self.fail_on in sql:
+            raise Exception("Injected failure for statement containing {!r}".format(self.fail_on))
+
+    def begin_transaction(self, resourceArn, secretArn, database, **kwargs):
+        self._record("begin_transaction")
+        transaction_id = uuid.uuid4().hex
+        self.transactions[transaction_id] = psycopg2.connect(self.dsn)
+        return {"transactionId": transaction_id}
+
+    def commit_transaction(self, resourceArn, secretArn, transactionId):
+        self._record("commit_transaction")
+        connection = self.transactions.pop(transactionId)
+        connection.commit()
+        connection.close()
+        return {"transactionStatus": "Transaction Committed"}
+
+    def rollback_transaction(self, resourceArn, secretArn, transactionId):
+        self._record("rollback_transaction")
+        connection = self.transactions.pop(transactionId)
+        connection.rollback()
+        connection.close()
+        return {"transactionStatus": "Rollback Complete"}
+
+    def execute_statement(self, resourceArn, secretArn, database, sql, transactionId=None, parameters=None, **kwargs):
+        self._record("execute_statement")
+        self._check_failure(sql)
+        connection, close = self._connection(transactionId)
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(*to_psycopg(sql, parameters))
+                records = cursor.fetchall() if cursor.description else []
+                return {
+                    "numberOfRecordsUpdated": max(cursor.rowcount, 0),
+                    "records": [[{"stringValue": str(v)} for v in row] for row in records],
+                }
+        finally:
+            if close:
+                connection.close()
+
+    def query(self, sql):
+        connection = psycopg2.connect(self.dsn)
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(sql)
+                return cursor.fetchall()
+        finally:
+            connection.close()
+
+
+class LocalSecretsManagerClient:
+    def __init__(self, password):
+        self.password = password
+
+    def get_secret_value(self, SecretId):
+        return {"SecretString": '{"password": "%s"}' % self.password}
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+"""
+"What is my wallet worth?" answered with one getPortfolio action against the chain of actions the agent needs
+without it: getWalletAddress, getBalance and getCryptoPrice for the native token, then getTokenBalance and
+getCryptoPrice per registry token. Both run in fresh processes of the combined supervisor handler (index.py)
+against the stand-ins of event_replay_benchmark.py, each delaying every request by --latency-ms; the first pass is
+the cold turn, the second the warm one (prices, wallet address and reads cached).
+
+The end-to-end estimate adds --agent-step-ms per action: the model's orchestration step that picks each action
+and reads its answer, which the agent pays once per action round trip.
+
+It checks that both answer, that getPortfolio values the wallet like the chained answers do, and that its reads
+of the balances take one eth_call and its prices one CoinGecko request.
+
+    python benchmarks/portfolio_benchmark.py --latency-ms 40 --agent-step-ms 1500
+"""
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+from contextlib import ExitStack
+from types import SimpleNamespace
+
+BENCHMARKS = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCHMARKS)
+
+
+def agent_event(function, **parameters):
+    return {
+        "messageVersion": "1.0",
+        "agent": {"name": "CryptoAIAgent", "id": "AGENT00001", "alias": "TSTALIASID", "version": "DRAFT"},
+        "sessionId": "portfolio-benchmark",
+        "actionGroup": "wallet_management",
+        "function": function,
+        "parameters": [{"name": name, "type": "string", "value": value} for name, value in parameters.items()],
+        "inputText": "What is my wallet worth?",
+        "sessionAttributes": {},
+        "promptSessionAttributes": {},
+    }
+
+
+def turn(mode):
+    # [(action, event)] of one agent turn
+    from chains import get_chain
+    from portfolio import holdings
+
+    if mode == "portfolio":
+        return [("getPortfolio", agent_event("getPortfolio"))]
+    steps = [
+        ("getWalletAddress", agent_event("getWalletAddress")),
+        ("getBalance", agent_event("getBalance")),
+        ("getCryptoPrice", agent_event("getCryptoPrice", token=get_chain()["coingecko_id"])),
+    ]
+    for asset in holdings()[1:]:
+        steps.append((f"getTokenBalance {asset['symbol']}", agent_event("getTokenBalance", token=asset["symbol"])))
+        steps.append((f"getCryptoPrice {asset['symbol']}", agent_event("getCryptoPrice", token=asset["price_id"])))
+    return steps
+
+
+def child(mode):
+    from event_replay_benchmark import invoke
+
+    sys.path.insert(0, os.path.join(ROOT, "lib/shared/tracing"))
+    sys.path.insert(0, os.path.join(ROOT, "lib/crypto-ai-agent-supervisor-stack/lambda"))
+    import index
+
+    passes = []
+    for _ in range(2):
+        answers = []
+
+        def handler(event, context):
+            response = index.lambda_handler(event, context)
+            answers.append(response["response"]["functionResponse"]["responseBody"]["TEXT"]["body"])
+            return response
+
+        steps = [(name,) + invoke(handler, "supervisor", name, event) for name, event in turn(mode)]
+        passes.append({"steps": steps, "answers": answers})
+    print(json.dumps(passes))
+
+
+def run_child(mode, env, servers):
+    before = {name: server.requests for name, server in servers.items() if name != "node"}
+    before["rpc"] = servers["node"].http_requests
+    calls_before = dict(servers["node"].calls)
+    process = subprocess.run([sys.executable, os.path.abspath(__file__), "--child", mode],
+                             env=env, stdout=subprocess.PIPE, text=True)
+    if process.returncode != 0:
+        raise RuntimeError(f"{mode} process exited with {process.returncode}")
+    passes = json.loads(process.stdout.strip().splitlines()[-1])
+    requests = {name: server.requests - before[name] for name, server in servers.items() if name != "node"}
+    requests["rpc"] = servers["node"].http_requests - before["rpc"]
+    eth_calls = servers["node"].calls.get("eth_call", 0) - calls_before.get("eth_call", 0)
+    return passes, requests, eth_calls
+
+
+def chained_value(answers):
+    # The USD value the agent would add up from the chained answers: balance x price per asset
+    from portfolio import holdings
+
+    assets = holdings()
+    native_balance, native_price = float(answers[1]), float(answers[2])
+    total = native_balance * native_price
+    for position in range(1, len(assets)):
+        balance = float(answers[1 + 2 * position].split()[0])
+        price = answers[2 + 2 * position]
+        if balance and not price.startswith("No data"):
+            total += balance * float(price)
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--latency-ms", type=float, default=40.0)
+    parser.add_argument("--agent-step-ms", type=float, default=1500.0)
+    parser.add_argument("--child", choices=["chained", "portfolio"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    sys.path.insert(0, os.path.join(ROOT, "lib/shared/tracing"))
+    sys.path.insert(0, os.path.join(ROOT, "lib/crypto-ai-agent-supervisor-stack/lambda"))
+    if args.child:
+        child(args.child)
+        return
+
+    from event_replay_benchmark import start_stand_ins
+
+    with ExitStack() as stack:
+        stand_in_env, servers = start_stand_ins(
+            stack, SimpleNamespace(latency_ms=args.latency_ms, handlers=["supervisor"], athena_rows=0)
+        )
+        env = dict(os.environ, **stand_in_env, ACTIVITY_DB_PATH=os.path.join(tempfile.mkdtemp(), "activity.sqlite3"))
+        env.pop("AWS_PROFILE", None)
+        results = {mode: run_child(mode, env, servers) for mode in ("chained", "portfolio")}
+
+    print(f"wallet valuation turn, {args.latency_ms:.0f} ms per stand-in request, "
+          f"{args.agent_step_ms:.0f} ms agent step per action")
+    print(f"{'':<12}{'actions':>8}{'cold ms':>10}{'warm ms':>10}{'end to end cold ms':>20}{'requests, both passes':>40}")
+    totals = {}
+    for mode, (passes, requests, _) in results.items():
+        cold, warm = (sum(ms for _, ms, _ in one_pass["steps"]) for one_pass in passes)
+        actions = len(passes[0]["steps"])
+        totals[mode] = cold + actions * args.agent_step_ms
+        counts = f"rpc {requests['rpc']}, kms {requests['kms']}, coingecko {requests['coingecko']}"
+        print(f"{mode:<12}{actions:>8}{cold:>10.0f}{warm:>10.0f}{totals[mode]:>20.0f}{counts:>40}")
+    print()
+    portfolio_answer = results["portfolio"][0][0]["answers"][0]
+    print(portfolio_answer)
+    print()
+
+    def check(name, condition):
+        print("{:<66}{}".format(name, "ok" if condition else "FAILED"))
+        return condition
+
+    chained_passes = results["chained"][0]
+    portfolio_passes, portfolio_requests, portfolio_eth_calls = results["portfolio"]
+    total = float(re.search(r"Total value: ([\d,.]+) USD", portfolio_answer).group(1).replace(",", ""))
+    ok = True
+    ok &= check("every action answered", not any(
+        error for passes in (chained_passes, portfolio_passes) for one_pass in passes for _, _, error in one_pass["steps"]
+    ))
+    ok &= check("getPortfolio values the wallet like the chained answers",
+                abs(total - chained_value(chained_passes[0]["answers"])) < 0.01)
+    # Two passes: one eth_call (the multicall) and one CoinGecko request each at most
+    ok &= check("one multicall per turn and one batched price request", portfolio_eth_calls <= 2
+                and portfolio_requests["coingecko"] <= 2)
+    ok &= check("the portfolio turn is faster end to end", totals["portfolio"] < totals["chained"])
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
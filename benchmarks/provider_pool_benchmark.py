@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+"""
+Read latency and success rate of the supervisor Lambda's RPC provider pool (`provider_pool.py`) against three
+local fake JSON-RPC nodes (fake_rpc.py) with injected faults, compared with using each node on its own:
+- steady: low latency with rare long spikes
+- spiky: a bit faster on average but with frequent spikes
+- flaky: fast but fails a share of requests with HTTP 503
+Halfway through, the steady node goes down to show failover. The script also checks that requests made inside
+`pin()` all reach a single node, and that `keep_chain()` drops a node serving another chain ID.
+
+    python benchmarks/provider_pool_benchmark.py --requests 400 --hedge-after-ms 150
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+os.environ.setdefault("POWERTOOLS_METRICS_DISABLED", "true")
+os.environ.setdefault("POWERTOOLS_TRACE_DISABLED", "true")
+os.environ.setdefault("POWERTOOLS_LOG_LEVEL", "ERROR")
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "lib/shared/tracing"))
+sys.path.insert(0, os.path.join(ROOT, "lib/crypto-ai-agent-supervisor-stack/lambda"))
+
+from fake_rpc import FakeChain, FakeRPCServer  # noqa: E402
+
+from provider_pool import RPCProviderPool  # noqa: E402
+
+BODY = json.dumps({"jsonrpc": "2.0", "id": 1, "method": "eth_blockNumber", "params": []}).encode()
+
+
+def run(pool, requests, on_half=None):
+    latencies, failures = [], 0
+    for i in range(requests):
+        if on_half and i == requests // 2:
+            on_half()
+        start = time.perf_counter()
+        try:
+            pool.request(BODY, ["eth_blockNumber"])
+            latencies.append((time.perf_counter() - start) * 1000)
+        except Exception:
+            failures += 1
+    latencies.sort()
+    if not latencies:
+        return float("nan"), float("nan"), 0.0
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    return latencies[len(latencies) // 2], p99, 1 - failures / requests
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--hedge-after-ms", type=float, default=150)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    chain = FakeChain()
+    profiles = {
+        "steady": dict(latency_seconds=0.030, slow_rate=0.01, slow_seconds=1.0),
+        "spiky": dict(latency_seconds=0.020, slow_rate=0.10, slow_seconds=0.8),
+        "flaky": dict(latency_seconds=0.015, error_rate=0.25),
+    }
+    nodes = {name: FakeRPCServer(chain, seed=args.seed, **profile) for name, profile in profiles.items()}
+    for node in nodes.values():
+        node.__enter__()
+    hedge = args.hedge_after_ms / 1000
+    try:
+        print(f"{'routing':<22}{'p50 ms':>9}{'p99 ms':>9}{'success':>9}")
+        for name, node in nodes.items():
+            p50, p99, success = run(RPCProviderPool([node.url], hedge_after_seconds=60), args.requests)
+            print(f"{'only ' + name:<22}{p50:>9.1f}{p99:>9.1f}{success:>9.1%}")
+
+        pool = RPCProviderPool([node.url for node in nodes.values()], hedge_after_seconds=hedge)
+        p50, p99, success = run(pool, args.requests)
+        print(f"{'pool':<22}{p50:>9.1f}{p99:>9.1f}{success:>9.1%}")
+
+        pool = RPCProviderPool([node.url for node in nodes.values()], hedge_after_seconds=hedge)
+        p50, p99, success = run(pool, args.requests, on_half=lambda: setattr(nodes["steady"], "down", True))
+        print(f"{'pool, steady dies':<22}{p50:>9.1f}{p99:>9.1f}{success:>9.1%}")
+        nodes["steady"].down = False
+
+        print()
+        for stats in pool.stats():
+            print("  {url:<28} latency {latency_ms} ms, error rate {error_rate}, requests {requests}".format(**stats))
+
+        for node in nodes.values():
+            node.reset_counters()
+        pool = RPCProviderPool([node.url for node in nodes.values()], hedge_after_seconds=hedge)
+        with pool.pin():
+            for _ in range(20):
+                try:
+                    pool.request(BODY, ["eth_sendRawTransaction"])
+                except Exception:
+                    pass
+        reached = [name for name, node in nodes.items() if node.http_requests]
+        print()
+        print("pinned requests reached {} node(s): {}".format(len(reached), ", ".join(reached)))
+
+        with FakeRPCServer(FakeChain(chain_id=1)) as other_chain:
+            pool = RPCProviderPool([nodes["steady"].url, other_chain.url], hedge_after_seconds=hedge)
+            pool.keep_chain(chain.chain_id)
+            kept = [endpoint.url for endpoint in pool.endpoints]
+        print("endpoints kept for chain ID {}: {} of 2".format(chain.chain_id, len(kept)))
+        sys.exit(0 if len(reached) == 1 and kept == [nodes["steady"].url] else 1)
+    finally:
+        for node in nodes.values():
+            node.__exit__()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+"""
+Sends SQL through the txtsql handler's /athenaQuery with the EXPLAIN dry run of `query_validation.py`, against the
+Athena stand-in of fake_services.py (which answers EXPLAIN (TYPE IO, FORMAT JSON) with an IO plan) and a moto S3
+server for the results. It checks that:
+- queries Athena cannot plan come back with its message after the EXPLAIN alone, nothing else is run
+- a large table read on every day, or on more days than ATHENA_MAX_SCAN_DAYS, comes back with rewrite hints
+  instead of running; bounded ranges and full reads of small tables run
+- with table statistics (estimates in the plan) a query over ATHENA_MAX_SCAN_GB comes back, and the estimate of
+  the queries that run is in their answer
+- a cast filter on the partition column counts for the table it is qualified with only, in joins
+- the same query written with other case, whitespace or comments is answered from the verdict cache
+- an EXPLAIN that fails for another reason than the SQL comes back unrun and uncached, and SHOW / DESCRIBE
+  statements run without one
+It then prints the latency at --latency-ms per stand-in request of each kind of query with and without the dry
+run, with the Athena calls made.
+
+    python benchmarks/query_validation_check.py --latency-ms 50
+"""
+import argparse
+import io
+import os
+import sys
+import time
+import warnings
+from contextlib import ExitStack, redirect_stdout
+
+os.environ.setdefault("POWERTOOLS_METRICS_DISABLED", "true")
+os.environ.setdefault("POWERTOOLS_TRACE_DISABLED", "true")
+os.environ.setdefault("POWERTOOLS_LOG_LEVEL", "ERROR")
+os.environ.update(AWS_REGION="us-east-1", AWS_DEFAULT_REGION="us-east-1", AWS_ACCESS_KEY_ID="check",
+                  AWS_SECRET_ACCESS_KEY="check", ATHENA_QUERY_RESULTS_BUCKET_NAME="check-results")
+
+# Metrics are disabled, so powertools warns on every flush that there is nothing to publish
+warnings.filterwarnings("ignore", category=UserWarning)
+
+BENCHMARKS = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCHMARKS)
+sys.path.insert(0, os.path.join(ROOT, "lib/shared/tracing"))
+sys.path.insert(0, os.path.join(ROOT, "lib/knowledge-base-blockchain-data-stack/lambda/bedrock-agent-txtsql-action"))
+
+INVALID = [
+    "SELECT count(*) FROM btc.blocks WHERE",
+    "SELECT count(*) FROM eth.receipts WHERE date = '2024-01-01'",
+    "SELECT count(nonce) FROM eth.transactions WHERE date = '2024-01-01'",
+]
+REJECTED = [
+    "SELECT from_address, count(*) FROM eth.transactions GROUP BY 1 ORDER BY 2 DESC LIMIT 20",
+    "SELECT * FROM btc.transactions ORDER BY fee DESC LIMIT 20",
+    "SELECT avg(fee) FROM btc.transactions WHERE date BETWEEN '2023-01-01' AND '2024-01-02'",
+    "SELECT count(*) FROM eth.token_transfers WHERE date <= '2024-01-01'",
+]
+ALLOWED = [
+    "SELECT cast(date as date) AS day, count(*) AS blocks FROM btc.blocks GROUP BY 1 ORDER BY 1",
+    "SELECT avg(fee) FROM btc.transactions WHERE date BETWEEN '2024-01-01' AND '2024-01-07'",
+    "SELECT count(*) FROM eth.transactions WHERE cast(date as date) >= DATE '2024-01-01'",
+]
+# The cast filter is on eth.blocks only, then on both tables
+JOIN = ("SELECT count(*) FROM eth.transactions t JOIN eth.blocks AS b ON t.block_number = b.number "
+        "WHERE cast(b.date as date) = DATE '2024-01-01'")
+JOIN_FILTERED = JOIN + " AND cast(t.date as date) = DATE '2024-01-01'"
+
+
+def check(name, condition):
+    print("{:<72}{}".format(name, "ok" if condition else "FAILED"))
+    return condition
+
+
+def athena_event(query):
+    return {
+        "messageVersion": "1.0",
+        "agent": {"name": "BlockchainDataAgent", "id": "AGENT00001", "alias": "TSTALIASID", "version": "DRAFT"},
+        "sessionId": "validation-check",
+        "actionGroup": "query-athena",
+        "apiPath": "/athenaQuery",
+        "httpMethod": "POST",
+        "parameters": [],
+        "requestBody": {"content": {"application/json": {"properties": [
+            {"name": "query", "type": "string", "value": query}
+        ]}}},
+        "sessionAttributes": {},
+        "promptSessionAttributes": {},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    parser.add_argument("--athena-rows", type=int, default=10000)
+    args = parser.parse_args()
+
+    from event_replay_benchmark import LambdaContext, start_s3
+    from fake_services import FakeAthenaServer
+
+    with ExitStack() as stack:
+        s3_endpoint = start_s3(stack, os.environ["ATHENA_QUERY_RESULTS_BUCKET_NAME"])
+        server = stack.enter_context(FakeAthenaServer(rows=args.athena_rows, s3_endpoint=s3_endpoint))
+        os.environ["AWS_ENDPOINT_URL_ATHENA"] = server.url
+        if s3_endpoint:
+            os.environ["AWS_ENDPOINT_URL_S3"] = s3_endpoint
+
+        import index
+        from query_validation import get_validation_cache
+
+        # The invalid queries run without the dry run log their failure
+        index.logger.setLevel("CRITICAL")
+
+        def executions(kind):
+            # Queries the stand-in has seen: the EXPLAIN dry runs or the others
+            explain = kind == "explain"
+            return sum(execution["Query"].lstrip().upper().startswith("EXPLAIN") == explain
+                       for execution in list(server.executions.values()))
+
+        def call(query, validate=True):
+            index.VALIDATE = validate
+            before = (server.requests, executions("explain"), executions("query"))
+            start = time.perf_counter()
+            # The handler prints its cold start metric
+            with redirect_stdout(io.StringIO()):
+                response = index.lambda_handler(athena_event(query), LambdaContext())
+            seconds = time.perf_counter() - start
+            body = response["response"]["responseBody"]["application/json"]["body"]
+            return body, {"seconds": seconds, "requests": server.requests - before[0],
+                          "explains": executions("explain") - before[1], "queries": executions("query") - before[2]}
+
+        ok = True
+        answers = [call(query) for query in INVALID]
+        ok &= check("queries Athena cannot plan come back after the EXPLAIN alone",
+                    all("not valid" in body.get("error", "") and calls["explains"] == 1 and calls["queries"] == 0
+                        for body, calls in answers))
+        answers = [call(query) for query in REJECTED]
+        ok &= check("large tables read on every day or too many days come back unrun",
+                    all("not run" in body.get("error", "") and body.get("hints") and calls["queries"] == 0
+                        for body, calls in answers))
+        ok &= check("the hints name the rewrite",
+                    "filter eth.transactions" in answers[0][0]["error"]
+                    and "instead of SELECT *" in answers[1][0]["error"]
+                    and "at most" in answers[2][0]["error"] and "unbounded" in answers[3][0]["error"])
+        answers = [call(query) for query in ALLOWED]
+        ok &= check("bounded ranges and small tables run",
+                    all("error" not in body and body["rowCount"] > 0 and calls["queries"] == 1
+                        for body, calls in answers))
+
+        body, calls = call(JOIN)
+        ok &= check("a filter on another table of the join does not count",
+                    "every day of eth.transactions" in body.get("error", "") and calls["queries"] == 0)
+        body, calls = call(JOIN_FILTERED)
+        ok &= check("a filter qualified with the table's alias does",
+                    "error" not in body and body["rowCount"] == 1 and calls["queries"] == 1)
+
+        get_validation_cache().entries.clear()
+        server.explain_row_bytes = 2_000_000
+        day = "SELECT avg(gas_price) FROM eth.transactions WHERE date = '2024-01-01'"
+        body, _ = call(day)
+        ok &= check("with statistics a query over the GB limit comes back unrun",
+                    "GB allowed" in body.get("error", "") and body["estimatedScanBytes"] > 50e9)
+        server.explain_row_bytes = 200
+        body, _ = call(day.replace("avg", "max"))
+        ok &= check("the estimate of a query that runs is in its answer",
+                    "error" not in body and body.get("estimatedScanBytes", 0) > 0)
+        server.explain_row_bytes = None
+
+        first, _ = call(ALLOWED[1])
+        variant = "select   AVG(fee)\n  from BTC.TRANSACTIONS -- the first week\n where date between '2024-01-01' " \
+                  "and '2024-01-07';"
+        again, calls = call(variant)
+        ok &= check("the same query in other case, spacing or comments skips the EXPLAIN",
+                    calls["explains"] == 0 and calls["queries"] == 1 and again["rows"] == first["rows"])
+        _, calls = call(variant.replace("'2024-01-07'", "'2024-01-06'"))
+        ok &= check("another literal is planned again", calls["explains"] == 1)
+
+        server.explain_failure = "INTERNAL_ERROR_QUERY_ENGINE: Amazon Athena experienced an internal error"
+        body, calls = call(ALLOWED[2])
+        server.explain_failure = None
+        ok &= check("an EXPLAIN failing on Athena's side comes back unrun",
+                    "could not be checked" in body.get("error", "") and calls["queries"] == 0)
+        body, calls = call(ALLOWED[2])
+        ok &= check("and is not cached", "error" not in body and calls["explains"] == 1 and calls["queries"] == 1)
+        body, calls = call("DESCRIBE eth.transactions")
+        ok &= check("DESCRIBE runs without an EXPLAIN",
+                    "error" not in body and calls["explains"] == 0 and calls["queries"] == 1)
+
+        print()
+        print(f"{args.latency_ms:.0f} ms per stand-in request (moto S3 answers at once)")
+        print(f"{'query':<20}{'dry run':>9}{'answer':>12}{'EXPLAINs':>10}{'queries':>9}{'requests':>10}{'ms':>8}")
+        server.latency_seconds = args.latency_ms / 1000
+        for label, query in (("invalid", INVALID[1]), ("every day", REJECTED[0]), ("bounded", ALLOWED[1])):
+            for mode in ("off", "cold", "cached"):
+                if mode == "cold":
+                    get_validation_cache().entries.clear()
+                body, calls = call(query, validate=mode != "off")
+                answer = "error" if "error" in body else f"{body['rowCount']} rows"
+                print(f"{label:<20}{mode:>9}{answer[:40]:>12}{calls['explains']:>10}{calls['queries']:>9}"
+                      f"{calls['requests']:>10}{calls['seconds'] * 1000:>8.0f}")
+        print("An EXPLAIN scans nothing; Athena bills the query it replaces by the bytes it would have scanned")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+"""
+RPC traffic and turn latency of the supervisor Lambda's block read cache (`read_cache.py`) under load: concurrent
+"agent turns" (a balance read, a domain lookup and a gas estimate over a small set of popular addresses) against a
+fake JSON-RPC node (fake_rpc.py) that mines a block every --block-time-ms, with and without the cache. It also
+checks that:
+- reads in the same block return the same answer even if the node's state changes in between
+- a new balance is seen within one block time of the block that carries it
+- the cache stays within its entry limit
+- a gas estimate at `pending` (sendToken's) always goes to the node
+
+    python benchmarks/read_cache_benchmark.py --workers 8 --seconds 5 --latency-ms 20 --block-time-ms 500
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import threading
+import time
+
+os.environ.setdefault("POWERTOOLS_METRICS_DISABLED", "true")
+os.environ.setdefault("POWERTOOLS_TRACE_DISABLED", "true")
+os.environ.setdefault("POWERTOOLS_LOG_LEVEL", "ERROR")
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "lib/shared/tracing"))
+sys.path.insert(0, os.path.join(ROOT, "lib/crypto-ai-agent-supervisor-stack/lambda"))
+
+from fake_rpc import FakeRPCServer  # noqa: E402
+
+from web3 import Web3  # noqa: E402
+
+import unstoppable_domains  # noqa: E402
+from chains import get_chain  # noqa: E402
+from provider_pool import PooledHTTPProvider, RPCProviderPool  # noqa: E402
+from read_cache import BlockReadCache  # noqa: E402
+
+WALLET = Web3.to_checksum_address("0x" + "f" * 40)
+
+
+def owner(i):
+    return Web3.to_checksum_address("0x" + format(0xB0B + i, "040x"))
+
+
+def agent_turn(w3, rng, popular):
+    i = rng.randrange(popular)
+    contract = w3.eth.contract(address=Web3.to_checksum_address(get_chain()["ud_resolver"]), abi=unstoppable_domains.ABI)
+    w3.eth.get_balance(owner(i))
+    contract.functions.getData([], unstoppable_domains.token_id(f"user{i}.crypto")).call()
+    w3.eth.estimate_gas({"from": WALLET, "to": owner(i), "value": 1})
+
+
+def load(node, w3, workers, seconds):
+    node.reset_counters()
+    latencies = []
+    lock = threading.Lock()
+    deadline = time.monotonic() + seconds
+
+    def worker(seed):
+        rng = random.Random(seed)
+        while time.monotonic() < deadline:
+            start = time.perf_counter()
+            agent_turn(w3, rng, popular=5)
+            with lock:
+                latencies.append((time.perf_counter() - start) * 1000)
+
+    threads = [threading.Thread(target=worker, args=(seed,)) for seed in range(workers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return len(latencies), node.http_requests, statistics.median(latencies)
+
+
+def check(name, condition):
+    print("{:<66}{}".format(name, "ok" if condition else "FAILED"))
+    return condition
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--latency-ms", type=float, default=20.0)
+    parser.add_argument("--block-time-ms", type=float, default=500.0)
+    args = parser.parse_args()
+    block_time = args.block_time_ms / 1000
+
+    with FakeRPCServer(latency_seconds=args.latency_ms / 1000) as node:
+        chain = node.chain
+        for i in range(5):
+            chain.balances[owner(i).lower()] = 10 ** 18
+            chain.register_domain(unstoppable_domains.token_id(f"user{i}.crypto"), owner(i))
+        stop = threading.Event()
+
+        def miner():
+            while not stop.wait(block_time):
+                chain.mine()
+
+        threading.Thread(target=miner, daemon=True).start()
+        try:
+            uncached = Web3(PooledHTTPProvider(RPCProviderPool([node.url])))
+            cache = BlockReadCache(max_entries=1024, block_time_seconds=block_time)
+            cached = Web3(PooledHTTPProvider(RPCProviderPool([node.url]), read_cache=cache))
+
+            print(f"{args.workers} workers for {args.seconds:.0f} s, {args.latency_ms:.0f} ms per RPC round trip, "
+                  f"a block every {args.block_time_ms:.0f} ms")
+            print(f"{'':<12}{'turns':>8}{'RPC requests':>14}{'per turn':>10}{'p50 turn ms':>13}")
+            for name, w3 in (("uncached", uncached), ("cached", cached)):
+                turns, requests, p50 = load(node, w3, args.workers, args.seconds)
+                print(f"{name:<12}{turns:>8}{requests:>14}{requests / turns:>10.2f}{p50:>13.1f}")
+            print(f"cache stats: {cache.stats()}")
+            print()
+        finally:
+            stop.set()
+
+        ok = True
+        cache = BlockReadCache(block_time_seconds=block_time)
+        w3 = Web3(PooledHTTPProvider(RPCProviderPool([node.url]), read_cache=cache))
+        address = owner(0)
+        before = w3.eth.get_balance(address)
+        chain.balances[address.lower()] = 2 * 10 ** 18
+        chain.mine()
+        ok &= check("a read in the same block returns the same answer", w3.eth.get_balance(address) == before)
+        time.sleep(block_time)
+        ok &= check("a new balance is seen after one block time", w3.eth.get_balance(address) == 2 * 10 ** 18)
+
+        small = BlockReadCache(max_entries=3, block_time_seconds=60)
+        w3 = Web3(PooledHTTPProvider(RPCProviderPool([node.url]), read_cache=small))
+        for i in range(5):
+            w3.eth.get_balance(owner(i))
+        ok &= check("the cache evicts least recently used entries at its limit",
+                    small.stats()["entries"] == 3 and small.stats()["evictions"] == 2)
+
+        w3 = Web3(PooledHTTPProvider(RPCProviderPool([node.url]), read_cache=BlockReadCache(block_time_seconds=60)))
+        transfer = {"from": WALLET, "to": owner(0), "data": "0xa9059cbb" + "00" * 64}
+        node.reset_counters()
+        for _ in range(2):
+            w3.eth.estimate_gas(transfer, "pending")
+        ok &= check("a gas estimate at pending is never served from the cache", node.calls.get("eth_estimateGas") == 2)
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+"""
+Runs the supervisor Lambda's receipt tracking (`tx_status.py`, `receipt_poller.py`) against the in-process fake
+JSON-RPC node in fake_rpc.py and checks that:
+- pending transactions go PENDING -> MINED -> SUCCESS / REVERTED as blocks are added
+- final states are cached: getTxStatus on a final transaction makes no RPC call
+- a reorged-out receipt sends the transaction back to PENDING
+- the poller follows transactions on several chains, each through its own node
+It then compares HTTP round trips per block for N pending hashes: one JSON-RPC batch against one
+eth_getTransactionReceipt request per hash, with a simulated round trip latency.
+
+    python benchmarks/receipt_poller_check.py --pending 50 --latency-ms 40
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("POWERTOOLS_METRICS_DISABLED", "true")
+os.environ.setdefault("POWERTOOLS_TRACE_DISABLED", "true")
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "lib/shared/tracing"))
+sys.path.insert(0, os.path.join(ROOT, "lib/crypto-ai-agent-supervisor-stack/lambda"))
+
+from fake_rpc import FakeChain, FakeRPCServer  # noqa: E402
+
+from provider_pool import RPCProviderPool  # noqa: E402
+
+import tx_status  # noqa: E402
+from receipt_poller import poll  # noqa: E402
+from rpc import batch_call  # noqa: E402
+from tx_status import MINED, PENDING, REVERTED, SUCCESS, SQLiteTxStatusStore, get_tx_status, refresh_pending, track  # noqa: E402,E501
+
+
+def check(name, condition):
+    print("{:<60}{}".format(name, "ok" if condition else "FAILED"))
+    return condition
+
+
+def tx_hash(i):
+    return "0x" + format(i, "064x")
+
+
+def new_store():
+    return SQLiteTxStatusStore(os.path.join(tempfile.mkdtemp(), "tx_status.sqlite3"))
+
+
+def run_checks(node, pool):
+    # Every chain is served by the one node here
+    def get_pool(chain):
+        return pool
+
+    ok = True
+    store = new_store()
+    chain = node.chain
+    for i in (1, 2):
+        chain.add_transaction(tx_hash(i), status=1 if i == 1 else 0)
+        track(store, tx_hash(i)[2:])
+
+    refresh_pending(store, get_pool)
+    ok &= check("unmined transactions stay PENDING", store.get(tx_hash(1))["status"] == PENDING)
+
+    chain.mine([tx_hash(1), tx_hash(2)])
+    refresh_pending(store, get_pool)
+    ok &= check("freshly mined transactions are MINED", store.get(tx_hash(1))["status"] == MINED)
+
+    chain.mine(blocks=tx_status.REQUIRED_CONFIRMATIONS)
+    refresh_pending(store, get_pool)
+    ok &= check("confirmed success is SUCCESS", store.get(tx_hash(1))["status"] == SUCCESS)
+    ok &= check("confirmed failure is REVERTED", store.get(tx_hash(2))["status"] == REVERTED)
+    ok &= check("final transactions leave the pending list", store.list_pending() == [])
+
+    node.reset_counters()
+    message = get_tx_status(store, get_pool, tx_hash(1))
+    ok &= check("getTxStatus on a final transaction makes no RPC call",
+                node.http_requests == 0 and "succeeded" in message)
+
+    chain.add_transaction(tx_hash(3))
+    track(store, tx_hash(3))
+    chain.mine([tx_hash(3)])
+    refresh_pending(store, get_pool)
+    chain.transactions[tx_hash(3)]["block_number"] = None
+    refresh_pending(store, get_pool)
+    ok &= check("reorged-out receipt goes back to PENDING", store.get(tx_hash(3))["status"] == PENDING)
+    return ok
+
+
+def compare(node, pool, pending, blocks):
+    store = new_store()
+    hashes = [tx_hash(100 + i) for i in range(pending)]
+    for h in hashes:
+        node.chain.add_transaction(h)
+        track(store, h)
+
+    node.reset_counters()
+    start = time.perf_counter()
+    for _ in range(blocks):
+        node.chain.mine()
+        refresh_pending(store, lambda chain: pool)
+    batched = (node.http_requests / blocks, (time.perf_counter() - start) * 1000 / blocks)
+
+    node.reset_counters()
+    start = time.perf_counter()
+    for _ in range(blocks):
+        node.chain.mine()
+        batch_call(pool, [("eth_blockNumber", [])])
+        for h in hashes:
+            batch_call(pool, [("eth_getTransactionReceipt", [h])])
+    per_hash = (node.http_requests / blocks, (time.perf_counter() - start) * 1000 / blocks)
+    return batched, per_hash
+
+
+def check_multi_chain():
+    # Polygon (137) and Ethereum (1) transactions in one store, each chain answered by its own node
+    store = new_store()
+    chains = {"polygon": FakeChain(chain_id=137), "ethereum": FakeChain(chain_id=1)}
+    nodes = {name: FakeRPCServer(chain) for name, chain in chains.items()}
+    for node in nodes.values():
+        node.__enter__()
+    try:
+        pools = {name: RPCProviderPool([node.url]) for name, node in nodes.items()}
+        for i, name in enumerate(chains):
+            chains[name].add_transaction(tx_hash(200 + i))
+            track(store, tx_hash(200 + i), name)
+            chains[name].mine([tx_hash(200 + i)], blocks=tx_status.REQUIRED_CONFIRMATIONS)
+        poll(store, pools.__getitem__, duration_seconds=0.1, interval_seconds=0.05)
+        statuses = [store.get(tx_hash(200 + i))["status"] for i in range(len(chains))]
+        asked = all(node.calls.get("eth_getTransactionReceipt") == 1 for node in nodes.values())
+    finally:
+        for node in nodes.values():
+            node.__exit__()
+    return check("the poller follows each chain through its own node", statuses == [SUCCESS, SUCCESS] and asked)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pending", type=int, default=50)
+    parser.add_argument("--blocks", type=int, default=5)
+    parser.add_argument("--latency-ms", type=float, default=40.0)
+    args = parser.parse_args()
+
+    with FakeRPCServer() as node:
+        ok = run_checks(node, RPCProviderPool([node.url]))
+    ok &= check_multi_chain()
+    with FakeRPCServer(latency_seconds=args.latency_ms / 1000) as node:
+        batched, per_hash = compare(node, RPCProviderPool([node.url]), args.pending, args.blocks)
+
+    print()
+    print("{} pending transactions, {:.0f} ms simulated round trip, per block:".format(args.pending, args.latency_ms))
+    print("{:<24}{:>14}{:>12}".format("", "HTTP requests", "wall ms"))
+    print("{:<24}{:>14.0f}{:>12.0f}".format("one batch per block", *batched))
+    print("{:<24}{:>14.0f}{:>12.0f}".format("one request per hash", *per_hash))
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+"""
+Backtest of the Simple Bitcoin Cycle Index bands of investAdviceMetric (coingecko.py) over a daily price series,
+for a grid of band thresholds and strategies, evaluated with NumPy across the whole grid at once.
+
+The index is computed like the Lambda does, for every day from the prices up to that day only:
+(price / highest price of the trailing 365 days + price / 200-day moving average) / 2. Four increasing thresholds
+cut it into the five bands of the advice (extremely undervalued ... extremely overvalued).
+
+Every --interval-days (weekly by default) each configuration:
+- buys --budget x the buy multiplier of the day's band (dollar-cost averaging scaled by the band)
+- sells the sell fraction of its holdings for the day's band (partial profit-taking), keeping the proceeds as cash
+paying --fee-bps on every trade. Per configuration it reports the amount invested, the final value (holdings plus
+cash), the return on the amount invested and the maximum drawdown of value / invested, sampled on decision days.
+The grid is every increasing 4-combination of --threshold-values times every strategy in STRATEGIES; it includes
+the Lambda's current thresholds and plain DCA (multiplier 1, no sells) as the baseline.
+
+Bands are computed for all thresholds and decision days in one array operation; the simulation steps through the
+decision days with every configuration as one vector. --verify replays a sample of configurations with a plain
+Python loop and checks the results match, timing both.
+
+Prices come from --prices: a CSV of date,price or a CoinGecko market_chart JSON ({"prices": [[ms, price], ...]}).
+The default fixture, fixtures/btc_daily_synthetic.csv, is a synthetic 11 year series of three boom / bust cycles
+(made with --write-fixture, not market data), so the backtest runs offline.
+
+    python benchmarks/sbci_backtest.py --verify 200
+    python benchmarks/sbci_backtest.py --prices market_chart.json --threshold-values 0.3 0.4 0.5 0.6 0.7 0.8 0.9 1.0
+"""
+import argparse
+import csv
+import datetime
+import itertools
+import json
+import math
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+BENCHMARKS = os.path.dirname(os.path.abspath(__file__))
+FIXTURE = os.path.join(BENCHMARKS, "fixtures", "btc_daily_synthetic.csv")
+
+# investAdviceMetric's thresholds and windows
+CURRENT_THRESHOLDS = (0.25, 0.50, 0.75, 1.00)
+ATH_WINDOW_DAYS = 365
+MA_DAYS = 200
+BANDS = ["extremely undervalued", "undervalued", "fair value", "overvalued", "extremely overvalued"]
+
+# name -> (buy multiplier per band, fraction of holdings sold per band)
+STRATEGIES = {
+    "dca": ((1, 1, 1, 1, 1), (0, 0, 0, 0, 0)),
+    "dca_scaled": ((2, 1.5, 1, 0.5, 0), (0, 0, 0, 0, 0)),
+    "dca_aggressive": ((3, 2, 1, 0, 0), (0, 0, 0, 0, 0)),
+    "dca_take_profit": ((1, 1, 1, 1, 0), (0, 0, 0, 0.02, 0.05)),
+    "scaled_take_profit": ((2, 1.5, 1, 0.5, 0), (0, 0, 0, 0.02, 0.05)),
+    "scaled_sell_hard": ((2, 1.5, 1, 0, 0), (0, 0, 0, 0.05, 0.15)),
+    "advice": ((2, 1.5, 1, 0, 0), (0, 0, 0, 0.03, 0.10)),
+}
+
+
+def load_prices(path):
+    if path.endswith(".json"):
+        with open(path) as f:
+            points = json.load(f)["prices"]
+        return np.array([price for _, price in points], dtype=float)
+    with open(path) as f:
+        return np.array([float(row[1]) for row in csv.reader(f) if row and row[0] != "date"], dtype=float)
+
+
+def synthetic_prices(days=4018, seed=6):
+    # Lognormal daily returns over ~4 year cycles of a ~1060 day bull market and a sharper bear market, with
+    # returns fading cycle after cycle, like Bitcoin's; deterministic for a seed
+    rng = random.Random(seed)
+    price, prices = 250.0, []
+    for day in range(days):
+        cycle, phase = divmod(day + 300, 1461)
+        drift = (0.004 if phase < 1060 else -0.005) * 0.8 ** cycle
+        price *= math.exp(drift + rng.gauss(0, 0.028))
+        prices.append(price)
+    return prices
+
+
+def write_fixture(path):
+    start = datetime.date(2014, 1, 1)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["date", "price"])
+        for day, price in enumerate(synthetic_prices()):
+            writer.writerow([(start + datetime.timedelta(days=day)).isoformat(), f"{price:.2f}"])
+
+
+def sbci(prices):
+    # The index for every day, NaN until a full ATH window and moving average are available
+    windows = np.lib.stride_tricks.sliding_window_view(prices, ATH_WINDOW_DAYS)
+    ath = np.full(len(prices), np.nan)
+    ath[ATH_WINDOW_DAYS - 1:] = windows.max(axis=1)
+    sums = np.concatenate([[0.0], np.cumsum(prices)])
+    ma = np.full(len(prices), np.nan)
+    ma[MA_DAYS - 1:] = (sums[MA_DAYS:] - sums[:-MA_DAYS]) / MA_DAYS
+    return (prices / ath + prices / ma) / 2
+
+
+def threshold_grid(values):
+    grid = [combination for combination in itertools.combinations(sorted(set(values)), 4)]
+    if CURRENT_THRESHOLDS not in grid:
+        grid.append(CURRENT_THRESHOLDS)
+    return np.array(grid, dtype=float)
+
+
+def bands(index, thresholds):
+    # (threshold sets, days) band 0..4 of each day: how many thresholds the index is above
+    result = np.zeros((len(thresholds), len(index)), dtype=np.int8)
+    for k in range(thresholds.shape[1]):
+        result += index[None, :] > thresholds[:, k, None]
+    return result
+
+
+def simulate(prices, day_bands, threshold_ids, buys, sells, budget, fee):
+    # Every configuration as one vector: day_bands (threshold sets, decision days), threshold_ids (configs,),
+    # buys / sells (configs, 5). Returns invested, final value, max drawdown of value / invested per configuration.
+    configs = len(threshold_ids)
+    rows = np.arange(configs)
+    holdings = np.zeros(configs)
+    cash = np.zeros(configs)
+    invested = np.zeros(configs)
+    peak = np.zeros(configs)
+    drawdown = np.zeros(configs)
+    for step, price in enumerate(prices):
+        band = day_bands[threshold_ids, step]
+        sold = holdings * sells[rows, band]
+        holdings -= sold
+        cash += sold * price * (1 - fee)
+        spend = budget * buys[rows, band]
+        holdings += spend * (1 - fee) / price
+        invested += spend
+        value = holdings * price + cash
+        multiple = np.divide(value, invested, out=np.ones(configs), where=invested > 0)
+        np.maximum(peak, multiple, out=peak)
+        np.maximum(drawdown, 1 - np.divide(multiple, peak, out=np.ones(configs), where=peak > 0), out=drawdown)
+    return invested, holdings * prices[-1] + cash, drawdown
+
+
+def simulate_one(prices, day_bands, buys, sells, budget, fee):
+    # The same for one configuration in plain Python, for --verify
+    holdings = cash = invested = peak = drawdown = 0.0
+    for price, band in zip(prices.tolist(), day_bands.tolist()):
+        sold = holdings * sells[band]
+        holdings -= sold
+        cash += sold * price * (1 - fee)
+        spend = budget * buys[band]
+        holdings += spend * (1 - fee) / price
+        invested += spend
+        multiple = (holdings * price + cash) / invested if invested > 0 else 1.0
+        peak = max(peak, multiple)
+        drawdown = max(drawdown, 1 - multiple / peak if peak > 0 else 0.0)
+    return invested, holdings * float(prices[-1]) + cash, drawdown
+
+
+def describe(thresholds, strategy):
+    return "{:<22}{}".format(strategy, " ".join(f"{t:.2f}" for t in thresholds))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--prices", default=FIXTURE)
+    parser.add_argument("--threshold-values", type=float, nargs="+",
+                        default=[round(0.20 + 0.05 * i, 2) for i in range(23)])
+    parser.add_argument("--strategies", nargs="+", choices=sorted(STRATEGIES), default=sorted(STRATEGIES))
+    parser.add_argument("--interval-days", type=int, default=7)
+    parser.add_argument("--budget", type=float, default=100.0)
+    parser.add_argument("--fee-bps", type=float, default=10.0)
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--min-invested", type=float, default=0.25,
+                        help="rank only configurations investing at least this share of what plain DCA does")
+    parser.add_argument("--verify", type=int, default=0, help="check this many configurations with a Python loop")
+    parser.add_argument("--write-fixture", action="store_true", help="regenerate the synthetic fixture and exit")
+    args = parser.parse_args()
+    if args.write_fixture:
+        write_fixture(FIXTURE)
+        print(f"wrote {FIXTURE}")
+        return
+
+    prices = load_prices(args.prices)
+    if len(prices) <= ATH_WINDOW_DAYS + args.interval_days:
+        sys.exit(f"{len(prices)} daily prices, the backtest needs more than {ATH_WINDOW_DAYS + args.interval_days}")
+    thresholds = threshold_grid(args.threshold_values)
+    strategies = args.strategies
+    threshold_ids = np.repeat(np.arange(len(thresholds)), len(strategies))
+    strategy_ids = np.tile(np.arange(len(strategies)), len(thresholds))
+    buys = np.array([STRATEGIES[name][0] for name in strategies], dtype=float)[strategy_ids]
+    sells = np.array([STRATEGIES[name][1] for name in strategies], dtype=float)[strategy_ids]
+    fee = args.fee_bps / 10000
+
+    start = time.perf_counter()
+    index = sbci(prices)
+    decision_days = np.arange(ATH_WINDOW_DAYS - 1, len(prices), args.interval_days)
+    day_bands = bands(index[decision_days], thresholds)
+    invested, final, drawdown = simulate(prices[decision_days], day_bands, threshold_ids, buys, sells,
+                                         args.budget, fee)
+    elapsed = time.perf_counter() - start
+    returns = np.divide(final, invested, out=np.ones_like(final), where=invested > 0) - 1
+
+    current_set = [tuple(t) for t in thresholds].index(CURRENT_THRESHOLDS)
+    current = np.flatnonzero(threshold_ids == current_set)
+    baseline = current[strategies.index("dca")] if "dca" in strategies else None
+
+    print(f"{len(prices)} daily prices from {os.path.relpath(args.prices)}, {len(decision_days)} decision days "
+          f"every {args.interval_days} days, {args.budget:g} USD budget, {args.fee_bps:g} bps fees")
+    print(f"{len(threshold_ids)} configurations ({len(thresholds)} threshold sets x {len(strategies)} strategies) "
+          f"evaluated in {elapsed:.2f} s")
+    share = np.bincount(day_bands[current_set], minlength=5)
+    print("decision days per band at the current thresholds: " + ", ".join(
+        f"{name} {count}" for name, count in zip(BANDS, share)))
+
+    header = f"{'':<4}{'strategy':<22}{'thresholds':<21}{'invested':>12}{'final value':>14}{'return':>9}{'max dd':>9}"
+
+    def table(title, ids, limit=None):
+        # Threshold sets that only differ where no decision day falls give the same results: one row for them
+        print()
+        print(title)
+        print(header)
+        seen = set()
+        for i in ids:
+            key = (strategy_ids[i], round(invested[i], 6), round(final[i], 6))
+            if key in seen:
+                continue
+            seen.add(key)
+            print(f"{len(seen):<4}{describe(thresholds[threshold_ids[i]], strategies[strategy_ids[i]]):<43}"
+                  f"{invested[i]:>12,.0f}{final[i]:>14,.0f}{returns[i]:>8.0%}{drawdown[i]:>9.0%}")
+            if len(seen) == limit:
+                break
+
+    # Configurations that hardly ever buy can show a high return on a small amount: rank the ones deploying at
+    # least --min-invested of plain DCA's amount
+    ranked = np.flatnonzero(invested >= args.min_invested * len(decision_days) * args.budget)
+    table(f"top {args.top} by return", ranked[np.argsort(-returns[ranked])], args.top)
+    # Return per unit of drawdown, so a configuration cannot top the list by riding the whole cycle down
+    table(f"top {args.top} by return / max drawdown",
+          ranked[np.argsort(-(returns[ranked] / np.maximum(drawdown[ranked], 0.01)))], args.top)
+    table("current thresholds", current)
+    if baseline is not None:
+        print()
+        print(f"plain DCA returns {returns[baseline]:.0%} with a {drawdown[baseline]:.0%} max drawdown; "
+              f"{np.mean(returns > returns[baseline]):.0%} of the configurations beat it")
+
+    if args.verify:
+        sample = random.Random(7).sample(range(len(threshold_ids)), min(args.verify, len(threshold_ids)))
+        start = time.perf_counter()
+        reference = [simulate_one(prices[decision_days], day_bands[threshold_ids[i]], buys[i].tolist(),
+                                  sells[i].tolist(), args.budget, fee) for i in sample]
+        loop_seconds = time.perf_counter() - start
+        matches = all(np.allclose((invested[i], final[i], drawdown[i]), expected, rtol=1e-9, atol=1e-9)
+                      for i, expected in zip(sample, reference))
+        per_config_loop = loop_seconds / len(sample)
+        print()
+        print(f"verify: {len(sample)} configurations replayed with a Python loop in {loop_seconds:.2f} s "
+              f"({per_config_loop * 1000:.2f} ms each, {per_config_loop * len(threshold_ids):.1f} s for the grid "
+              f"against {elapsed:.2f} s vectorized): {'match' if matches else 'MISMATCH'}")
+        sys.exit(0 if matches else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+"""
+Runs every query template of the txtsql handler (`query_templates.json`) through /templateQuery with its example
+parameters, against the Athena stand-in of fake_services.py holding the templates as prepared statements (like
+the stack creates them) and a moto S3 server for the results. It checks that:
+- each template answers like /athenaQuery does for the same SQL with the parameters written in
+- parameters of the wrong type, missing or unknown ones and unknown templates are refused before Athena is called
+- a repeated call is answered from the (template, parameters) cache without Athena; other parameters are not
+It prints per template the cold and cached latency at --latency-ms per stand-in request, and the characters the
+model writes for the call: the SQL for /athenaQuery against the template id and parameters for /templateQuery.
+
+    python benchmarks/template_query_check.py --latency-ms 50
+"""
+import argparse
+import io
+import json
+import os
+import sys
+import time
+import warnings
+from contextlib import ExitStack, redirect_stdout
+
+os.environ.setdefault("POWERTOOLS_METRICS_DISABLED", "true")
+os.environ.setdefault("POWERTOOLS_TRACE_DISABLED", "true")
+os.environ.setdefault("POWERTOOLS_LOG_LEVEL", "ERROR")
+os.environ.update(AWS_REGION="us-east-1", AWS_DEFAULT_REGION="us-east-1", AWS_ACCESS_KEY_ID="check",
+                  AWS_SECRET_ACCESS_KEY="check", ATHENA_QUERY_RESULTS_BUCKET_NAME="check-results",
+                  ATHENA_WORKGROUP="check-workgroup")
+
+# Metrics are disabled, so powertools warns on every flush that there is nothing to publish
+warnings.filterwarnings("ignore", category=UserWarning)
+
+BENCHMARKS = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCHMARKS)
+sys.path.insert(0, os.path.join(ROOT, "lib/shared/tracing"))
+sys.path.insert(0, os.path.join(ROOT, "lib/knowledge-base-blockchain-data-stack/lambda/bedrock-agent-txtsql-action"))
+
+
+def check(name, condition):
+    print("{:<72}{}".format(name, "ok" if condition else "FAILED"))
+    return condition
+
+
+def api_event(api_path, **properties):
+    return {
+        "messageVersion": "1.0",
+        "agent": {"name": "BlockchainDataAgent", "id": "AGENT00001", "alias": "TSTALIASID", "version": "DRAFT"},
+        "sessionId": "template-check",
+        "actionGroup": "query-athena",
+        "apiPath": api_path,
+        "httpMethod": "POST",
+        "parameters": [],
+        "requestBody": {"content": {"application/json": {"properties": [
+            {"name": name, "type": "string", "value": value} for name, value in properties.items()
+        ]}}},
+        "sessionAttributes": {},
+        "promptSessionAttributes": {},
+    }
+
+
+def template_event(template_id, parameters):
+    return api_event("/templateQuery", templateId=template_id, parameters=json.dumps(parameters))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    parser.add_argument("--athena-rows", type=int, default=10000)
+    args = parser.parse_args()
+
+    from event_replay_benchmark import LambdaContext, prepare_templates, start_s3
+    from fake_services import FakeAthenaServer
+
+    with ExitStack() as stack:
+        s3_endpoint = start_s3(stack, os.environ["ATHENA_QUERY_RESULTS_BUCKET_NAME"])
+        server = stack.enter_context(FakeAthenaServer(rows=args.athena_rows, latency_seconds=args.latency_ms / 1000,
+                                                      s3_endpoint=s3_endpoint))
+        os.environ["AWS_ENDPOINT_URL_ATHENA"] = server.url
+        if s3_endpoint:
+            os.environ["AWS_ENDPOINT_URL_S3"] = s3_endpoint
+        prepare_templates(server.url, os.environ["ATHENA_WORKGROUP"])
+
+        import index
+        from query_templates import TEMPLATES, render
+
+        def call(event):
+            before = server.requests
+            start = time.perf_counter()
+            # The handler prints its cold start metric
+            with redirect_stdout(io.StringIO()):
+                response = index.lambda_handler(event, LambdaContext())
+            body = response["response"]["responseBody"]["application/json"]["body"]
+            return body, (time.perf_counter() - start) * 1000, server.requests - before
+
+        ok = True
+        rows = []
+        same, answered = True, True
+        for template_id, template in TEMPLATES.items():
+            query, _, _ = render(template_id, template["example"])
+            sql = server._executable(query, os.environ["ATHENA_WORKGROUP"])
+            answer, cold_ms, _ = call(template_event(template_id, template["example"]))
+            expected, _, _ = call(api_event("/athenaQuery", query=sql))
+            cached, cached_ms, cached_requests = call(template_event(template_id, template["example"]))
+            answered &= "error" not in answer and cached_requests == 0 and cached == answer
+            same &= answer == expected
+            call_text = json.dumps({"templateId": template_id, "parameters": json.dumps(template["example"])})
+            rows.append((template_id, answer.get("rowCount"), cold_ms, cached_ms, len(sql), len(call_text)))
+        ok &= check("every template answers, then from the cache without Athena", answered)
+        ok &= check("templates answer like /athenaQuery with the parameters written in", same)
+
+        refused = True
+        for template_id, parameters in (
+            ("btc_blocks_per_day", {"start_date": "last week", "end_date": "2024-01-07"}),
+            ("eth_token_transfer_count", {"token_address": "0x5149", "start_time": "2024-01-01",
+                                          "end_time": "2024-01-02"}),
+            ("block_at_time", {"time": "2024-01-01 25:00:00"}),
+            ("btc_blocks_per_day", {"start_date": "2024-01-01"}),
+            ("btc_blocks_per_day", {"start_date": "2024-01-01", "end_date": "2024-01-02", "chain": "btc"}),
+            ("btc_blocks_per_day", {"start_date": "2024-01-01'; DROP TABLE btc.blocks; --", "end_date": "2024-01-02"}),
+            ("blocks_per_hour", {}),
+        ):
+            answer, _, requests = call(template_event(template_id, parameters))
+            refused &= "error" in answer and requests == 0
+        ok &= check("bad or unknown parameters and templates are refused before Athena", refused)
+
+        other = dict(TEMPLATES["btc_blocks_per_day"]["example"], end_date="2024-01-03")
+        _, _, requests = call(template_event("btc_blocks_per_day", other))
+        ok &= check("other parameters are not answered from the cache", requests > 0)
+
+    print()
+    print(f"{args.latency_ms:.0f} ms per stand-in request")
+    print(f"{'template':<28}{'rows':>6}{'cold ms':>10}{'cached ms':>11}{'SQL chars':>11}{'template call chars':>21}")
+    for template_id, row_count, cold_ms, cached_ms, sql_chars, call_chars in rows:
+        print(f"{template_id:<28}{row_count:>6}{cold_ms:>10.0f}{cached_ms:>11.1f}{sql_chars:>11}{call_chars:>21}")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
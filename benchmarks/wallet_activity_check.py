@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+"""
+Runs getWalletActivity (`wallet_activity.py`) against the fake JSON-RPC node in fake_rpc.py, seeded with synthetic
+ERC-20 transfers to and from a wallet (with a burst of them in a few blocks) among unrelated transfers. The node
+refuses an eth_getLogs query past --log-limit results or --max-range blocks, like hosted providers do. It checks that:
+- the first call finds exactly the wallet's transfers of the period, splitting the ranges the node refuses
+- a repeated call only scans the unconfirmed tail, and a call after new blocks only the new blocks
+- a transfer dropped by a reorg of the unconfirmed tail disappears from the next answer
+- a longer period only scans the blocks before the indexed range
+- the action answers with totals per token, the unregistered token included
+- rate limit errors (the same -32005 code as the size limits) are retried after a backoff instead of split, and
+  fail the scan once the retries are used up
+It then compares HTTP round trips and wall time of the first scan against one eth_getLogs request per fixed range.
+
+    python benchmarks/wallet_activity_check.py --transfers 600 --latency-ms 20
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("POWERTOOLS_METRICS_DISABLED", "true")
+os.environ.setdefault("POWERTOOLS_TRACE_DISABLED", "true")
+os.environ.setdefault("POWERTOOLS_LOG_LEVEL", "ERROR")
+os.environ.setdefault("COINGECKO_API_KEY", "check")
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "lib/shared/tracing"))
+sys.path.insert(0, os.path.join(ROOT, "lib/crypto-ai-agent-supervisor-stack/lambda"))
+
+from fake_rpc import TRANSFER_TOPIC, FakeChain, FakeRPCServer  # noqa: E402
+
+HEAD = 2_000_000
+WALLET = "0x00000000000000000000000000000000000a11ce"
+TEST_TOKEN = "0x0000000000000000000000000000000000007e57"
+BLOCKS_PER_DAY = 86400 // 2
+
+
+def check(name, condition):
+    print("{:<70}{}".format(name, "ok" if condition else "FAILED"))
+    return condition
+
+
+def seed(chain, rng, transfers, tokens):
+    # The wallet's transfers over the last 14 days, a burst of a fifth of them within 200 blocks, and 3x as many
+    # transfers between other addresses
+    others = ["0x" + rng.randbytes(20).hex() for _ in range(50)]
+    burst = HEAD - rng.randrange(200, 5 * BLOCKS_PER_DAY)
+    for i in range(transfers):
+        block = burst + rng.randrange(200) if i < transfers // 5 else HEAD - 40 - rng.randrange(14 * BLOCKS_PER_DAY)
+        token, decimals = rng.choice(tokens)
+        units = rng.randrange(1, 1000) * 10 ** (decimals - 2)
+        if rng.random() < 0.5:
+            chain.add_token_transfer(token, rng.choice(others), WALLET, units, block)
+        else:
+            chain.add_token_transfer(token, WALLET, rng.choice(others), units, block)
+    for _ in range(3 * transfers):
+        token, decimals = rng.choice(tokens)
+        chain.add_token_transfer(token, rng.choice(others), rng.choice(others), 10 ** decimals,
+                                 HEAD - rng.randrange(14 * BLOCKS_PER_DAY))
+
+
+def expected(chain, days, wallet=WALLET):
+    start = chain.block_number - int(days * BLOCKS_PER_DAY)
+    topic = "0x" + wallet[2:].rjust(64, "0")
+    return {
+        (log["transactionHash"], log["logIndex"]) for log in chain.logs
+        if log["blockNumber"] >= start and log["topics"][0] == TRANSFER_TOPIC and topic in log["topics"][1:3]
+    }
+
+
+def found(transfers):
+    return {(transfer["tx_hash"], transfer["log_index"]) for transfer in transfers}
+
+
+def fixed_range_scan(pool, start, end, span):
+    # The baseline: one eth_getLogs request per range and filter, halving a range only when the node refuses it
+    from rpc import RPCError, batch_call
+    from tokens import address_topic
+    from wallet_activity import is_limit_error
+
+    filters = [[TRANSFER_TOPIC, address_topic(WALLET)], [TRANSFER_TOPIC, None, address_topic(WALLET)]]
+    ranges = [(low, min(end, low + span - 1)) for low in range(start, end + 1, span)][::-1]
+    logs = set()
+    while ranges:
+        low, high = ranges.pop()
+        for topics in filters:
+            log_filter = {"fromBlock": hex(low), "toBlock": hex(high), "topics": topics}
+            result = batch_call(pool, [("eth_getLogs", [log_filter])])[0]
+            if isinstance(result, RPCError):
+                if not is_limit_error(result):
+                    raise result
+                middle = (low + high) // 2
+                ranges += [(middle + 1, high), (low, middle)]
+                break
+            logs |= {(log["transactionHash"], int(log["logIndex"], 16)) for log in result}
+    return logs
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--transfers", type=int, default=600)
+    parser.add_argument("--log-limit", type=int, default=50)
+    parser.add_argument("--max-range", type=int, default=50000)
+    parser.add_argument("--fixed-range", type=int, default=2000, help="range of the one-request-per-range baseline")
+    parser.add_argument("--latency-ms", type=float, default=20.0)
+    parser.add_argument("--seed", type=int, default=3)
+    args = parser.parse_args()
+
+    from tokens import TOKENS
+
+    rng = random.Random(args.seed)
+    chain = FakeChain(block_number=HEAD)
+    chain.log_limit = args.log_limit
+    chain.max_log_range = args.max_range
+    chain.add_token(TEST_TOKEN, "TST", 18)
+    seed(chain, rng, args.transfers, [TOKENS["polygon"]["USDC"], TOKENS["polygon"]["WETH"], (TEST_TOKEN, 18)])
+
+    with FakeRPCServer(chain, latency_seconds=args.latency_ms / 1000) as node:
+        os.environ["BLOCKCHAIN_RPC_URL"] = node.url
+        os.environ["ACTIVITY_DB_PATH"] = os.path.join(tempfile.mkdtemp(), "wallet_activity.sqlite3")
+        from provider_pool import RPCProviderPool
+        from wallet_activity import CONFIRMATIONS, SQLiteActivityIndex, get_activity_index, wallet_activity
+        import wallet_management
+
+        index = get_activity_index()
+        ok = True
+
+        node.reset_counters()
+        start = time.perf_counter()
+        transfers, window = wallet_activity(WALLET, 7, index=index)
+        first_ms = (time.perf_counter() - start) * 1000
+        first = dict(window["stats"], http=node.http_requests, ms=first_ms)
+        ok &= check("the first 7 day scan finds exactly the wallet's transfers",
+                    found(transfers) == expected(chain, 7) and len(transfers) > 0)
+        ok &= check("ranges refused by the node were split", first["splits"] > 0)
+
+        node.reset_counters()
+        transfers, window = wallet_activity(WALLET, 7, index=index)
+        ok &= check("a repeated call only scans the unconfirmed tail",
+                    window["stats"]["blocks"] <= CONFIRMATIONS + 1 and found(transfers) == expected(chain, 7))
+        repeat_http = node.http_requests
+
+        chain.mine(blocks=1000)
+        new = {chain.add_token_transfer(TOKENS["polygon"]["USDC"][0], "0x" + "ab" * 20, WALLET, 10 ** 6,
+                                        chain.block_number - 500 + i) for i in range(5)}
+        transfers, window = wallet_activity(WALLET, 7, index=index)
+        ok &= check("after 1000 new blocks only those (and the tail) are scanned",
+                    window["stats"]["blocks"] <= 1000 + CONFIRMATIONS + 1
+                    and new <= {tx_hash for tx_hash, _ in found(transfers)} and found(transfers) == expected(chain, 7))
+
+        reorged = chain.add_token_transfer(TOKENS["polygon"]["USDC"][0], "0x" + "cd" * 20, WALLET, 10 ** 6)
+        seen = reorged in {transfer["tx_hash"] for transfer in wallet_activity(WALLET, 7, index=index)[0]}
+        chain.logs = [log for log in chain.logs if log["transactionHash"] != reorged]
+        chain.mine(blocks=2)
+        gone = reorged not in {transfer["tx_hash"] for transfer in wallet_activity(WALLET, 7, index=index)[0]}
+        ok &= check("a transfer reorged out of the unconfirmed tail disappears", seen and gone)
+
+        transfers, window = wallet_activity(WALLET, 14, index=index)
+        ok &= check("a 14 day call only scans the 7 days before the index",
+                    window["stats"]["blocks"] <= 7 * BLOCKS_PER_DAY + 2 + CONFIRMATIONS + 1
+                    and found(transfers) == expected(chain, 14))
+
+        message = wallet_management.getWalletActivity(days=14, walletAddress=WALLET)
+        ok &= check("the action answers with totals, the unregistered token included",
+                    "Received:" in message and "Sent:" in message and "TST" in message and "USDC" in message)
+        only_in = wallet_management.getWalletActivity(days=14, direction="in", token="USDC", walletAddress=WALLET)
+        ok &= check("direction and token filters apply", "Sent:" not in only_in and "WETH" not in only_in)
+
+        from wallet_activity import RATE_LIMIT_RETRIES
+        limited = SQLiteActivityIndex(os.path.join(tempfile.mkdtemp(), "limited.sqlite3"))
+        chain.rate_limited_logs = 6
+        limited_transfers, limited_window = wallet_activity(WALLET, 7, index=limited)
+        ok &= check("rate limited queries are retried, not split",
+                    limited_window["stats"]["rate_limited"] > 0 and found(limited_transfers) == expected(chain, 7)
+                    and limited_window["stats"]["splits"] <= first["splits"])
+        chain.rate_limited_logs = 10 ** 6
+        try:
+            wallet_activity(WALLET, 7, index=SQLiteActivityIndex(os.path.join(tempfile.mkdtemp(), "failed.sqlite3")))
+            failed = ""
+        except Exception as e:
+            failed = str(e)
+        chain.rate_limited_logs = 0
+        ok &= check(f"and fail after {RATE_LIMIT_RETRIES} retries", "rate exceeded" in failed)
+
+        # The same first scan on a fresh index, against one request per fixed range on a separate pool
+        chain_head = chain.block_number
+        scan_start = chain_head - 7 * BLOCKS_PER_DAY
+        node.reset_counters()
+        start = time.perf_counter()
+        fresh = SQLiteActivityIndex(os.path.join(tempfile.mkdtemp(), "fresh.sqlite3"))
+        fresh_transfers, fresh_window = wallet_activity(WALLET, 7, index=fresh)
+        adaptive = dict(fresh_window["stats"], http=node.http_requests, ms=(time.perf_counter() - start) * 1000)
+        node.reset_counters()
+        start = time.perf_counter()
+        baseline_found = fixed_range_scan(RPCProviderPool([node.url]), scan_start, chain_head, args.fixed_range)
+        baseline = {"http": node.http_requests, "ms": (time.perf_counter() - start) * 1000}
+        ok &= check("both scans find the same transfers", baseline_found == found(fresh_transfers))
+
+    print()
+    print(f"{args.transfers} wallet transfers among {4 * args.transfers} over 14 days, node limit "
+          f"{args.log_limit} results / {args.max_range} blocks, {args.latency_ms:.0f} ms per request")
+    print(f"first scan: {first['blocks']} blocks, {first['queries']} eth_getLogs queries in {first['batches']} "
+          f"batches, {first['splits']} splits, {first['http']} HTTP requests, {first['ms']:.0f} ms")
+    print(f"repeated call: {repeat_http} HTTP requests")
+    print()
+    print(f"{'7 day scan, empty index':<36}{'HTTP requests':>14}{'ms':>10}")
+    print(f"{'adaptive batched (wallet_activity)':<36}{adaptive['http']:>14}{adaptive['ms']:>10.0f}")
+    print(f"{'fixed ' + str(args.fixed_range) + ' block ranges, 1 per request':<36}{baseline['http']:>14}"
+          f"{baseline['ms']:>10.0f}")
+    print()
+    print(message)
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
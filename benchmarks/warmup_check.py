@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+"""
+First agent turn of a supervisor Lambda execution environment with and without the scheduled warm-up
+(warmup.py), against the stand-ins of event_replay_benchmark.py (fake JSON-RPC node, KMS and CoinGecko), each
+delaying every request by --latency-ms. Two fresh processes import the combined handler (index.py); one of them
+is first invoked with the warm-up event, like the EventBridge schedule does. Both then serve the same turn:
+prices, the investment advice metric, the wallet address, the wallet balance and a gas estimate.
+
+It prints the warm-up report, then the turn latency and the stand-in requests of each, and checks that:
+- every warm-up step succeeded
+- after the warm-up, the turn makes no CoinGecko or KMS request and is faster than the turn without it
+
+    python benchmarks/warmup_check.py --latency-ms 30
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import ExitStack
+from types import SimpleNamespace
+
+BENCHMARKS = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCHMARKS)
+
+TURN = ["getCryptoPrice_bitcoin", "getCryptoPrice_native", "investAdviceMetric", "getWalletAddress",
+        "getBalance_wallet", "estimateGas"]
+
+
+def child(args):
+    from event_replay_benchmark import LambdaContext, invoke, load_events
+
+    sys.path.insert(0, os.path.join(ROOT, "lib/shared/tracing"))
+    sys.path.insert(0, os.path.join(ROOT, "lib/crypto-ai-agent-supervisor-stack/lambda"))
+    import index
+    from warmup import WARMUP_EVENT
+
+    result = {}
+    if args.child == "warmed":
+        result["warmup"] = index.lambda_handler(dict(WARMUP_EVENT), LambdaContext())["warmup"]
+    open(os.path.join(args.barrier, "ready"), "w").close()
+    while not os.path.exists(os.path.join(args.barrier, "go")):
+        time.sleep(0.005)
+    events = dict(load_events("supervisor"))
+    result["turn"] = [(name,) + invoke(index.lambda_handler, "supervisor", name, events[name]) for name in TURN]
+    print(json.dumps(result))
+
+
+def counts(servers):
+    return {"rpc": servers["node"].http_requests, "kms": servers["kms"].requests,
+            "coingecko": servers["coingecko"].requests}
+
+
+def first_turn(mode, env, servers):
+    barrier = tempfile.mkdtemp(prefix="warmup-check-")
+    try:
+        process = subprocess.Popen([sys.executable, os.path.abspath(__file__), "--child", mode, "--barrier", barrier],
+                                   env=env, stdout=subprocess.PIPE, text=True)
+        while not os.path.exists(os.path.join(barrier, "ready")) and process.poll() is None:
+            time.sleep(0.01)
+        before = counts(servers)
+        open(os.path.join(barrier, "go"), "w").close()
+        stdout, _ = process.communicate()
+        after = counts(servers)
+    finally:
+        shutil.rmtree(barrier, ignore_errors=True)
+    if process.returncode != 0:
+        raise RuntimeError(f"{mode} process exited with {process.returncode}")
+    result = json.loads(stdout.strip().splitlines()[-1])
+    result["requests"] = {name: after[name] - before[name] for name in after}
+    return result
+
+
+def check(name, condition):
+    print("{:<66}{}".format(name, "ok" if condition else "FAILED"))
+    return condition
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--latency-ms", type=float, default=30.0)
+    parser.add_argument("--child", choices=["quiet", "warmed"], help=argparse.SUPPRESS)
+    parser.add_argument("--barrier", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        child(args)
+        return
+
+    from event_replay_benchmark import start_stand_ins
+
+    with ExitStack() as stack:
+        stand_in_env, servers = start_stand_ins(
+            stack, SimpleNamespace(latency_ms=args.latency_ms, handlers=["supervisor"], athena_rows=0)
+        )
+        env = dict(os.environ, **stand_in_env)
+        env.pop("AWS_PROFILE", None)
+        quiet = first_turn("quiet", env, servers)
+        warmed = first_turn("warmed", env, servers)
+
+    print(f"warm-up, {args.latency_ms:.0f} ms per stand-in request")
+    for step in warmed["warmup"]:
+        print(f"  {step['step']:<22}{step['ms']:>8.1f} ms  {'ok' if step['ok'] else 'FAILED'}  {step['detail']}")
+    print()
+    print(f"{'first turn':<26}{'no warm-up ms':>15}{'warmed ms':>12}")
+    for (name, quiet_ms, quiet_error), (_, warmed_ms, warmed_error) in zip(quiet["turn"], warmed["turn"]):
+        print(f"{name:<26}{quiet_ms:>15.1f}{warmed_ms:>12.1f}  {quiet_error or warmed_error or ''}")
+    quiet_total = sum(ms for _, ms, _ in quiet["turn"])
+    warmed_total = sum(ms for _, ms, _ in warmed["turn"])
+    print(f"{'total':<26}{quiet_total:>15.1f}{warmed_total:>12.1f}")
+    print(f"{'stand-in requests':<26}{json.dumps(quiet['requests']):>15}  {json.dumps(warmed['requests'])}")
+    print()
+
+    ok = True
+    ok &= check("every warm-up step succeeded", all(step["ok"] for step in warmed["warmup"]))
+    ok &= check("every turn answered", not any(error for _, _, error in quiet["turn"] + warmed["turn"]))
+    ok &= check("no CoinGecko or KMS request after the warm-up",
+                warmed["requests"]["coingecko"] == 0 and warmed["requests"]["kms"] == 0)
+    ok &= check("the warmed turn is faster", warmed_total < quiet_total)
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
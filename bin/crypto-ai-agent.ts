@@ -51,6 +51,7 @@ NagSuppressions.addStackSuppressions(openSearchServerlessInfraStack, [
 NagSuppressions.addStackSuppressions(kbInfraStack, [
   { id: 'AwsSolutions-IAM4', reason: 'AWSLambdaBasicExecutionRole, AWSLambdaVPCAccessExecutionRole are restrictive roles' },
   { id: 'AwsSolutions-IAM5', reason: 'Permission to read CF stack is restrictive enough' },
+  { id: 'AwsSolutions-L1', reason: 'The ingestion job custom resource Lambda runtime is managed by CDK' },
 ], true);
 
 NagSuppressions.addStackSuppressions(blockchainDataAgentStack, [
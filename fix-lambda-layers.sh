@@ -77,6 +77,12 @@ asn1tools>=0.166.0"
 
 create_or_update_requirements "$SUPERVISOR_LAMBDA_DIR" "$SUPERVISOR_LAMBDA_DEPS"
 
+# 4. Fix shared tracing layer dependencies
+TRACING_LAYER_DIR="lib/shared/tracing"
+TRACING_LAYER_DEPS="aws-lambda-powertools[tracer]>=2.32.0"
+
+create_or_update_requirements "$TRACING_LAYER_DIR" "$TRACING_LAYER_DEPS"
+
 # Create a root level requirements.txt for the OpenSearch custom resource
 echo -e "${YELLOW}Creating root level requirements.txt for OpenSearch custom resource...${NC}"
 cat > requirements.txt << EOL
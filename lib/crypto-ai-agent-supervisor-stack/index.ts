@@ -11,7 +11,7 @@ import { getConfig, EnvironmentConfig } from '../../utils/environment';
 const config: EnvironmentConfig = getConfig();
 
 interface CryptoAIAgentSupervisorStackProps extends cdk.StackProps {
-  knowledgeBase: bedrockGenAIConstructs.VectorKnowledgeBase;
+  knowledgeBase: bedrockGenAIConstructs.IVectorKnowledgeBase;
 }
 
 export class CryptoAIAgentSupervisorStack extends cdk.Stack {
@@ -53,15 +53,22 @@ export class CryptoAIAgentSupervisorStack extends cdk.Stack {
       shouldPrepareAgent: true,
       userInputEnabled: true,
       instruction: `
-      Role: You are a Crypto AI Agent. You have access to an Ethereum Virtual Machine compatible blockchain and can query it and send transactions from your own wallet. You can query the blockchain for information and perform actions such as sending transactions. You have access to a knowledge base that contains current blockchain news. You have access to a wallet that you can use to send transactions to the blockchain. Use the Action Group to interact with the blockchain.
+      Role: You are a Crypto AI Agent. You have access to Ethereum Virtual Machine compatible blockchains (Polygon, Ethereum, Base, Arbitrum and Optimism) and can query them and send transactions from your own wallet. You can query the blockchain for information and perform actions such as sending transactions. You have access to a knowledge base that contains current blockchain news. You have access to a wallet that you can use to send transactions to the blockchain. Use the Action Group to interact with the blockchain.
       
       These are the functions you can invoke:
       sendTx - send a transaction to the blockchain
+      sendToken - send an ERC-20 token such as USDC, USDT, DAI or WETH
       estimateGas - estimate the gas cost of a transaction
       getBalance - get the balance of a wallet
+      getTokenBalance - get the ERC-20 token balance of a wallet
+      getPortfolio - get the balances of a wallet and what they are worth in USD, in one call
+      getWalletActivity - list the ERC-20 token transfers into and out of a wallet over the last days
       getCryptoPrice - get the price of a cryptocurrency token
       investAdviceMetric - get investment advice
       getWalletAddress - get your own wallet's address
+      getTxStatus - check whether a transaction you sent has been mined, and its gas used
+      To answer what a wallet is worth, call getPortfolio alone rather than getWalletAddress, getBalance and getCryptoPrice.
+      The blockchain functions take an optional chain (polygon, ethereum, base, arbitrum or optimism). Pass it when the user names a chain, and use the same chain for getTxStatus as for the sendTx or sendToken it follows.
       `,
     });
     
@@ -75,44 +82,136 @@ export class CryptoAIAgentSupervisorStack extends cdk.Stack {
 
     agent.addKnowledgeBase(props.knowledgeBase);
 
-    const baseEnvironment = {
-      AMB_ACCESSOR_TOKEN: accessorToken.getAtt('BillingToken').toString(),
-      COINGECKO_API_KEY: config.coinGeckoAPIKey,
+    // Logger / Tracer / Metrics settings for the shared tracing module (lib/shared/tracing)
+    const powertoolsEnvironment = {
+      POWERTOOLS_SERVICE_NAME: 'crypto_ai_agent_supervisor',
+      POWERTOOLS_METRICS_NAMESPACE: 'CryptoAIAgent',
+      POWERTOOLS_LOG_LEVEL: config.logLevel,
+    };
+
+    // The image is built from lib/ so the Dockerfile can copy the shared tracing module next to the handler
+    const imageAssetProps = {
+      file: 'crypto-ai-agent-supervisor-stack/lambda/Dockerfile',
+      exclude: ['*', '!crypto-ai-agent-supervisor-stack/lambda', '!shared/tracing', '**/__pycache__'],
+      platform: ecrAssets.Platform.LINUX_AMD64,
     };
+    // One image per action group, each with only the packages its handler imports: price lookups are plain HTTPS
+    // and skip the web3 / KMS signing stack of the wallet actions
+    const investmentAdviceImageCode = lambda.DockerImageCode.fromImageAsset(path.join(__dirname, '..'), {
+      ...imageAssetProps,
+      buildArgs: { REQUIREMENTS: 'requirements-investment-advice.txt' },
+      cmd: ['investment_advice.lambda_handler'],
+    });
+    const walletManagementImageCode = lambda.DockerImageCode.fromImageAsset(path.join(__dirname, '..'), {
+      ...imageAssetProps,
+      cmd: ['wallet_management.lambda_handler'],
+    });
 
-    const lambdaEnvironment = {
-      ...baseEnvironment,
+    // Endpoints of the RPC provider pools (a Polygon URL replaces the AMB endpoint), and the default chain
+    const rpcEnvironment = {
       ...(config.blockchainRPCURL && {
         BLOCKCHAIN_RPC_URL: process.env.BLOCKCHAIN_RPC_URL
       }),
-      ...(config.unstoppableDomainsAddress && {
-        UNSTOPPABLE_DOMAINS_ADDRESS: process.env.UNSTOPPABLE_DOMAINS_ADDRESS
+      ...(config.blockchainRPCURLs && {
+        BLOCKCHAIN_RPC_URLS: process.env.BLOCKCHAIN_RPC_URLS
+      }),
+      ...config.chainRPCURLs,
+      ...(config.defaultChain && {
+        DEFAULT_CHAIN: config.defaultChain
       }),
     };
 
-    const actionGroupInvestmentAdviceFunction = new lambda.DockerImageFunction(this, 'InvestmentAdviceActionGroupFunction', {
-      code: lambda.DockerImageCode.fromImageAsset(path.join(__dirname, 'lambda'), {
-        cmd: ['index.lambda_handler'],
-        platform: ecrAssets.Platform.LINUX_AMD64,
+    // getCryptoPrice only reads the chain registry (the native token of a chain), never the chain itself
+    const investmentAdviceEnvironment = {
+      COINGECKO_API_KEY: config.coinGeckoAPIKey,
+      ...powertoolsEnvironment,
+      ...(config.defaultChain && {
+        DEFAULT_CHAIN: config.defaultChain
       }),
+    };
+
+    const actionGroupInvestmentAdviceFunction = new lambda.DockerImageFunction(this, 'InvestmentAdviceActionGroupFunction', {
+      code: investmentAdviceImageCode,
       timeout: cdk.Duration.seconds(300),
-      environment: lambdaEnvironment,
+      environment: investmentAdviceEnvironment,
+      tracing: lambda.Tracing.ACTIVE,
       memorySize: 512
     });
 
+    // sendTx idempotency records, so agent retries of the same payment never broadcast a second transaction
+    const idempotencyTable = new cdk.aws_dynamodb.Table(this, 'SendTxIdempotencyTable', {
+      partitionKey: { name: 'id', type: cdk.aws_dynamodb.AttributeType.STRING },
+      billingMode: cdk.aws_dynamodb.BillingMode.PAY_PER_REQUEST,
+      timeToLiveAttribute: 'expires_at',
+      removalPolicy: cdk.RemovalPolicy.DESTROY,
+    });
+
+    // Status of sent transactions; final states are kept, pending ones are listed through the sparse `pending` index
+    const txStatusTable = new cdk.aws_dynamodb.Table(this, 'TxStatusTable', {
+      partitionKey: { name: 'tx_hash', type: cdk.aws_dynamodb.AttributeType.STRING },
+      billingMode: cdk.aws_dynamodb.BillingMode.PAY_PER_REQUEST,
+      removalPolicy: cdk.RemovalPolicy.DESTROY,
+    });
+    txStatusTable.addGlobalSecondaryIndex({
+      indexName: 'pending',
+      partitionKey: { name: 'pending', type: cdk.aws_dynamodb.AttributeType.STRING },
+    });
+
     const actionGroupWalletManagerFunction = new lambda.DockerImageFunction(this, 'WalletManagerActionGroupFunction', {
-      code: lambda.DockerImageCode.fromImageAsset(path.join(__dirname, 'lambda'), {
-        cmd: ['index.lambda_handler'],
-        platform: ecrAssets.Platform.LINUX_AMD64,
-      }),
+      code: walletManagementImageCode,
       timeout: cdk.Duration.seconds(300),
       environment: {
         AMB_ACCESSOR_TOKEN: accessorToken.getAtt('BillingToken').toString(),
-        COINGECKO_API_KEY: config.coinGeckoAPIKey
+        IDEMPOTENCY_TABLE_NAME: idempotencyTable.tableName,
+        TX_STATUS_TABLE_NAME: txStatusTable.tableName,
+        // getPortfolio prices the balances it reads
+        COINGECKO_API_KEY: config.coinGeckoAPIKey,
+        ...powertoolsEnvironment,
+        ...rpcEnvironment,
+        ...(config.unstoppableDomainsAddress && {
+          UNSTOPPABLE_DOMAINS_ADDRESS: process.env.UNSTOPPABLE_DOMAINS_ADDRESS
+        }),
       },
+      tracing: lambda.Tracing.ACTIVE,
       memorySize: 512
     });
 
+    // Polls receipts of pending transactions in one JSON-RPC batch per block, so sendTx never waits for mining
+    const receiptPollerFunction = new lambda.DockerImageFunction(this, 'ReceiptPollerFunction', {
+      code: lambda.DockerImageCode.fromImageAsset(path.join(__dirname, '..'), {
+        ...imageAssetProps,
+        cmd: ['receipt_poller.lambda_handler'],
+      }),
+      timeout: cdk.Duration.seconds(58),
+      environment: {
+        AMB_ACCESSOR_TOKEN: accessorToken.getAtt('BillingToken').toString(),
+        TX_STATUS_TABLE_NAME: txStatusTable.tableName,
+        ...powertoolsEnvironment,
+        ...rpcEnvironment,
+      },
+      tracing: lambda.Tracing.ACTIVE,
+      memorySize: 256
+    });
+
+    new cdk.aws_events.Rule(this, 'ReceiptPollerSchedule', {
+      schedule: cdk.aws_events.Schedule.rate(cdk.Duration.minutes(1)),
+      targets: [new cdk.aws_events_targets.LambdaFunction(receiptPollerFunction)],
+    });
+
+    // Keeps one execution environment of each action group warm: prices, the Bitcoin price history, the wallet
+    // address, gas prices and RPC connections are refreshed before the next agent turn needs them (warmup.py)
+    new cdk.aws_events.Rule(this, 'ActionGroupWarmupSchedule', {
+      schedule: cdk.aws_events.Schedule.rate(cdk.Duration.minutes(5)),
+      targets: [actionGroupInvestmentAdviceFunction, actionGroupWalletManagerFunction].map(
+        (fn) => new cdk.aws_events_targets.LambdaFunction(fn, {
+          event: cdk.aws_events.RuleTargetInput.fromObject({ warmup: true }),
+        })
+      ),
+    });
+
+    txStatusTable.grantReadWriteData(actionGroupWalletManagerFunction);
+    txStatusTable.grantReadWriteData(receiptPollerFunction);
+
     // This will grant all required permissions including DescribeKey
     kmsWallet.grant(actionGroupWalletManagerFunction, 
       'kms:DescribeKey',
@@ -122,13 +221,7 @@ export class CryptoAIAgentSupervisorStack extends cdk.Stack {
       'kms:Sign'
     );
 
-    kmsWallet.grant(actionGroupInvestmentAdviceFunction,
-      'kms:DescribeKey',
-      'kms:Encrypt',
-      'kms:Decrypt',
-      'kms:GetPublicKey',
-      'kms:Sign'
-    );
+    idempotencyTable.grantReadWriteData(actionGroupWalletManagerFunction);
 
     const actionGroupInvestmentAdvice = new bedrockGenAIConstructs.AgentActionGroup({
         name: 'investment_advice',
@@ -147,8 +240,13 @@ export class CryptoAIAgentSupervisorStack extends cdk.Stack {
             "parameters": {
                 "token": {
                   "type": "string",
-                  "description": "The token for which to get the price of",
-                  "required": true
+                  "description": "The token for which to get the price of. Defaults to the native token of the chain",
+                  "required": false
+                },
+                "chain": {
+                  "type": "string",
+                  "description": "The chain whose native token to price when no token is given: polygon, ethereum, base, arbitrum or optimism. Defaults to polygon",
+                  "required": false
                 },
             }
           },
@@ -158,7 +256,7 @@ export class CryptoAIAgentSupervisorStack extends cdk.Stack {
 
     const actionGroupWalletManagement = new bedrockGenAIConstructs.AgentActionGroup({
         name: 'wallet_management',
-        description: 'Queries the wallet address, gets wallet token balances, and sends ether to a specified address',
+        description: 'Queries the wallet address, gets wallet and ERC-20 token balances, and sends ether or ERC-20 tokens to a specified address',
         executor: bedrockGenAIConstructs.ActionGroupExecutor.fromlambdaFunction(actionGroupWalletManagerFunction),
         enabled: true,
         functionSchema: {
@@ -168,15 +266,26 @@ export class CryptoAIAgentSupervisorStack extends cdk.Stack {
             "parameters": {
                 "walletAddress": {
                   "type": "string",
-                  "description": "The address for which to query the balance. This can be a wallet address or an ENS name such as vitalik.eth",
+                  "description": "The address for which to query the balance. This can be a wallet address or an ENS name such as vitalik.eth. Several comma separated addresses are queried together",
                   "required": true
                 },
+                "chain": {
+                  "type": "string",
+                  "description": "The chain to use: polygon, ethereum, base, arbitrum or optimism. Defaults to polygon",
+                  "required": false
+                },
             }
           },
           {
             "description": "This function is used to estimate the gas required for a payment transaction",
             "name": "estimateGas",
-            "parameters": {}
+            "parameters": {
+                "chain": {
+                  "type": "string",
+                  "description": "The chain to use: polygon, ethereum, base, arbitrum or optimism. Defaults to polygon",
+                  "required": false
+                },
+            }
           },
           {
             "description": "This function is used to send transactions to the blockchain. It returns a transaction hash which should be returned to the user",
@@ -193,12 +302,134 @@ export class CryptoAIAgentSupervisorStack extends cdk.Stack {
                   "description": "The wallet address to send the transaction to",
                   "required": true
                 },
+                "chain": {
+                  "type": "string",
+                  "description": "The chain to use: polygon, ethereum, base, arbitrum or optimism. Defaults to polygon",
+                  "required": false
+                },
+            }
+          },
+          {
+            "description": "This function is used to send an ERC-20 token to an address. It returns a transaction hash which should be returned to the user",
+            "name": "sendToken",
+            "requireConfirmation": "ENABLED",
+            "parameters": {
+                "amount": {
+                  "type": "number",
+                  "description": "The amount of the token to send, in whole tokens (e.g. 2.5 USDC)",
+                  "required": true
+                },
+                "receiver": {
+                  "type": "string",
+                  "description": "The wallet address or domain to send the token to",
+                  "required": true
+                },
+                "token": {
+                  "type": "string",
+                  "description": "The token symbol (USDC, USDT, DAI or WETH) or its contract address",
+                  "required": true
+                },
+                "chain": {
+                  "type": "string",
+                  "description": "The chain to use: polygon, ethereum, base, arbitrum or optimism. Defaults to polygon",
+                  "required": false
+                },
+            }
+          },
+          {
+            "description": "This function is used to query the ERC-20 token balance of an address",
+            "name": "getTokenBalance",
+            "parameters": {
+                "token": {
+                  "type": "string",
+                  "description": "The token symbol (USDC, USDT, DAI or WETH) or its contract address",
+                  "required": true
+                },
+                "walletAddress": {
+                  "type": "string",
+                  "description": "The address or domain to query. Defaults to the agent's own wallet",
+                  "required": false
+                },
+                "chain": {
+                  "type": "string",
+                  "description": "The chain to use: polygon, ethereum, base, arbitrum or optimism. Defaults to polygon",
+                  "required": false
+                },
+            }
+          },
+          {
+            "description": "This function is used to value a wallet: its native token and ERC-20 token balances with their USD prices and total value, in one call",
+            "name": "getPortfolio",
+            "parameters": {
+                "walletAddress": {
+                  "type": "string",
+                  "description": "The address or domain to value. Defaults to the agent's own wallet",
+                  "required": false
+                },
+                "chain": {
+                  "type": "string",
+                  "description": "The chain to use: polygon, ethereum, base, arbitrum or optimism, or all for every chain. Defaults to polygon",
+                  "required": false
+                },
+            }
+          },
+          {
+            "description": "This function is used to list the ERC-20 token transfers received and sent by a wallet over the last days, with totals per token. Native token payments are not included",
+            "name": "getWalletActivity",
+            "parameters": {
+                "days": {
+                  "type": "number",
+                  "description": "How many days back to look, up to 30. Defaults to 7",
+                  "required": false
+                },
+                "direction": {
+                  "type": "string",
+                  "description": "in for received transfers, out for sent ones, all for both. Defaults to all",
+                  "required": false
+                },
+                "token": {
+                  "type": "string",
+                  "description": "Only transfers of this token: a symbol (USDC, USDT, DAI or WETH) or a contract address",
+                  "required": false
+                },
+                "walletAddress": {
+                  "type": "string",
+                  "description": "The address or domain to look at. Defaults to the agent's own wallet",
+                  "required": false
+                },
+                "chain": {
+                  "type": "string",
+                  "description": "The chain to use: polygon, ethereum, base, arbitrum or optimism. Defaults to polygon",
+                  "required": false
+                },
             }
           },
           {
             "description": "This function is used to get the agent's wallet address",
             "name": "getWalletAddress",
-            "parameters": {}
+            "parameters": {
+                "chain": {
+                  "type": "string",
+                  "description": "The chain to use: polygon, ethereum, base, arbitrum or optimism. Defaults to polygon",
+                  "required": false
+                },
+            }
+          },
+          {
+            "description": "This function is used to check whether a transaction has been mined and whether it succeeded, with its block number and gas used",
+            "name": "getTxStatus",
+            "parameters": {
+                "txHash": {
+                  "type": "string",
+                  "description": "The transaction hash returned by sendTx or sendToken",
+                  "required": true
+                },
+                "chain": {
+                  "type": "string",
+                  "description": "The chain to use: polygon, ethereum, base, arbitrum or optimism. Defaults to polygon",
+                  "required": false
+                },
+            }
           }]
         }
       });
@@ -0,0 +1,103 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+import asyncio
+import os
+import threading
+
+import aiohttp
+from web3 import AsyncWeb3
+
+import unstoppable_domains
+from chains import domain_chain, get_chain
+from provider_pool import PooledAsyncHTTPProvider
+from read_cache import get_read_cache
+from rpc import get_rpc_pool
+from tracing import logger
+
+# Independent chain reads of one request (domain lookups, balances) run concurrently on AsyncWeb3, at most
+# MAX_CONCURRENCY in flight. The event loop runs in a daemon thread for the lifetime of the execution environment,
+# so the aiohttp session and its keep-alive connections survive across warm invocations. Handlers stay synchronous
+# and call run(). X-Ray subsegments are thread-local, so callers trace a whole run() rather than each coroutine.
+MAX_CONCURRENCY = int(os.environ.get("RPC_MAX_CONCURRENCY", 8))
+
+_loop = None
+_loop_lock = threading.Lock()
+_session = None
+_w3 = {}
+
+
+def _event_loop():
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="async-reads", daemon=True).start()
+    return _loop
+
+
+def run(coroutine):
+    # Synchronous entry point: runs the coroutine on the shared loop and waits for its result
+    return asyncio.run_coroutine_threadsafe(coroutine, _event_loop()).result()
+
+
+async def get_async_w3(chain=None):
+    # One AsyncWeb3 per chain, created on the loop thread, which owns the shared aiohttp session
+    global _session
+    config = get_chain(chain)
+    if config["name"] not in _w3:
+        if _session is None:
+            _session = aiohttp.ClientSession()
+        w3 = AsyncWeb3(
+            PooledAsyncHTTPProvider(get_rpc_pool(config["name"]), _session, read_cache=get_read_cache(config["name"]))
+        )
+        served_chain_id = await w3.eth.chain_id
+        if served_chain_id != config["chain_id"]:
+            raise ValueError(f"The RPC endpoints for {config['name']} serve chain ID {served_chain_id}")
+        _w3[config["name"]] = w3
+    return _w3[config["name"]]
+
+
+async def gather_limited(coroutines, limit=MAX_CONCURRENCY):
+    # Results in order; a failed read comes back as its exception instead of cancelling the others
+    semaphore = asyncio.Semaphore(limit)
+
+    async def limited(coroutine):
+        async with semaphore:
+            return await coroutine
+
+    return await asyncio.gather(*(limited(coroutine) for coroutine in coroutines), return_exceptions=True)
+
+
+async def resolve_domain(domain, chain=None):
+    if unstoppable_domains.is_address(domain):
+        return domain
+    resolver_chain = domain_chain(chain)
+    w3 = await get_async_w3(resolver_chain["name"])
+    contract = w3.eth.contract(
+        address=AsyncWeb3.to_checksum_address(resolver_chain["ud_resolver"]), abi=unstoppable_domains.ABI
+    )
+    try:
+        result = await contract.functions.getData([], unstoppable_domains.token_id(domain)).call()
+    except Exception as e:
+        logger.error(f"An error occurred while resolving domain {domain}: {e}")
+        return None
+    if result[1] == unstoppable_domains.ZERO_ADDRESS:
+        logger.info(f"Domain {domain} not found")
+        return None
+    logger.info(f"Resolved {domain} to {result[1]}")
+    return result[1]
+
+
+async def get_balance(address, chain=None):
+    # (resolved address, balance in the chain's native token); the address is None when a domain does not resolve
+    resolved = await resolve_domain(address, chain)
+    if resolved is None:
+        return None, None
+    w3 = await get_async_w3(chain)
+    balance = await w3.eth.get_balance(AsyncWeb3.to_checksum_address(resolved))
+    return resolved, AsyncWeb3.from_wei(balance, 'ether')
+
+
+async def get_balances(addresses, chain=None, limit=MAX_CONCURRENCY):
+    # Each address is resolved and then queried independently of the others
+    return await gather_limited((get_balance(address, chain) for address in addresses), limit)
@@ -0,0 +1,107 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+import os
+
+# EVM chains the supervisor Lambda serves. Actions take an optional `chain` (a name below, an alias or a chain id;
+# DEFAULT_CHAIN otherwise), and RPC pools, read caches and web3 instances are created per chain on first use.
+# - rpc_urls_env: comma separated endpoints for the chain. The default chain also reads BLOCKCHAIN_RPC_URLS and
+#   BLOCKCHAIN_RPC_URL, and Polygon adds the AMB endpoint (the accessor token is for POLYGON_MAINNET)
+# - ud_resolver: Unstoppable Domains ProxyReader; chains without one resolve domains on the default chain, since a
+#   domain owner's address is the same on every EVM chain
+# - gas_price_gwei: fixed legacy gas price for sendTx; None reads eth_gasPrice from the node
+MULTICALL3_ADDRESS = "0xcA11bde05977b3631167028862bE2a173976CA11"
+
+CHAINS = {
+    "polygon": {
+        "chain_id": 137,
+        "native_symbol": "POL",
+        "coingecko_id": "polygon-ecosystem-token",
+        "rpc_urls_env": "BLOCKCHAIN_RPC_URLS_POLYGON",
+        "ud_resolver": os.environ.get("UNSTOPPABLE_DOMAINS_ADDRESS", "0xa2c203d7a6931f5368fb935cf1bffa7fa4c8360e"),
+        "multicall": MULTICALL3_ADDRESS,
+        "explorer": "https://polygonscan.com",
+        "block_time_seconds": 2,
+        "gas_price_gwei": 150,
+    },
+    "ethereum": {
+        "chain_id": 1,
+        "native_symbol": "ETH",
+        "coingecko_id": "ethereum",
+        "rpc_urls_env": "BLOCKCHAIN_RPC_URLS_ETHEREUM",
+        "ud_resolver": "0x578853aa776Eef10CeE6c4dd2B5862bdcE767A8B",
+        "multicall": MULTICALL3_ADDRESS,
+        "explorer": "https://etherscan.io",
+        "block_time_seconds": 12,
+        "gas_price_gwei": None,
+    },
+    "base": {
+        "chain_id": 8453,
+        "native_symbol": "ETH",
+        "coingecko_id": "ethereum",
+        "rpc_urls_env": "BLOCKCHAIN_RPC_URLS_BASE",
+        "ud_resolver": None,
+        "multicall": MULTICALL3_ADDRESS,
+        "explorer": "https://basescan.org",
+        "block_time_seconds": 2,
+        "gas_price_gwei": None,
+    },
+    "arbitrum": {
+        "chain_id": 42161,
+        "native_symbol": "ETH",
+        "coingecko_id": "ethereum",
+        "rpc_urls_env": "BLOCKCHAIN_RPC_URLS_ARBITRUM",
+        "ud_resolver": None,
+        "multicall": MULTICALL3_ADDRESS,
+        "explorer": "https://arbiscan.io",
+        "block_time_seconds": 0.25,
+        "gas_price_gwei": None,
+    },
+    "optimism": {
+        "chain_id": 10,
+        "native_symbol": "ETH",
+        "coingecko_id": "ethereum",
+        "rpc_urls_env": "BLOCKCHAIN_RPC_URLS_OPTIMISM",
+        "ud_resolver": None,
+        "multicall": MULTICALL3_ADDRESS,
+        "explorer": "https://optimistic.etherscan.io",
+        "block_time_seconds": 2,
+        "gas_price_gwei": None,
+    },
+}
+ALIASES = {
+    "matic": "polygon",
+    "pol": "polygon",
+    "eth": "ethereum",
+    "mainnet": "ethereum",
+    "arb": "arbitrum",
+    "op": "optimism",
+}
+DEFAULT_CHAIN = os.environ.get("DEFAULT_CHAIN", "polygon")
+
+
+def get_chain(chain=None):
+    # The registry entry plus its `name`, for a name, alias or chain id; None is the default chain
+    key = str(chain).strip().lower() if chain not in (None, "") else DEFAULT_CHAIN
+    key = ALIASES.get(key, key)
+    if key not in CHAINS:
+        key = next((name for name, config in CHAINS.items() if str(config["chain_id"]) == key), key)
+    if key not in CHAINS:
+        raise ValueError(f"Unsupported chain '{chain}', use one of {', '.join(CHAINS)}")
+    return dict(CHAINS[key], name=key)
+
+
+def domain_chain(chain=None):
+    # The chain whose Unstoppable Domains resolver answers domain lookups for `chain`
+    for candidate in (chain, DEFAULT_CHAIN, "polygon"):
+        config = get_chain(candidate)
+        if config["ud_resolver"]:
+            return config
+
+
+def explorer_tx_url(chain, tx_hash):
+    tx_hash = tx_hash if tx_hash.startswith("0x") else "0x" + tx_hash
+    return f"{get_chain(chain)['explorer']}/tx/{tx_hash}"
+
+
+# Optional on every on-chain action: a chain name, alias or chain ID from CHAINS, the default chain otherwise
+CHAIN_PARAMETER = {"type": "string", "required": False}
@@ -0,0 +1,149 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+import os
+import threading
+import time
+import requests
+from chains import CHAINS, get_chain
+from tracing import logger, trace_dependency
+
+# Price lookups of the investment_advice action group. Plain HTTPS calls to CoinGecko: nothing here imports the
+# web3 / KMS signing stack, so the investment advice Lambda stays small (requirements-investment-advice.txt).
+# - one keep-alive session for every call of the execution environment
+# - prices are reused for PRICE_TTL_SECONDS and the Bitcoin price history for MARKET_CHART_TTL_SECONDS; the
+#   scheduled warm-up (warmup.py) refreshes both, with the prices of WARMUP_TOKENS in a single call
+
+#CoinGecko private key for making calls
+coingecko_api_key = os.environ.get('COINGECKO_API_KEY')
+if not coingecko_api_key:
+    raise ValueError("COINGECKO_API_KEY environment variable is not set")
+# Overridden by the offline benchmarks, which serve a fake CoinGecko API
+COINGECKO_API_URL = os.environ.get('COINGECKO_API_URL', 'https://api.coingecko.com/api/v3')
+PRICE_TTL_SECONDS = int(os.environ.get('PRICE_TTL_SECONDS', 300))
+MARKET_CHART_TTL_SECONDS = int(os.environ.get('MARKET_CHART_TTL_SECONDS', 3600))
+# CoinGecko ids to keep warm: Bitcoin and the native tokens of the chains by default
+WARMUP_TOKENS = [token.strip().lower() for token in os.environ.get(
+    'WARMUP_TOKENS', ','.join(dict.fromkeys(['bitcoin'] + [chain['coingecko_id'] for chain in CHAINS.values()]))
+).split(',') if token.strip()]
+
+_session = requests.Session()
+_cache_lock = threading.Lock()
+# coin id -> (USD price, fetched at)
+_prices = {}
+# (daily USD prices of the last year, fetched at)
+_market_chart = None
+
+def _headers():
+    return {
+        "accept": "application/json",
+        "x-cg-demo-api-key": coingecko_api_key
+    }
+
+def fetch_prices(tokens):
+    # One /coins/markets call for several coin ids; every price in a 200 answer is cached
+    params = {
+    "vs_currency": "usd",
+    "ids": ",".join(tokens)
+    }
+    with trace_dependency("coingecko", "coins_markets"):
+        response = _session.get(f"{COINGECKO_API_URL}/coins/markets", params=params, headers=_headers())
+    logger.debug("CoinGecko response: %s", response.text)
+    if response.status_code == 200:
+        now = time.monotonic()
+        with _cache_lock:
+            for item in response.json():
+                _prices[item["id"]] = (item["current_price"], now)
+    return response
+
+def fetch_market_chart():
+    global _market_chart
+    url = f"{COINGECKO_API_URL}/coins/bitcoin/market_chart?vs_currency=usd&days=365&interval=daily"
+    with trace_dependency("coingecko", "market_chart"):
+        response = _session.get(url, headers=_headers())
+    response.raise_for_status()
+    prices = [price[1] for price in response.json()['prices']]
+    with _cache_lock:
+        _market_chart = (prices, time.monotonic())
+    return prices
+
+def cached_price(token):
+    with _cache_lock:
+        entry = _prices.get(token)
+    if entry is not None and time.monotonic() - entry[1] < PRICE_TTL_SECONDS:
+        return entry[0]
+    return None
+
+def get_prices(tokens):
+    # USD prices of several coin ids: cached ones as they are, the rest from one /coins/markets call; None for a
+    # coin CoinGecko has no price for
+    tokens = list(dict.fromkeys(token for token in tokens if token))
+    missing = [token for token in tokens if cached_price(token) is None]
+    if missing:
+        response = fetch_prices(missing)
+        if response.status_code != 200:
+            logger.warning(f"CoinGecko answered {response.status_code} for {len(missing)} prices: {response.text}")
+    return {token: cached_price(token) for token in tokens}
+
+def btc_price_history():
+    with _cache_lock:
+        entry = _market_chart
+    if entry is not None and time.monotonic() - entry[1] < MARKET_CHART_TTL_SECONDS:
+        return entry[0]
+    return fetch_market_chart()
+
+def warm_prices():
+    response = fetch_prices(WARMUP_TOKENS)
+    response.raise_for_status()
+    return f"{len(response.json())} of {len(WARMUP_TOKENS)} prices refreshed"
+
+def warm_btc_price_history():
+    return f"{len(fetch_market_chart())} daily prices refreshed"
+
+def investAdviceMetric():
+    prices = btc_price_history()
+    current_price = prices[-1]
+    all_time_high = max(prices)
+
+    # Calculate 200-day moving average
+    ma_200 = sum(prices[-200:]) / min(200, len(prices))
+
+    ath_ratio = current_price / all_time_high
+    ma_ratio = current_price / ma_200
+
+    sbci = (ath_ratio + ma_ratio) / 2
+
+    logger.info(
+        f"Current Price: ${current_price:.2f}, All Time High: ${all_time_high:.2f}, "
+        f"200-day Moving Average: ${ma_200:.2f}, Simple Bitcoin Cycle Index: {sbci:.2f}"
+    )
+
+    if sbci <= 0.25:
+        return "The market appears extremely undervalued. Consider investing but be aware of potential further downside."
+    elif sbci <= 0.50:
+        return "The market appears somewhat undervalued. This might be a good opportunity for dollar-cost averaging or increasing your position."
+    elif sbci <= 0.75:
+        return "The market seems to be around fair value. This might be a good time to hold your current position and continue to monitor the market."
+    elif sbci <= 1.00:
+        return "The market appears overvalued. Consider taking some profits or reducing your position."
+    else:
+        return "The market appears extremely overvalued. This might be a good time to take significant profits."
+
+def getCryptoPrice(token=None, chain=None):
+    # Without a token, the price of the chain's native token
+    token = (token or get_chain(chain)['coingecko_id']).lower()
+
+    price = cached_price(token)
+    if price is not None:
+        return price
+
+    response = fetch_prices([token])
+
+    if response.status_code == 200:
+        data = response.json()
+        if data:
+            price = data[0]["current_price"]
+            return price
+        else:
+            return f"No data found for {token}"
+    else:
+        return f"Error: {response.status_code} - {response.text}"
@@ -0,0 +1,148 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from decimal import Decimal, InvalidOperation
+
+from tracing import logger, trace_function
+
+# Functions the agent can call, registered with `register`:
+# name -> {"handler", "parameters", "timeout_seconds", "with_event"}
+ACTIONS = {}
+
+DEFAULT_TIMEOUT_SECONDS = 30
+# Time kept back from the Lambda deadline to build and return the response
+RESPONSE_MARGIN_SECONDS = 2
+
+
+class ParameterError(Exception):
+    pass
+
+
+def _to_boolean(value):
+    if isinstance(value, bool):
+        return value
+    if str(value).strip().lower() in ("true", "1", "yes"):
+        return True
+    if str(value).strip().lower() in ("false", "0", "no"):
+        return False
+    raise ValueError(value)
+
+
+def _to_number(value):
+    # Decimal keeps amounts such as 0.1 ether exact all the way to to_wei
+    try:
+        number = Decimal(str(value).strip())
+    except InvalidOperation:
+        raise ValueError(value)
+    if not number.is_finite():
+        raise ValueError(value)
+    return number
+
+
+def _to_string(value):
+    return str(value).strip()
+
+
+# Coercion per parameter type; the types are the ones used in the action group function schemas
+COERCERS = {
+    "string": _to_string,
+    "number": _to_number,
+    "integer": int,
+    "boolean": _to_boolean,
+}
+
+
+def register(name, handler, parameters=None, timeout_seconds=DEFAULT_TIMEOUT_SECONDS, with_event=False):
+    # parameters: {parameter name: {"type": "string" | "number" | "integer" | "boolean", "required": bool}}
+    # The handler is called with the coerced parameters as keyword arguments, plus the agent event as `event`
+    # when with_event is set (e.g. to read the session id).
+    for parameter_name, spec in (parameters or {}).items():
+        if spec["type"] not in COERCERS:
+            raise Exception("Unsupported type {} for parameter {} of {}".format(spec["type"], parameter_name, name))
+    ACTIONS[name] = {
+        "handler": handler,
+        "parameters": parameters or {},
+        "timeout_seconds": timeout_seconds,
+        "with_event": with_event,
+    }
+
+
+def parse_parameters(schema, raw_parameters):
+    values = {param["name"]: param.get("value") for param in raw_parameters or []}
+    parsed = {}
+    for name, spec in schema.items():
+        value = values.get(name)
+        if value is None or value == "":
+            if spec.get("required", False):
+                raise ParameterError(f"Missing required parameter '{name}'")
+            parsed[name] = None
+            continue
+        try:
+            parsed[name] = COERCERS[spec["type"]](value)
+        except (TypeError, ValueError):
+            raise ParameterError(f"Parameter '{name}' must be a {spec['type']}, got '{value}'")
+    return parsed
+
+
+def text_body(result):
+    # Bedrock expects a string body; results such as Decimal balances are not JSON serializable as-is
+    return {"TEXT": {"body": result if isinstance(result, str) else str(result)}}
+
+
+def function_response(event, response_body):
+    action_response = {
+        'actionGroup': event['actionGroup'],
+        'function': event['function'],
+        'functionResponse': {
+            'responseBody': response_body
+        }
+    }
+    return {'response': action_response, 'messageVersion': event['messageVersion']}
+
+
+def _remaining_seconds(context):
+    if context is None or not hasattr(context, "get_remaining_time_in_millis"):
+        return None
+    return context.get_remaining_time_in_millis() / 1000 - RESPONSE_MARGIN_SECONDS
+
+
+def call_with_timeout(handler, kwargs, timeout_seconds):
+    # A timed out call keeps running in its worker thread until it finishes or the Lambda is frozen, so handlers
+    # with side effects (sendTx) get timeouts close to the Lambda timeout rather than tight ones.
+    executor = ThreadPoolExecutor(max_workers=1)
+    try:
+        return executor.submit(handler, **kwargs).result(timeout=timeout_seconds)
+    finally:
+        executor.shutdown(wait=False)
+
+
+def dispatch(event, context=None):
+    function = event['function']
+    action = ACTIONS.get(function)
+    if action is None:
+        return function_response(event, text_body(f"Function {function} not found"))
+
+    try:
+        kwargs = parse_parameters(action["parameters"], event.get('parameters'))
+    except ParameterError as e:
+        logger.warning(f"Invalid parameters for {function}: {e}")
+        return function_response(event, text_body(f"Invalid parameters for {function}: {e}"))
+    logger.info(f"Parameters: {kwargs}")
+    if action["with_event"]:
+        kwargs["event"] = event
+
+    timeout_seconds = action["timeout_seconds"]
+    remaining_seconds = _remaining_seconds(context)
+    if remaining_seconds is not None:
+        timeout_seconds = max(min(timeout_seconds, remaining_seconds), 0)
+
+    try:
+        with trace_function(function):
+            result = call_with_timeout(action["handler"], kwargs, timeout_seconds)
+    except FutureTimeoutError:
+        logger.error(f"{function} timed out after {timeout_seconds:.0f} seconds")
+        result = f"{function} did not complete within {timeout_seconds:.0f} seconds"
+    except Exception as e:
+        logger.exception(f"{function} failed")
+        result = f"{function} failed: {e}"
+    return function_response(event, text_body(result))
@@ -0,0 +1,223 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+import boto3
+from botocore.exceptions import ClientError
+
+from tracing import logger, trace_dependency
+
+# Bedrock agents retry an action group call when it times out, so the same payment request can reach sendTx more
+# than once. Every request is recorded under a key built from the agent session, the invocation and the payment
+# itself, and moves through these states:
+# - IN_PROGRESS: claimed by an invocation, nothing signed yet. Expires after IN_PROGRESS_TTL_SECONDS so a crashed
+#   invocation does not block the request forever.
+# - SIGNED: the raw transaction and its hash are stored before broadcasting. A retry re-broadcasts the same raw
+#   transaction (same nonce), which can never pay twice.
+# - SENT: the node accepted the transaction; retries return the stored hash.
+# A SIGNED transaction whose nonce another transaction took can never be mined; it is discarded so the request can
+# be signed again.
+# Bedrock function-details events carry no invocation id, so the key falls back to the turn's input text: the same
+# payment asked again in the same words within IDEMPOTENCY_TTL_SECONDS gets the stored hash back too, and sendTx says
+# so in its answer.
+IN_PROGRESS = "IN_PROGRESS"
+SIGNED = "SIGNED"
+SENT = "SENT"
+
+IDEMPOTENCY_TTL_SECONDS = int(os.environ.get("IDEMPOTENCY_TTL_SECONDS", 3600))
+IN_PROGRESS_TTL_SECONDS = int(os.environ.get("IDEMPOTENCY_IN_PROGRESS_TTL_SECONDS", 300))
+RECORD_FIELDS = ["status", "tx_hash", "raw_tx", "receiver", "amount", "created_at", "expires_at"]
+
+
+def idempotency_key(event, *values):
+    # Bedrock sends the same sessionId and inputText on every retry of one agent turn
+    invocation = event.get('invocationId') or event.get('inputText', '')
+    parts = [event.get('sessionId', ''), invocation] + [str(value) for value in values]
+    return hashlib.sha256("\x1f".join(parts).encode()).hexdigest()
+
+
+class SQLiteIdempotencyStore:
+    # Local file store. In Lambda /tmp is per execution environment, so this only covers retries that land on the
+    # same warm container; set IDEMPOTENCY_TABLE_NAME to share records across containers.
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS idempotency ("
+            "id TEXT PRIMARY KEY, status TEXT NOT NULL, tx_hash TEXT, raw_tx TEXT, receiver TEXT, amount TEXT, "
+            "created_at INTEGER NOT NULL, expires_at INTEGER NOT NULL)"
+        )
+
+    def _row_to_record(self, row):
+        return dict(zip(RECORD_FIELDS, row)) if row else None
+
+    def get(self, key):
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT {} FROM idempotency WHERE id = ? AND expires_at > ?".format(", ".join(RECORD_FIELDS)),
+                (key, int(time.time())),
+            ).fetchone()
+        return self._row_to_record(row)
+
+    def claim(self, key, receiver, amount):
+        # Returns None when the caller now owns the request, otherwise the existing record
+        now = int(time.time())
+        with self.lock:
+            self.connection.execute("BEGIN IMMEDIATE")
+            try:
+                row = self.connection.execute(
+                    "SELECT {} FROM idempotency WHERE id = ? AND expires_at > ?".format(", ".join(RECORD_FIELDS)),
+                    (key, now),
+                ).fetchone()
+                if row is None:
+                    self.connection.execute(
+                        "INSERT OR REPLACE INTO idempotency (id, status, receiver, amount, created_at, expires_at) "
+                        "VALUES (?, ?, ?, ?, ?, ?)",
+                        (key, IN_PROGRESS, receiver, str(amount), now, now + IN_PROGRESS_TTL_SECONDS),
+                    )
+                self.connection.execute("COMMIT")
+            except Exception:
+                self.connection.execute("ROLLBACK")
+                raise
+        return self._row_to_record(row)
+
+    def mark_signed(self, key, tx_hash, raw_tx):
+        with self.lock:
+            self.connection.execute(
+                "UPDATE idempotency SET status = ?, tx_hash = ?, raw_tx = ?, expires_at = ? WHERE id = ?",
+                (SIGNED, tx_hash, raw_tx, int(time.time()) + IDEMPOTENCY_TTL_SECONDS, key),
+            )
+
+    def mark_sent(self, key):
+        with self.lock:
+            self.connection.execute("UPDATE idempotency SET status = ? WHERE id = ?", (SENT, key))
+
+    def release(self, key):
+        # Only for requests that failed before anything was signed
+        with self.lock:
+            self.connection.execute("DELETE FROM idempotency WHERE id = ? AND status = ?", (key, IN_PROGRESS))
+
+    def discard_signed(self, key):
+        # Only for signed transactions that can never be mined
+        with self.lock:
+            self.connection.execute("DELETE FROM idempotency WHERE id = ? AND status = ?", (key, SIGNED))
+
+
+class DynamoDBIdempotencyStore:
+    # Table with a string partition key `id` and TTL on `expires_at`. endpoint_url points it at DynamoDB Local.
+
+    def __init__(self, table_name, client=None, endpoint_url=None):
+        self.table_name = table_name
+        self.client = client or boto3.client('dynamodb', endpoint_url=endpoint_url)
+
+    def _item_to_record(self, item):
+        if not item:
+            return None
+        record = {field: None for field in RECORD_FIELDS}
+        for field, value in item.items():
+            if field in record:
+                record[field] = int(value["N"]) if "N" in value else value["S"]
+        return record
+
+    def get(self, key):
+        with trace_dependency("dynamodb", "GetItem"):
+            item = self.client.get_item(
+                TableName=self.table_name, Key={"id": {"S": key}}, ConsistentRead=True
+            ).get("Item")
+        record = self._item_to_record(item)
+        # TTL deletion is lazy, so expired items can still be returned
+        if record and record["expires_at"] <= int(time.time()):
+            return None
+        return record
+
+    def claim(self, key, receiver, amount):
+        now = int(time.time())
+        try:
+            with trace_dependency("dynamodb", "PutItem"):
+                self.client.put_item(
+                    TableName=self.table_name,
+                    Item={
+                        "id": {"S": key},
+                        "status": {"S": IN_PROGRESS},
+                        "receiver": {"S": receiver},
+                        "amount": {"S": str(amount)},
+                        "created_at": {"N": str(now)},
+                        "expires_at": {"N": str(now + IN_PROGRESS_TTL_SECONDS)},
+                    },
+                    ConditionExpression="attribute_not_exists(id) OR expires_at <= :now",
+                    ExpressionAttributeValues={":now": {"N": str(now)}},
+                )
+            return None
+        except ClientError as e:
+            if e.response["Error"]["Code"] != "ConditionalCheckFailedException":
+                raise
+        return self.get(key)
+
+    def _update(self, key, expression, values, condition=None):
+        kwargs = {"ConditionExpression": condition} if condition else {}
+        with trace_dependency("dynamodb", "UpdateItem"):
+            self.client.update_item(
+                TableName=self.table_name,
+                Key={"id": {"S": key}},
+                UpdateExpression=expression,
+                ExpressionAttributeNames={"#status": "status"},
+                ExpressionAttributeValues=values,
+                **kwargs,
+            )
+
+    def mark_signed(self, key, tx_hash, raw_tx):
+        self._update(
+            key,
+            "SET #status = :status, tx_hash = :tx_hash, raw_tx = :raw_tx, expires_at = :expires_at",
+            {
+                ":status": {"S": SIGNED},
+                ":tx_hash": {"S": tx_hash},
+                ":raw_tx": {"S": raw_tx},
+                ":expires_at": {"N": str(int(time.time()) + IDEMPOTENCY_TTL_SECONDS)},
+            },
+        )
+
+    def mark_sent(self, key):
+        self._update(key, "SET #status = :status", {":status": {"S": SENT}})
+
+    def _delete_with_status(self, key, status):
+        try:
+            with trace_dependency("dynamodb", "DeleteItem"):
+                self.client.delete_item(
+                    TableName=self.table_name,
+                    Key={"id": {"S": key}},
+                    ConditionExpression="#status = :status",
+                    ExpressionAttributeNames={"#status": "status"},
+                    ExpressionAttributeValues={":status": {"S": status}},
+                )
+        except ClientError as e:
+            if e.response["Error"]["Code"] != "ConditionalCheckFailedException":
+                raise
+
+    def release(self, key):
+        self._delete_with_status(key, IN_PROGRESS)
+
+    def discard_signed(self, key):
+        self._delete_with_status(key, SIGNED)
+
+
+_store = None
+
+
+def get_idempotency_store():
+    global _store
+    if _store is None:
+        table_name = os.environ.get("IDEMPOTENCY_TABLE_NAME")
+        if table_name:
+            _store = DynamoDBIdempotencyStore(table_name, endpoint_url=os.environ.get("DYNAMODB_ENDPOINT_URL"))
+        else:
+            path = os.environ.get("IDEMPOTENCY_DB_PATH", "/tmp/idempotency.sqlite3")
+            logger.warning(f"IDEMPOTENCY_TABLE_NAME is not set, using the local store at {path}")
+            _store = SQLiteIdempotencyStore(path)
+    return _store
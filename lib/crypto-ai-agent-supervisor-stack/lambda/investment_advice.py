@@ -0,0 +1,32 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+from chains import CHAIN_PARAMETER
+from coingecko import getCryptoPrice, investAdviceMetric, warm_btc_price_history, warm_prices
+from dispatcher import dispatch, register
+from tracing import logger, metrics, tracer
+from warmup import is_warmup_event, register_step, warm_up
+
+# Handler of the investment_advice action group: token prices and the Bitcoin cycle index, HTTP only
+
+register("getCryptoPrice", getCryptoPrice, parameters={
+    "token": {"type": "string", "required": False},
+    "chain": CHAIN_PARAMETER,
+}, timeout_seconds=15)
+register("investAdviceMetric", investAdviceMetric, timeout_seconds=30)
+
+register_step("prices", warm_prices)
+register_step("btc_price_history", warm_btc_price_history)
+
+@logger.inject_lambda_context
+@tracer.capture_lambda_handler
+@metrics.log_metrics(capture_cold_start_metric=True)
+def lambda_handler(event, context):
+    logger.debug("Event: %s", event)
+    if is_warmup_event(event):
+        return warm_up()
+    logger.append_keys(agent_function=event['function'])
+
+    function_response = dispatch(event, context)
+    logger.debug("Response: %s", function_response)
+
+    return function_response
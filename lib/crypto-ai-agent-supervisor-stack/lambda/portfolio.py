@@ -0,0 +1,106 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+from decimal import Decimal
+
+from eth_abi import decode, encode
+
+from chains import get_chain
+from rpc import RPCError, batch_call, get_rpc_pool
+from tokens import PRICE_IDS, TOKENS, balance_of_data, decode_uint, from_units
+from tracing import logger
+
+# getPortfolio: the native and registry token balances of a wallet with their USD value, in one action instead of
+# getWalletAddress + getBalance + getCryptoPrice round trips of the agent.
+# - the balances of a chain come from one eth_call of Multicall3 aggregate3 (getEthBalance for the native token,
+#   balanceOf per token), calldata packed like tokens.py does; a chain where that call fails falls back to one
+#   JSON-RPC batch of eth_getBalance / eth_call
+# - every price comes from one batched CoinGecko call (coingecko.get_prices), fetched while the balances are read
+AGGREGATE3_SELECTOR = "0x82ad56cb"  # aggregate3((address,bool,bytes)[])
+GET_ETH_BALANCE_SELECTOR = "0x4d2301cc"  # getEthBalance(address)
+
+
+def holdings(chain=None):
+    # The assets getPortfolio reads on a chain: its native token, then the registry tokens
+    config = get_chain(chain)
+    assets = [{"symbol": config['native_symbol'], "address": None, "decimals": 18, "price_id": config['coingecko_id']}]
+    for symbol, (address, decimals) in TOKENS.get(config['name'], {}).items():
+        assets.append({"symbol": symbol, "address": address, "decimals": decimals, "price_id": PRICE_IDS.get(symbol)})
+    return assets
+
+
+def price_ids(chains):
+    return list(dict.fromkeys(asset["price_id"] for chain in chains for asset in holdings(chain) if asset["price_id"]))
+
+
+def multicall_data(owner, assets, multicall):
+    owner_word = balance_of_data(owner)[10:]
+    calls = [
+        (multicall, True, bytes.fromhex(GET_ETH_BALANCE_SELECTOR[2:] + owner_word)) if asset["address"] is None
+        else (asset["address"], True, bytes.fromhex(balance_of_data(owner)[2:]))
+        for asset in assets
+    ]
+    return AGGREGATE3_SELECTOR + encode(["(address,bool,bytes)[]"], [calls]).hex()
+
+
+def fetch_balances(chain, owner, call):
+    # [(asset, base units or None when unreadable)] of `owner` on `chain`. `call(to, data) -> bytes` runs an
+    # eth_call (see wallet_management.token_call)
+    config = get_chain(chain)
+    assets = holdings(chain)
+    try:
+        result = call(config['multicall'], multicall_data(owner, assets, config['multicall']))
+        answers = decode(["(bool,bytes)[]"], bytes(result))[0]
+        return [
+            (asset, decode_uint(data) if success and len(data) >= 32 else None)
+            for asset, (success, data) in zip(assets, answers)
+        ]
+    except Exception as e:
+        logger.warning(f"Multicall failed on {config['name']}, reading the balances in one JSON-RPC batch: {e}")
+    calls = [
+        ("eth_getBalance", [owner, "latest"]) if asset["address"] is None
+        else ("eth_call", [{"to": asset["address"], "data": balance_of_data(owner)}, "latest"])
+        for asset in assets
+    ]
+    results = batch_call(get_rpc_pool(chain), calls)
+    return [(asset, None if isinstance(result, RPCError) else decode_uint(result)) for asset, result in zip(assets, results)]
+
+
+def describe_portfolio(owner, balances, prices, unavailable=()):
+    # balances: [(chain, asset, units)]; prices: {coin id: USD price or None}; unavailable: chains whose balances could
+    # not be read at all. Zero balances are left out.
+    rows, unread, unpriced, total = [], [], [], 0.0
+    for chain, asset, units in balances:
+        if units is None:
+            unread.append(f"{asset['symbol']} on {chain}")
+            continue
+        if units == 0:
+            continue
+        amount = from_units(units, asset)
+        price = prices.get(asset["price_id"])
+        if price is None:
+            unpriced.append(asset["symbol"])
+            value = None
+        else:
+            value = float(amount) * price
+            total += value
+        rows.append((chain, asset["symbol"], amount, price, value))
+
+    lines = [f"Portfolio of {owner}, USD prices from CoinGecko"]
+    if rows:
+        rows.sort(key=lambda row: -(row[4] or 0))
+        lines.append(f"{'chain':<10}{'asset':<8}{'balance':>20}{'price':>12}{'value':>14}")
+        for chain, symbol, amount, price, value in rows:
+            balance = f"{round(amount, 6).normalize():f}" if amount >= Decimal("0.000001") else f"{amount:.2e}"
+            price_text = "n/a" if price is None else f"{price:,.4g}" if price < 1 else f"{price:,.2f}"
+            value_text = "n/a" if value is None else f"{value:,.2f}"
+            lines.append(f"{chain:<10}{symbol:<8}{balance:>20}{price_text:>12}{value_text:>14}")
+        lines.append(f"Total value: {total:,.2f} USD")
+    elif not unavailable:
+        lines.append("No holdings found.")
+    if unpriced:
+        lines.append(f"No price for {', '.join(dict.fromkeys(unpriced))}, not counted in the total.")
+    if unread:
+        lines.append(f"Could not read the balance of {', '.join(unread)}.")
+    if unavailable:
+        lines.append(f"Could not read the balances on {', '.join(unavailable)}, not counted in the total.")
+    return "\n".join(lines)
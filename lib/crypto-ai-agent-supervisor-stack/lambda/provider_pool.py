@@ -0,0 +1,342 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+import asyncio
+import json
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+
+import aiohttp
+import requests
+from web3.providers.async_base import AsyncJSONBaseProvider
+from web3.providers.base import JSONBaseProvider
+
+from read_cache import READ_METHODS
+from tracing import logger
+
+# Routing for several JSON-RPC endpoints of the same chain:
+# - reads go to the healthy endpoint with the best score (EWMA latency inflated by the EWMA error rate, so a fast but
+#   flaky endpoint ranks behind a slightly slower reliable one); if it has not answered after
+#   HEDGE_AFTER_SECONDS the same request goes to the next endpoint too and the first answer wins, and an endpoint
+#   that fails hands the request to the next one
+# - writes are never hedged, and inside `pin()` every call (nonce lookup, broadcast, re-broadcast) goes to the same
+#   endpoint so one transaction is not split across nodes with different mempools
+# - an endpoint whose EWMA error rate passes MAX_ERROR_RATE sits out COOLDOWN_SECONDS, then gets traffic again
+# request_async() applies the same routing on an event loop through a shared aiohttp session (see async_reads.py);
+# pinning only covers the synchronous path, so writes should stay there
+WRITE_METHODS = {"eth_sendRawTransaction", "eth_sendTransaction"}
+HEDGE_AFTER_SECONDS = float(os.environ.get("RPC_HEDGE_AFTER_MS", 400)) / 1000
+REQUEST_TIMEOUT_SECONDS = float(os.environ.get("RPC_TIMEOUT_SECONDS", 10))
+EWMA_ALPHA = 0.2
+ERROR_PENALTY = 4
+MAX_ERROR_RATE = 0.5
+COOLDOWN_SECONDS = 30
+# Answers that cannot change for the endpoints of one chain (keep_chain() checks each endpoint serves it); web3 asks
+# for the chain id before every contract call
+CONSTANT_METHODS = {"eth_chainId"}
+
+
+class Endpoint:
+    def __init__(self, url):
+        self.url = url
+        self.session = requests.Session()
+        self.latency = None
+        self.error_rate = 0.0
+        self.cooldown_until = 0.0
+        self.requests = 0
+        self.failures = 0
+
+    def record(self, latency, failed):
+        self.requests += 1
+        self.failures += int(failed)
+        if not failed:
+            self.latency = latency if self.latency is None else EWMA_ALPHA * latency + (1 - EWMA_ALPHA) * self.latency
+        self.error_rate = EWMA_ALPHA * int(failed) + (1 - EWMA_ALPHA) * self.error_rate
+        if failed and self.error_rate > MAX_ERROR_RATE:
+            self.cooldown_until = time.monotonic() + COOLDOWN_SECONDS
+            # Start over after the cooldown so one probe can bring it back
+            self.error_rate = MAX_ERROR_RATE
+
+    def healthy(self, now):
+        return now >= self.cooldown_until
+
+    def score(self):
+        # Unmeasured endpoints score 0 so each one gets measured
+        return (self.latency or 0.0) * (1 + ERROR_PENALTY * self.error_rate)
+
+    def stats(self):
+        return {
+            "url": self.url.split("?")[0],
+            "latency_ms": None if self.latency is None else round(self.latency * 1000, 1),
+            "error_rate": round(self.error_rate, 3),
+            "requests": self.requests,
+            "failures": self.failures,
+            "cooling_down": not self.healthy(time.monotonic()),
+        }
+
+
+class RPCProviderPool:
+    def __init__(self, urls, hedge_after_seconds=HEDGE_AFTER_SECONDS, timeout_seconds=REQUEST_TIMEOUT_SECONDS):
+        if not urls:
+            raise ValueError("At least one RPC URL is required")
+        self.endpoints = [Endpoint(url) for url in urls]
+        self.hedge_after_seconds = hedge_after_seconds
+        self.timeout_seconds = timeout_seconds
+        self.executor = ThreadPoolExecutor(max_workers=4 * len(self.endpoints))
+        self.local = threading.local()
+
+    def keep_chain(self, chain_id):
+        # Drops the endpoints that serve another chain or do not answer eth_chainId; ConnectionError if none is left
+        body = json.dumps({"jsonrpc": "2.0", "id": 1, "method": "eth_chainId", "params": []}).encode()
+        futures = [(endpoint, self.executor.submit(self._post, endpoint, body)) for endpoint in self.endpoints]
+        kept = []
+        for endpoint, future in futures:
+            try:
+                served = int(json.loads(future.result())["result"], 16)
+            except Exception as e:
+                served = e
+            if served == chain_id:
+                kept.append(endpoint)
+            else:
+                logger.warning(f"Dropping RPC endpoint {endpoint.url.split('?')[0]}, chain ID {served} is not {chain_id}")
+        if not kept:
+            raise ConnectionError(f"No RPC endpoint serves chain ID {chain_id}")
+        self.endpoints = kept
+
+    def ranked(self):
+        # Healthy endpoints by score, then the ones cooling down, soonest back first
+        now = time.monotonic()
+        return sorted(
+            self.endpoints, key=lambda e: (not e.healthy(now), e.score() if e.healthy(now) else e.cooldown_until)
+        )
+
+    def _post(self, endpoint, body):
+        start = time.monotonic()
+        try:
+            response = endpoint.session.post(
+                endpoint.url, data=body, headers={"Content-Type": "application/json"}, timeout=self.timeout_seconds
+            )
+            # Rate limiting and server errors count against the endpoint, JSON-RPC errors (reverts) do not
+            response.raise_for_status()
+            content = response.content
+            json.loads(content)
+        except Exception:
+            endpoint.record(time.monotonic() - start, failed=True)
+            raise
+        endpoint.record(time.monotonic() - start, failed=False)
+        return content
+
+    @contextmanager
+    def pin(self):
+        # All requests made by this thread inside the block go to one endpoint
+        if getattr(self.local, "endpoint", None) is not None:
+            yield self.local.endpoint
+            return
+        self.local.endpoint = self.ranked()[0]
+        try:
+            yield self.local.endpoint
+        finally:
+            self.local.endpoint = None
+
+    def request(self, body, methods):
+        # body: encoded JSON-RPC request or batch; methods: the JSON-RPC methods it contains
+        pinned = getattr(self.local, "endpoint", None)
+        if pinned is not None:
+            return self._post(pinned, body)
+        if WRITE_METHODS.intersection(methods):
+            return self._post(self.ranked()[0], body)
+        return self._hedged(body, methods)
+
+    def _hedged(self, body, methods):
+        candidates = iter(self.ranked())
+        pending = {}
+        last_error = None
+        hedged = False
+
+        def launch():
+            endpoint = next(candidates, None)
+            if endpoint is not None:
+                pending[self.executor.submit(self._post, endpoint, body)] = endpoint
+            return endpoint is not None
+
+        launch()
+        while pending:
+            timeout = None if hedged else self.hedge_after_seconds
+            done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            if not done:
+                hedged = True
+                if launch():
+                    logger.debug("Hedging %s to a second endpoint", methods)
+                continue
+            for future in done:
+                endpoint = pending.pop(future)
+                try:
+                    return future.result()
+                except Exception as e:
+                    last_error = e
+                    logger.warning(f"RPC endpoint {endpoint.url.split('?')[0]} failed: {e}")
+                    launch()
+        raise last_error
+
+    async def _post_async(self, session, endpoint, body):
+        start = time.monotonic()
+        try:
+            async with session.post(
+                endpoint.url,
+                data=body,
+                headers={"Content-Type": "application/json"},
+                timeout=aiohttp.ClientTimeout(total=self.timeout_seconds),
+            ) as response:
+                response.raise_for_status()
+                content = await response.read()
+            json.loads(content)
+        except Exception:
+            endpoint.record(time.monotonic() - start, failed=True)
+            raise
+        endpoint.record(time.monotonic() - start, failed=False)
+        return content
+
+    async def request_async(self, session, body, methods):
+        if WRITE_METHODS.intersection(methods):
+            return await self._post_async(session, self.ranked()[0], body)
+        candidates = iter(self.ranked())
+        pending = {}
+        last_error = None
+        hedged = False
+
+        def launch():
+            endpoint = next(candidates, None)
+            if endpoint is not None:
+                pending[asyncio.ensure_future(self._post_async(session, endpoint, body))] = endpoint
+            return endpoint is not None
+
+        launch()
+        try:
+            while pending:
+                timeout = None if hedged else self.hedge_after_seconds
+                done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    hedged = True
+                    if launch():
+                        logger.debug("Hedging %s to a second endpoint", methods)
+                    continue
+                for task in done:
+                    endpoint = pending.pop(task)
+                    try:
+                        return task.result()
+                    except Exception as e:
+                        last_error = e
+                        logger.warning(f"RPC endpoint {endpoint.url.split('?')[0]} failed: {e}")
+                        launch()
+        finally:
+            # Unlike the threads of the synchronous path, the losing request of a hedge can be cancelled
+            for task in pending:
+                task.cancel()
+        raise last_error
+
+    def stats(self):
+        return [endpoint.stats() for endpoint in self.endpoints]
+
+
+class PooledHTTPProvider(JSONBaseProvider):
+    # web3 provider that sends every request through an RPCProviderPool, and state reads through read_cache if given
+
+    def __init__(self, pool, read_cache=None, **kwargs):
+        super().__init__(**kwargs)
+        self.pool = pool
+        self.read_cache = read_cache
+        self.constant_responses = {}
+        self.block_lock = threading.Lock()
+
+    def _send(self, method, params):
+        raw_response = self.pool.request(self.encode_rpc_request(method, params), [method])
+        return self.decode_rpc_response(raw_response)
+
+    def _cache_key(self, method, params):
+        # One caller refreshes the block number, the others wait for it
+        with self.block_lock:
+            if self.read_cache.needs_block_number():
+                self.read_cache.set_block_number(int(self._send("eth_blockNumber", [])["result"], 16))
+        return self.read_cache.key(method, params)
+
+    def make_request(self, method, params):
+        if method in self.constant_responses:
+            return self.constant_responses[method]
+        key = None
+        if self.read_cache is not None and method in READ_METHODS:
+            try:
+                key = self._cache_key(method, params)
+            except Exception as e:
+                logger.warning(f"Could not refresh the block number, reading {method} uncached: {e}")
+            cached = self.read_cache.get(key) if key else None
+            if cached is not None:
+                return cached
+        response = self._send(method, params)
+        if "result" in response:
+            if method in CONSTANT_METHODS:
+                self.constant_responses[method] = response
+            elif key is not None:
+                self.read_cache.put(key, response)
+        return response
+
+    def make_batch_request(self, batch_requests):
+        raw_response = self.pool.request(
+            self.encode_batch_rpc_request(batch_requests), [method for method, _ in batch_requests]
+        )
+        response = self.decode_rpc_response(raw_response)
+        if not isinstance(response, list):
+            return response
+        return sorted(response, key=lambda item: item.get("id", 0))
+
+
+class PooledAsyncHTTPProvider(AsyncJSONBaseProvider):
+    # AsyncWeb3 counterpart of PooledHTTPProvider; every request shares one aiohttp session
+
+    def __init__(self, pool, session, read_cache=None, **kwargs):
+        super().__init__(**kwargs)
+        self.pool = pool
+        self.session = session
+        self.read_cache = read_cache
+        self.constant_responses = {}
+        self.block_lock = asyncio.Lock()
+
+    async def _send(self, method, params):
+        raw_response = await self.pool.request_async(self.session, self.encode_rpc_request(method, params), [method])
+        return self.decode_rpc_response(raw_response)
+
+    async def _cache_key(self, method, params):
+        async with self.block_lock:
+            if self.read_cache.needs_block_number():
+                self.read_cache.set_block_number(int((await self._send("eth_blockNumber", []))["result"], 16))
+        return self.read_cache.key(method, params)
+
+    async def make_request(self, method, params):
+        if method in self.constant_responses:
+            return self.constant_responses[method]
+        key = None
+        if self.read_cache is not None and method in READ_METHODS:
+            try:
+                key = await self._cache_key(method, params)
+            except Exception as e:
+                logger.warning(f"Could not refresh the block number, reading {method} uncached: {e}")
+            cached = self.read_cache.get(key) if key else None
+            if cached is not None:
+                return cached
+        response = await self._send(method, params)
+        if "result" in response:
+            if method in CONSTANT_METHODS:
+                self.constant_responses[method] = response
+            elif key is not None:
+                self.read_cache.put(key, response)
+        return response
+
+    async def make_batch_request(self, batch_requests):
+        raw_response = await self.pool.request_async(
+            self.session, self.encode_batch_rpc_request(batch_requests), [method for method, _ in batch_requests]
+        )
+        response = self.decode_rpc_response(raw_response)
+        if not isinstance(response, list):
+            return response
+        return sorted(response, key=lambda item: item.get("id", 0))
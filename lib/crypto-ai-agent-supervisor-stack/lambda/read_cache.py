@@ -0,0 +1,109 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from chains import get_chain
+
+# Read-through cache for chain state reads, shared by the pooled web3 providers (sync and async).
+# - entries are keyed by (method, params, block number): a `latest` read is filed under the block the cache
+#   currently knows, so every read of one agent turn sees the same block and repeated turns reuse the answers
+# - the block number is refreshed with eth_blockNumber at most once per block time (the chain's, see chains.py),
+#   which bounds how stale a `latest` answer can be; reads at an explicit block number are immutable and cached
+#   as such
+# - `pending` and the other block tags are never cached, nor are errors (reverts)
+# - at most MAX_ENTRIES entries, least recently used evicted first
+# eth_gasPrice is filed under the block like the other `latest` reads, so the gas price the scheduled warm-up or an
+# estimate just read is reused by a sendTx in the same block, and never older than that
+READ_METHODS = {"eth_getBalance", "eth_call", "eth_estimateGas", "eth_gasPrice"}
+BLOCK_TIME_SECONDS = 2
+MAX_ENTRIES = int(os.environ.get("RPC_CACHE_MAX_ENTRIES", 1024))
+
+
+class BlockReadCache:
+    def __init__(self, max_entries=MAX_ENTRIES, block_time_seconds=BLOCK_TIME_SECONDS):
+        self.max_entries = max_entries
+        self.block_time_seconds = block_time_seconds
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        self.block_number = None
+        self.block_checked_at = 0.0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.block_refreshes = 0
+
+    def needs_block_number(self):
+        return self.block_number is None or time.monotonic() - self.block_checked_at >= self.block_time_seconds
+
+    def set_block_number(self, block_number):
+        with self.lock:
+            self.block_number = block_number
+            self.block_checked_at = time.monotonic()
+            self.block_refreshes += 1
+
+    def key(self, method, params):
+        # None when the read must not be cached
+        params = list(params)
+        block = params[1] if len(params) > 1 else "latest"
+        if block == "latest":
+            block = self.block_number
+        elif isinstance(block, str) and block.startswith("0x"):
+            block = int(block, 16)
+        elif not isinstance(block, int):
+            return None
+        if block is None:
+            return None
+        return method, json.dumps(params[:1] + params[2:], sort_keys=True, default=str), block
+
+    def get(self, key):
+        with self.lock:
+            response = self.entries.get(key)
+            if response is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return response
+
+    def put(self, key, response):
+        with self.lock:
+            self.entries[key] = response
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self.entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+                "evictions": self.evictions,
+                "block_number": self.block_number,
+                "block_refreshes": self.block_refreshes,
+            }
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def get_read_cache(chain=None):
+    # One cache per chain, refreshing its block number at the chain's block time
+    config = get_chain(chain)
+    with _caches_lock:
+        if config["name"] not in _caches:
+            _caches[config["name"]] = BlockReadCache(block_time_seconds=config["block_time_seconds"])
+        return _caches[config["name"]]
+
+
+def stats_by_chain():
+    with _caches_lock:
+        return {name: cache.stats() for name, cache in _caches.items()}
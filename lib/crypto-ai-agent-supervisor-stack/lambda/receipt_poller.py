@@ -0,0 +1,56 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+import os
+import time
+
+from rpc import batch_call, get_rpc_pool
+from tracing import logger, metrics, tracer
+from tx_status import get_tx_status_store, record_chain, refresh_pending
+
+# Runs on a schedule (every minute) and keeps polling until shortly before the next run: every new block of a chain
+# triggers one JSON-RPC batch with the receipts of all pending transactions on that chain.
+POLL_DURATION_SECONDS = int(os.environ.get("RECEIPT_POLL_DURATION_SECONDS", 50))
+BLOCK_POLL_INTERVAL_SECONDS = float(os.environ.get("BLOCK_POLL_INTERVAL_SECONDS", 2))
+
+
+def current_block(pool):
+    return int(batch_call(pool, [("eth_blockNumber", [])])[0], 16)
+
+
+def poll(store, get_pool, duration_seconds, interval_seconds=BLOCK_POLL_INTERVAL_SECONDS):
+    # Watches every chain with pending transactions and refreshes the chains that advanced
+    chains = {record_chain(record) for record in store.list_pending()}
+    if not chains:
+        return 0, 0
+    deadline = time.monotonic() + duration_seconds
+    last_blocks = {}
+    polls = changed = 0
+    while time.monotonic() < deadline:
+        advanced = []
+        for chain in chains:
+            try:
+                block_number = current_block(get_pool(chain))
+            except Exception as e:
+                logger.warning(f"Could not read the block number of {chain}: {e}")
+                continue
+            if block_number != last_blocks.get(chain):
+                last_blocks[chain] = block_number
+                advanced.append(chain)
+        if advanced:
+            _, updated = refresh_pending(store, get_pool, advanced)
+            polls += 1
+            changed += updated
+        time.sleep(interval_seconds)
+    return polls, changed
+
+
+@logger.inject_lambda_context
+@tracer.capture_lambda_handler
+@metrics.log_metrics
+def lambda_handler(event, context):
+    duration_seconds = POLL_DURATION_SECONDS
+    if context is not None:
+        duration_seconds = min(duration_seconds, context.get_remaining_time_in_millis() / 1000 - 5)
+    polls, changed = poll(get_tx_status_store(), get_rpc_pool, duration_seconds)
+    logger.info(f"Polled {polls} blocks, updated {changed} transaction statuses")
+    return {"polls": polls, "changed": changed}
@@ -0,0 +1,87 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+import json
+import os
+import threading
+
+from chains import CHAINS, get_chain
+from provider_pool import RPCProviderPool
+from tracing import trace_dependency
+
+
+def getBlockchainRPCURLs(chain=None):
+    # The chain's own BLOCKCHAIN_RPC_URLS_<CHAIN>; the default chain adds BLOCKCHAIN_RPC_URLS (comma separated) and
+    # BLOCKCHAIN_RPC_URL. Polygon falls back to the AMB endpoint when a token is set and no URL is configured: an
+    # explicit URL replaces AMB, it is not pooled with it
+    config = get_chain(chain)
+    urls = [url.strip() for url in os.environ.get(config['rpc_urls_env'], '').split(',') if url.strip()]
+    if config['name'] == get_chain()['name']:
+        urls += [url.strip() for url in os.environ.get('BLOCKCHAIN_RPC_URLS', '').split(',') if url.strip()]
+        if os.environ.get('BLOCKCHAIN_RPC_URL'):
+            urls.append(os.environ['BLOCKCHAIN_RPC_URL'])
+    amb_accessor_token = os.environ.get('AMB_ACCESSOR_TOKEN')
+    if amb_accessor_token and config['name'] == 'polygon' and not urls:
+        urls.append(f"https://mainnet.polygon.managedblockchain.us-east-1.amazonaws.com/?billingtoken={amb_accessor_token}")
+    if not urls:
+        raise ValueError(f"No RPC endpoint configured for {config['name']}, set {config['rpc_urls_env']}")
+    return list(dict.fromkeys(urls))
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_rpc_pool(chain=None):
+    # The pool keeps only the endpoints that answer with the chain's ID, so requests are never hedged or failed over
+    # to another network
+    config = get_chain(chain)
+    with _pools_lock:
+        if config['name'] not in _pools:
+            pool = RPCProviderPool(getBlockchainRPCURLs(config['name']))
+            with trace_dependency("rpc", "eth_chainId"):
+                pool.keep_chain(config['chain_id'])
+            _pools[config['name']] = pool
+        return _pools[config['name']]
+
+
+class RPCError(Exception):
+    pass
+
+
+def batch_call(pool, calls):
+    # Sends [(method, params), ...] as one JSON-RPC batch through the pool and returns the results in the same
+    # order. A failed call comes back as an RPCError instance in its slot instead of failing the whole batch.
+    if not calls:
+        return []
+    payload = [
+        {"jsonrpc": "2.0", "id": request_id, "method": method, "params": params}
+        for request_id, (method, params) in enumerate(calls)
+    ]
+    with trace_dependency("rpc", "batch"):
+        body = json.loads(pool.request(json.dumps(payload).encode(), [method for method, _ in calls]))
+    if isinstance(body, dict):
+        # Some nodes answer a batch they reject with a single error object
+        raise RPCError(body.get("error", body))
+    by_id = {item.get("id"): item for item in body}
+    results = []
+    for request_id in range(len(calls)):
+        item = by_id.get(request_id)
+        if item is None:
+            results.append(RPCError(f"No response for request {request_id}"))
+        elif "error" in item:
+            results.append(RPCError(item["error"]))
+        else:
+            results.append(item.get("result"))
+    return results
+
+
+def configured_chains():
+    # Names of the chains with at least one RPC endpoint configured
+    names = []
+    for name in CHAINS:
+        try:
+            getBlockchainRPCURLs(name)
+        except ValueError:
+            continue
+        names.append(name)
+    return names
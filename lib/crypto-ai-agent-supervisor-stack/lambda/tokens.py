@@ -0,0 +1,144 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+import threading
+from decimal import Decimal
+
+from eth_abi import decode
+
+from chains import get_chain
+
+# ERC-20 tokens of sendToken and getTokenBalance. TOKENS lists the common ones per chain by symbol; any other
+# token can be given by its contract address, whose decimals and symbol are read from the contract once per
+# execution environment.
+#
+# Calldata is built directly from the precomputed 4-byte selectors and 32-byte words (an address is left padded
+# with zeros, an amount is a big-endian uint256) instead of going through a web3 contract object per call: the
+# encoding is a string concatenation, and benchmarks/erc20_encoding_benchmark.py checks it against web3's.
+TRANSFER_SELECTOR = "0xa9059cbb"  # transfer(address,uint256)
+BALANCE_OF_SELECTOR = "0x70a08231"  # balanceOf(address)
+DECIMALS_SELECTOR = "0x313ce567"  # decimals()
+SYMBOL_SELECTOR = "0x95d89b41"  # symbol()
+# keccak("Transfer(address,address,uint256)")
+TRANSFER_TOPIC = "0xddf252ad1be2c89b69c2b068fc378daa952ba7f163c4a11628f55a4df523b3ef"
+MAX_UINT256 = 2 ** 256 - 1
+
+TOKENS = {
+    "polygon": {
+        "USDC": ("0x3c499c542cEF5E3811e1192ce70d8cC03d5c3359", 6),
+        "USDC.E": ("0x2791Bca1f2de4661ED88A30C99A7a9449Aa84174", 6),
+        "USDT": ("0xc2132D05D31c914a87C6611C10748AEb04B58e8F", 6),
+        "DAI": ("0x8f3Cf7ad23Cd3CaDbD9735AFf958023239c6A063", 18),
+        "WETH": ("0x7ceB23fD6bC0adD59E62ac25578270cFf1b9f619", 18),
+    },
+    "ethereum": {
+        "USDC": ("0xA0b86991c6218b36c1d19D4a2e9Eb0cE3606eB48", 6),
+        "USDT": ("0xdAC17F958D2ee523a2206206994597C13D831ec7", 6),
+        "DAI": ("0x6B175474E89094C44Da98b954EedeAC495271d0F", 18),
+        "WETH": ("0xC02aaA39b223FE8D0A0e5C4F27eAD9083C756Cc2", 18),
+    },
+    "base": {
+        "USDC": ("0x833589fCD6eDb6E08f4c7C32D4f71b54bdA02913", 6),
+        "DAI": ("0x50c5725949A6F0c72E6C4a641F24049A917DB0Cb", 18),
+        "WETH": ("0x4200000000000000000000000000000000000006", 18),
+    },
+    "arbitrum": {
+        "USDC": ("0xaf88d065e77c8cC2239327C5EDb3A432268e5831", 6),
+        "USDT": ("0xFd086bC7CD5C481DCC9C85ebE478A1C0b69FCbb9", 6),
+        "DAI": ("0xDA10009cBd5D07dd0CeCc66161FC93D7c9000da1", 18),
+        "WETH": ("0x82aF49447D8a07e3bd95BD0d56f35241523fBab1", 18),
+    },
+    "optimism": {
+        "USDC": ("0x0b2C639c533813f4Aa9D7837CAf62653d097Ff85", 6),
+        "USDT": ("0x94b008aA00579c1307B0EF2c499aD98a8ce58e58", 6),
+        "DAI": ("0xDA10009cBd5D07dd0CeCc66161FC93D7c9000da1", 18),
+        "WETH": ("0x4200000000000000000000000000000000000006", 18),
+    },
+}
+
+# CoinGecko ids of the registry symbols, for getPortfolio
+PRICE_IDS = {"USDC": "usd-coin", "USDC.E": "usd-coin", "USDT": "tether", "DAI": "dai", "WETH": "weth"}
+
+# (chain, lowercase address) -> {"symbol", "address", "decimals"}, for the registry and every token looked up since
+_tokens = {
+    (chain, address.lower()): {"symbol": symbol, "address": address, "decimals": decimals}
+    for chain, tokens in TOKENS.items()
+    for symbol, (address, decimals) in tokens.items()
+}
+_tokens_lock = threading.Lock()
+
+
+def _address_word(address):
+    return address[2:].lower().rjust(64, "0")
+
+
+def _uint_word(value):
+    if not 0 <= value <= MAX_UINT256:
+        raise ValueError(f"{value} does not fit in a uint256")
+    return format(value, "064x")
+
+
+def transfer_data(receiver, units):
+    return TRANSFER_SELECTOR + _address_word(receiver) + _uint_word(units)
+
+
+def balance_of_data(owner):
+    return BALANCE_OF_SELECTOR + _address_word(owner)
+
+
+def address_topic(address):
+    # An indexed address in a log topic, e.g. the from / to of a Transfer event
+    return "0x" + _address_word(address)
+
+
+def decode_uint(data):
+    # A uint256 return value or log data word, from bytes or hex
+    if isinstance(data, (bytes, bytearray)):
+        return int.from_bytes(data[:32], "big")
+    return int(data[2:66] or "0", 16)
+
+
+def to_units(amount, token):
+    # Decimal token amount -> integer base units; more decimals than the token has is an error, not a rounding
+    units = Decimal(amount).scaleb(token["decimals"])
+    if units != units.to_integral_value():
+        raise ValueError(f"{token['symbol']} has {token['decimals']} decimals, {amount} has more")
+    return int(units)
+
+
+def from_units(units, token):
+    return Decimal(units).scaleb(-token["decimals"])
+
+
+def _decode_symbol(data):
+    # symbol() returns a string, or a bytes32 on a few older tokens
+    try:
+        return decode(["string"], data)[0]
+    except Exception:
+        return bytes(data[:32]).rstrip(b"\0").decode(errors="replace")
+
+
+def get_token(token, chain=None, call=None):
+    # A token by symbol (from TOKENS) or contract address. `call(to, data) -> bytes` runs an eth_call on the chain;
+    # it is only needed the first time an address outside the registry is used.
+    chain = get_chain(chain)["name"]
+    token = (token or "").strip()
+    if not token.startswith("0x"):
+        entry = TOKENS.get(chain, {}).get(token.upper())
+        if entry is None:
+            known = ", ".join(TOKENS.get(chain, {})) or "none"
+            raise ValueError(f"Unknown token '{token}' on {chain}: use a contract address or one of {known}")
+        return _tokens[(chain, entry[0].lower())]
+    if len(token) != 42:
+        raise ValueError(f"'{token}' is not a token contract address")
+    with _tokens_lock:
+        cached = _tokens.get((chain, token.lower()))
+    if cached is not None:
+        return cached
+    if call is None:
+        raise ValueError(f"Token {token} is not in the registry of {chain}")
+    decimals = decode_uint(call(token, DECIMALS_SELECTOR))
+    symbol = _decode_symbol(call(token, SYMBOL_SELECTOR))
+    entry = {"symbol": symbol, "address": token, "decimals": decimals}
+    with _tokens_lock:
+        _tokens[(chain, token.lower())] = entry
+    return entry
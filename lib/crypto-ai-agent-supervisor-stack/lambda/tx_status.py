@@ -0,0 +1,253 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+import os
+import sqlite3
+import threading
+import time
+
+import boto3
+
+from chains import get_chain
+from rpc import RPCError, batch_call
+from tracing import logger, trace_dependency
+
+# Status of the transactions sendTx broadcasts, kept up to date by the receipt poller and read by getTxStatus.
+# - PENDING: no receipt yet
+# - MINED: receipt found, fewer than REQUIRED_CONFIRMATIONS blocks on top of it
+# - SUCCESS / REVERTED: final, cached permanently
+# - NOT_FOUND: no receipt after PENDING_TIMEOUT_SECONDS; the poller stops asking, getTxStatus still checks live
+PENDING = "PENDING"
+MINED = "MINED"
+SUCCESS = "SUCCESS"
+REVERTED = "REVERTED"
+NOT_FOUND = "NOT_FOUND"
+FINAL_STATUSES = (SUCCESS, REVERTED)
+POLLED_STATUSES = (PENDING, MINED)
+
+REQUIRED_CONFIRMATIONS = int(os.environ.get("TX_REQUIRED_CONFIRMATIONS", 5))
+PENDING_TIMEOUT_SECONDS = int(os.environ.get("TX_PENDING_TIMEOUT_SECONDS", 3600))
+RECORD_FIELDS = [
+    "tx_hash", "chain", "status", "block_number", "gas_used", "effective_gas_price", "created_at", "updated_at"
+]
+INTEGER_FIELDS = ("block_number", "gas_used", "effective_gas_price", "created_at", "updated_at")
+
+
+def normalize_tx_hash(tx_hash):
+    tx_hash = tx_hash.strip().lower()
+    return tx_hash if tx_hash.startswith("0x") else "0x" + tx_hash
+
+
+def apply_receipt(record, receipt, block_number):
+    # Returns the updated record for a receipt (or None) seen at block_number
+    record = dict(record, updated_at=int(time.time()))
+    if receipt is None:
+        if record["status"] == PENDING and record["updated_at"] - record["created_at"] > PENDING_TIMEOUT_SECONDS:
+            record["status"] = NOT_FOUND
+        elif record["status"] == MINED:
+            # The block holding it was reorged out
+            record.update(status=PENDING, block_number=None, gas_used=None, effective_gas_price=None)
+        return record
+    record.update(
+        block_number=int(receipt["blockNumber"], 16),
+        gas_used=int(receipt["gasUsed"], 16),
+        effective_gas_price=int(receipt.get("effectiveGasPrice") or "0x0", 16),
+    )
+    if block_number - record["block_number"] + 1 < REQUIRED_CONFIRMATIONS:
+        record["status"] = MINED
+    else:
+        record["status"] = SUCCESS if int(receipt["status"], 16) == 1 else REVERTED
+    return record
+
+
+def fetch_receipts(pool, tx_hashes):
+    # One JSON-RPC batch: the current block number plus a receipt per hash
+    results = batch_call(
+        pool, [("eth_blockNumber", [])] + [("eth_getTransactionReceipt", [tx_hash]) for tx_hash in tx_hashes]
+    )
+    if isinstance(results[0], RPCError):
+        raise results[0]
+    receipts = {}
+    for tx_hash, result in zip(tx_hashes, results[1:]):
+        if isinstance(result, RPCError):
+            logger.warning(f"Receipt lookup failed for {tx_hash}: {result}")
+            continue
+        receipts[tx_hash] = result
+    return int(results[0], 16), receipts
+
+
+def describe(record):
+    tx_hash = record["tx_hash"]
+    status = record["status"]
+    chain = record_chain(record)
+    if status in (PENDING, NOT_FOUND):
+        return f"Transaction {tx_hash} has not been mined on {chain} yet"
+    gas = f"gas used {record['gas_used']}, effective gas price {record['effective_gas_price']} wei"
+    if status == MINED:
+        return (
+            f"Transaction {tx_hash} was mined in block {record['block_number']} on {chain} and is awaiting "
+            f"confirmations ({gas})"
+        )
+    outcome = "succeeded" if status == SUCCESS else "reverted"
+    return f"Transaction {tx_hash} {outcome} in block {record['block_number']} on {chain} ({gas})"
+
+
+class SQLiteTxStatusStore:
+    # Local file store, only shared by code running in the same execution environment (tests, benchmarks)
+
+    def __init__(self, path):
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS tx_status ("
+            "tx_hash TEXT PRIMARY KEY, chain TEXT, status TEXT NOT NULL, block_number INTEGER, gas_used INTEGER, "
+            "effective_gas_price INTEGER, created_at INTEGER NOT NULL, updated_at INTEGER NOT NULL)"
+        )
+
+    def _select(self, where, parameters):
+        with self.lock:
+            rows = self.connection.execute(
+                "SELECT {} FROM tx_status WHERE {}".format(", ".join(RECORD_FIELDS), where), parameters
+            ).fetchall()
+        return [dict(zip(RECORD_FIELDS, row)) for row in rows]
+
+    def get(self, tx_hash):
+        records = self._select("tx_hash = ?", (tx_hash,))
+        return records[0] if records else None
+
+    def list_pending(self):
+        return self._select("status IN (?, ?)", POLLED_STATUSES)
+
+    def put(self, record):
+        with self.lock:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO tx_status ({}) VALUES ({})".format(
+                    ", ".join(RECORD_FIELDS), ", ".join("?" * len(RECORD_FIELDS))
+                ),
+                [record.get(field) for field in RECORD_FIELDS],
+            )
+
+
+class DynamoDBTxStatusStore:
+    # Table with a string partition key `tx_hash`. Records still being polled carry `pending = "1"`, which feeds
+    # the sparse `pending` GSI the poller queries; final records drop it and stay in the table.
+    PENDING_INDEX = "pending"
+
+    def __init__(self, table_name, client=None, endpoint_url=None):
+        self.table_name = table_name
+        self.client = client or boto3.client('dynamodb', endpoint_url=endpoint_url)
+
+    def _item_to_record(self, item):
+        record = {field: None for field in RECORD_FIELDS}
+        for field, value in item.items():
+            if field in record:
+                record[field] = int(value["N"]) if "N" in value else value["S"]
+        return record
+
+    def get(self, tx_hash):
+        with trace_dependency("dynamodb", "GetItem"):
+            item = self.client.get_item(TableName=self.table_name, Key={"tx_hash": {"S": tx_hash}}).get("Item")
+        return self._item_to_record(item) if item else None
+
+    def list_pending(self):
+        records = []
+        kwargs = {
+            "TableName": self.table_name,
+            "IndexName": self.PENDING_INDEX,
+            "KeyConditionExpression": "pending = :pending",
+            "ExpressionAttributeValues": {":pending": {"S": "1"}},
+        }
+        while True:
+            with trace_dependency("dynamodb", "Query"):
+                response = self.client.query(**kwargs)
+            records.extend(self._item_to_record(item) for item in response["Items"])
+            if "LastEvaluatedKey" not in response:
+                return records
+            kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+    def put(self, record):
+        item = {}
+        for field in RECORD_FIELDS:
+            if record.get(field) is not None:
+                item[field] = {"N": str(record[field])} if field in INTEGER_FIELDS else {"S": record[field]}
+        if record["status"] in POLLED_STATUSES:
+            item["pending"] = {"S": "1"}
+        with trace_dependency("dynamodb", "PutItem"):
+            self.client.put_item(TableName=self.table_name, Item=item)
+
+
+_store = None
+
+
+def get_tx_status_store():
+    global _store
+    if _store is None:
+        table_name = os.environ.get("TX_STATUS_TABLE_NAME")
+        if table_name:
+            _store = DynamoDBTxStatusStore(table_name, endpoint_url=os.environ.get("DYNAMODB_ENDPOINT_URL"))
+        else:
+            path = os.environ.get("TX_STATUS_DB_PATH", "/tmp/tx_status.sqlite3")
+            logger.warning(f"TX_STATUS_TABLE_NAME is not set, using the local store at {path}")
+            _store = SQLiteTxStatusStore(path)
+    return _store
+
+
+def record_chain(record):
+    # Records written before multi-chain support have no chain and belong to the default chain
+    return get_chain(record.get("chain"))["name"]
+
+
+def track(store, tx_hash, chain=None):
+    now = int(time.time())
+    store.put({
+        "tx_hash": normalize_tx_hash(tx_hash),
+        "chain": get_chain(chain)["name"],
+        "status": PENDING,
+        "created_at": now,
+        "updated_at": now,
+    })
+
+
+def refresh_pending(store, get_pool, chains=None):
+    # One poll: a single batch per chain for every pending hash on it, optionally only on the given chains. Only
+    # changed records are written back. get_pool(chain name) returns the RPC pool of a chain.
+    # Returns ({chain: block number}, changed records).
+    pending = {}
+    for record in store.list_pending():
+        if chains is None or record_chain(record) in chains:
+            pending.setdefault(record_chain(record), []).append(record)
+    block_numbers = {}
+    changed = 0
+    for chain, records in pending.items():
+        try:
+            block_number, receipts = fetch_receipts(get_pool(chain), [record["tx_hash"] for record in records])
+        except Exception as e:
+            # One unreachable chain does not hold up the others
+            logger.warning(f"Receipt poll on {chain} failed: {e}")
+            continue
+        block_numbers[chain] = block_number
+        for record in records:
+            if record["tx_hash"] not in receipts:
+                continue
+            updated = apply_receipt(record, receipts[record["tx_hash"]], block_number)
+            if (updated["status"], updated["block_number"]) != (record["status"], record["block_number"]):
+                store.put(updated)
+                changed += 1
+    return block_numbers, changed
+
+
+def get_tx_status(store, get_pool, tx_hash, chain=None):
+    # A tracked transaction is looked up on the chain it was sent on, others on `chain`
+    tx_hash = normalize_tx_hash(tx_hash)
+    record = store.get(tx_hash)
+    if record and record["status"] in FINAL_STATUSES:
+        return describe(record)
+    if record is None:
+        now = int(time.time())
+        record = {
+            "tx_hash": tx_hash, "chain": get_chain(chain)["name"], "status": PENDING, "created_at": now, "updated_at": now
+        }
+    block_number, receipts = fetch_receipts(get_pool(record_chain(record)), [tx_hash])
+    updated = apply_receipt(record, receipts.get(tx_hash), block_number)
+    if updated["status"] in FINAL_STATUSES:
+        store.put(updated)
+    return describe(updated)
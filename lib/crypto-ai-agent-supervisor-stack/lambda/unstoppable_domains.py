@@ -0,0 +1,72 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+from web3 import Web3
+
+ZERO_ADDRESS = '0x0000000000000000000000000000000000000000'
+
+# getData of the Unstoppable Domains ProxyReader (per chain addresses in chains.py); owner is ZERO_ADDRESS for
+# unregistered domains
+ABI = [
+    {
+        "constant": True,
+        "inputs": [
+            {
+                "internalType": "string[]",
+                "name": "keys",
+                "type": "string[]"
+            },
+            {
+                "internalType": "uint256",
+                "name": "tokenId",
+                "type": "uint256"
+            }
+        ],
+        "name": "getData",
+        "outputs": [
+            {
+                "internalType": "address",
+                "name": "resolver",
+                "type": "address"
+            },
+            {
+                "internalType": "address",
+                "name": "owner",
+                "type": "address"
+            },
+            {
+                "internalType": "string[]",
+                "name": "values",
+                "type": "string[]"
+            }
+        ],
+        "payable": False,
+        "stateMutability": "view",
+        "type": "function"
+    }
+]
+
+
+def is_address(value):
+    return bool(value) and isinstance(value, str) and value.startswith('0x') and len(value) == 42
+
+
+def namehash(name):
+    if not name:
+        return b'\0' * 32
+
+    if name.startswith('.'):
+        name = name[1:]
+
+    labels = name.split('.')
+    labels.reverse()
+
+    node = b'\0' * 32
+    for label in labels:
+        label_hash = Web3.keccak(label.encode('utf-8'))
+        node = Web3.keccak(node + label_hash)
+
+    return node.hex()
+
+
+def token_id(domain):
+    return int(namehash(domain), 16)
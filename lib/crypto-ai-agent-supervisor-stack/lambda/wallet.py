@@ -0,0 +1,158 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+import boto3
+from web3 import Web3
+from pyasn1.type import namedtype, univ
+from tracing import logger, trace_dependency
+
+# The agent's wallet: a secp256k1 KMS key. Its address and the signatures of sendTx come from KMS, the private key
+# never leaves it. Only the wallet_management action group (and the combined index handler) imports this.
+
+# the KMS alias for the agent's wallet
+KMS_KEY_ALIAS='alias/crypto-ai-agent-wallet'
+
+# One KMS client per execution environment, and the wallet address is looked up once: the key behind the alias
+# does not change while the environment lives
+_kms_client = None
+_wallet_address = None
+
+def get_kms_client():
+    global _kms_client
+    if _kms_client is None:
+        _kms_client = boto3.client('kms')
+    return _kms_client
+
+# Get the KMS key by alias
+def get_kms_key():
+    kms_client = get_kms_client()
+    try:
+        with trace_dependency("kms", "DescribeKey"):
+            kms_key = kms_client.describe_key(
+                KeyId='alias/crypto-ai-agent-wallet'
+            )['KeyMetadata']['KeyId']
+        logger.debug("Found KMS key: %s", kms_key)
+        return kms_key
+    except Exception as e:
+        logger.error(f"Error getting KMS key: {e}")
+        raise
+
+# Given a public key, calculate the Ethereum wallet address
+def calc_eth_address(pub_key) -> str:
+    SUBJECT_ASN = '''
+    Key DEFINITIONS ::= BEGIN
+
+    SubjectPublicKeyInfo  ::=  SEQUENCE  {
+       algorithm         AlgorithmIdentifier,
+       subjectPublicKey  BIT STRING
+     }
+
+    AlgorithmIdentifier  ::=  SEQUENCE  {
+        algorithm   OBJECT IDENTIFIER,
+        parameters  ANY DEFINED BY algorithm OPTIONAL
+      }
+
+    END
+    '''
+    
+    try:
+        import asn1tools
+        key = asn1tools.compile_string(SUBJECT_ASN)
+        key_decoded = key.decode('SubjectPublicKeyInfo', pub_key)
+        logger.debug("key_decoded: %s", key_decoded)
+        pub_key_raw = key_decoded['subjectPublicKey'][0]
+        pub_key = pub_key_raw[1:len(pub_key_raw)]
+
+        hex_address = Web3.keccak(bytes(pub_key)).hex()
+        eth_address = '0x{}'.format(hex_address[-40:])
+        eth_checksum_addr = Web3.to_checksum_address(eth_address)
+        logger.debug("eth_checksum_addr: %s", eth_checksum_addr)
+        return eth_checksum_addr
+    except Exception as e:
+        logger.error(f"Error calculating Ethereum address ({type(e).__name__}): {str(e)}")
+        raise
+
+# Get the wallet address for the agent's KMS key
+def get_wallet_address():
+    global _wallet_address
+    if _wallet_address is not None:
+        return _wallet_address
+    try:
+        # Get the KMS key ID first
+        key_id = get_kms_key()
+        # Get the public key using the key ID
+        kms_client = get_kms_client()
+        with trace_dependency("kms", "GetPublicKey"):
+            public_key_response = kms_client.get_public_key(
+                KeyId=key_id
+            )
+        logger.debug("Retrieved public key response: %s", public_key_response)
+        
+        # Extract the public key bytes (removes DER encoding)
+        public_key_bytes = public_key_response['PublicKey']
+
+        eth_address = calc_eth_address(public_key_bytes)
+        logger.info(f"Wallet address: {eth_address}")
+        _wallet_address = eth_address
+        return eth_address
+        
+    except Exception as e:
+        logger.error(f"Error getting wallet address: {e}")
+        raise
+
+class KMSSignature(univ.Sequence):
+    componentType = namedtype.NamedTypes(
+        namedtype.NamedType('r', univ.Integer()),
+        namedtype.NamedType('s', univ.Integer())
+    )
+
+# Returns the v,r,s of the KMS signature
+def parse_kms_signature(kms_signature_bytes, transaction_hash, expected_address, chain_id):
+    logger.debug(
+        "Parsing KMS signature %s for tx hash %s, expected address %s, chain ID %s",
+        kms_signature_bytes.hex(), transaction_hash.hex(), expected_address, chain_id,
+    )
+
+    try:
+        from pyasn1.codec.der import decoder
+        signature, _ = decoder.decode(kms_signature_bytes, asn1Spec=KMSSignature())
+        r = int(signature['r'])
+        s = int(signature['s'])
+    except Exception as e:
+        logger.error(f"Failed to decode signature: {e}")
+        return None
+
+    logger.debug("Signature r: %s, s: %s", r, s)
+    
+    for recovery_id in [0,1]:
+        try:
+            # Create signature using eth_keys
+            from eth_keys import KeyAPI
+            keys = KeyAPI()
+            sig = keys.Signature(vrs=(recovery_id, r, s))
+            recovered_pub_key = sig.recover_public_key_from_msg_hash(transaction_hash)
+            recovered_address = Web3.to_checksum_address(recovered_pub_key.to_address())
+            
+            logger.debug("Trying recovery_id=%s, recovered: %s", recovery_id, recovered_address)
+
+            if recovered_address.lower() == expected_address.lower():
+                logger.debug("Found correct recovery_id: %s", recovery_id)
+                v = 35 + recovery_id + chain_id * 2
+                return r, s, v
+        except Exception as e:
+            logger.warning(f"Error with recovery_id={recovery_id} ({type(e).__name__}): {str(e)}")
+            continue
+    
+    raise ValueError("Could not determine correct v value")
+
+def sign_kms(key_id: str, msg_hash: bytes) -> dict:
+    client = get_kms_client()
+
+    with trace_dependency("kms", "Sign"):
+        response = client.sign(
+            KeyId=key_id,
+            Message=msg_hash,
+            MessageType="DIGEST",
+            SigningAlgorithm="ECDSA_SHA_256",
+        )
+
+    return response
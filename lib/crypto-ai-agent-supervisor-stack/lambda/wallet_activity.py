@@ -0,0 +1,358 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+import os
+import sqlite3
+import threading
+import time
+from decimal import Decimal
+
+from chains import get_chain
+from rpc import RPCError, batch_call, get_rpc_pool
+from tokens import TRANSFER_TOPIC, address_topic, from_units, get_token
+from tracing import logger, trace_dependency
+
+# Token transfers to and from a wallet for getWalletActivity, from the Transfer logs of eth_getLogs.
+# - a local log index keeps, per chain and wallet, the transfers found and the contiguous block range scanned so far;
+#   a later call only scans the blocks after it (and before it, when asked about a longer period)
+# - blocks are scanned in ranges of `span` blocks, BATCH_RANGES ranges (a "from" and a "to" filter each) per JSON-RPC
+#   batch. A range the provider refuses (too many results, too wide a range) is split in half and retried; the span
+#   shrinks with it, doubles after a batch without a split, up to MAX_SPAN, and is remembered per chain
+# - a range refused because of the provider's rate limit is not split: the batch's refused ranges are sent again
+#   after a backoff, RATE_LIMIT_RETRIES times at most, then the scan fails with the provider's error
+# - the last CONFIRMATIONS blocks are scanned again on every call rather than checkpointed, so a reorg there does not
+#   leave transfers in the index that never happened
+# - native token payments emit no logs and are not included; ERC-721 transfers share the event and are listed by
+#   token id
+# The index is a SQLite file. In Lambda /tmp is per execution environment, so a new environment starts with an
+# empty index and its first call scans the whole period.
+INITIAL_SPAN = int(os.environ.get("ACTIVITY_LOG_RANGE", 2000))
+MAX_SPAN = int(os.environ.get("ACTIVITY_MAX_LOG_RANGE", 100000))
+BATCH_RANGES = int(os.environ.get("ACTIVITY_BATCH_RANGES", 8))
+CONFIRMATIONS = int(os.environ.get("ACTIVITY_CONFIRMATIONS", 32))
+MAX_DAYS = int(os.environ.get("ACTIVITY_MAX_DAYS", 30))
+MAX_LISTED = 15
+RATE_LIMIT_RETRIES = int(os.environ.get("ACTIVITY_RATE_LIMIT_RETRIES", 3))
+RATE_LIMIT_BACKOFF_SECONDS = float(os.environ.get("ACTIVITY_RATE_LIMIT_BACKOFF_SECONDS", 1))
+MAX_BACKOFF_SECONDS = float(os.environ.get("ACTIVITY_MAX_BACKOFF_SECONDS", 10))
+# How providers refuse an eth_getLogs query that is too large: EIP-1474 "limit exceeded", or one of these messages
+LIMIT_ERROR_CODES = {-32005}
+LIMIT_ERROR_HINTS = ("more than", "too many", "limit", "range", "too large", "exceed", "response size")
+# -32005 is also the rate limit error of some providers (Infura: "project ID request rate exceeded", with
+# data.backoff_seconds); these messages tell it apart
+RATE_LIMIT_HINTS = ("rate", "request limit", "requests limit", "too many requests", "429", "per second")
+TRANSFER_FIELDS = ["block_number", "log_index", "tx_hash", "token", "sender", "receiver", "value", "nft"]
+
+
+def _error_message(error):
+    details = error.args[0] if error.args else None
+    if isinstance(details, dict):
+        return str(details.get("message", "")).lower()
+    return str(details).lower()
+
+
+def is_rate_limit_error(error):
+    return any(hint in _error_message(error) for hint in RATE_LIMIT_HINTS)
+
+
+def is_limit_error(error):
+    # Too many results or too wide a range: the range is worth splitting. Rate limit errors are not
+    if is_rate_limit_error(error):
+        return False
+    details = error.args[0] if error.args else None
+    if isinstance(details, dict) and details.get("code") in LIMIT_ERROR_CODES:
+        return True
+    return any(hint in _error_message(error) for hint in LIMIT_ERROR_HINTS)
+
+
+def backoff_seconds(error, attempt):
+    # The wait the provider asks for (Infura's data.backoff_seconds), else exponential from RATE_LIMIT_BACKOFF_SECONDS
+    details = error.args[0] if error.args else None
+    data = details.get("data") if isinstance(details, dict) else None
+    try:
+        return float(data["backoff_seconds"])
+    except (KeyError, TypeError, ValueError):
+        return RATE_LIMIT_BACKOFF_SECONDS * 2 ** (attempt - 1)
+
+
+def parse_transfer(log):
+    # A Transfer log -> index row; ERC-721 transfers carry the token id as a fourth topic instead of data
+    topics = log["topics"]
+    if len(topics) < 3:
+        return None
+    nft = len(topics) == 4
+    value = int(topics[3], 16) if nft else int((log.get("data") or "0x")[2:66] or "0", 16)
+    return {
+        "block_number": int(log["blockNumber"], 16),
+        "log_index": int(log["logIndex"], 16),
+        "tx_hash": log["transactionHash"],
+        "token": log["address"].lower(),
+        "sender": "0x" + topics[1][-40:],
+        "receiver": "0x" + topics[2][-40:],
+        "value": str(value),
+        "nft": int(nft),
+    }
+
+
+class SQLiteActivityIndex:
+
+    def __init__(self, path):
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS transfers ("
+            "chain TEXT NOT NULL, wallet TEXT NOT NULL, block_number INTEGER NOT NULL, log_index INTEGER NOT NULL, "
+            "tx_hash TEXT NOT NULL, token TEXT NOT NULL, sender TEXT NOT NULL, receiver TEXT NOT NULL, "
+            "value TEXT NOT NULL, nft INTEGER NOT NULL, PRIMARY KEY (chain, wallet, tx_hash, log_index))"
+        )
+        # first_block..last_block is scanned; last_block < first_block when nothing is yet
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS checkpoints ("
+            "chain TEXT NOT NULL, wallet TEXT NOT NULL, first_block INTEGER NOT NULL, last_block INTEGER NOT NULL, "
+            "PRIMARY KEY (chain, wallet))"
+        )
+        self.connection.execute("CREATE TABLE IF NOT EXISTS spans (chain TEXT PRIMARY KEY, span INTEGER NOT NULL)")
+
+    def checkpoint(self, chain, wallet):
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT first_block, last_block FROM checkpoints WHERE chain = ? AND wallet = ?", (chain, wallet)
+            ).fetchone()
+        return tuple(row) if row else None
+
+    def set_checkpoint(self, chain, wallet, first_block, last_block):
+        with self.lock:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO checkpoints (chain, wallet, first_block, last_block) VALUES (?, ?, ?, ?)",
+                (chain, wallet, first_block, last_block),
+            )
+
+    def add(self, chain, wallet, transfers):
+        if not transfers:
+            return
+        with self.lock:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO transfers (chain, wallet, {}) VALUES (?, ?, {})".format(
+                    ", ".join(TRANSFER_FIELDS), ", ".join("?" * len(TRANSFER_FIELDS))
+                ),
+                [[chain, wallet] + [transfer[field] for field in TRANSFER_FIELDS] for transfer in transfers],
+            )
+
+    def drop(self, chain, wallet, after_block=-1):
+        # Forgets the transfers after `after_block` (all of them by default)
+        with self.lock:
+            self.connection.execute(
+                "DELETE FROM transfers WHERE chain = ? AND wallet = ? AND block_number > ?",
+                (chain, wallet, after_block),
+            )
+
+    def transfers(self, chain, wallet, from_block, direction=None, token=None):
+        # Newest first; direction "in" or "out" relative to the wallet
+        where = ["chain = ?", "wallet = ?", "block_number >= ?"]
+        parameters = [chain, wallet, from_block]
+        if direction in ("in", "out"):
+            where.append("receiver = ?" if direction == "in" else "sender = ?")
+            parameters.append(wallet)
+        if token:
+            where.append("token = ?")
+            parameters.append(token.lower())
+        with self.lock:
+            rows = self.connection.execute(
+                "SELECT {} FROM transfers WHERE {} ORDER BY block_number DESC, log_index DESC".format(
+                    ", ".join(TRANSFER_FIELDS), " AND ".join(where)
+                ),
+                parameters,
+            ).fetchall()
+        return [dict(zip(TRANSFER_FIELDS, row)) for row in rows]
+
+    def span(self, chain):
+        with self.lock:
+            row = self.connection.execute("SELECT span FROM spans WHERE chain = ?", (chain,)).fetchone()
+        return row[0] if row else None
+
+    def set_span(self, chain, span):
+        with self.lock:
+            self.connection.execute("INSERT OR REPLACE INTO spans (chain, span) VALUES (?, ?)", (chain, span))
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_activity_index():
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = SQLiteActivityIndex(os.environ.get("ACTIVITY_DB_PATH", "/tmp/wallet_activity.sqlite3"))
+        return _index
+
+
+def scan_transfers(pool, wallet, start, end, span, on_batch, stats):
+    # Transfer logs from and to `wallet` in blocks start..end. After each batch, on_batch(transfers, done) gets the
+    # batch's transfers and the block up to which every block is scanned. Returns the span for the next scan.
+    filters = [[TRANSFER_TOPIC, address_topic(wallet)], [TRANSFER_TOPIC, None, address_topic(wallet)]]
+    # Halves of refused ranges and rate limited ranges, the lowest last
+    retry = []
+    cursor = start
+    rate_limited_batches = 0
+    while retry or cursor <= end:
+        ranges = []
+        while retry and len(ranges) < BATCH_RANGES:
+            ranges.append(retry.pop())
+        while cursor <= end and len(ranges) < BATCH_RANGES:
+            ranges.append((cursor, min(end, cursor + span - 1)))
+            cursor = ranges[-1][1] + 1
+        calls = [
+            ("eth_getLogs", [{"fromBlock": hex(low), "toBlock": hex(high), "topics": topics}])
+            for low, high in ranges for topics in filters
+        ]
+        with trace_dependency("rpc", "eth_getLogs"):
+            results = batch_call(pool, calls)
+        stats["batches"] += 1
+        stats["queries"] += len(calls)
+        transfers, split, rate_limit_error = [], False, None
+        for position, (low, high) in enumerate(ranges):
+            answers = results[position * len(filters):(position + 1) * len(filters)]
+            error = next((answer for answer in answers if isinstance(answer, RPCError)), None)
+            if error is None:
+                transfers += [transfer for answer in answers for transfer in map(parse_transfer, answer or []) if transfer]
+                stats["blocks"] += high - low + 1
+                continue
+            if is_rate_limit_error(error):
+                retry.append((low, high))
+                rate_limit_error = error
+                continue
+            if low == high or not is_limit_error(error):
+                raise error
+            middle = (low + high) // 2
+            retry += [(middle + 1, high), (low, middle)]
+            span = max(1, min(span, (high - low + 1) // 2))
+            split = True
+            stats["splits"] += 1
+        if not split and rate_limit_error is None:
+            span = min(MAX_SPAN, span * 2)
+        retry.sort(reverse=True)
+        on_batch(transfers, (retry[-1][0] if retry else cursor) - 1)
+        if rate_limit_error is None:
+            rate_limited_batches = 0
+            continue
+        rate_limited_batches += 1
+        stats["rate_limited"] += 1
+        wait = backoff_seconds(rate_limit_error, rate_limited_batches)
+        if rate_limited_batches > RATE_LIMIT_RETRIES or wait > MAX_BACKOFF_SECONDS:
+            raise rate_limit_error
+        logger.warning(f"eth_getLogs rate limited, retrying in {wait:.1f} s", extra={"error": str(rate_limit_error)})
+        time.sleep(wait)
+    return span
+
+
+def wallet_activity(wallet, days, chain=None, direction=None, token=None, index=None):
+    # Brings the index of `wallet` up to date for the last `days` days and returns (transfers, window), window being
+    # {"start", "head", "stats"} with what this call scanned
+    config = get_chain(chain)
+    chain = config['name']
+    wallet = wallet.lower()
+    pool = get_rpc_pool(chain)
+    index = index or get_activity_index()
+
+    head = batch_call(pool, [("eth_blockNumber", [])])[0]
+    if isinstance(head, RPCError):
+        raise head
+    head = int(head, 16)
+    start = max(0, head - int(days * 86400 / config['block_time_seconds']))
+    confirmed = head - CONFIRMATIONS
+    span = index.span(chain) or INITIAL_SPAN
+    stats = {"batches": 0, "queries": 0, "blocks": 0, "splits": 0, "rate_limited": 0}
+
+    checkpoint = index.checkpoint(chain, wallet)
+    if checkpoint is not None and not start - 1 <= checkpoint[1] <= head:
+        # The index ends before the period asked about (start over rather than scan the gap), or past the chain's
+        # head (a node that went back, e.g. a deep reorg)
+        index.drop(chain, wallet)
+        checkpoint = None
+    if checkpoint is None:
+        first, last = start, start - 1
+    else:
+        first, last = checkpoint
+
+    if start < first:
+        # A longer period than indexed so far: scan the blocks before it, then extend the checkpoint at once
+        span = scan_transfers(pool, wallet, start, first - 1, span,
+                              lambda transfers, done: index.add(chain, wallet, transfers), stats)
+        first = start
+        index.set_checkpoint(chain, wallet, first, last)
+
+    # Transfers past the checkpoint are from unconfirmed blocks of an earlier call: scan them again
+    index.drop(chain, wallet, last)
+
+    def on_forward_batch(transfers, done):
+        index.add(chain, wallet, transfers)
+        index.set_checkpoint(chain, wallet, first, max(last, min(done, confirmed)))
+
+    if last < head:
+        span = scan_transfers(pool, wallet, last + 1, head, span, on_forward_batch, stats)
+    index.set_span(chain, span)
+    logger.info(f"Scanned {stats['blocks']} blocks of {chain} for the activity of {wallet}", extra={"scan": stats})
+    return index.transfers(chain, wallet, start, direction, token), {"start": start, "head": head, "stats": stats}
+
+
+def _age(blocks, block_time_seconds):
+    seconds = blocks * block_time_seconds
+    if seconds < 3600:
+        return f"{max(1, round(seconds / 60))} min ago"
+    if seconds < 86400:
+        return f"{round(seconds / 3600)} h ago"
+    return f"{round(seconds / 86400)} days ago"
+
+
+def describe_activity(transfers, window, wallet, days, chain=None, call=None):
+    # Totals in and out per token, then the latest transfers. `call` reads the decimals and symbol of tokens outside
+    # the registry (see tokens.get_token); a contract that does not answer them is shown by address.
+    config = get_chain(chain)
+    wallet = wallet.lower()
+    header = (
+        f"Token transfers of {wallet} on {config['name']} in the last {days:g} days "
+        f"(blocks {window['start']} to {window['head']}); native {config['native_symbol']} payments are not included."
+    )
+    if not transfers:
+        return header + "\nNo token transfers found."
+
+    tokens = {}
+    for address in {transfer["token"] for transfer in transfers}:
+        try:
+            tokens[address] = get_token(address, config['name'], call)
+        except Exception as e:
+            logger.warning(f"Could not read the token details of {address}: {e}")
+            tokens[address] = {"symbol": address, "address": address, "decimals": 0}
+
+    def amount(transfer):
+        token = tokens[transfer["token"]]
+        if transfer["nft"]:
+            return f"{token['symbol']} #{transfer['value']}"
+        return f"{from_units(int(transfer['value']), token).normalize():f} {token['symbol']}"
+
+    totals = {"in": {}, "out": {}}
+    for transfer in transfers:
+        if transfer["nft"]:
+            continue
+        symbol = tokens[transfer["token"]]["symbol"]
+        value = from_units(int(transfer["value"]), tokens[transfer["token"]])
+        for direction, party in (("in", "receiver"), ("out", "sender")):
+            if transfer[party] == wallet:
+                totals[direction][symbol] = totals[direction].get(symbol, Decimal(0)) + value
+
+    lines = [header]
+    for direction, label in (("in", "Received"), ("out", "Sent")):
+        if totals[direction]:
+            summary = ", ".join(f"{value.normalize():f} {symbol}" for symbol, value in totals[direction].items())
+            lines.append(f"{label}: {summary}")
+    lines.append(f"{len(transfers)} transfers, latest first:")
+    for transfer in transfers[:MAX_LISTED]:
+        age = _age(window["head"] - transfer["block_number"], config['block_time_seconds'])
+        if transfer["receiver"] == wallet:
+            party = f"in {amount(transfer)} from {transfer['sender']}"
+        else:
+            party = f"out {amount(transfer)} to {transfer['receiver']}"
+        lines.append(f"- {party}, block {transfer['block_number']} ({age}), tx {transfer['tx_hash']}")
+    if len(transfers) > MAX_LISTED:
+        lines.append(f"... and {len(transfers) - MAX_LISTED} earlier transfers")
+    return "\n".join(lines)
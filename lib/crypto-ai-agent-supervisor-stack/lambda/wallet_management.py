@@ -0,0 +1,519 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from web3 import Web3
+from web3.exceptions import TransactionNotFound
+from web3.middleware import ExtraDataToPOAMiddleware
+import unstoppable_domains
+from async_reads import get_async_w3, get_balances, run
+from chains import CHAIN_PARAMETER, domain_chain, explorer_tx_url, get_chain
+from coingecko import get_prices
+from dispatcher import dispatch, register
+from idempotency import IN_PROGRESS, SIGNED, get_idempotency_store, idempotency_key
+from portfolio import describe_portfolio, fetch_balances, price_ids
+from provider_pool import PooledHTTPProvider
+from read_cache import get_read_cache, stats_by_chain
+from rpc import configured_chains, get_rpc_pool
+from tokens import balance_of_data, decode_uint, from_units, get_token, to_units, transfer_data
+from tx_status import get_tx_status, get_tx_status_store, track
+from tracing import logger, metrics, trace_dependency, tracer
+from unstoppable_domains import is_address
+from wallet_activity import MAX_DAYS, describe_activity, wallet_activity
+from wallet import KMS_KEY_ALIAS, get_wallet_address, parse_kms_signature, sign_kms
+from warmup import is_warmup_event, register_step, warm_up
+
+# Handler of the wallet_management action group: balances, gas estimates and payments from the agent's KMS wallet,
+# in the chain's native token or an ERC-20 token (see tokens.py)
+
+# One web3 instance per chain (see chains.py), connected on first use. Reads are routed and hedged across the
+# chain's RPC endpoints, see provider_pool.py, and balance, call and gas estimate reads are reused within a block,
+# see read_cache.py
+_w3 = {}
+_w3_lock = threading.Lock()
+
+def get_w3(chain=None):
+    config = get_chain(chain)
+    with _w3_lock:
+        if config['name'] not in _w3:
+            w3 = Web3(PooledHTTPProvider(get_rpc_pool(config['name']), read_cache=get_read_cache(config['name'])))
+            # Adding middleware to support ENS resolution on non-mainnet EVM chains
+            w3.middleware_onion.inject(ExtraDataToPOAMiddleware, layer=0)
+            # Check for connection to the network, and that it is the chain transactions will be signed for
+            with trace_dependency("rpc", "eth_chainId"):
+                served_chain_id = w3.eth.chain_id
+            if served_chain_id != config['chain_id']:
+                raise ConnectionError(f"The RPC endpoints for {config['name']} serve chain ID {served_chain_id}")
+            logger.info(f"Connected to {config['name']} with chain ID: {served_chain_id}")
+            _w3[config['name']] = w3
+        return _w3[config['name']]
+
+# Headroom over eth_estimateGas for the gas limit of a token transfer; the estimate is exact for the current
+# state, but a transfer that touches a new storage slot first can cost more once mined
+TOKEN_GAS_MARGIN = 1.2
+
+# Price lookups and per-chain balance reads of getPortfolio run side by side
+_portfolio_executor = ThreadPoolExecutor(max_workers=8)
+
+# Vitalik's wallet address
+vitalikaddr = "0xd8dA6BF26964aF9D7eEd9e03E53415D37aA96045"
+
+# Resolve domain address, on the chain whose Unstoppable Domains resolver serves `chain`
+def resolve_domain(domain, chain=None):
+
+    logger.info(f"Resolving domain: {domain}")
+    
+    # if it's already an address then just return
+    if is_address(domain):
+        return domain
+        
+    try:
+        # Initialize contract
+        resolver_chain = domain_chain(chain)
+        contract = get_w3(resolver_chain['name']).eth.contract(
+            address=Web3.to_checksum_address(resolver_chain['ud_resolver']),
+            abi=unstoppable_domains.ABI
+        )
+            
+        # Generate tokenId and resolve
+        with trace_dependency("rpc", "eth_call"):
+            result = contract.functions.getData([], unstoppable_domains.token_id(domain)).call()
+        
+        # Check if owner was found
+        if result[1] == unstoppable_domains.ZERO_ADDRESS:
+            logger.info(f"Domain {domain} not found")
+            return None
+            
+        resolved_address = result[1]
+        logger.info(f"Resolved {domain} to {resolved_address}")
+        return resolved_address
+        
+    except Exception as e:
+        logger.error(f"An error occurred while resolving domain: {e}")
+        return None
+
+
+def transaction_known(chain, tx_hash_hex):
+    # True when the node has the transaction (pending or mined), False when it does not, None when it cannot tell
+    try:
+        with trace_dependency("rpc", "eth_getTransactionByHash"):
+            get_w3(chain).eth.get_transaction(tx_hash_hex)
+        return True
+    except TransactionNotFound:
+        return False
+    except Exception as e:
+        logger.error(f"Error looking up transaction {tx_hash_hex}: {e}")
+        return None
+
+def broadcast(key, raw_tx, tx_hash_hex, chain):
+    # The transaction hash once the node has the transaction, otherwise why it was not sent
+    store = get_idempotency_store()
+    try:
+        with trace_dependency("rpc", "eth_sendRawTransaction"):
+            get_w3(chain).eth.send_raw_transaction(raw_tx)
+    except Exception as e:
+        # A re-broadcast of a transaction the node already has is not an error
+        message = str(e).lower()
+        if "nonce too low" in message:
+            # Also the answer when another transaction took the nonce, e.g. the nonce was read from a node behind
+            # the chain: only a node that knows this hash shows it went out
+            known = transaction_known(chain, tx_hash_hex)
+            if known is False:
+                logger.error(f"Transaction {tx_hash_hex} was not sent, its nonce is used by another transaction")
+                # It can never be mined; a retry signs it again with a fresh nonce
+                store.discard_signed(key)
+                return ("Failed to send transaction: its nonce was already used by another transaction. "
+                        "Nothing was sent, ask again to retry.")
+            if known is None:
+                return "Failed to send transaction"
+        elif not ("already known" in message or "already imported" in message):
+            logger.error(f"Error sending transaction: {str(e)}")
+            return "Failed to send transaction"
+    store.mark_sent(key)
+    try:
+        track(get_tx_status_store(), tx_hash_hex, chain)
+    except Exception as e:
+        # The payment went out; getTxStatus can still look it up on chain
+        logger.warning(f"Could not record {tx_hash_hex} for receipt polling: {e}")
+    logger.info(f"Transaction sent to network: {explorer_tx_url(chain, tx_hash_hex)}")
+    return tx_hash_hex
+
+def sendTx(receiver, amount, event, chain=None):
+    chain = get_chain(chain)['name']
+    # One endpoint for the nonce lookup, the broadcast and any re-broadcast of this transaction
+    with get_rpc_pool(chain).pin():
+        return send_transaction(receiver, amount, event, chain)
+
+def sendToken(receiver, amount, token, event, chain=None):
+    chain = get_chain(chain)['name']
+    with get_rpc_pool(chain).pin():
+        try:
+            token = get_token(token, chain, token_call(chain))
+        except ValueError as e:
+            return str(e)
+        return send_transaction(receiver, amount, event, chain, token)
+
+def token_call(chain):
+    # eth_call of get_token, to read the decimals and symbol of a token outside the registry
+    def call(to, data):
+        with trace_dependency("rpc", "eth_call"):
+            return get_w3(chain).eth.call({'to': Web3.to_checksum_address(to), 'data': data})
+    return call
+
+def send_transaction(receiver, amount, event, chain, token=None):
+    # The native token, or `token` (from tokens.get_token) with an ERC-20 transfer call to its contract
+    if amount <= 0:
+        return "Amount must be greater than zero"
+    if token is not None:
+        try:
+            units = to_units(amount, token)
+        except ValueError as e:
+            return str(e)
+
+    # Claim the request before any KMS or RPC call, so a retried call costs one store lookup
+    store = get_idempotency_store()
+    token_key = (token['address'].lower(),) if token is not None else ()
+    key = idempotency_key(event, receiver.lower(), amount.normalize(), chain, *token_key)
+    record = store.claim(key, receiver, amount)
+    if record is not None:
+        logger.info(f"Repeated sendTx request, previous state {record['status']}")
+        if record["status"] == IN_PROGRESS:
+            return "This transaction is already being processed. Check the wallet balance again shortly."
+        if record["status"] == SIGNED:
+            return broadcast(key, bytes.fromhex(record["raw_tx"]), record["tx_hash"], chain)
+        # Bedrock gives a retried call and the same words asked again in the session the same key
+        return (f"{record['tx_hash']} (already sent for the same request in this session and not sent again; "
+                "for another payment of the same amount, ask for it in different words)")
+
+    try:
+        from_address = get_wallet_address()
+    except Exception:
+        store.release(key)
+        raise
+    
+    symbol = token['symbol'] if token is not None else get_chain(chain)['native_symbol']
+    logger.info(f"Sending {amount} {symbol} to {receiver} on {chain}")
+    
+    # Check if it's an ENS domain, if so resolve it
+    if not is_address(receiver):
+        resolved_address = resolve_domain(receiver, chain)
+        if resolved_address:
+            receiver = resolved_address
+        else:
+            store.release(key)
+            return "Failed to resolve receiver address"
+    
+    logger.info(f"Final receiver address: {receiver}")
+
+    from eth_account._utils.legacy_transactions import serializable_unsigned_transaction_from_dict, encode_transaction
+
+    try:
+        config = get_chain(chain)
+        chain_id = config['chain_id']
+        w3 = get_w3(chain)
+        with trace_dependency("rpc", "eth_getTransactionCount"):
+            nonce = w3.eth.get_transaction_count(from_address)
+
+        if config['gas_price_gwei']:
+            gas_price = w3.to_wei(config['gas_price_gwei'], 'gwei')
+        else:
+            with trace_dependency("rpc", "eth_gasPrice"):
+                gas_price = w3.eth.gas_price
+
+        # Define transaction parameters
+        if token is None:
+            transaction = {
+                    'to': receiver,
+                    'value': w3.to_wei(amount, 'ether'),
+                    'gas': 21000,  # 
+                    'gasPrice': gas_price,
+                    'nonce': nonce,
+                    'chainId': chain_id,
+            }
+        else:
+            token_address = Web3.to_checksum_address(token['address'])
+            data = transfer_data(receiver, units)
+            # A transfer the token would revert (e.g. more than the wallet holds) fails here, before signing. Estimated
+            # at `pending`, which the block read cache never serves: a balance spent earlier in the block must count
+            try:
+                with trace_dependency("rpc", "eth_estimateGas"):
+                    gas = w3.eth.estimate_gas({'from': from_address, 'to': token_address, 'data': data}, 'pending')
+            except Exception as e:
+                logger.error(f"Error estimating gas for the {symbol} transfer: {e}")
+                store.release(key)
+                return f"Failed to send {symbol}: the transfer would not succeed ({e})"
+            transaction = {
+                    'to': token_address,
+                    'value': 0,
+                    'data': data,
+                    'gas': int(gas * TOKEN_GAS_MARGIN),
+                    'gasPrice': gas_price,
+                    'nonce': nonce,
+                    'chainId': chain_id,
+            }
+
+        logger.debug("Transaction details: %s", transaction)
+
+        # Create the unsigned transaction
+        try:
+            unsigned_tx = serializable_unsigned_transaction_from_dict(transaction)
+        except Exception as e:
+            logger.error(f"Error serializing transaction: {e}")
+            store.release(key)
+            return "Failed to send because of serialization error"
+
+        unsigned_tx_hash = unsigned_tx.hash()
+        logger.debug("Unsigned transaction hash: %s", unsigned_tx_hash.hex())
+        kms_signature_dict = sign_kms(KMS_KEY_ALIAS, unsigned_tx_hash)
+        signature = kms_signature_dict["Signature"]
+        logger.debug("KMS signature dict: %s", kms_signature_dict)
+        r, s, v = parse_kms_signature(signature, unsigned_tx_hash, from_address, chain_id)
+
+        encoded_transaction = encode_transaction(unsigned_tx, vrs=(v, r, s))
+    except Exception:
+        store.release(key)
+        raise
+
+    logger.debug("Signed transaction: %s", encoded_transaction)
+    # Record the signed transaction before broadcasting: from here on a retry re-sends these exact bytes
+    tx_hash_hex = Web3.keccak(encoded_transaction).hex()
+    store.mark_signed(key, tx_hash_hex, encoded_transaction.hex())
+    return broadcast(key, encoded_transaction, tx_hash_hex, chain)
+
+def estimate_gas(to_address, value, data='', gas_price=None, chain=None):
+
+    from_address = get_wallet_address()
+    w3 = get_w3(chain)
+
+    with trace_dependency("rpc", "is_connected"):
+        connected = w3.is_connected()
+    if not connected:
+        raise Exception("Failed to connect to the network")
+
+    # Prepare transaction data
+    transaction = {
+        'from': from_address,
+        'to': to_address,
+        'value': w3.to_wei(value, 'ether'),  
+        'data': data,
+    }
+
+    # If gas price is provided, add it to the transaction
+    if gas_price:
+        transaction['gasPrice'] = w3.to_wei(gas_price, 'gwei')
+
+    try:
+        # Estimate
+        with trace_dependency("rpc", "eth_estimateGas"):
+            gas_estimate = w3.eth.estimate_gas(transaction)
+        return gas_estimate
+    except Exception as e:
+        logger.error(f"Error estimating gas: {e}")
+        return None
+
+    
+def getBalance(address, chain=None):
+    # One or more comma separated addresses or domains; each is resolved and queried concurrently with the others
+    addresses = [entry.strip() for entry in (address or '').split(',') if entry.strip()]
+    if not addresses:
+        addresses = [get_wallet_address()]
+
+    symbol = get_chain(chain)['native_symbol']
+    with trace_dependency("rpc", "get_balances"):
+        results = run(get_balances(addresses, chain))
+
+    if len(addresses) == 1:
+        # A single lookup keeps its original answer
+        if isinstance(results[0], Exception):
+            raise results[0]
+        resolved_address, ether_balance = results[0]
+        if resolved_address is None:
+            return "Failed to resolve address"
+        logger.info(f"Account {resolved_address} has a balance of {ether_balance} {symbol}")
+        return ether_balance
+
+    lines = []
+    for entry, result in zip(addresses, results):
+        if isinstance(result, Exception):
+            logger.error(f"Error getting the balance of {entry}: {result}")
+            lines.append(f"{entry}: failed to get the balance")
+        elif result[0] is None:
+            lines.append(f"{entry}: failed to resolve address")
+        elif is_address(entry):
+            lines.append(f"{entry}: {result[1]} {symbol}")
+        else:
+            lines.append(f"{entry} ({result[0]}): {result[1]} {symbol}")
+    return "\n".join(lines)
+
+def getTokenBalance(token, walletAddress=None, chain=None):
+    chain = get_chain(chain)['name']
+    try:
+        token = get_token(token, chain, token_call(chain))
+    except ValueError as e:
+        return str(e)
+    owner = walletAddress.strip() if walletAddress and walletAddress.strip() else get_wallet_address()
+    if not is_address(owner):
+        resolved_address = resolve_domain(owner, chain)
+        if not resolved_address:
+            return "Failed to resolve address"
+        owner = resolved_address
+
+    with trace_dependency("rpc", "eth_call"):
+        result = get_w3(chain).eth.call({
+            'to': Web3.to_checksum_address(token['address']),
+            'data': balance_of_data(owner),
+        })
+    balance = from_units(decode_uint(result), token)
+    logger.info(f"Account {owner} has a balance of {balance} {token['symbol']}")
+    return f"{balance.normalize():f} {token['symbol']}"
+
+def getWalletActivity(days=None, direction=None, token=None, walletAddress=None, chain=None):
+    # ERC-20 transfers in and out of the wallet (the agent's own by default), see wallet_activity.py
+    chain = get_chain(chain)['name']
+    days = 7 if days is None else float(days)
+    if not 0 < days <= MAX_DAYS:
+        return f"The activity can cover 1 to {MAX_DAYS} days"
+    direction = (direction or 'all').strip().lower()
+    if direction not in ('all', 'in', 'out'):
+        return "The direction must be in, out or all"
+    token_address = None
+    if token:
+        try:
+            token_address = get_token(token, chain, token_call(chain))['address']
+        except ValueError as e:
+            return str(e)
+    wallet_address = walletAddress.strip() if walletAddress and walletAddress.strip() else get_wallet_address()
+    if not is_address(wallet_address):
+        resolved_address = resolve_domain(wallet_address, chain)
+        if not resolved_address:
+            return "Failed to resolve address"
+        wallet_address = resolved_address
+
+    with trace_dependency("rpc", "wallet_activity"):
+        transfers, window = wallet_activity(wallet_address, days, chain, direction, token_address)
+    return describe_activity(transfers, window, wallet_address, days, chain, token_call(chain))
+
+def getPortfolio(walletAddress=None, chain=None):
+    # Balances and their USD value on one chain, or on every configured chain for "all", see portfolio.py
+    if (chain or '').strip().lower() == 'all':
+        chains = configured_chains()
+    else:
+        chains = [get_chain(chain)['name']]
+    # The prices do not depend on the wallet: fetch them while the address is looked up and the balances read
+    prices = _portfolio_executor.submit(get_prices, price_ids(chains))
+
+    owner = walletAddress.strip() if walletAddress and walletAddress.strip() else get_wallet_address()
+    if not is_address(owner):
+        resolved_address = resolve_domain(owner, chains[0])
+        if not resolved_address:
+            return "Failed to resolve address"
+        owner = resolved_address
+    with trace_dependency("rpc", "multicall"):
+        reads = [_portfolio_executor.submit(fetch_balances, name, owner, token_call(name)) for name in chains]
+        balances, unavailable = [], []
+        for name, read in zip(chains, reads):
+            try:
+                balances += [(name, asset, units) for asset, units in read.result()]
+            except Exception as e:
+                # One unreachable chain does not hide the others
+                logger.error(f"Error reading the portfolio balances on {name}: {e}")
+                unavailable.append(name)
+    try:
+        prices = prices.result()
+    except Exception as e:
+        logger.error(f"Error getting the portfolio prices: {e}")
+        prices = {}
+    return describe_portfolio(owner, balances, prices, unavailable)
+
+def getWalletAddress(chain=None):
+    # The KMS key gives the same address on every EVM chain; the chain is only validated
+    get_chain(chain)
+    address = get_wallet_address()
+    return address
+    
+def getTxStatus(txHash, chain=None):
+    return get_tx_status(get_tx_status_store(), get_rpc_pool, txHash, chain)
+
+def estimateGas(chain=None):
+    value = 0.000001  # ETH
+    return estimate_gas(vitalikaddr, value, chain=chain)
+
+def warm_wallet_address():
+    # DescribeKey and GetPublicKey once per execution environment, see wallet.py
+    return f"wallet {get_wallet_address()}"
+
+def warm_portfolio_prices():
+    # The token prices of getPortfolio; the native token prices are also kept warm by the investment_advice steps
+    prices = get_prices(price_ids(configured_chains()))
+    return f"{sum(price is not None for price in prices.values())} of {len(prices)} prices refreshed"
+
+def warm_chain(chain):
+    # Connects (chain ID check), reads the gas price into the block read cache and opens the AsyncWeb3 session of
+    # getBalance; the pool's keep-alive connections to the chain's endpoints stay open for the next agent turn
+    w3 = get_w3(chain)
+    with trace_dependency("rpc", "eth_gasPrice"):
+        gas_price = w3.eth.gas_price
+    run(get_async_w3(chain))
+    return f"block {get_read_cache(chain).block_number}, gas price {Web3.from_wei(gas_price, 'gwei')} gwei"
+
+register("sendTx", sendTx, parameters={
+    "receiver": {"type": "string", "required": True},
+    "amount": {"type": "number", "required": True},
+    "chain": CHAIN_PARAMETER,
+}, timeout_seconds=240, with_event=True)
+register("sendToken", sendToken, parameters={
+    "receiver": {"type": "string", "required": True},
+    "amount": {"type": "number", "required": True},
+    "token": {"type": "string", "required": True},
+    "chain": CHAIN_PARAMETER,
+}, timeout_seconds=240, with_event=True)
+register("getTxStatus", getTxStatus, parameters={
+    "txHash": {"type": "string", "required": True},
+    "chain": CHAIN_PARAMETER,
+}, timeout_seconds=15)
+register("estimateGas", estimateGas, parameters={
+    "chain": CHAIN_PARAMETER,
+}, timeout_seconds=20)
+register("getBalance", lambda walletAddress, chain: getBalance(walletAddress, chain), parameters={
+    "walletAddress": {"type": "string", "required": False},
+    "chain": CHAIN_PARAMETER,
+}, timeout_seconds=20)
+register("getTokenBalance", getTokenBalance, parameters={
+    "token": {"type": "string", "required": True},
+    "walletAddress": {"type": "string", "required": False},
+    "chain": CHAIN_PARAMETER,
+}, timeout_seconds=20)
+register("getWalletActivity", getWalletActivity, parameters={
+    "days": {"type": "number", "required": False},
+    "direction": {"type": "string", "required": False},
+    "token": {"type": "string", "required": False},
+    "walletAddress": {"type": "string", "required": False},
+    "chain": CHAIN_PARAMETER,
+}, timeout_seconds=60)
+register("getPortfolio", getPortfolio, parameters={
+    "walletAddress": {"type": "string", "required": False},
+    "chain": CHAIN_PARAMETER,
+}, timeout_seconds=30)
+register("getWalletAddress", getWalletAddress, parameters={
+    "chain": CHAIN_PARAMETER,
+}, timeout_seconds=20)
+
+register_step("wallet_address", warm_wallet_address)
+register_step("portfolio_prices", warm_portfolio_prices)
+for chain_name in configured_chains():
+    register_step(f"rpc:{chain_name}", lambda chain=chain_name: warm_chain(chain))
+
+@logger.inject_lambda_context
+@tracer.capture_lambda_handler
+@metrics.log_metrics(capture_cold_start_metric=True)
+def lambda_handler(event, context):
+    logger.debug("Event: %s", event)
+    if is_warmup_event(event):
+        return warm_up()
+    logger.append_keys(agent_function=event['function'])
+
+    function_response = dispatch(event, context)
+    logger.debug("Response: %s", function_response)
+    logger.debug("RPC read cache: %s", stats_by_chain())
+
+    return function_response
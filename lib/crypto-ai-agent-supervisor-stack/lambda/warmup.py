@@ -0,0 +1,38 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+from time import perf_counter
+
+from tracing import logger, trace_function
+
+# Scheduled warm-up of the action group Lambdas. An EventBridge rule invokes each of them with WARMUP_EVENT every
+# few minutes, so the first agent turn after a quiet period finds the prices, the Bitcoin price history, the wallet
+# address, the gas price and open RPC / HTTPS connections in the execution environment instead of fetching them.
+# The handler modules register their steps with `register_step`; a step returns what it refreshed, as text.
+# Only the environment that serves the scheduled call is warmed, so this keeps one environment ready per function.
+WARMUP_EVENT = {"warmup": True}
+
+# [(step name, function)], run in registration order
+STEPS = []
+
+
+def register_step(name, function):
+    STEPS.append((name, function))
+
+
+def is_warmup_event(event):
+    return isinstance(event, dict) and event.get("warmup") is True
+
+
+def warm_up():
+    # Runs every step, even after a failed one, and reports what each refreshed and how long it took
+    report = []
+    with trace_function("warmup"):
+        for name, function in STEPS:
+            start = perf_counter()
+            try:
+                detail, ok = function(), True
+            except Exception as e:
+                detail, ok = f"{type(e).__name__}: {e}", False
+            report.append({"step": name, "ok": ok, "ms": round((perf_counter() - start) * 1000, 1), "detail": detail})
+    logger.info("Warm-up finished", extra={"warmup": report})
+    return {"warmup": report}
@@ -10,6 +10,27 @@ import { bedrock } from '@cdklabs/generative-ai-cdk-constructs';
 import * as path from 'path';
 import { CfnInclude } from 'aws-cdk-lib/cloudformation-include';
 import { readFileSync } from 'fs';
+import { getConfig, EnvironmentConfig } from '../../utils/environment';
+const config: EnvironmentConfig = getConfig();
+
+interface QueryTemplate {
+  description: string;
+  parameters: Record<string, { type: string; description: string }>;
+  sql: string;
+}
+
+/**
+ * The OpenAPI schema of the action group, with the template catalog in the /templateQuery description
+ */
+function apiSchemaWithTemplates(queryTemplates: Record<string, QueryTemplate>) {
+  const schema = JSON.parse(readFileSync(path.join(__dirname, './athena-schema.json'), 'utf-8'));
+  const catalog = Object.entries(queryTemplates).map(([templateId, template]) => {
+    const parameters = Object.entries(template.parameters).map(([name, spec]) => `${name}: ${spec.type}`);
+    return `${templateId}(${parameters.join(', ')}): ${template.description}`;
+  });
+  schema.paths['/templateQuery'].post.description += ` Templates: ${catalog.join('; ')}.`;
+  return schema;
+}
 
 /**
  * This Bedrock Agent queries data from the AWS Public Blockchain Data data sets
@@ -25,7 +46,7 @@ export class BlockchainDataAgentStack extends cdk.Stack {
       foundationModel: bedrock.BedrockFoundationModel.ANTHROPIC_CLAUDE_HAIKU_V1_0,
       shouldPrepareAgent: true,
       userInputEnabled: true,
-      instruction: "Role: You are a SQL developer creating queries for Amazon Athena Bitcoin and Ethereum databases. If you receive an ERROR from Athena, create another query to resolve the error message, and try to run it again. If there are 0 rows returned in the result set, specify that there were no results. Make sure that you properly return scientific notation values. Databases and Tables: Bitcoin: blocks, transactions Ethereum: blocks, contracts, logs, token_transfers, traces, transactions Objective: Generate SQL queries based on the provided schema and user request. Return the response from the query. Guidelines: 1. Query Decomposition and Understanding: Analyze the user’s request to understand the main objective. Identify the blockchain. If unclear, ask for clarification. - For general requests (e.g., how many blocks are there), use a UNION. 2. SQL Query Creation: Use relevant fields from the schema. - Use btc for Bitcoin (btc.blocks) and eth for Ethereum (eth.logs). Bitcoin has array structures for inputs and outputs that require the UNNEST keyword. Do not use EXPLODE, this is not supported. Cast varchar dates to date (e.g., cast(date_column as date)). - use the date_add function to create timestamps for requested time ranges. to request a date of one day ago use date_add('day', -1, now()). - Ensure date comparisons use proper functions (e.g., date >= date_add('day', -30, current_date)). - **Always cast the date column to a date type in both the `SELECT` and `WHERE` clauses to avoid type mismatches (e.g., `cast(date as date)`).** -Determine the current date and time with the query. -Avoid mistakes: proper casting, correct prefixes, accurate syntax. 3. Query Execution and Response: Execute queries in Athena. Return results as fetched. Limit results to 20 to avoid memory issues. 4. Queries for a token_address, use the lower function on both sides of the equality check. for example if the address is '0xA0b86991', you would compare like this lower(token_address) = lower('0xA0b86991') -To check if an array contains an item, use the built-in function `contains`. For example, to check if the array 'products' contains an item called 'shoe', use this syntax: contains(products, 'shoe') -SQL array indices start at 1 **Ensure data integrity and accuracy. Always make sure to generate a query. Format the date parameter as instructed. Do not hallucinate.**",
+      instruction: "Role: You are a SQL developer creating queries for Amazon Athena Bitcoin and Ethereum databases. If you receive an ERROR from Athena, create another query to resolve the error message, and try to run it again. If a query is not run because it would scan too much, rewrite it as the hints in the error suggest. If there are 0 rows returned in the result set, specify that there were no results. Make sure that you properly return scientific notation values. Databases and Tables: Bitcoin: blocks, transactions Ethereum: blocks, contracts, logs, token_transfers, traces, transactions Objective: Answer with a query template of /templateQuery when one fits the request, otherwise generate SQL queries based on the provided schema and user request. Return the response from the query. Guidelines: 1. Query Decomposition and Understanding: Analyze the user’s request to understand the main objective. Identify the blockchain. If unclear, ask for clarification. - For general requests (e.g., how many blocks are there), use a UNION. 2. SQL Query Creation: Use relevant fields from the schema. - Use btc for Bitcoin (btc.blocks) and eth for Ethereum (eth.logs). Bitcoin has array structures for inputs and outputs that require the UNNEST keyword. Do not use EXPLODE, this is not supported. Cast varchar dates to date (e.g., cast(date_column as date)). - use the date_add function to create timestamps for requested time ranges. to request a date of one day ago use date_add('day', -1, now()). - Ensure date comparisons use proper functions (e.g., date >= date_add('day', -30, current_date)). - **Always cast the date column to a date type in both the `SELECT` and `WHERE` clauses to avoid type mismatches (e.g., `cast(date as date)`).** -Determine the current date and time with the query. -Avoid mistakes: proper casting, correct prefixes, accurate syntax. 3. Query Execution and Response: Execute queries in Athena. Return results as fetched. Limit results to 20 to avoid memory issues. 4. Queries for a token_address, use the lower function on both sides of the equality check. for example if the address is '0xA0b86991', you would compare like this lower(token_address) = lower('0xA0b86991') -To check if an array contains an item, use the built-in function `contains`. For example, to check if the array 'products' contains an item called 'shoe', use this syntax: contains(products, 'shoe') -SQL array indices start at 1 **Ensure data integrity and accuracy. Always make sure to generate a query. Format the date parameter as instructed. Do not hallucinate.**",
       promptOverrideConfiguration: bedrock.PromptOverrideConfiguration.fromSteps(
         [{
           stepType: bedrock.AgentStepType.ORCHESTRATION,
@@ -74,13 +95,40 @@ export class BlockchainDataAgentStack extends cdk.Stack {
       }
     });
 
+    // Query templates of /templateQuery: one prepared statement per template in the workgroup, executed by the
+    // action group Lambda with EXECUTE ... USING
+    const templatesPath = path.join(__dirname, './lambda/bedrock-agent-txtsql-action/query_templates.json');
+    const queryTemplates: Record<string, QueryTemplate> = JSON.parse(readFileSync(templatesPath, 'utf-8'));
+    for (const [templateId, template] of Object.entries(queryTemplates)) {
+      const statement = new athena.CfnPreparedStatement(this, `QueryTemplate-${templateId}`, {
+        statementName: templateId,
+        workGroup: workGroup.name,
+        queryStatement: template.sql,
+        description: template.description,
+      });
+      statement.addDependency(workGroup);
+    }
+
+    // Shared Logger / Tracer / Metrics module (lib/shared/tracing) and its powertools dependency
+    const tracingLayer = new lambda.PythonLayerVersion(this, 'TracingLayer', {
+      entry: path.join(__dirname, '../shared/tracing'),
+      compatibleRuntimes: [cdk.aws_lambda.Runtime.PYTHON_3_12],
+      description: 'Structured logging, X-Ray tracing and EMF latency metrics for action group Lambdas',
+    });
+
     const actionGroupFunction = new lambda.PythonFunction(this, 'ActionGroupFunction', {
       runtime: cdk.aws_lambda.Runtime.PYTHON_3_12,
       entry: path.join(__dirname, './lambda/bedrock-agent-txtsql-action'),
       handler: 'lambda_handler',
       timeout: cdk.Duration.seconds(300),
+      layers: [tracingLayer],
+      tracing: cdk.aws_lambda.Tracing.ACTIVE,
       environment: { // Optional: Set environment variables for the function
         ATHENA_QUERY_RESULTS_BUCKET_NAME: athenaBucket.bucketName,
+        ATHENA_WORKGROUP: workGroup.name,
+        POWERTOOLS_SERVICE_NAME: 'crypto_ai_agent_txtsql',
+        POWERTOOLS_METRICS_NAMESPACE: 'CryptoAIAgent',
+        POWERTOOLS_LOG_LEVEL: config.logLevel,
       },
     });
 
@@ -102,7 +150,7 @@ export class BlockchainDataAgentStack extends cdk.Stack {
       description: 'Uses Amazon Athena with s3 data source that contains bitcoin and ethereum data',
       executor: bedrock.ActionGroupExecutor.fromlambdaFunction(actionGroupFunction),
       enabled: true,
-      apiSchema: bedrock.ApiSchema.fromLocalAsset(path.join(__dirname, './athena-schema.json')),
+      apiSchema: bedrock.ApiSchema.fromInline(JSON.stringify(apiSchemaWithTemplates(queryTemplates))),
     });
 
     agent.addActionGroup(actionGroup);
@@ -0,0 +1,246 @@
+#  Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#  SPDX-License-Identifier: MIT-0
+import codecs
+import csv
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal, InvalidOperation
+from urllib.parse import urlparse
+
+from tracing import logger, trace_dependency
+
+# Results of a finished query for the agent. A SELECT writes its full result as CSV to
+# s3://<output location>/<id>.csv; that object is read with ranged GETs (small first, doubling up to
+# RANGE_MAX_BYTES) and parsed line by line with the csv module, instead of paging GetQueryResults 1000 rows at a
+# time in its verbose JSON shape. Values are typed from the column types of the query's result metadata.
+# - the first MAX_ROWS rows, up to MAX_BYTES of JSON, are returned as they are
+# - the rows past that budget are only counted and summarized per column (nulls, min, max, sum), reading at most
+#   SCAN_BYTES of the object; past that the row count is estimated from the bytes left
+# Results without a CSV object (DDL, SHOW, ...) or an unreadable one are paged from GetQueryResults instead, with
+# the same budget.
+MAX_ROWS = int(os.environ.get('ATHENA_RESULT_MAX_ROWS', '200'))
+# Bedrock agents take up to 25 KB of action group response
+MAX_BYTES = int(os.environ.get('ATHENA_RESULT_MAX_BYTES', '16000'))
+SCAN_BYTES = int(os.environ.get('ATHENA_RESULT_SCAN_BYTES', str(64 * 1024 * 1024)))
+RANGE_MIN_BYTES = 256 * 1024
+RANGE_MAX_BYTES = int(os.environ.get('ATHENA_RESULT_RANGE_BYTES', str(8 * 1024 * 1024)))
+API_PAGE_ROWS = 1000
+
+INTEGER_TYPES = {'tinyint', 'smallint', 'integer', 'int', 'bigint'}
+FLOAT_TYPES = {'double', 'float', 'real'}
+NUMERIC_TYPES = INTEGER_TYPES | FLOAT_TYPES | {'decimal'}
+# Python 3.12+ reads unquoted empty fields, Athena's NULLs, as None; before, typed columns still read '' as None
+CSV_QUOTING = getattr(csv, 'QUOTE_NOTNULL', csv.QUOTE_MINIMAL)
+
+_metadata_executor = ThreadPoolExecutor(max_workers=2)
+
+
+def base_type(type_name):
+    # 'decimal(38,0)' -> 'decimal', 'array(varchar)' -> 'array'
+    return type_name.split('(', 1)[0].strip().lower()
+
+
+def parse_value(text, type_name):
+    if text is None:
+        return None
+    kind = base_type(type_name)
+    if kind in ('varchar', 'char', 'string'):
+        return text
+    if text == '':
+        return None
+    try:
+        if kind in INTEGER_TYPES:
+            return int(text)
+        if kind in FLOAT_TYPES:
+            return float(text)
+        if kind == 'decimal':
+            return Decimal(text)
+        if kind == 'boolean':
+            return text.lower() == 'true'
+    except (ValueError, InvalidOperation):
+        pass
+    return text
+
+
+def json_value(value):
+    # Decimals stay exact as strings (wei amounts do not fit a double)
+    return str(value) if isinstance(value, Decimal) else value
+
+
+def column_info(athena_client, execution_id):
+    # [(name, type)] from the result metadata: one GetQueryResults call of a single row
+    with trace_dependency("athena", "GetQueryResults"):
+        response = athena_client.get_query_results(QueryExecutionId=execution_id, MaxResults=1)
+    return [(column['Name'], column['Type']) for column in response['ResultSet']['ResultSetMetadata']['ColumnInfo']]
+
+
+def s3_location(output_location):
+    url = urlparse(output_location)
+    return url.netloc, url.path.lstrip('/')
+
+
+def object_chunks(s3_client, bucket, key, stats):
+    # The object's bytes, one ranged GET per chunk, up to SCAN_BYTES
+    start, size, length = 0, None, RANGE_MIN_BYTES
+    while size is None or start < size:
+        if start >= SCAN_BYTES:
+            stats['incomplete'] = True
+            return
+        with trace_dependency("s3", "GetObject"):
+            response = s3_client.get_object(Bucket=bucket, Key=key, Range=f"bytes={start}-{start + length - 1}")
+            body = response['Body'].read()
+        size = int(response['ContentRange'].rsplit('/', 1)[1])
+        stats['requests'] += 1
+        stats['size'] = size
+        stats['read'] = start = start + len(body)
+        yield body
+        if not body:
+            return
+        length = min(length * 2, RANGE_MAX_BYTES)
+
+
+def object_lines(chunks, stats):
+    # Text lines of UTF-8 chunks, a character or line split across two chunks joined again. The partial line at
+    # the end of a scan stopped at SCAN_BYTES is dropped.
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    pending = ''
+    for chunk in chunks:
+        pending += decoder.decode(chunk)
+        lines = pending.splitlines(keepends=True)
+        pending = lines.pop() if lines and not lines[-1].endswith(('\n', '\r')) else ''
+        yield from lines
+    if not stats.get('incomplete'):
+        pending += decoder.decode(b'', final=True)
+        if pending:
+            yield pending
+
+
+def api_rows(athena_client, execution_id, stats):
+    # The result rows as text, header first, paged from GetQueryResults; stops past SCAN_BYTES worth of pages
+    token, scanned = None, 0
+    while True:
+        options = {'NextToken': token} if token else {}
+        with trace_dependency("athena", "GetQueryResults"):
+            response = athena_client.get_query_results(QueryExecutionId=execution_id, MaxResults=API_PAGE_ROWS,
+                                                       **options)
+        stats['requests'] += 1
+        if 'columns' not in stats:
+            stats['columns'] = [(column['Name'], column['Type'])
+                                for column in response['ResultSet']['ResultSetMetadata']['ColumnInfo']]
+        for row in response['ResultSet']['Rows']:
+            values = [field.get('VarCharValue') for field in row['Data']]
+            scanned += sum(len(value) + 3 for value in values if value is not None)
+            yield values
+        token = response.get('NextToken')
+        if not token:
+            return
+        if scanned >= SCAN_BYTES:
+            stats['incomplete'] = True
+            return
+
+
+class ColumnSummary:
+    def __init__(self, name, type_name):
+        self.name = name
+        self.numeric = base_type(type_name) in NUMERIC_TYPES
+        self.nulls = 0
+        self.minimum = self.maximum = None
+        self.total = 0
+
+    def add(self, value):
+        if value is None:
+            self.nulls += 1
+            return
+        try:
+            if self.minimum is None or value < self.minimum:
+                self.minimum = value
+            if self.maximum is None or value > self.maximum:
+                self.maximum = value
+            if self.numeric:
+                self.total += value
+        except TypeError:
+            # A value that did not parse as the column type, or an array / map
+            pass
+
+    def describe(self):
+        summary = {'nulls': self.nulls, 'min': json_value(self.minimum), 'max': json_value(self.maximum)}
+        if self.numeric:
+            summary['sum'] = json_value(self.total)
+        return summary
+
+
+def collect(columns, rows, stats):
+    # The agent's answer from text rows (header first): the rows within the budget and a summary of the rest
+    header = next(rows, None) or []
+    columns = columns or stats.get('columns') or [(name, 'varchar') for name in header]
+    kept, kept_bytes, rest = [], 2, 0
+    summaries = None
+    for text_row in _complete_rows(rows, stats):
+        values = [parse_value(text, type_name) for text, (_, type_name) in zip(text_row, columns)]
+        if not summaries:
+            row = [json_value(value) for value in values]
+            size = len(json.dumps(row)) + 1
+            if len(kept) < MAX_ROWS and kept_bytes + size <= MAX_BYTES:
+                kept.append(row)
+                kept_bytes += size
+                continue
+            summaries = [ColumnSummary(name, type_name) for name, type_name in columns]
+        rest += 1
+        for summary, value in zip(summaries, values):
+            summary.add(value)
+
+    result = {
+        'columns': [{'name': name, 'type': type_name} for name, type_name in columns],
+        'rows': kept,
+        'rowCount': len(kept) + rest,
+        'truncated': rest > 0,
+    }
+    if rest:
+        result['remaining'] = {'rows': rest, 'columns': {summary.name: summary.describe() for summary in summaries}}
+    if stats.get('incomplete'):
+        # Only part of the result was scanned: the row count is a lower bound
+        result['remaining']['complete'] = False
+        if stats.get('read'):
+            left = stats['size'] - stats['read']
+            result['estimatedRowCount'] = result['rowCount'] + int(left * result['rowCount'] / stats['read'])
+    return result
+
+
+def read_results(athena_client, s3_client, execution):
+    # execution: the QueryExecution of GetQueryExecution for a SUCCEEDED query
+    execution_id = execution['QueryExecutionId']
+    output_location = execution.get('ResultConfiguration', {}).get('OutputLocation', '')
+    if output_location.endswith('.csv'):
+        # The column types are fetched while the first range is read
+        columns = _metadata_executor.submit(column_info, athena_client, execution_id)
+        bucket, key = s3_location(output_location)
+        stats = {'requests': 0, 'source': 's3'}
+        try:
+            chunks = object_chunks(s3_client, bucket, key, stats)
+            first = next(chunks)
+            rows = csv.reader(object_lines(_prepend(first, chunks), stats), quoting=CSV_QUOTING)
+            result = collect(columns.result(), rows, stats)
+            logger.info("Read query results", extra={'execution_id': execution_id, **stats})
+            return result
+        except Exception as e:
+            logger.warning(f"Could not read {output_location}, paging GetQueryResults instead: {e}")
+    stats = {'requests': 0, 'source': 'api'}
+    result = collect(None, api_rows(athena_client, execution_id, stats), stats)
+    stats.pop('columns', None)
+    logger.info("Read query results", extra={'execution_id': execution_id, **stats})
+    return result
+
+
+def _prepend(first, chunks):
+    yield first
+    yield from chunks
+
+
+def _complete_rows(rows, stats):
+    # A scan stopped at SCAN_BYTES can end inside a quoted value spanning lines: that row is left out
+    try:
+        yield from rows
+    except csv.Error:
+        if not stats.get('incomplete'):
+            raise
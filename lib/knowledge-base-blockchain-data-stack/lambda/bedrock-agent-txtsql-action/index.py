@@ -2,27 +2,47 @@
 #  Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
 #  SPDX-License-Identifier: MIT-0
 import boto3
+import json
 import os
 from time import sleep
+from athena_results import read_results
+from query_templates import get_template_cache, render
+from query_validation import VALIDATE, validate_query
+from tracing import logger, metrics, trace_dependency, trace_function, tracer
 
-# Initialize the Athena client
+# Initialize the Athena and S3 clients
 athena_client = boto3.client('athena')
+s3_client = boto3.client('s3')
 
+@logger.inject_lambda_context
+@tracer.capture_lambda_handler
+@metrics.log_metrics(capture_cold_start_metric=True)
 def lambda_handler(event, context):
-    print("Received event:", event)
+    logger.debug("Received event: %s", event)
 
     def athena_query_handler(event):
         try:
             # Fetch parameters for the new fields
             query = event['requestBody']['content']['application/json']['properties'][0]['value']
-            print("Received QUERY:", query)
+            logger.info(f"Received QUERY: {query}")
         except KeyError as e:
-            print(f"Error extracting query: {e}")
+            logger.error(f"Error extracting query: {e}")
             return {"error": "Invalid request structure"}
 
         bucket_name = os.environ['ATHENA_QUERY_RESULTS_BUCKET_NAME']
         s3_output = f"s3://{bucket_name}/"
 
+        # Dry run first: invalid or too expensive queries go back to the agent without running
+        verdict = {}
+        if VALIDATE:
+            try:
+                verdict = validate_query(query, lambda statement: explain_query(statement, s3_output))
+            except RuntimeError as e:
+                return {"error": str(e)}
+            if 'error' in verdict:
+                logger.info(f"Query not run: {verdict['error']}")
+                return {key: value for key, value in verdict.items() if value is not None}
+
         # Execute the query and wait for completion
         execution_id_response = execute_athena_query(query, s3_output)
         if 'error' in execution_id_response:
@@ -30,49 +50,114 @@ def lambda_handler(event, context):
 
         execution_id = execution_id_response['QueryExecutionId']
         result = get_query_results(execution_id)
+        if verdict.get('estimatedScanBytes') is not None and 'error' not in result:
+            result['estimatedScanBytes'] = verdict['estimatedScanBytes']
+
+        return result
 
+    def template_query_handler(event):
+        try:
+            properties = {
+                prop['name']: prop['value']
+                for prop in event['requestBody']['content']['application/json']['properties']
+            }
+            template_id = properties['templateId']
+            parameters = json.loads(properties.get('parameters') or '{}')
+            logger.info(f"Received TEMPLATE: {template_id} {parameters}")
+        except (KeyError, TypeError, ValueError) as e:
+            logger.error(f"Error extracting template: {e}")
+            return {"error": "Invalid request structure, expected templateId and parameters as a JSON object"}
+        if not isinstance(parameters, dict):
+            return {"error": "parameters must be a JSON object of the template parameters"}
+
+        try:
+            query, cache_key, cache_seconds = render(template_id, parameters)
+        except ValueError as e:
+            return {"error": str(e)}
+        cache = get_template_cache()
+        cached = cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+        # Prepared statements live in the stack's workgroup
+        bucket_name = os.environ['ATHENA_QUERY_RESULTS_BUCKET_NAME']
+        execution_id_response = execute_athena_query(query, f"s3://{bucket_name}/", os.environ.get('ATHENA_WORKGROUP'))
+        if 'error' in execution_id_response:
+            return execution_id_response
+        result = get_query_results(execution_id_response['QueryExecutionId'])
+        if 'error' not in result:
+            cache.put(cache_key, result, cache_seconds)
         return result
 
-    def execute_athena_query(query, s3_output):
+    def execute_athena_query(query, s3_output, work_group=None):
         try:
-            response = athena_client.start_query_execution(
-                QueryString=query,
-                ResultConfiguration={'OutputLocation': s3_output}
-            )
+            options = {'WorkGroup': work_group} if work_group else {}
+            with trace_dependency("athena", "StartQueryExecution"):
+                response = athena_client.start_query_execution(
+                    QueryString=query,
+                    ResultConfiguration={'OutputLocation': s3_output},
+                    **options
+                )
             return {"QueryExecutionId": response['QueryExecutionId']}
         except Exception as e:
             error_message = str(e)
-            print(f"Error starting query execution: {error_message}")
+            logger.error(f"Error starting query execution: {error_message}")
             return {"error": f"Failed to start query execution: {error_message}"}
 
-    def check_query_status(execution_id):
-        response = athena_client.get_query_execution(QueryExecutionId=execution_id)
-        return response['QueryExecution']['Status']['State']
+    def get_query_execution(execution_id):
+        with trace_dependency("athena", "GetQueryExecution"):
+            response = athena_client.get_query_execution(QueryExecutionId=execution_id)
+        return response['QueryExecution']
 
-    def get_query_results(execution_id):
+    def wait_for_query(execution_id):
         while True:
-            status = check_query_status(execution_id)
-            if status in ['SUCCEEDED', 'FAILED', 'CANCELLED']:
-                break
+            execution = get_query_execution(execution_id)
+            if execution['Status']['State'] in ['SUCCEEDED', 'FAILED', 'CANCELLED']:
+                return execution
             sleep(1)  # Polling interval
 
+    def explain_query(statement, s3_output):
+        # The text output of an EXPLAIN statement, one line per result row; ValueError when Athena rejects it
+        execution_id_response = execute_athena_query(statement, s3_output)
+        if 'error' in execution_id_response:
+            raise RuntimeError(execution_id_response['error'])
+        execution = wait_for_query(execution_id_response['QueryExecutionId'])
+        if execution['Status']['State'] != 'SUCCEEDED':
+            raise ValueError(execution['Status'].get('StateChangeReason', execution['Status']['State']))
+        lines = []
+        paginator = athena_client.get_paginator('get_query_results')
+        with trace_dependency("athena", "GetQueryResults"):
+            for page in paginator.paginate(QueryExecutionId=execution['QueryExecutionId']):
+                lines += [row['Data'][0].get('VarCharValue', '') for row in page['ResultSet']['Rows']]
+        if lines[:1] == ['Query Plan']:
+            lines = lines[1:]
+        return '\n'.join(lines)
+
+    def get_query_results(execution_id):
+        execution = wait_for_query(execution_id)
+        status = execution['Status']['State']
+
         if status == 'SUCCEEDED':
-            return athena_client.get_query_results(QueryExecutionId=execution_id)
+            return read_results(athena_client, s3_client, execution)
         else:
-            error_message = athena_client.get_query_execution(QueryExecutionId=execution_id)['QueryExecution']['Status']['StateChangeReason']
-            print(f"Query failed with status '{status}': {error_message}")
+            error_message = execution['Status'].get('StateChangeReason', '')
+            logger.error(f"Query failed with status '{status}': {error_message}")
             return {"error": f"Query failed with status '{status}': {error_message}"}
 
     action_group = event.get('actionGroup')
     api_path = event.get('apiPath')
 
-    print("api_path:", api_path)
+    logger.append_keys(agent_function=api_path)
 
     result = ''
     response_code = 200
 
     if api_path == '/athenaQuery':
-        result = athena_query_handler(event)
+        with trace_function(api_path):
+            result = athena_query_handler(event)
+    elif api_path == '/templateQuery':
+        with trace_function(api_path):
+            result = template_query_handler(event)
     else:
         response_code = 404
         result = {"error": f"Unrecognized api path: {action_group}::{api_path}"}
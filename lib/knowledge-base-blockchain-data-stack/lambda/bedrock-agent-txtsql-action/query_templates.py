@@ -0,0 +1,74 @@
+#  Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#  SPDX-License-Identifier: MIT-0
+import json
+import os
+import re
+from datetime import date, datetime
+
+from ttl_cache import TTLCache
+
+# /templateQuery: canonical questions answered by Athena prepared statements instead of SQL written by the model.
+# query_templates.json holds the library; the stack creates one prepared statement per template (named after it)
+# in the Athena workgroup, and this module turns the agent's template id and parameters into
+# `EXECUTE <id> USING <literals>`:
+# - every parameter is typed (date, timestamp, address) and rendered as a literal of that type, so a value the
+#   model gets wrong is rejected here, before Athena runs anything
+# - `using` lists the parameter behind each `?` of the statement, in order (a parameter can fill several)
+# Answers are cached per (template, parameters) for the template's cacheSeconds, at most CACHE_MAX_ENTRIES of
+# them, least recently used evicted first.
+TEMPLATES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'query_templates.json')
+CACHE_MAX_ENTRIES = int(os.environ.get('TEMPLATE_CACHE_MAX_ENTRIES', '256'))
+
+ADDRESS_PATTERN = re.compile(r'^0x[0-9a-fA-F]{40}$')
+
+with open(TEMPLATES_PATH) as templates_file:
+    TEMPLATES = json.load(templates_file)
+
+
+def literal(value, type_name):
+    # The SQL literal of a parameter value; ValueError when the value is not of the type
+    value = str(value).strip()
+    if type_name == 'date':
+        return f"DATE '{date.fromisoformat(value).isoformat()}'"
+    if type_name == 'timestamp':
+        moment = datetime.fromisoformat(value.replace('T', ' ').rstrip('Z'))
+        return f"TIMESTAMP '{moment.strftime('%Y-%m-%d %H:%M:%S')}'"
+    if type_name == 'address':
+        if not ADDRESS_PATTERN.match(value):
+            raise ValueError(f"{value} is not a 0x address of 40 hex digits")
+        return f"'{value.lower()}'"
+    raise ValueError(f"unknown parameter type {type_name}")
+
+
+def render(template_id, parameters):
+    # (EXECUTE statement, cache key, cache seconds) for a template and the agent's parameters
+    template = TEMPLATES.get(template_id)
+    if template is None:
+        raise ValueError(f"Unknown template {template_id}. Templates: {', '.join(TEMPLATES)}")
+    expected = template['parameters']
+    missing = [name for name in expected if name not in parameters]
+    unknown = [name for name in parameters if name not in expected]
+    if missing or unknown:
+        problems = [f"missing {', '.join(missing)}"] if missing else []
+        problems += [f"unknown {', '.join(unknown)}"] if unknown else []
+        signature = ', '.join(f"{name} ({spec['type']})" for name, spec in expected.items()) or 'none'
+        raise ValueError(f"Invalid parameters for {template_id} ({'; '.join(problems)}). Expected: {signature}")
+    literals = {}
+    for name, spec in expected.items():
+        try:
+            literals[name] = literal(parameters[name], spec['type'])
+        except ValueError as e:
+            raise ValueError(f"Invalid {name} for {template_id}, expected a {spec['type']} "
+                             f"({spec['description']}): {e}")
+    query = f"EXECUTE {template_id}"
+    if template['using']:
+        query += " USING " + ", ".join(literals[name] for name in template['using'])
+    key = (template_id, tuple(sorted(literals.items())))
+    return query, key, template['cacheSeconds']
+
+
+_cache = TTLCache(CACHE_MAX_ENTRIES)
+
+
+def get_template_cache():
+    return _cache
@@ -0,0 +1,200 @@
+#  Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#  SPDX-License-Identifier: MIT-0
+import json
+import math
+import os
+import re
+from datetime import date, datetime, timezone
+
+from ttl_cache import TTLCache
+
+# Dry run of the SQL the agent writes for /athenaQuery: before the query runs, Athena plans it with
+# `EXPLAIN (TYPE IO, FORMAT JSON)`, which scans nothing. A query Athena cannot plan (syntax error, unknown table or
+# column) goes back to the agent with Athena's message at once. From the plan, per input table:
+# - the estimated bytes read, when the Glue table has statistics (Athena reports NaN otherwise)
+# - the range of the `date` partition column read, when the query compares it to constants
+# A query is sent back with hints for a cheaper rewrite instead of run when it reads more than MAX_SCAN_GB, more than
+# MAX_SCAN_DAYS partitions of one of LARGE_TABLES, or one of LARGE_TABLES without filtering on `date` at all.
+# Only SELECT / WITH queries are planned; SHOW, DESCRIBE and other statements run as they are.
+# Verdicts are cached per normalized SQL for CACHE_SECONDS, so the agent retrying the same query does not plan it
+# again. EXPLAIN failures are cached only when Athena rejects the SQL itself (syntax, unknown table or column ...);
+# the others (throttling, internal errors, cancellation) say so and are not cached.
+VALIDATE = os.environ.get('ATHENA_VALIDATE_QUERIES', 'true').lower() == 'true'
+MAX_SCAN_BYTES = float(os.environ.get('ATHENA_MAX_SCAN_GB', '50')) * 1e9
+MAX_SCAN_DAYS = int(os.environ.get('ATHENA_MAX_SCAN_DAYS', '31'))
+LARGE_TABLES = [table.strip() for table in os.environ.get(
+    'ATHENA_LARGE_TABLES', 'btc.transactions,eth.transactions,eth.logs,eth.token_transfers,eth.traces'
+).split(',') if table.strip()]
+CACHE_SECONDS = int(os.environ.get('ATHENA_VALIDATION_CACHE_SECONDS', '3600'))
+CACHE_MAX_ENTRIES = int(os.environ.get('ATHENA_VALIDATION_CACHE_MAX_ENTRIES', '512'))
+
+PARTITION_COLUMN = 'date'
+
+# Quoted strings and identifiers, comments, and the rest of the SQL text
+TOKEN_PATTERN = re.compile(r"('(?:[^']|'')*'|\"(?:[^\"]|\"\")*\")|(--[^\n]*|/\*.*?\*/)|([^'\"/-]+|.)", re.DOTALL)
+# A comparison on the partition column, cast or not, in normalized SQL; group 1 or 2 is the table name or alias
+# it is qualified with
+PARTITION_FILTER_PATTERN = re.compile(
+    r"(?<![\w.\"])(?:(\w+)\.)?\"?date\"?(?!\s*')\s*(?:=|<|>|!=|between\b|in\b)"
+    r"|cast\s*\(\s*(?:(\w+)\.)?\"?date\"?\s+as\s+\w+\s*\)\s*(?:=|<|>|!=|between\b|in\b)"
+)
+# A table read in normalized SQL, with its alias (or the keyword after it)
+TABLE_REFERENCE_PATTERN = r"\b(?:from|join)\s+\"?{schema}\"?\.\"?{table}\"?(?:\s+(?:as\s+)?(\w+))?"
+NOT_ALIASES = {'where', 'join', 'inner', 'left', 'right', 'full', 'cross', 'natural', 'on', 'using', 'group', 'order',
+               'limit', 'having', 'union', 'except', 'intersect', 'window', 'offset', 'tablesample', 'for'}
+# Statements the dry run plans; the rest (SHOW, DESCRIBE, ...) have no IO plan
+PLANNED_STATEMENT_PATTERN = re.compile(r"^\(*\s*(?:select|with)\b")
+# Athena's errors for SQL it cannot plan, e.g. "SYNTAX_ERROR: line 1:8: ..." or "COLUMN_NOT_FOUND: line 1:14: ..."
+INVALID_QUERY_PATTERN = re.compile(
+    r"\b(?:SYNTAX_ERROR|[A-Z_]+_NOT_FOUND|TYPE_MISMATCH|AMBIGUOUS_[A-Z_]+|INVALID_[A-Z_]+|MISSING_[A-Z_]+|"
+    r"NOT_SUPPORTED)\b|\bline \d+:\d+: "
+)
+
+
+def normalize_sql(query):
+    # The query without comments, trailing semicolons and repeated whitespace, lowercase outside string literals
+    parts = []
+    for literal, comment, text in TOKEN_PATTERN.findall(query):
+        if literal:
+            parts.append(literal)
+        elif not comment:
+            parts.append(text.lower())
+        else:
+            parts.append(' ')
+    return re.sub(r'\s+', ' ', ''.join(parts)).strip().rstrip(';').strip()
+
+
+def _bytes(value):
+    # outputSizeInBytes is a number or "NaN" without table statistics
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return None
+    return value if math.isfinite(value) else None
+
+
+def _day(marker):
+    try:
+        return date.fromisoformat(str(marker['value'])[:10])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def partition_days(constraint):
+    # Days of the partition column read: None without a constraint on it, inf when the range has no lower bound.
+    # A range without an upper bound ends today
+    if not constraint:
+        return None
+    for column in constraint.get('columnConstraints') or []:
+        if column.get('columnName') != PARTITION_COLUMN:
+            continue
+        days = 0
+        today = datetime.now(timezone.utc).date()
+        for domain_range in (column.get('domain') or {}).get('ranges') or []:
+            low, high = _day(domain_range.get('low') or {}), _day(domain_range.get('high') or {})
+            if low is None:
+                return math.inf
+            days += max(((high or today) - low).days + 1, 0)
+        return days
+    return None
+
+
+def parse_io_plan(text):
+    # [{table, days, bytes}] per input table of an IO plan; none when the plan cannot be read
+    try:
+        plan = json.loads(text)
+    except ValueError:
+        return []
+    inputs = []
+    for info in plan.get('inputTableColumnInfos') or []:
+        schema_table = info.get('table', {}).get('schemaTable', {})
+        inputs.append({
+            'table': f"{schema_table.get('schema')}.{schema_table.get('table')}",
+            'days': partition_days(info.get('constraint')),
+            'bytes': _bytes((info.get('estimate') or {}).get('outputSizeInBytes')),
+        })
+    return inputs
+
+
+def table_qualifiers(normalized, table):
+    # The names a column of the table can be qualified with in normalized SQL: its name and its aliases
+    schema, name = table.split('.', 1)
+    qualifiers = {name}
+    pattern = TABLE_REFERENCE_PATTERN.format(schema=re.escape(schema), table=re.escape(name))
+    for alias in re.findall(pattern, normalized):
+        if alias and alias not in NOT_ALIASES:
+            qualifiers.add(alias)
+    return qualifiers
+
+
+def is_filtered(normalized, table, filters, table_count):
+    # Whether the SQL compares the table's partition column to something the plan has no range for, e.g.
+    # cast(date as date) >= DATE '2024-01-01'. An unqualified column is the table's only when it is the only table
+    # read; otherwise the comparison has to name the table or its alias
+    if None in filters and table_count == 1:
+        return True
+    return not filters.isdisjoint(table_qualifiers(normalized, table))
+
+
+def assess(normalized, inputs):
+    # The verdict on a planned query: its estimate, and the rewrite hints when it is too expensive to run
+    known = [entry['bytes'] for entry in inputs if entry['bytes'] is not None]
+    estimated_bytes = sum(known) if known else None
+    problems, hints = [], []
+    if estimated_bytes is not None and estimated_bytes > MAX_SCAN_BYTES:
+        problems.append(f"it would read about {estimated_bytes / 1e9:,.1f} GB, more than the "
+                        f"{MAX_SCAN_BYTES / 1e9:,.0f} GB allowed")
+    # Tables or aliases the partition column is compared on; None for an unqualified column
+    filters = {qualifier or cast_qualifier or None
+               for qualifier, cast_qualifier in PARTITION_FILTER_PATTERN.findall(normalized)}
+    for entry in inputs:
+        if entry['table'] not in LARGE_TABLES:
+            continue
+        if entry['days'] is None and not is_filtered(normalized, entry['table'], filters, len(inputs)):
+            problems.append(f"it reads every day of {entry['table']}")
+            qualified = ' (qualified with its alias)' if len(inputs) > 1 else ''
+            hints.append(f"filter {entry['table']} on its {PARTITION_COLUMN} partition column{qualified}, e.g. "
+                         f"{PARTITION_COLUMN} >= '{datetime.now(timezone.utc).strftime('%Y-%m-01')}' (ISO dates compare as strings)")
+        elif entry['days'] is not None and entry['days'] > MAX_SCAN_DAYS:
+            span = 'an unbounded range' if math.isinf(entry['days']) else f"{entry['days']} days"
+            problems.append(f"it reads {span} of {entry['table']}")
+            hints.append(f"narrow the {PARTITION_COLUMN} range of {entry['table']} to at most {MAX_SCAN_DAYS} days, "
+                         f"or aggregate a shorter period and ask for more")
+    verdict = {'estimatedScanBytes': estimated_bytes}
+    if problems:
+        if re.search(r'select\s+(?:distinct\s+)?(?:\w+\.)?\*', normalized):
+            hints.append('select only the columns needed instead of SELECT *: Athena reads only those columns')
+        hints = hints or [f"filter on the {PARTITION_COLUMN} partition column and select fewer columns"]
+        verdict['error'] = (f"Query not run because {' and '.join(problems)}. Rewrite it cheaper: "
+                            f"{'; '.join(hints)}.")
+        verdict['hints'] = hints
+    return verdict
+
+
+def validate_query(query, explain):
+    # The verdict on a query: {"error": ...} when it must not run, else {"estimatedScanBytes": bytes or None}.
+    # explain runs a statement and returns its output, raising ValueError when Athena rejects it
+    key = normalize_sql(query)
+    if not PLANNED_STATEMENT_PATTERN.match(key):
+        return {'estimatedScanBytes': None}
+    cached = _cache.get(key)
+    if cached is not None:
+        return cached
+    try:
+        plan = explain(f"EXPLAIN (TYPE IO, FORMAT JSON) {query.strip().rstrip(';')}")
+    except ValueError as e:
+        if not INVALID_QUERY_PATTERN.search(str(e)):
+            # Athena failed to plan a query it may well run next time: nothing to remember
+            return {'error': f"Query could not be checked, nothing was run: {e}. Try it again."}
+        verdict = {'error': f"Query is not valid, nothing was run: {e}"}
+    else:
+        verdict = assess(key, parse_io_plan(plan))
+    _cache.put(key, verdict, CACHE_SECONDS)
+    return verdict
+
+
+_cache = TTLCache(CACHE_MAX_ENTRIES)
+
+
+def get_validation_cache():
+    return _cache
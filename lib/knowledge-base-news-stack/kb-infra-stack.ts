@@ -3,6 +3,9 @@
 import * as cdk from 'aws-cdk-lib';
 import { Construct } from 'constructs';
 import * as ssm from 'aws-cdk-lib/aws-ssm';
+import * as iam from 'aws-cdk-lib/aws-iam';
+import * as bedrock from 'aws-cdk-lib/aws-bedrock';
+import * as cr from 'aws-cdk-lib/custom-resources';
 import { bedrock as bedrockGenAIConstructs } from '@cdklabs/generative-ai-cdk-constructs';
 import { getConfig, EnvironmentConfig } from '../../utils/environment';
 
@@ -15,11 +18,43 @@ if (!bucket) {
   throw new Error('S3_BUCKET_NAME environment variable is required');
 }
 
+// The knowledge base embeds with the model and vector size the OpenSearch index is created for (EMBEDDING_MODEL_ID,
+// EMBEDDING_DIMENSION; supported and default sizes as in lib/shared/embedding_models)
+const DEFAULT_DIMENSIONS: Record<string, number> = {
+  'amazon.titan-embed-text-v1': 1536,
+  'amazon.titan-embed-text-v2:0': 1024,
+  'cohere.embed-english-v3': 1024,
+  'cohere.embed-multilingual-v3': 1024,
+};
+const SUPPORTED_DIMENSIONS: Record<string, number[]> = {
+  'amazon.titan-embed-text-v1': [1536],
+  'amazon.titan-embed-text-v2:0': [256, 512, 1024],
+  'cohere.embed-english-v3': [1024],
+  'cohere.embed-multilingual-v3': [1024],
+};
+
+// Field names of the index mapping created by oss_utils.build_index_request
+const VECTOR_FIELD = 'bedrock-knowledge-base-default-vector';
+const TEXT_FIELD = 'AMAZON_BEDROCK_TEXT_CHUNK';
+const METADATA_FIELD = 'AMAZON_BEDROCK_METADATA';
+
+function getEmbeddingDimension(modelId: string, dimension: string | null): number {
+  const supported = SUPPORTED_DIMENSIONS[modelId];
+  if (!supported) {
+    throw new Error(`EMBEDDING_MODEL_ID ${modelId} is not one of ${Object.keys(SUPPORTED_DIMENSIONS).join(', ')}`);
+  }
+  const size = dimension ? parseInt(dimension, 10) : DEFAULT_DIMENSIONS[modelId];
+  if (!supported.includes(size)) {
+    throw new Error(`EMBEDDING_DIMENSION ${dimension} is not produced by ${modelId}, expected one of ${supported.join(', ')}`);
+  }
+  return size;
+}
+
 export class KbInfraStack extends cdk.Stack {
   private kbRoleArn: string;
   private collectionArn: string;
-  public readonly knowledgeBase: bedrockGenAIConstructs.VectorKnowledgeBase;
-  
+  public readonly knowledgeBase: bedrockGenAIConstructs.IVectorKnowledgeBase;
+
   constructor(scope: Construct, id: string, props?: cdk.StackProps) {
     super(scope, id, props);
 
@@ -34,18 +69,86 @@ export class KbInfraStack extends cdk.Stack {
     this.knowledgeBase = this.createKnowledgeBase();
   }
 
-  private createKnowledgeBase(): bedrockGenAIConstructs.VectorKnowledgeBase {
+  private createKnowledgeBase(): bedrockGenAIConstructs.IVectorKnowledgeBase {
+    const instruction = 'Use this knowledge base to obtain current news about blockchain';
+    const dimension = getEmbeddingDimension(config.embeddingModelId, config.embeddingDimension);
 
-    const kb = new bedrockGenAIConstructs.VectorKnowledgeBase(this, 'e2eRagKB', {
-        embeddingsModel: bedrockGenAIConstructs.BedrockFoundationModel.TITAN_EMBED_TEXT_V1,
-        instruction: 'Use this knowledge base to obtain current news about blockchain'
+    // Stored in the collection and index of OpenSearchServerlessInfraStack, with its KB role. With BLUE_GREEN_INDEX
+    // INDEX_NAME is the alias the OSS stack swaps between indexes, so the knowledge base reads and syncs into
+    // whichever index is live. The name changes with the embeddings model, which replaces the knowledge base
+    const kb = new bedrock.CfnKnowledgeBase(this, 'e2eRagKB', {
+      name: `KbInfraStack-e2eRAG-${config.embeddingModelId.replace(/[^0-9a-zA-Z]+/g, '-')}-${dimension}`,
+      description: instruction,
+      roleArn: this.kbRoleArn,
+      knowledgeBaseConfiguration: {
+        type: 'VECTOR',
+        vectorKnowledgeBaseConfiguration: {
+          embeddingModelArn: `arn:aws:bedrock:${config.region}::foundation-model/${config.embeddingModelId}`,
+          // Only models with several sizes take one
+          ...(SUPPORTED_DIMENSIONS[config.embeddingModelId].length > 1 && {
+            embeddingModelConfiguration: { bedrockEmbeddingModelConfiguration: { dimensions: dimension } },
+          }),
+        },
+      },
+      storageConfiguration: {
+        type: 'OPENSEARCH_SERVERLESS',
+        opensearchServerlessConfiguration: {
+          collectionArn: this.collectionArn,
+          vectorIndexName: config.indexName,
+          fieldMapping: { vectorField: VECTOR_FIELD, textField: TEXT_FIELD, metadataField: METADATA_FIELD },
+        },
+      },
     });
 
-    kb.addWebCrawlerDataSource({
-        sourceUrls: ['https://www.theblockbeats.info/'],
-        chunkingStrategy: bedrockGenAIConstructs.ChunkingStrategy.HIERARCHICAL_COHERE,
+    const dataSource = new bedrock.CfnDataSource(this, 'e2eRagDataSource', {
+      knowledgeBaseId: kb.attrKnowledgeBaseId,
+      name: 'crawler-ds-kbinfra-news',
+      dataSourceConfiguration: {
+        type: 'WEB',
+        webConfiguration: {
+          sourceConfiguration: { urlConfiguration: { seedUrls: [{ url: 'https://www.theblockbeats.info/' }] } },
+        },
+      },
+      // Hierarchical chunking with Cohere's token sizes (ChunkingStrategy.HIERARCHICAL_COHERE)
+      vectorIngestionConfiguration: {
+        chunkingConfiguration: {
+          chunkingStrategy: 'HIERARCHICAL',
+          hierarchicalChunkingConfiguration: {
+            levelConfigurations: [{ maxTokens: 500 }, { maxTokens: 100 }],
+            overlapTokens: 50,
+          },
+        },
+      },
     });
 
-    return kb;
+    // Sync once the knowledge base is created or its embeddings model changes. A blue/green roll-out that cannot copy
+    // the documents to the new vector size swaps to an empty index, which this ingestion job fills
+    const ingestionJob = {
+      service: 'bedrock-agent',
+      action: 'startIngestionJob',
+      parameters: {
+        knowledgeBaseId: kb.attrKnowledgeBaseId,
+        dataSourceId: dataSource.attrDataSourceId,
+        description: `Ingest with ${config.embeddingModelId} at ${dimension} dimensions`,
+      },
+      physicalResourceId: cr.PhysicalResourceId.fromResponse('ingestionJob.ingestionJobId'),
+    };
+    new cr.AwsCustomResource(this, 'e2eRagIngestionJob', {
+      onCreate: ingestionJob,
+      onUpdate: ingestionJob,
+      policy: cr.AwsCustomResourcePolicy.fromStatements([
+        new iam.PolicyStatement({
+          actions: ['bedrock:StartIngestionJob'],
+          resources: [kb.attrKnowledgeBaseArn],
+        }),
+      ]),
+      installLatestAwsSdk: false,
+    });
+
+    return bedrockGenAIConstructs.VectorKnowledgeBase.fromKnowledgeBaseAttributes(this, 'e2eRagKBReference', {
+      knowledgeBaseId: kb.attrKnowledgeBaseId,
+      executionRoleArn: this.kbRoleArn,
+      instruction: instruction,
+    });
   }
 }
\ No newline at end of file
@@ -40,6 +40,10 @@ const kbRoleName = config.kbRoleName;
 const collectionName = config.collectionName;
 const indexName = config.indexName;
 const embeddingModelId = config.embeddingModelId;
+const indexProfile = config.indexProfile;
+const embeddingDimension = config.embeddingDimension;
+// When enabled, indexName is an alias and index updates are rolled out blue/green behind it
+const blueGreenIndex = config.blueGreenIndex;
 import * as path from 'path';
 
 export class OpenSearchServerlessInfraStack extends cdk.Stack {
@@ -158,6 +162,21 @@ export class OpenSearchServerlessInfraStack extends cdk.Stack {
       description: 'dependency_layer including requests, requests-aws4auth, aws-lambda-powertools, opensearch-py'
     });
 
+    // Embedding model registry shared with the knowledge base query Lambda (lib/shared/embedding_models)
+    const embeddingModelsLayer = new lambda.LayerVersion(this, 'EmbeddingModelsLayer', {
+      code: lambda.Code.fromAsset(path.join(__dirname, '../shared/embedding_models'), {
+        bundling: {
+          image: lambda.Runtime.PYTHON_3_12.bundlingImage,
+          command: [
+            'bash', '-c',
+            'mkdir -p /asset-output/python && cp embedding_models.py /asset-output/python/'
+          ],
+        },
+      }),
+      compatibleRuntimes: [lambda.Runtime.PYTHON_3_12],
+      description: 'Embedding model registry shared by the index setup and knowledge base query Lambdas'
+    });
+
 
     // Lambda Role
     const ossLambdaRole = new iam.Role(this, 'OSSLambdaRole', {
@@ -187,7 +206,7 @@ export class OpenSearchServerlessInfraStack extends cdk.Stack {
       runtime: lambda.Runtime.PYTHON_3_12,
       tracing: lambda.Tracing.ACTIVE,
       currentVersionOptions: { removalPolicy: cdk.RemovalPolicy.DESTROY },
-      layers: [dependencyLayer],
+      layers: [dependencyLayer, embeddingModelsLayer],
       environment: {
         POWERTOOLS_SERVICE_NAME: 'InfraSetupLambda',
         POWERTOOLS_METRICS_NAMESPACE: 'InfraSetupLambda-NameSpace',
@@ -227,7 +246,10 @@ export class OpenSearchServerlessInfraStack extends cdk.Stack {
         collection_endpoint: this.collection.attrCollectionEndpoint,
         data_access_policy_name: this.dataAccessPolicy.name,
         index_name: indexName,
-        embedding_model_id: embeddingModelId
+        embedding_model_id: embeddingModelId,
+        ...(indexProfile && { index_profile: indexProfile }),
+        ...(embeddingDimension && { embedding_dimension: embeddingDimension }),
+        ...(blueGreenIndex && { blue_green: 'true' })
       }
     });
 
@@ -4,12 +4,17 @@ import os
 from typing import Dict
 from boto3 import client
 
+from tracing import logger, metrics, trace_dependency, tracer
+
 KNOWLEDGE_BASE_ID = os.environ['KNOWLEDGE_BASE_ID']
 DATA_SOURCE_ID = os.environ['DATA_SOURCE_ID']
 AWS_REGION = os.environ['AWS_REGION']
 
 bedrock_agent_client = client('bedrock-agent', region_name=AWS_REGION)
 
+@logger.inject_lambda_context
+@tracer.capture_lambda_handler
+@metrics.log_metrics(capture_cold_start_metric=True)
 def lambda_handler(event, context):
     input_data = {
         'knowledgeBaseId': KNOWLEDGE_BASE_ID,
@@ -17,10 +22,13 @@ def lambda_handler(event, context):
         'clientToken': context.aws_request_id
     }
     
-    response = bedrock_agent_client.start_ingestion_job(**input_data)
-    print(response)
+    with trace_dependency('bedrock', 'StartIngestionJob'):
+        response = bedrock_agent_client.start_ingestion_job(**input_data)
+    ingestion_job = response['ingestionJob']
+    logger.info('Started ingestion job %s (%s)', ingestion_job['ingestionJobId'], ingestion_job['status'])
+    logger.debug('StartIngestionJob response: %s', response)
     
     return {
-        'ingestionJob': response['ingestionJob']
+        'ingestionJob': ingestion_job
     }
 
@@ -1,6 +1,8 @@
 # Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
 # SPDX-License-Identifier: MIT-0
+import json
 import os
+from time import monotonic
 from aws_lambda_powertools import Logger
 
 from client_utils import (
@@ -11,14 +13,24 @@ from client_utils import (
     get_sts_client,
 )
 from oss_utils import (
-    MODEL_ID_TO_INDEX_REQUEST_MAP,
+    count_documents,
     create_index_with_retries,
     delete_index_if_present,
+    delete_index_or_alias_targets,
     get_access_policy,
+    get_alias_targets,
     get_host_from_collection_endpoint,
+    get_index_mappings,
+    get_index_request_from_props,
+    get_next_blue_green_index_name,
     get_updated_access_policy_with_caller_arn,
+    has_compatible_vectors,
+    is_blue_green,
+    reindex,
+    swap_alias,
     update_access_policy,
 )
+from oss_readiness import wait_for_data_access, wait_for_document_count, wait_for_index_ready
 
 logger = Logger(service="amazon_bedrock_knowledge_base_infra_setup_lambda", level="INFO")
 
@@ -46,10 +58,15 @@ def lambda_handler(event, context):
 """
 During a creation event:
 1. We first update the data access policy (supplied as part of the resoure properties) to add the caller arn as a trusted principal.
-2. We create an index with name `index_name`.
-3. In case of any failure, the error gets thrown and the Custom Resource Provider treats it as a resource creation failure. We don't do any
+2. We create an index with name `index_name`. The HNSW settings come from the optional `index_profile` property (`default`,
+`low-latency`, `high-recall`, `compact`), which `space_type`, `quantization` and `embedding_dimension` can further override.
+3. Instead of sleeping for fixed periods, we poll (bounded exponential backoff) until the access policy has propagated, the index exists,
+is healthy and accepts a test write/search. How long each phase took is logged and returned as `ReadinessTimings` in the resource data.
+4. In case of any failure, the error gets thrown and the Custom Resource Provider treats it as a resource creation failure. We don't do any
 cleanup since the index failed to be created - so there is nothing to delete.
-4. We are using the index_name as the physical resource id because it serves as the identifier for an index.
+5. We are using the index_name as the physical resource id because it serves as the identifier for an index.
+6. With the `blue_green` property set to "true", `index_name` is an alias in front of a physical `<index_name>-blue` index,
+see `deploy_blue_green_index` below.
 """
 
 
@@ -61,8 +78,7 @@ def on_create(event):
     collection_endpoint = props["collection_endpoint"]
     host = get_host_from_collection_endpoint(collection_endpoint)
     index_name = props["index_name"]
-    embedding_model_id = props["embedding_model_id"]
-    index_request = MODEL_ID_TO_INDEX_REQUEST_MAP[embedding_model_id]
+    index_request = get_index_request_from_props(props)
 
     session = get_session()
     sts_client = get_sts_client(session, region)
@@ -70,11 +86,17 @@ def on_create(event):
     oss_http_client = get_oss_http_client(session, region, host)
 
     update_access_policy_with_caller_arn_if_applicable(sts_client, oss_client, policy_name)
+    timings = {"access_policy": wait_for_data_access(oss_http_client, index_name)}
+
+    if is_blue_green(props):
+        timings.update(deploy_blue_green_index(oss_http_client, index_name, index_request))
+        return {"PhysicalResourceId": index_name, "Data": get_readiness_report(timings)}
 
     logger.info("Creating index {}".format(index_name))
     create_index_with_retries(oss_http_client, index_name, index_request)
+    timings.update(wait_for_index_ready(oss_http_client, index_name))
 
-    return {"PhysicalResourceId": index_name}
+    return {"PhysicalResourceId": index_name, "Data": get_readiness_report(timings)}
 
 
 """
@@ -89,6 +111,8 @@ provider will send another update event in this case with the old and new resour
 the old index again during rollback.
 6. We are using the new index_name as the physical resource id because it serves as the identifier for the index. If the index naem has changed from before,
 the Custom Resource provider will send a delete event for the old index but our deletion logic below is robust enough to not fail if we try deleting a non-existent index.
+7. With the `blue_green` property set to "true", the old index is not deleted up front. `deploy_blue_green_index` builds the new index next to it and
+only removes the old one after the alias has been switched, so retrieval keeps working throughout.
 """
 
 
@@ -108,8 +132,7 @@ def on_update(event):
     collection_endpoint = props["collection_endpoint"]
     host = get_host_from_collection_endpoint(collection_endpoint)
     index_name = props["index_name"]
-    embedding_model_id = props["embedding_model_id"]
-    index_request = MODEL_ID_TO_INDEX_REQUEST_MAP[embedding_model_id]
+    index_request = get_index_request_from_props(props)
 
     session = get_session()
     sts_client = get_sts_client(session, region)
@@ -117,19 +140,25 @@ def on_update(event):
     oss_http_client = get_oss_http_client(session, region, host)
 
     update_access_policy_with_caller_arn_if_applicable(sts_client, oss_client, policy_name)
+    timings = {"access_policy": wait_for_data_access(oss_http_client, index_name)}
+
+    if is_blue_green(props):
+        timings.update(deploy_blue_green_index(oss_http_client, index_name, index_request))
+        return {"PhysicalResourceId": index_name, "Data": get_readiness_report(timings)}
 
     old_index_name = old_props["index_name"]
     logger.info("Deleting old index {}".format(old_index_name))
-    delete_index_if_present(oss_http_client, old_index_name)
+    delete_index_or_alias_targets(oss_http_client, old_index_name)
 
     logger.info("Creating new index {}".format(index_name))
     create_index_with_retries(oss_http_client, index_name, index_request)
-    return {"PhysicalResourceId": index_name}
+    timings.update(wait_for_index_ready(oss_http_client, index_name))
+    return {"PhysicalResourceId": index_name, "Data": get_readiness_report(timings)}
 
 
 """
 During a delete event:
-1. We try deleting the index if it exists.
+1. We try deleting the index if it exists. For blue/green deployments we delete the index behind the alias.
 2. If it doesn't exist, we return without error. If it exists, we delete it.
 3. In case of any errors (when the index exists), we throw the error and CFN treats it as a Deletion failure.
 """
@@ -146,10 +175,71 @@ def on_delete(event):
     session = get_session()
     oss_http_client = get_oss_http_client(session, region, host)
 
-    delete_index_if_present(oss_http_client, index_name)
+    delete_index_or_alias_targets(oss_http_client, index_name)
     return {"PhysicalResourceId": index_name}
 
 
+"""
+Blue/green deployment of the index behind the `alias_name` alias:
+1. We create the new index (`<alias_name>-blue` or `-green`, whichever is not live) next to the live one and wait until it is ready.
+2. If the stored vectors still fit the new mapping (same dimension and data type as the live index), we copy all documents over with
+`_reindex` and wait until the document counts match.
+Otherwise the documents cannot be copied, and a knowledge base sync cannot fill the new index before the swap since it writes through the
+alias. The knowledge base's embeddings model is also only updated after this stack, by KbInfraStack, which starts an ingestion job once the
+knowledge base matches the new mapping. So we swap to the empty index and let that ingestion job fill it.
+3. We switch the alias from the old index to the new one in a single `_aliases` call.
+4. Only then do we delete the old index. An old index whose documents could not be copied is kept as it was, out of the alias, until the
+next deployment reuses its name and deletes it.
+An index created before blue/green was enabled has the alias name itself. An alias cannot share its name with an index, so that index
+is dropped right before the alias is added. This is the only case with a short retrieval gap.
+"""
+
+
+def deploy_blue_green_index(oss_http_client, alias_name, index_request):
+    timings = {}
+    old_index_names = get_alias_targets(oss_http_client, alias_name)
+    legacy_index = not old_index_names and oss_http_client.indices.exists(index=alias_name)
+    source_index_names = old_index_names or ([alias_name] if legacy_index else [])
+    new_index_name = get_next_blue_green_index_name(alias_name, old_index_names[0] if old_index_names else None)
+
+    # Left over from an earlier failed deployment, never live since it is not behind the alias
+    delete_index_if_present(oss_http_client, new_index_name)
+    logger.info("Creating index {} behind alias {}".format(new_index_name, alias_name))
+    create_index_with_retries(oss_http_client, new_index_name, index_request)
+    timings.update(wait_for_index_ready(oss_http_client, new_index_name))
+
+    expected_count = sum(count_documents(oss_http_client, name) for name in source_index_names)
+    compatible = all(
+        has_compatible_vectors(get_index_mappings(oss_http_client, name), index_request) for name in source_index_names
+    )
+    reingest = expected_count and not compatible
+    if reingest:
+        logger.warning(
+            "The vector dimension or data type changed, so the {} documents of {} cannot be copied. Swapping to the empty "
+            "index {} for the knowledge base to ingest into, keeping {}".format(
+                expected_count, alias_name, new_index_name, ", ".join(source_index_names)
+            )
+        )
+    elif expected_count:
+        start = monotonic()
+        for source_index_name in source_index_names:
+            reindex(oss_http_client, source_index_name, new_index_name)
+        timings["reindex"] = monotonic() - start
+        timings["verify_count"] = wait_for_document_count(oss_http_client, new_index_name, expected_count)
+
+    start = monotonic()
+    if legacy_index:
+        delete_index_if_present(oss_http_client, alias_name)
+    swap_alias(oss_http_client, alias_name, old_index_names, new_index_name)
+    timings["alias_swap"] = monotonic() - start
+
+    if not reingest:
+        for old_index_name in old_index_names:
+            logger.info("Deleting previous index {}".format(old_index_name))
+            delete_index_if_present(oss_http_client, old_index_name)
+    return timings
+
+
 def update_access_policy_with_caller_arn_if_applicable(sts_client, oss_client, policy_name):
     caller_arn = get_caller_arn(sts_client)
 
@@ -165,3 +255,7 @@ def update_access_policy_with_caller_arn_if_applicable(sts_client, oss_client, p
         updated_access_policy["Version"],
         updated_access_policy["PolicyName"],
     )
+
+
+def get_readiness_report(timings):
+    return {"ReadinessTimings": json.dumps({phase: round(seconds, 1) for phase, seconds in timings.items()})}
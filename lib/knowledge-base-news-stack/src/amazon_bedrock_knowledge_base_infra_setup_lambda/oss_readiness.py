@@ -0,0 +1,121 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+import os
+import uuid
+from time import monotonic, sleep
+
+from aws_lambda_powertools import Logger
+from opensearchpy import AuthorizationException, TransportError
+
+logger = Logger(service="amazon_bedrock_knowledge_base_infra_setup_lambda", level="INFO")
+
+text_field_name = os.environ.get("TEXT_FIELD_NAME", "AMAZON_BEDROCK_TEXT_CHUNK")
+
+# Upper bound for any single readiness phase, well below the 14 minute Lambda timeout
+READINESS_TIMEOUT_SECONDS = int(os.environ.get("READINESS_TIMEOUT_SECONDS", "300"))
+INITIAL_POLL_DELAY_SECONDS = 1
+MAX_POLL_DELAY_SECONDS = 16
+
+# Status codes returned for APIs a collection does not implement (e.g. cluster health on serverless)
+UNSUPPORTED_API_STATUS_CODES = (400, 404, 405)
+
+
+def poll_until(check, description, timeout=READINESS_TIMEOUT_SECONDS):
+    start = monotonic()
+    delay = INITIAL_POLL_DELAY_SECONDS
+    attempts = 0
+    while True:
+        attempts += 1
+        try:
+            if check():
+                elapsed = monotonic() - start
+                logger.info("{} ready after {:.1f}s ({} attempts)".format(description, elapsed, attempts))
+                return elapsed
+            logger.info("{} not ready yet (attempt {})".format(description, attempts))
+        except Exception as e:
+            logger.info("{} not ready yet (attempt {}): {}".format(description, attempts, e))
+        if monotonic() - start + delay > timeout:
+            raise TimeoutError("{} not ready after {}s".format(description, timeout))
+        sleep(delay)
+        delay = min(delay * 2, MAX_POLL_DELAY_SECONDS)
+
+
+def wait_for_data_access(oss_http_client, index_name):
+    # Any answer other than 403 means the data access policy now covers the caller
+    def check():
+        try:
+            oss_http_client.indices.exists(index=index_name)
+            return True
+        except AuthorizationException:
+            return False
+
+    return poll_until(check, "Data access policy")
+
+
+def wait_for_index_exists(oss_http_client, index_name):
+    return poll_until(lambda: oss_http_client.indices.exists(index=index_name), "Index {}".format(index_name))
+
+
+def wait_for_index_absent(oss_http_client, index_name):
+    return poll_until(
+        lambda: not oss_http_client.indices.exists(index=index_name), "Deletion of index {}".format(index_name)
+    )
+
+
+def wait_for_index_health(oss_http_client, index_name):
+    def check():
+        try:
+            health = oss_http_client.cluster.health(index=index_name, wait_for_status="yellow", timeout="5s")
+        except TransportError as e:
+            if e.status_code in UNSUPPORTED_API_STATUS_CODES:
+                logger.info("Cluster health API not available on this collection, skipping")
+                return True
+            raise
+        return not health.get("timed_out") and health.get("status") in ("yellow", "green")
+
+    return poll_until(check, "Health of index {}".format(index_name))
+
+
+def wait_for_write_and_search(oss_http_client, index_name):
+    # Writes a text-only probe document (no vector, so it never surfaces in k-NN retrieval),
+    # waits until it is searchable and removes it again
+    marker = "readiness-probe-{}".format(uuid.uuid4().hex)
+    probe_ids = []
+
+    def check():
+        if not probe_ids:
+            response = oss_http_client.index(index=index_name, body={text_field_name: marker})
+            probe_ids.append(response["_id"])
+        response = oss_http_client.search(
+            index=index_name,
+            body={"size": 1, "_source": False, "query": {"match_phrase": {text_field_name: marker}}},
+        )
+        return response["hits"]["hits"]
+
+    try:
+        return poll_until(check, "Write and search on index {}".format(index_name))
+    finally:
+        for probe_id in probe_ids:
+            try:
+                oss_http_client.delete(index=index_name, id=probe_id)
+            except Exception as e:
+                logger.info("Could not remove readiness probe document {}: {}".format(probe_id, e))
+
+
+def wait_for_index_ready(oss_http_client, index_name):
+    timings = {
+        "index_exists": wait_for_index_exists(oss_http_client, index_name),
+        "index_health": wait_for_index_health(oss_http_client, index_name),
+        "write_search": wait_for_write_and_search(oss_http_client, index_name),
+    }
+    logger.info("Index {} ready, phase timings (s): {}".format(index_name, timings))
+    return timings
+
+
+def wait_for_document_count(oss_http_client, index_name, expected_count):
+    def check():
+        count = oss_http_client.count(index=index_name)["count"]
+        logger.info("Index {} holds {} of {} documents".format(index_name, count, expected_count))
+        return count == expected_count
+
+    return poll_until(check, "Document count of index {}".format(index_name))
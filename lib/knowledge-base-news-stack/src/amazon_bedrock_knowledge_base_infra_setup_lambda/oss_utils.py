@@ -9,6 +9,9 @@ import os
 from aws_lambda_powertools import Logger
 from opensearchpy import NotFoundError
 
+from embedding_models import EMBEDDING_MODELS, get_embedding_dimension, get_embedding_model
+from oss_readiness import MAX_POLL_DELAY_SECONDS, wait_for_index_absent
+
 logger = Logger(service="amazon_bedrock_knowledge_base_infra_setup_lambda", level="INFO")
 
 vector_field_name = os.environ.get('VECTOR_FIELD_NAME')
@@ -16,64 +19,97 @@ metadata_field_name = os.environ.get('METADATA_FIELD_NAME')
 text_field_name = os.environ.get('TEXT_FIELD_NAME')
 
 
-MODEL_ID_TO_INDEX_REQUEST_MAP = {
-    "amazon.titan-embed-text-v1": {
-        "settings": {"index": {"knn": True, "knn.algo_param.ef_search": 512}},
-        "mappings": {
-            "properties": {
-                "bedrock-knowledge-base-default-vector": {
-                    "type": "knn_vector",
-                    "dimension": 1536,
-                    "method": {
-                        "name": "hnsw",
-                        "engine": "faiss",
-                        "parameters": {"ef_construction": 512, "m": 16},
-                        "space_type": "l2",
-                    },
-                },
-                "AMAZON_BEDROCK_METADATA": {"type": "text", "index": "false"},
-                "AMAZON_BEDROCK_TEXT_CHUNK": {"type": "text", "index": "true"},
-            }
-        },
-    },
-    "amazon.titan-embed-text-v2:0": {
-        "settings": {"index": {"knn": True, "knn.algo_param.ef_search": 512}},
-        "mappings": {
-            "properties": {
-                "bedrock-knowledge-base-default-vector": {
-                    "type": "knn_vector",
-                    "dimension": 1024,
-                    "method": {
-                        "name": "hnsw",
-                        "engine": "faiss",
-                        "parameters": {"ef_construction": 512, "m": 16},
-                        "space_type": "l2",
-                    },
-                },
-                "AMAZON_BEDROCK_METADATA": {"type": "text", "index": "false"},
-                "AMAZON_BEDROCK_TEXT_CHUNK": {"type": "text", "index": "true"},
-            }
+DEFAULT_INDEX_PROFILE = "default"
+
+# HNSW presets layered over the embedding model's recommendations in embedding_models.py.
+# `default` uses those recommendations unchanged.
+INDEX_PROFILES = {
+    "default": {},
+    "low-latency": {"ef_search": 64, "ef_construction": 128, "m": 8},
+    "high-recall": {"ef_search": 1024, "ef_construction": 1024, "m": 32},
+    "compact": {"ef_search": 256, "ef_construction": 256, "m": 16, "quantization": "fp16"},
+}
+
+SUPPORTED_SPACE_TYPES = ["l2", "innerproduct"]
+
+# fp16: faiss scalar quantization, halves graph memory, accepts float vectors as ingested by Bedrock KB
+# byte: 8-bit vectors, the ingested embeddings must already be integers in [-128, 127]
+SUPPORTED_QUANTIZATIONS = [None, "fp16", "byte"]
+
+
+def get_index_profile(embedding_model_id, profile_name=None, space_type=None, quantization=None):
+    profile_name = profile_name or DEFAULT_INDEX_PROFILE
+    if profile_name not in INDEX_PROFILES:
+        raise Exception(
+            "Unsupported index profile {}, expected one of {}".format(profile_name, list(INDEX_PROFILES))
+        )
+    model = get_embedding_model(embedding_model_id)
+    profile = {
+        **model["hnsw"],
+        "space_type": model["opensearch_space_type"],
+        "quantization": None,
+        **INDEX_PROFILES[profile_name],
+    }
+    if space_type:
+        profile["space_type"] = space_type
+    if quantization:
+        profile["quantization"] = None if quantization == "none" else quantization
+    if profile["space_type"] not in SUPPORTED_SPACE_TYPES:
+        raise Exception(
+            "Unsupported space type {}, expected one of {}".format(profile["space_type"], SUPPORTED_SPACE_TYPES)
+        )
+    if profile["quantization"] not in SUPPORTED_QUANTIZATIONS:
+        raise Exception(
+            "Unsupported quantization {}, expected one of {}".format(
+                profile["quantization"], SUPPORTED_QUANTIZATIONS
+            )
+        )
+    return profile
+
+
+def build_index_request(embedding_model_id, profile_name=None, dimension=None, space_type=None, quantization=None):
+    profile = get_index_profile(embedding_model_id, profile_name, space_type, quantization)
+    method_parameters = {"ef_construction": profile["ef_construction"], "m": profile["m"]}
+    if profile["quantization"] == "fp16":
+        method_parameters["encoder"] = {"name": "sq", "parameters": {"type": "fp16"}}
+
+    vector_mapping = {
+        "type": "knn_vector",
+        "dimension": get_embedding_dimension(embedding_model_id, dimension),
+        "method": {
+            "name": "hnsw",
+            "engine": "faiss",
+            "parameters": method_parameters,
+            "space_type": profile["space_type"],
         },
-    },
-    "cohere.embed-english-v3": {
-        "settings": {"index": {"knn": True, "knn.algo_param.ef_search": 512}},
+    }
+    if profile["quantization"] == "byte":
+        vector_mapping["data_type"] = "byte"
+
+    return {
+        "settings": {"index": {"knn": True, "knn.algo_param.ef_search": profile["ef_search"]}},
         "mappings": {
             "properties": {
-                "bedrock-knowledge-base-default-vector": {
-                    "type": "knn_vector",
-                    "dimension": 1024,
-                    "method": {
-                        "name": "hnsw",
-                        "engine": "faiss",
-                        "parameters": {"ef_construction": 512, "m": 16},
-                        "space_type": "l2",
-                    },
-                },
+                "bedrock-knowledge-base-default-vector": vector_mapping,
                 "AMAZON_BEDROCK_METADATA": {"type": "text", "index": "false"},
                 "AMAZON_BEDROCK_TEXT_CHUNK": {"type": "text", "index": "true"},
             }
         },
-    },
+    }
+
+
+def get_index_request_from_props(props):
+    return build_index_request(
+        props["embedding_model_id"],
+        props.get("index_profile"),
+        props.get("embedding_dimension"),
+        props.get("space_type"),
+        props.get("quantization"),
+    )
+
+
+MODEL_ID_TO_INDEX_REQUEST_MAP = {
+    embedding_model_id: build_index_request(embedding_model_id) for embedding_model_id in EMBEDDING_MODELS
 }
 
 
@@ -98,8 +134,7 @@ def update_access_policy(oss_client, updated_policy, policy_version, policy_name
         type="data",
     )
     logger.info(response)
-    logger.info("Updated data access policy, sleeping for 2 minutes for permissions to propagate")
-    sleep(120)
+    logger.info("Updated data access policy")
 
 
 def get_updated_access_policy_with_caller_arn(policy, caller_arn):
@@ -116,30 +151,29 @@ def create_index(oss_http_client, index_name, request_body):
 
 def create_index_with_retries(oss_http_client, index_name, request_body):
     attempts = 0
+    delay = 1
     while attempts < 10:
         try:
             response = create_index(oss_http_client, index_name, request_body)
             logger.info(response)
-            logger.info(
-                "Created index {}, sleeping for 2 minutes for index to get ready".format(index_name)
-            )
-            sleep(120)
+            logger.info("Created index {}".format(index_name))
             return response
         except Exception as e:
             logger.info("Caught: " + str(e))
-            logger.info("Sleeping for 10 seconds and retrying.")
-            sleep(10)
             attempts += 1
             if attempts == 10:
                 raise e
+            logger.info("Sleeping for {} seconds and retrying.".format(delay))
+            sleep(delay)
+            delay = min(delay * 2, MAX_POLL_DELAY_SECONDS)
 
 
 def delete_index_if_present(oss_http_client, index_name):
     try:
         response = oss_http_client.indices.delete(index=index_name)
         logger.info(response)
-        logger.info("Deleted index {}, sleeping for 1 min".format(index_name))
-        sleep(60)
+        logger.info("Deleted index {}, waiting for it to disappear".format(index_name))
+        wait_for_index_absent(oss_http_client, index_name)
         return response
     except NotFoundError:
         logger.info("Index {} not found, skipping deletion".format(index_name))
@@ -148,4 +182,72 @@ def delete_index_if_present(oss_http_client, index_name):
 
 
 def get_host_from_collection_endpoint(collection_endpoint):
-    return re.sub(r"https?://", "", collection_endpoint)
\ No newline at end of file
+    return re.sub(r"https?://", "", collection_endpoint)
+
+BLUE_GREEN_COLORS = ("blue", "green")
+
+
+def is_blue_green(props):
+    return str(props.get("blue_green", "false")).lower() == "true"
+
+
+def get_alias_targets(oss_http_client, alias_name):
+    try:
+        return sorted(oss_http_client.indices.get_alias(name=alias_name).keys())
+    except NotFoundError:
+        return []
+
+
+def get_next_blue_green_index_name(alias_name, current_index_name):
+    color = BLUE_GREEN_COLORS[0]
+    if current_index_name and current_index_name.endswith("-" + BLUE_GREEN_COLORS[0]):
+        color = BLUE_GREEN_COLORS[1]
+    return "{}-{}".format(alias_name, color)
+
+
+def get_index_mappings(oss_http_client, index_name):
+    # The mappings of a live index, in the shape of an index request
+    response = oss_http_client.indices.get_mapping(index=index_name)
+    return {"mappings": next(iter(response.values()))["mappings"]}
+
+
+def has_compatible_vectors(old_index_request, new_index_request):
+    # Documents can only be copied if the stored vectors still fit the new mapping
+    old_vector = old_index_request["mappings"].get("properties", {}).get("bedrock-knowledge-base-default-vector")
+    new_vector = new_index_request["mappings"]["properties"]["bedrock-knowledge-base-default-vector"]
+    if old_vector is None:
+        return False
+    return old_vector.get("dimension") == new_vector["dimension"] and old_vector.get("data_type") == new_vector.get(
+        "data_type"
+    )
+
+
+def reindex(oss_http_client, source_index_name, target_index_name):
+    response = oss_http_client.reindex(
+        body={"source": {"index": source_index_name}, "dest": {"index": target_index_name}},
+        wait_for_completion=True,
+        request_timeout=600,
+    )
+    logger.info(response)
+    return response
+
+
+def count_documents(oss_http_client, index_name):
+    return oss_http_client.count(index=index_name)["count"]
+
+
+def swap_alias(oss_http_client, alias_name, old_index_names, new_index_name):
+    actions = [{"remove": {"index": old_index_name, "alias": alias_name}} for old_index_name in old_index_names]
+    actions.append({"add": {"index": new_index_name, "alias": alias_name}})
+    response = oss_http_client.indices.update_aliases(body={"actions": actions})
+    logger.info(response)
+    return response
+
+
+def delete_index_or_alias_targets(oss_http_client, name):
+    # `name` may be a plain index or, for blue/green deployments, an alias in front of one
+    alias_targets = get_alias_targets(oss_http_client, name)
+    if not alias_targets:
+        return delete_index_if_present(oss_http_client, name)
+    for index_name in alias_targets:
+        delete_index_if_present(oss_http_client, index_name)
@@ -7,10 +7,11 @@ from client_utils import (
     get_secret_manager_client,
     get_session,
 )
+from embedding_models import get_embedding_dimension
 from rds_utils import (
     create,
     delete,
-    get_embedding_dimension,
+    get_vector_index_options,
 )
 
 logger = Logger(service="amazon_bedrock_knowledge_base_infra_setup_lambda", level="INFO")
@@ -42,7 +43,10 @@ During a creation event:
 2. We create the schema if it does not exist.
 3. We create the role.
 4. We grant permissions to the role for the schema.
-5. We create the table with columns "embedding", "chunks" and "metadata".
+5. We create the table with columns "embedding", "chunks" and "metadata" (jsonb), with GIN indexes for full-text search on "chunks"
+and for "metadata".
+6. We create the ANN index on "embedding": HNSW by default, IVFFlat or none via the `vector_index_type` property. `hnsw_m`,
+`hnsw_ef_construction`, `hnsw_ef_search`, `ivfflat_lists`, `ivfflat_probes` and `vector_ops` tune it, see `DEFAULT_VECTOR_INDEX_OPTIONS`.
 
 We are using f"{database_name}-{schema_name}-{table_name}-{user_name}" as the physical resource id
 because it serves as the identifier for all the resources we create.
@@ -60,7 +64,8 @@ def on_create(event):
     rds_cluster_arn = props["cluster_arn"]
     rds_secret_arn = props["secret_arn"]
     embedding_model_id = props["embedding_model_id"]
-    emb_dim = get_embedding_dimension(embedding_model_id)
+    emb_dim = get_embedding_dimension(embedding_model_id, props.get("embedding_dimension"))
+    index_options = get_vector_index_options(props)
 
     session = get_session()
     rds_data_api_client = get_rds_data_api_client(session, region)
@@ -76,6 +81,7 @@ def on_create(event):
         schema_name,
         user_name,
         emb_dim,
+        index_options,
     )
 
     return {"PhysicalResourceId": f"{database_name}-{schema_name}-{table_name}-{user_name}"}
@@ -122,7 +128,8 @@ def on_update(event):
     schema_name = props["schema_name"]
     user_name = props["user_name"]
     embedding_model_id = props["embedding_model_id"]
-    emb_dim = get_embedding_dimension(embedding_model_id)
+    emb_dim = get_embedding_dimension(embedding_model_id, props.get("embedding_dimension"))
+    index_options = get_vector_index_options(props)
 
     session = get_session()
     rds_data_api_client = get_rds_data_api_client(session, region)
@@ -148,6 +155,7 @@ def on_update(event):
         schema_name,
         user_name,
         emb_dim,
+        index_options,
     )
 
     return {"PhysicalResourceId": f"{database_name}-{schema_name}-{table_name}-{user_name}"}
@@ -1,10 +1,82 @@
 # Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
 # SPDX-License-Identifier: MIT-0
 import json
+from time import perf_counter
 from aws_lambda_powertools import Logger
 
+from embedding_models import get_embedding_model
+
 logger = Logger(service="amazon_bedrock_knowledge_base_infra_setup_lambda", level="INFO")
 
+SUPPORTED_VECTOR_INDEX_TYPES = ["hnsw", "ivfflat", "none"]
+SUPPORTED_VECTOR_OPS = ["vector_cosine_ops", "vector_l2_ops", "vector_ip_ops"]
+
+# pgvector defaults, except lists which pgvector leaves to the user (rows / 1000 is the usual starting point).
+# vector_ops defaults to the embedding model's pgvector_ops when the model is known.
+DEFAULT_VECTOR_INDEX_OPTIONS = {
+    "vector_index_type": "hnsw",
+    "vector_ops": "vector_cosine_ops",
+    "hnsw_m": 16,
+    "hnsw_ef_construction": 64,
+    "hnsw_ef_search": 40,
+    "ivfflat_lists": 100,
+    "ivfflat_probes": 1,
+}
+
+
+def get_vector_index_options(props=None):
+    options = dict(DEFAULT_VECTOR_INDEX_OPTIONS)
+    if (props or {}).get("embedding_model_id"):
+        options["vector_ops"] = get_embedding_model(props["embedding_model_id"])["pgvector_ops"]
+    for key, default in DEFAULT_VECTOR_INDEX_OPTIONS.items():
+        value = (props or {}).get(key)
+        if value not in (None, ""):
+            options[key] = type(default)(value)
+    if options["vector_index_type"] not in SUPPORTED_VECTOR_INDEX_TYPES:
+        raise Exception(
+            "Unsupported vector index type {}, expected one of {}".format(
+                options["vector_index_type"], SUPPORTED_VECTOR_INDEX_TYPES
+            )
+        )
+    if options["vector_ops"] not in SUPPORTED_VECTOR_OPS:
+        raise Exception(
+            "Unsupported vector operator class {}, expected one of {}".format(
+                options["vector_ops"], SUPPORTED_VECTOR_OPS
+            )
+        )
+    return options
+
+
+def get_table_statements(schema_name, table_name, emb_dim):
+    return [
+        f"CREATE TABLE IF NOT EXISTS {schema_name}.{table_name} (id uuid PRIMARY KEY, embedding vector({emb_dim}), chunks text, metadata jsonb);",
+        # Tables created before metadata moved to jsonb are converted in place, a no-op otherwise
+        f"ALTER TABLE {schema_name}.{table_name} ALTER COLUMN metadata TYPE jsonb USING metadata::jsonb;",
+        f"CREATE INDEX IF NOT EXISTS {table_name}_chunks_fts_idx ON {schema_name}.{table_name} USING gin (to_tsvector('simple', chunks));",
+        f"CREATE INDEX IF NOT EXISTS {table_name}_metadata_idx ON {schema_name}.{table_name} USING gin (metadata);",
+    ]
+
+
+def get_vector_index_statements(schema_name, table_name, user_name, index_options):
+    # ef_search / probes are query-time settings, so they are attached to the role Bedrock KB connects with
+    index_type = index_options["vector_index_type"]
+    index_name = f"{table_name}_embedding_idx"
+    vector_ops = index_options["vector_ops"]
+    if index_type == "hnsw":
+        return [
+            f"CREATE INDEX IF NOT EXISTS {index_name} ON {schema_name}.{table_name} USING hnsw (embedding {vector_ops}) "
+            f"WITH (m = {index_options['hnsw_m']}, ef_construction = {index_options['hnsw_ef_construction']});",
+            f"ALTER ROLE {user_name} SET hnsw.ef_search = {index_options['hnsw_ef_search']};",
+        ]
+    if index_type == "ivfflat":
+        return [
+            f"CREATE INDEX IF NOT EXISTS {index_name} ON {schema_name}.{table_name} USING ivfflat (embedding {vector_ops}) "
+            f"WITH (lists = {index_options['ivfflat_lists']});",
+            f"ALTER ROLE {user_name} SET ivfflat.probes = {index_options['ivfflat_probes']};",
+        ]
+    return []
+
+
 def create(
     rds_data_api_client,
     secretsmanager_client,
@@ -15,45 +87,27 @@ def create(
     schema_name,
     user_name,
     emb_dim,
+    index_options=None,
 ):
-    execute_sql_statement(
-        rds_data_api_client,
-        rds_cluster_arn,
-        rds_secret_arn,
-        database_name,
-        r"CREATE EXTENSION IF NOT EXISTS vector;",
-    )
-    execute_sql_statement(
-        rds_data_api_client,
-        rds_cluster_arn,
-        rds_secret_arn,
-        database_name,
-        f"CREATE SCHEMA IF NOT EXISTS {schema_name};",
-    )
-
+    index_options = index_options or get_vector_index_options()
     secret_value = secretsmanager_client.get_secret_value(SecretId=rds_secret_arn)
     password = json.loads(secret_value["SecretString"])["password"]
-    execute_sql_statement(
-        rds_data_api_client,
-        rds_cluster_arn,
-        rds_secret_arn,
-        database_name,
-        f"CREATE ROLE {user_name} WITH PASSWORD '{password}' LOGIN;",
-    )
 
-    execute_sql_statement(
-        rds_data_api_client,
-        rds_cluster_arn,
-        rds_secret_arn,
-        database_name,
-        f"GRANT ALL ON SCHEMA {schema_name} TO {user_name};",
-    )
-    execute_sql_statement(
+    # All of these are transactional in Postgres, so either everything is created or nothing is
+    execute_sql_transaction(
         rds_data_api_client,
         rds_cluster_arn,
         rds_secret_arn,
         database_name,
-        f"CREATE TABLE IF NOT EXISTS {schema_name}.{table_name} (id uuid PRIMARY KEY, embedding vector({emb_dim}), chunks text, metadata json);",
+        [
+            r"CREATE EXTENSION IF NOT EXISTS vector;",
+            f"CREATE SCHEMA IF NOT EXISTS {schema_name};",
+            get_create_role_if_not_exists_statement(user_name, password),
+            f"GRANT ALL ON SCHEMA {schema_name} TO {user_name};",
+            *get_table_statements(schema_name, table_name, emb_dim),
+            *get_vector_index_statements(schema_name, table_name, user_name, index_options),
+        ],
+        redacted_values=[password],
     )
 
 
@@ -66,75 +120,126 @@ def delete(
     schema_name,
     user_name,
 ):
-    execute_sql_statement(
-        rds_data_api_client,
-        rds_cluster_arn,
-        rds_secret_arn,
-        database_name,
+    statements = [
         f"DROP TABLE IF EXISTS {schema_name}.{table_name};",
-        True,
-    )
-    execute_sql_statement(
-        rds_data_api_client,
-        rds_cluster_arn,
-        rds_secret_arn,
-        database_name,
-        f"REVOKE ALL ON SCHEMA {schema_name} FROM {user_name};",
-        True,
-    )
-    execute_sql_statement(
-        rds_data_api_client,
-        rds_cluster_arn,
-        rds_secret_arn,
-        database_name,
+        get_revoke_if_role_exists_statement(schema_name, user_name),
         f"DROP ROLE IF EXISTS {user_name};",
-        True,
-    )
-    execute_sql_statement(
-        rds_data_api_client,
-        rds_cluster_arn,
-        rds_secret_arn,
-        database_name,
         f"DROP SCHEMA IF EXISTS {schema_name};",
-        True,
-    )
-    execute_sql_statement(
-        rds_data_api_client,
-        rds_cluster_arn,
-        rds_secret_arn,
-        database_name,
         r"DROP EXTENSION IF EXISTS vector;",
-        True,
+    ]
+    try:
+        execute_sql_transaction(
+            rds_data_api_client, rds_cluster_arn, rds_secret_arn, database_name, statements
+        )
+    except Exception as e:
+        # e.g. the schema still holds other tables or other tables use the vector extension. Fall back to
+        # dropping as much as possible statement by statement, as deletion has always been best effort.
+        logger.info("Transactional deletion failed ({}), retrying statement by statement".format(e))
+        for statement in statements:
+            execute_sql_statement(
+                rds_data_api_client,
+                rds_cluster_arn,
+                rds_secret_arn,
+                database_name,
+                statement,
+                True,
+            )
+
+
+def get_create_role_if_not_exists_statement(user_name, password):
+    # Postgres has no CREATE ROLE IF NOT EXISTS, so re-running the setup must not fail on an existing role
+    return (
+        f"DO $$ BEGIN IF NOT EXISTS (SELECT 1 FROM pg_roles WHERE rolname = '{user_name}') THEN "
+        f"CREATE ROLE {user_name} WITH PASSWORD '{password}' LOGIN; END IF; END $$;"
     )
 
 
-def execute_sql_statement(
+def get_revoke_if_role_exists_statement(schema_name, user_name):
+    return (
+        f"DO $$ BEGIN IF EXISTS (SELECT 1 FROM pg_roles WHERE rolname = '{user_name}') "
+        f"AND EXISTS (SELECT 1 FROM pg_namespace WHERE nspname = '{schema_name}') THEN "
+        f"REVOKE ALL ON SCHEMA {schema_name} FROM {user_name}; END IF; END $$;"
+    )
+
+
+def redact(statement, redacted_values):
+    for value in redacted_values:
+        if value:
+            statement = statement.replace(value, "****")
+    return statement
+
+
+def execute_sql_transaction(
     rds_data_api_client,
     rds_cluster_arn,
     rds_secret_arn,
     database_name,
-    statement,
-    ignore_error=False,
+    statements,
+    redacted_values=(),
 ):
+    # Runs the statements in one Data API transaction. A failure rolls back the whole transaction.
+    start = perf_counter()
+    transaction_id = rds_data_api_client.begin_transaction(
+        resourceArn=rds_cluster_arn,
+        secretArn=rds_secret_arn,
+        database=database_name,
+    )["transactionId"]
     try:
-        logger.info("Executing: {}".format(statement))
-        response = rds_data_api_client.execute_statement(
+        for statement in statements:
+            execute_sql_statement(
+                rds_data_api_client,
+                rds_cluster_arn,
+                rds_secret_arn,
+                database_name,
+                statement,
+                transaction_id=transaction_id,
+                redacted_values=redacted_values,
+            )
+        rds_data_api_client.commit_transaction(
             resourceArn=rds_cluster_arn,
             secretArn=rds_secret_arn,
-            database=database_name,
-            sql=statement,
+            transactionId=transaction_id,
         )
+    except Exception:
+        logger.error("Rolling back transaction {}".format(transaction_id))
+        rds_data_api_client.rollback_transaction(
+            resourceArn=rds_cluster_arn,
+            secretArn=rds_secret_arn,
+            transactionId=transaction_id,
+        )
+        raise
+    logger.info(
+        "Committed {} statements in {:.0f} ms".format(len(statements), (perf_counter() - start) * 1000)
+    )
+
+
+def execute_sql_statement(
+    rds_data_api_client,
+    rds_cluster_arn,
+    rds_secret_arn,
+    database_name,
+    statement,
+    ignore_error=False,
+    transaction_id=None,
+    redacted_values=(),
+):
+    loggable_statement = redact(statement, redacted_values)
+    start = perf_counter()
+    try:
+        logger.info("Executing: {}".format(loggable_statement))
+        request = {
+            "resourceArn": rds_cluster_arn,
+            "secretArn": rds_secret_arn,
+            "database": database_name,
+            "sql": statement,
+        }
+        if transaction_id:
+            request["transactionId"] = transaction_id
+        response = rds_data_api_client.execute_statement(**request)
         logger.info(response)
+        logger.info("Executed in {:.0f} ms".format((perf_counter() - start) * 1000))
+        return response
     except Exception as e:
-        logger.error("Error executing statment {}: {}".format(statement, str(e)))
+        logger.error("Error executing statment {}: {}".format(loggable_statement, redact(str(e), redacted_values)))
         if not ignore_error:
             raise e
-
-
-def get_embedding_dimension(embedding_model_id):
-    if embedding_model_id == "amazon.titan-embed-text-v1":
-        return 1536
-    elif embedding_model_id == "cohere.embed-english-v3":
-        return 1024
-    else:
-        raise Exception("Unsupported embedding model id {} provided!".format(embedding_model_id))
\ No newline at end of file
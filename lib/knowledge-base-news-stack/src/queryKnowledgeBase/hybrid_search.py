@@ -0,0 +1,99 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+import os
+import re
+
+vector_field_name = os.environ.get("VECTOR_FIELD_NAME", "bedrock-knowledge-base-default-vector")
+text_field_name = os.environ.get("TEXT_FIELD_NAME", "AMAZON_BEDROCK_TEXT_CHUNK")
+metadata_field_name = os.environ.get("METADATA_FIELD_NAME", "AMAZON_BEDROCK_METADATA")
+
+# Constant from the original reciprocal rank fusion paper; it damps the weight of the top ranks
+RRF_K = 60
+
+# Ticker symbols (PEPE, USDC) and hex contract addresses / tx hashes are matched verbatim
+EXACT_TOKEN_PATTERN = re.compile(r"0x[0-9a-fA-F]{6,}|\b[A-Z][A-Z0-9]{1,9}\b")
+WORD_PATTERN = re.compile(r"0x[0-9a-fA-F]+|\w+")
+
+
+def build_lexical_query(question, size):
+    return {
+        "size": size,
+        "_source": [text_field_name, metadata_field_name],
+        "query": {"match": {text_field_name: {"query": question}}},
+    }
+
+
+def build_knn_query(embedding, size):
+    return {
+        "size": size,
+        "_source": [text_field_name, metadata_field_name],
+        "query": {"knn": {vector_field_name: {"vector": embedding, "k": size}}},
+    }
+
+
+def run_queries(oss_http_client, index_name, queries):
+    # A single _msearch keeps BM25 and kNN to one round trip
+    body = []
+    for query in queries:
+        body.append({"index": index_name})
+        body.append(query)
+    response = oss_http_client.msearch(body=body)
+    return [r.get("hits", {}).get("hits", []) for r in response["responses"]]
+
+
+def reciprocal_rank_fusion(result_lists, k=RRF_K, weights=None):
+    weights = weights or [1.0] * len(result_lists)
+    fused = {}
+    for hits, weight in zip(result_lists, weights):
+        for rank, hit in enumerate(hits, start=1):
+            entry = fused.setdefault(hit["_id"], {"hit": hit, "score": 0.0})
+            entry["score"] += weight / (k + rank)
+    ranked = sorted(fused.values(), key=lambda e: e["score"], reverse=True)
+    return [{**e["hit"], "_rrf_score": e["score"]} for e in ranked]
+
+
+def extract_exact_tokens(question):
+    return {token.lower() for token in EXACT_TOKEN_PATTERN.findall(question)}
+
+
+def tokenize(text):
+    return {token.lower() for token in WORD_PATTERN.findall(text or "")}
+
+
+# Lightweight local reranker (no model call): the fused score plus the share of exact identifiers
+# and of question terms found in the chunk, scaled to the top fused score
+def rerank(question, hits, exact_weight=1.0, overlap_weight=0.5):
+    if not hits:
+        return hits
+    exact_tokens = extract_exact_tokens(question)
+    question_terms = tokenize(question)
+    top_score = max(hit.get("_rrf_score", 0.0) for hit in hits) or 1.0
+
+    def score(hit):
+        chunk_terms = tokenize(hit.get("_source", {}).get(text_field_name))
+        exact = len(exact_tokens & chunk_terms) / len(exact_tokens) if exact_tokens else 0.0
+        overlap = len(question_terms & chunk_terms) / len(question_terms) if question_terms else 0.0
+        return hit.get("_rrf_score", 0.0) + top_score * (exact_weight * exact + overlap_weight * overlap)
+
+    rescored = [{**hit, "_rerank_score": score(hit)} for hit in hits]
+    return sorted(rescored, key=lambda h: h["_rerank_score"], reverse=True)
+
+
+def hybrid_search(
+    oss_http_client,
+    index_name,
+    question,
+    embedding,
+    size=5,
+    num_candidates=50,
+    use_reranker=True,
+):
+    lexical_hits, knn_hits = run_queries(
+        oss_http_client,
+        index_name,
+        [build_lexical_query(question, num_candidates), build_knn_query(embedding, num_candidates)],
+    )
+    fused = reciprocal_rank_fusion([lexical_hits, knn_hits])
+    if use_reranker:
+        fused = rerank(question, fused)
+    return fused[:size]
@@ -5,28 +5,136 @@ from typing import Dict
 from boto3 import client
 import json
 
+from embedding_models import build_embedding_request, parse_embedding_response
+from tracing import logger, metrics, trace_dependency, tracer
+
 bedrock_agent_runtime_client = client("bedrock-agent-runtime", region_name=os.environ["AWS_REGION"])
 
+# Hybrid (BM25 + kNN) retrieval goes straight to the collection, bypassing the vector-only KB retrieve. INDEX_NAME is the
+# index (or blue/green alias) the knowledge base ingests into
+HYBRID_SEARCH_TYPE = "HYBRID"
+EMBEDDING_MODEL_ID = os.environ.get("EMBEDDING_MODEL_ID", "amazon.titan-embed-text-v1")
+# The vector size of the index, only sent to models that can produce several (Titan Text Embeddings v2)
+EMBEDDING_DIMENSION = os.environ.get("EMBEDDING_DIMENSION")
+
+_bedrock_runtime_client = None
+_oss_http_client = None
+
+
+def get_bedrock_runtime_client():
+    global _bedrock_runtime_client
+    if _bedrock_runtime_client is None:
+        _bedrock_runtime_client = client("bedrock-runtime", region_name=os.environ["AWS_REGION"])
+    return _bedrock_runtime_client
+
+
+def get_oss_http_client():
+    global _oss_http_client
+    if _oss_http_client is None:
+        import re
+        import boto3
+        from opensearchpy import OpenSearch, RequestsHttpConnection
+        from requests_aws4auth import AWS4Auth
+
+        region = os.environ["AWS_REGION"]
+        credentials = boto3.Session().get_credentials()
+        awsauth = AWS4Auth(
+            credentials.access_key, credentials.secret_key, region, "aoss", session_token=credentials.token
+        )
+        host = re.sub(r"https?://", "", os.environ["COLLECTION_ENDPOINT"])
+        _oss_http_client = OpenSearch(
+            hosts=[{"host": host, "port": 443}],
+            http_auth=awsauth,
+            use_ssl=True,
+            verify_certs=True,
+            connection_class=RequestsHttpConnection,
+            timeout=30,
+        )
+    return _oss_http_client
+
+
+def embed_question(question):
+    body = build_embedding_request(EMBEDDING_MODEL_ID, question, EMBEDDING_DIMENSION)
+    with trace_dependency("bedrock", "InvokeModel"):
+        response = get_bedrock_runtime_client().invoke_model(
+            modelId=EMBEDDING_MODEL_ID,
+            body=json.dumps(body),
+            contentType="application/json",
+            accept="application/json",
+        )
+    return parse_embedding_response(EMBEDDING_MODEL_ID, json.loads(response["body"].read()))
+
+
+def hybrid_retrieve(question, size):
+    from hybrid_search import hybrid_search, metadata_field_name, text_field_name
+
+    embedding = embed_question(question)
+    with trace_dependency("aoss", "MSearch"):
+        hits = hybrid_search(
+            get_oss_http_client(),
+            os.environ["INDEX_NAME"],
+            question,
+            embedding,
+            size=size,
+        )
+    logger.debug("Hybrid search returned %d hits", len(hits))
+    if not hits:
+        # Nothing ingested yet, e.g. a blue/green roll-out swapped to an empty index that is still being synced
+        return retrieve(question, size)
+    return [
+        {
+            "text": hit["_source"].get(text_field_name),
+            "metadata": hit["_source"].get(metadata_field_name),
+            "score": hit.get("_rerank_score", hit["_rrf_score"]),
+        }
+        for hit in hits
+    ]
+
+
+def retrieve(question, size):
+    with trace_dependency("bedrock", "Retrieve"):
+        response = bedrock_agent_runtime_client.retrieve(
+            knowledgeBaseId=os.environ["KNOWLEDGE_BASE_ID"],
+            retrievalQuery={"text": question},
+            retrievalConfiguration={"vectorSearchConfiguration": {"numberOfResults": size}},
+        )
+    return [
+        {
+            "text": result["content"]["text"],
+            "metadata": result.get("metadata"),
+            "score": result.get("score"),
+        }
+        for result in response["retrievalResults"]
+    ]
+
+
+@logger.inject_lambda_context
+@tracer.capture_lambda_handler
+@metrics.log_metrics(capture_cold_start_metric=True)
 def lambda_handler(event, context):
-    question = json.loads(event["body"])["question"]
-
-    input_data = {
-        "input": {
-            "text": question
-        },
-        "retrieveAndGenerateConfiguration": {
-            "type": "KNOWLEDGE_BASE",
-            "knowledgeBaseConfiguration": {
-                "knowledgeBaseId": os.environ["KNOWLEDGE_BASE_ID"],
-                "modelArn": f"arn:aws:bedrock:{os.environ['AWS_REGION']}::foundation-model/anthropic.claude-v2"
-            }
+    body = json.loads(event["body"])
+    question = body["question"]
+    logger.debug("Knowledge base query: %s", question)
+
+    if body.get("search_type", "").upper() == HYBRID_SEARCH_TYPE:
+        return {
+            "results": hybrid_retrieve(question, int(body.get("size", 5)))
         }
-    }
 
-    command = bedrock_agent_runtime_client.RetrieveAndGenerateCommand(input_data)
-    response = bedrock_agent_runtime_client.send(command)
+    with trace_dependency("bedrock", "RetrieveAndGenerate"):
+        response = bedrock_agent_runtime_client.retrieve_and_generate(
+            input={
+                "text": question
+            },
+            retrieveAndGenerateConfiguration={
+                "type": "KNOWLEDGE_BASE",
+                "knowledgeBaseConfiguration": {
+                    "knowledgeBaseId": os.environ["KNOWLEDGE_BASE_ID"],
+                    "modelArn": f"arn:aws:bedrock:{os.environ['AWS_REGION']}::foundation-model/anthropic.claude-v2"
+                }
+            }
+        )
 
     return {
-        "response": response.output.text
+        "response": response["output"]["text"]
     }
-
@@ -0,0 +1,87 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+# Single source of truth for the embedding models the OpenSearch and RDS setup paths and the knowledge base query Lambda support.
+# - request_format: InvokeModel body and response shape, "titan" (inputText / embedding) or "cohere" (texts / embeddings)
+# - dimension: default embedding size
+# - supported_dimensions: sizes the model can be asked for at ingestion time (smaller = less storage, faster search)
+# - normalized: whether the model returns unit-length vectors, in which case inner product ranks like cosine
+# - opensearch_space_type: recommended faiss space type
+# - pgvector_ops: operator class for the Aurora ANN index. Bedrock KB queries Aurora with cosine distance (<=>),
+#   so the index must use vector_cosine_ops to be picked up by the planner regardless of normalization.
+# - hnsw: recommended HNSW build/search parameters
+EMBEDDING_MODELS = {
+    "amazon.titan-embed-text-v1": {
+        "request_format": "titan",
+        "dimension": 1536,
+        "supported_dimensions": [1536],
+        "normalized": False,
+        "opensearch_space_type": "l2",
+        "pgvector_ops": "vector_cosine_ops",
+        "hnsw": {"m": 16, "ef_construction": 512, "ef_search": 512},
+    },
+    "amazon.titan-embed-text-v2:0": {
+        "request_format": "titan",
+        "dimension": 1024,
+        "supported_dimensions": [256, 512, 1024],
+        "normalized": True,
+        "opensearch_space_type": "innerproduct",
+        "pgvector_ops": "vector_cosine_ops",
+        "hnsw": {"m": 16, "ef_construction": 512, "ef_search": 512},
+    },
+    "cohere.embed-english-v3": {
+        "request_format": "cohere",
+        "dimension": 1024,
+        "supported_dimensions": [1024],
+        "normalized": True,
+        "opensearch_space_type": "innerproduct",
+        "pgvector_ops": "vector_cosine_ops",
+        "hnsw": {"m": 16, "ef_construction": 512, "ef_search": 512},
+    },
+    "cohere.embed-multilingual-v3": {
+        "request_format": "cohere",
+        "dimension": 1024,
+        "supported_dimensions": [1024],
+        "normalized": True,
+        "opensearch_space_type": "innerproduct",
+        "pgvector_ops": "vector_cosine_ops",
+        "hnsw": {"m": 16, "ef_construction": 512, "ef_search": 512},
+    },
+}
+
+
+def get_embedding_model(embedding_model_id):
+    if embedding_model_id not in EMBEDDING_MODELS:
+        raise Exception("Unsupported embedding model id {} provided!".format(embedding_model_id))
+    return EMBEDDING_MODELS[embedding_model_id]
+
+
+def get_embedding_dimension(embedding_model_id, dimension=None):
+    model = get_embedding_model(embedding_model_id)
+    if not dimension:
+        return model["dimension"]
+    dimension = int(dimension)
+    if dimension not in model["supported_dimensions"]:
+        raise Exception(
+            "Embedding model {} does not support dimension {}, expected one of {}".format(
+                embedding_model_id, dimension, model["supported_dimensions"]
+            )
+        )
+    return dimension
+
+
+def build_embedding_request(embedding_model_id, text, dimension=None):
+    # The InvokeModel body embedding a search query. Only models with several sizes take a dimension
+    model = get_embedding_model(embedding_model_id)
+    if model["request_format"] == "cohere":
+        return {"texts": [text], "input_type": "search_query"}
+    body = {"inputText": text}
+    if len(model["supported_dimensions"]) > 1:
+        body["dimensions"] = get_embedding_dimension(embedding_model_id, dimension)
+    return body
+
+
+def parse_embedding_response(embedding_model_id, body):
+    if get_embedding_model(embedding_model_id)["request_format"] == "cohere":
+        return body["embeddings"][0]
+    return body["embedding"]
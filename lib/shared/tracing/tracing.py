@@ -0,0 +1,65 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+import os
+from contextlib import contextmanager
+from time import perf_counter
+
+from aws_lambda_powertools import Logger, Metrics, Tracer
+from aws_lambda_powertools.metrics import MetricUnit, single_metric
+
+# Shared by the action-group Lambdas: one Logger / Tracer / Metrics per process, configured through the
+# standard POWERTOOLS_* environment variables. POWERTOOLS_LOG_LEVEL=DEBUG brings back full payload logging,
+# which hot paths only format at debug level.
+SERVICE_NAME = os.environ.get("POWERTOOLS_SERVICE_NAME", "crypto_ai_agent")
+METRICS_NAMESPACE = os.environ.get("POWERTOOLS_METRICS_NAMESPACE", "CryptoAIAgent")
+# Off-Lambda runs (benchmarks) set this to keep the EMF blobs out of stdout
+METRICS_DISABLED = os.environ.get("POWERTOOLS_METRICS_DISABLED", "false").lower() == "true"
+
+logger = Logger(service=SERVICE_NAME, level=os.environ.get("POWERTOOLS_LOG_LEVEL", "INFO"))
+tracer = Tracer(service=SERVICE_NAME)
+metrics = Metrics(service=SERVICE_NAME, namespace=METRICS_NAMESPACE)
+
+
+def _emit(name, dimension_name, dimension_value, latency_ms, failed):
+    # single_metric flushes its own EMF blob, so every dependency / function gets its own dimension value
+    if METRICS_DISABLED:
+        return
+    with single_metric(
+        name=f"{name}Latency", unit=MetricUnit.Milliseconds, value=latency_ms, namespace=METRICS_NAMESPACE
+    ) as metric:
+        metric.add_dimension(name=dimension_name, value=dimension_value)
+    with single_metric(
+        name=f"{name}Errors", unit=MetricUnit.Count, value=1 if failed else 0, namespace=METRICS_NAMESPACE
+    ) as metric:
+        metric.add_dimension(name=dimension_name, value=dimension_value)
+
+
+@contextmanager
+def _timed_span(kind, dimension_name, name, operation=None):
+    segment_name = f"## {name}.{operation}" if operation else f"## {name}"
+    start = perf_counter()
+    failed = False
+    with tracer.provider.in_subsegment(segment_name) as subsegment:
+        subsegment.put_annotation(dimension_name, name)
+        if operation:
+            subsegment.put_annotation("Operation", operation)
+        try:
+            yield subsegment
+        except Exception:
+            # the subsegment records the exception itself when it propagates
+            failed = True
+            raise
+        finally:
+            latency_ms = (perf_counter() - start) * 1000
+            logger.debug("%s %s took %.1f ms (failed=%s)", segment_name[3:], kind, latency_ms, failed)
+            _emit(kind, dimension_name, name, latency_ms, failed)
+
+
+def trace_dependency(dependency, operation):
+    # Wraps one external call (KMS, RPC, CoinGecko, Athena, Bedrock ...)
+    return _timed_span("Dependency", "Dependency", dependency, operation)
+
+
+def trace_function(function_name):
+    # Wraps one agent function (sendTx, getBalance, /athenaQuery ...)
+    return _timed_span("Function", "AgentFunction", function_name)
@@ -21,7 +21,14 @@ export interface EnvironmentConfig {
     overlapPercentage: number;
     coinGeckoAPIKey: string;
     blockchainRPCURL: string | null;
+    blockchainRPCURLs: string | null;
+    chainRPCURLs: Record<string, string>;
+    defaultChain: string | null;
     unstoppableDomainsAddress: string | null;
+    indexProfile: string | null;
+    embeddingDimension: string | null;
+    blueGreenIndex: boolean;
+    logLevel: string;
 }
 
 export function getConfig(): EnvironmentConfig {
@@ -38,6 +45,16 @@ export function getConfig(): EnvironmentConfig {
       overlapPercentage:  parseInt(getRequiredEnvVar('OVERLAP_PERCENTAGE') || '20', 10),
       coinGeckoAPIKey: getRequiredEnvVar('COINGECKO_API_KEY'),
       blockchainRPCURL: process.env.BLOCKCHAIN_RPC_URL || null,
-      unstoppableDomainsAddress: process.env.UNSTOPPABLE_DOMAINS_ADDRESS || null
+      blockchainRPCURLs: process.env.BLOCKCHAIN_RPC_URLS || null,
+      // BLOCKCHAIN_RPC_URLS_<CHAIN> for the other chains of the supervisor Lambda's chain registry
+      chainRPCURLs: Object.fromEntries(
+        Object.entries(process.env).filter(([name, value]) => name.startsWith('BLOCKCHAIN_RPC_URLS_') && value)
+      ) as Record<string, string>,
+      defaultChain: process.env.DEFAULT_CHAIN || null,
+      unstoppableDomainsAddress: process.env.UNSTOPPABLE_DOMAINS_ADDRESS || null,
+      indexProfile: process.env.INDEX_PROFILE || null,
+      embeddingDimension: process.env.EMBEDDING_DIMENSION || null,
+      blueGreenIndex: (process.env.BLUE_GREEN_INDEX || 'false').toLowerCase() === 'true',
+      logLevel: (process.env.LOG_LEVEL || 'INFO').toUpperCase()
     };
 }